@@ -10,6 +10,8 @@ Agent Endpoints
 - POST /agents/{agent_id}/clone: 克隆智能体
 - GET /agents/templates: 检索模板智能体列表
 - GET /agents/active: 检索活动智能体列表
+- POST /agents/prewarm: 预构建智能体模板（模型客户端、工具、指令）
+- GET /agents/pool/stats: 智能体池统计（会话数、模板数、内存估算）
 
 
 对应的前端页面：
@@ -25,7 +27,7 @@ Agent Endpoints
 - 删除智能体
 - 克隆智能体
 """
-from typing import List
+from typing import List, Optional
 import shutil
 from pathlib import Path
 import uuid
@@ -33,6 +35,7 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.agent_pool import agent_pool
 from app.core.i18n import _
 from app.crud.crud_agent import agent as crud_agent
 from app.db.session import get_db
@@ -93,6 +96,20 @@ async def create_agent(*, db: AsyncSession = Depends(get_db), agent_in: AgentCre
     return agent
 
 
+@router.post("/prewarm", summary=_("Prewarm agent templates"), description=_("Build shared agent templates ahead of the first chat."))
+async def prewarm_agents(*, db: AsyncSession = Depends(get_db), agent_ids: Optional[List[str]] = Body(None, embed=True)):
+    """
+    Prewarm agent templates (all active agents when agent_ids is empty).
+    """
+    from app.services.eah_agent.core.agent_manager import agent_manager
+    return await agent_manager.prewarm_templates(db, agent_ids or None)
+
+
+@router.get("/pool/stats", summary=_("Agent pool stats"), description=_("Session agents, shared templates and their approximate memory."))
+async def agent_pool_stats():
+    return agent_pool.stats()
+
+
 @router.get("/{agent_id}", response_model=AgentResponse, summary=_("Get agent"), description=_("Get an agent by ID."))
 async def read_agent(*, db: AsyncSession = Depends(get_db), agent_id: str):
     """
@@ -114,6 +131,7 @@ async def update_agent(*, db: AsyncSession = Depends(get_db), agent_id: str, age
     agent = await agent_service.update_agent(db, agent_id, agent_in)
     if not agent:
         raise HTTPException(status_code=404, detail=_("Agent not found"))
+    agent_pool.invalidate_templates(f"agent:{agent_id}:")
     return agent
 
 
@@ -136,6 +154,8 @@ async def delete_agents_batch(*, db: AsyncSession = Depends(get_db), agent_ids:
     """
     from app.services.eah_agent.core.service import agent_service
     deleted_ids = await agent_service.delete_agents(db, agent_ids)
+    for agent_id in deleted_ids:
+        agent_pool.invalidate_templates(f"agent:{agent_id}:")
     return {"deleted": deleted_ids}
 
 
@@ -148,4 +168,5 @@ async def delete_agent(*, db: AsyncSession = Depends(get_db), agent_id: str):
     agent = await agent_service.delete_agent(db, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail=_("Agent not found"))
+    agent_pool.invalidate_templates(f"agent:{agent_id}:")
     return agent
@@ -4,6 +4,7 @@ Chat Endpoints（/chat）
 - POST /chat/sessions: 创建新会话
 - POST /chat/sessions/{session_id}: 发送消息到会话
 - GET /chat/sessions/{session_id}: 获取会话详情
+- GET /chat/sessions/{session_id}/messages: 分页获取会话消息（before_id 向前翻页）
 - PUT /chat/sessions/{session_id}: 更新会话状态
 - DELETE /chat/sessions/{session_id}: 删除会话
 对应的前端页面：
@@ -28,14 +29,14 @@ Chat Endpoints（/chat）
 import json
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.crud_chat import chat as crud_chat
 from app.db.session import get_db
-from app.schemas.chat import ChatSessionCreate, ChatSessionResponse, ChatSessionUpdate
+from app.schemas.chat import ChatMessageWindowItem, ChatSessionCreate, ChatSessionResponse, ChatSessionUpdate
 from app.services.eah_agent.core.qa import qa_service  # Fallback
 
 router = APIRouter()
@@ -61,6 +62,17 @@ async def get_session(session_id: str, db: AsyncSession = Depends(get_db)):
     return session
 
 
+@router.get("/sessions/{session_id}/messages", response_model=List[ChatMessageWindowItem])
+async def list_session_messages(
+    session_id: str,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+):
+    """最近的 limit 条消息（时间正序）；传入 before_id 获取该消息之前的更早消息。"""
+    return await crud_chat.get_history_window(db, session_id, limit=limit, before_id=before_id)
+
+
 @router.delete("/sessions/{session_id}")
 async def delete_session(session_id: str, db: AsyncSession = Depends(get_db)):
     await crud_chat.remove(db, session_id)
@@ -20,6 +20,7 @@ import logging
 import os
 import time
 import uuid
+from typing import Optional
 
 import aiofiles
 from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
@@ -111,9 +112,16 @@ async def get_table_data(table_name: str, limit: int = 100, offset: int = 0):
 
 
 @router.post("/table/{table_name}/convert_to_graph")
-async def convert_table_to_graph(table_name: str, background_tasks: BackgroundTasks):
+async def convert_table_to_graph(
+    table_name: str,
+    background_tasks: BackgroundTasks,
+    incremental: bool = False,
+    updated_column: Optional[str] = None,
+):
     """
     Start a background task to convert table data to Knowledge Graph.
+    Interrupted conversions resume from their checkpoint; incremental=true only converts rows
+    modified since the last run (by updated_column, auto-detected when omitted).
     """
     job_id = str(uuid.uuid4())
     update_job_status(job_id, "pending", 0, "任务已创建")
@@ -122,7 +130,9 @@ async def convert_table_to_graph(table_name: str, background_tasks: BackgroundTa
         data_query_service.convert_table_to_graph_task,
         job_id,
         table_name,
-        update_job_status
+        update_job_status,
+        incremental,
+        updated_column,
     )
 
     return {"job_id": job_id, "message": "转换任务已开始"}
@@ -146,6 +156,11 @@ from app.services.nlu.classifier import IntentClassifier, QueryIntent
 kg_query_service = KGQueryService.get_instance()
 intent_classifier = IntentClassifier.get_instance()
 
+@router.get("/intent/stats")
+async def intent_router_stats():
+    """意图路由各层（缓存/关键词/本地模型/LLM）的命中次数与平均耗时。"""
+    return intent_classifier.stats()
+
 @router.post("/query")
 async def query_data(request: VannaRequest):
     """
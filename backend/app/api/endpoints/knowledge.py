@@ -95,11 +95,22 @@ async def clean_vector_store(db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/vector/rebuild")
-async def rebuild_vector_store(db: AsyncSession = Depends(get_db)):
-    await lightrag_engine.rebuild_store(db)
+async def rebuild_vector_store(resume: bool = False, db: AsyncSession = Depends(get_db)):
+    await lightrag_engine.rebuild_store(db, resume=resume)
     return {"status": "rebuilt"}
 
 
+@router.get("/vector/rebuild/progress")
+async def rebuild_vector_store_progress():
+    return {"progress": lightrag_engine.get_rebuild_progress()}
+
+
+@router.post("/vector/segments/mount")
+async def mount_pathway_segments(embed: bool = True, db: AsyncSession = Depends(get_db)):
+    await lightrag_engine.ensure_initialized(db)
+    return {"status": "mounted", "counts": await lightrag_engine.mount_segments(embed=embed)}
+
+
 async def safe_update_status(
     doc_id: int, status: DocumentStatus, msg: str = None, oss_key: str = None, oss_url: str = None
 ):
@@ -215,12 +226,18 @@ async def background_upload_and_index(doc_id: int, temp_file_path: str, unique_f
             # [Optimization] Run parsing in thread pool to avoid blocking event loop
             import asyncio
 
-            text = await asyncio.to_thread(parse_local_file, str(temp_file_path))
+            text = await asyncio.to_thread(parse_local_file, str(temp_file_path), oss_key)
 
             logger.info(f"解析文本长度={len(text or '')}")
             if not text:
                 raise RuntimeError("解析到的文本为空，无法索引")
 
+            # 预热 QA 内容检索的词法索引，后续提问无需再读取文件
+            try:
+                await asyncio.to_thread(qa_service.build_lexical_index, doc_id, text, oss_key)
+            except Exception as e:
+                logger.warning(f"词法索引预热失败 文档ID={doc_id}: {e}")
+
             max_first = 5000  # [Optimization] Reduce first chunk size for faster feedback
             seg_size = 20000  # Smaller segments for more granular progress updates
             first = text[:max_first]
@@ -23,6 +23,7 @@ from openai import APIStatusError, APITimeoutError, AsyncOpenAI, AuthenticationE
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.agent_pool import agent_pool
 from app.db.session import get_db
 from app.models.llm_model import LLMModel
 from app.schemas.llm_model import LLMModelCreate, LLMModelResponse, LLMModelUpdate, LLMTestRequest, LLMTestResponse
@@ -148,6 +149,7 @@ async def create_llm_model(model_in: LLMModelCreate, db: AsyncSession = Depends(
     )
     db.add(new_model)
     await db.commit()
+    agent_pool.invalidate_templates()
     await db.refresh(new_model)
     return new_model
 
@@ -167,6 +169,7 @@ async def update_llm_model(model_id: int, model_in: LLMModelUpdate, db: AsyncSes
         setattr(model, field, value)
 
     await db.commit()
+    agent_pool.invalidate_templates()
     await db.refresh(model)
     return model
 
@@ -183,4 +186,5 @@ async def delete_llm_model(model_id: int, db: AsyncSession = Depends(get_db)):
 
     await db.delete(model)
     await db.commit()
+    agent_pool.invalidate_templates()
     return {"status": "deleted", "id": model_id}
@@ -3,6 +3,7 @@ MCP Server Endpoint
 前端接口：
 - HTTP POST `/mcp/servers/` 接口作用：创建新的MCP服务器
 - HTTP GET `/mcp/servers/` 接口作用：获取所有MCP服务器
+- HTTP GET `/mcp/servers/pool/stats` 接口作用：MCP会话池统计（连接、工具schema缓存、在途调用）
 - HTTP GET `/mcp/servers/{server_id}` 接口作用：获取指定MCP服务器详情
 - HTTP PATCH `/mcp/servers/{server_id}` 接口作用：更新指定MCP服务器
 - HTTP DELETE `/mcp/servers/{server_id}` 接口作用：删除指定MCP服务器
@@ -27,6 +28,8 @@ from sqlalchemy import select, or_, desc
 from app.db.session import get_db
 from app.models.mcp import MCPServer
 from app.schemas.mcp import MCPServer as MCPServerSchema, MCPServerCreate, MCPServerUpdate
+from app.services.mcp.client import mcp_pool
+from app.services.mcp.session_pool import mcp_session_pool
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -156,6 +159,18 @@ async def list_mcp_servers(
     servers = result.scalars().all()
     return servers
 
+@router.get("/pool/stats")
+async def get_mcp_pool_stats():
+    """
+    Pooled MCP sessions (stdio / HTTP / SSE) and legacy WebSocket clients.
+    """
+    return {
+        **mcp_session_pool.stats(),
+        "websocket_clients": [
+            {"url": url, **client.get_metrics()} for url, client in mcp_pool.clients.items()
+        ],
+    }
+
 @router.get("/{server_id}", response_model=MCPServerSchema)
 async def get_mcp_server(
     server_id: str,
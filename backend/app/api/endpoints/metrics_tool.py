@@ -3,6 +3,7 @@ Metrics Tool Endpoint
 前端接口：
 - HTTP POST `/metrics_tool/parse_doc/` 接口作用：解析上传的文档
 - HTTP POST `/metrics_tool/parse_knowledge_doc/` 接口作用：解析知识库文档
+- HTTP POST `/metrics_tool/extract/stream` 接口作用：流式指标提取（NDJSON，分块完成即返回部分合并结果）
 前端功能：
 - 解析上传的文档内容
 - 解析知识库文档内容
@@ -11,10 +12,12 @@ Metrics Tool Endpoint
 功能模块：
 - 指标工具管理
 """
+import json
 from typing import List, Optional
 
 import requests
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -22,7 +25,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 from app.models.knowledge import KnowledgeDocument
 from app.services.rag.knowledge.parser import parse_document
-from app.services.chatbi.extraction import run_extraction, generate_prompt
+from app.services.chatbi.extraction import run_extraction, stream_extraction, generate_prompt
 from app.services.storage.service import storage_service
 
 router = APIRouter()
@@ -204,10 +207,8 @@ class ExtractionResponse(BaseModel):
     prompt_used: Optional[str] = None
 
 
-@router.post("/extract", response_model=ExtractionResponse)
-async def extract_metric(request: ExtractionRequest):
-    # 1. Generate Prompt
-    prompt = generate_prompt(
+def _extraction_prompt(request: ExtractionRequest) -> str:
+    return generate_prompt(
         name=request.indicator_name,
         definition=request.definition,
         output_format=request.output_format,
@@ -218,7 +219,25 @@ async def extract_metric(request: ExtractionRequest):
         advanced_options=request.advanced_options.dict() if request.advanced_options else None,
     )
 
+
+@router.post("/extract", response_model=ExtractionResponse)
+async def extract_metric(request: ExtractionRequest):
+    # 1. Generate Prompt
+    prompt = _extraction_prompt(request)
+
     # 2. Run LLM
     result = await run_extraction(prompt=prompt, text_content=request.text_content, model=request.model)
 
     return ExtractionResponse(status=result["status"], content=result["content"], prompt_used=prompt)
+
+
+@router.post("/extract/stream")
+async def extract_metric_stream(request: ExtractionRequest):
+    """每行一个 JSON：分块完成时 status=partial（含 done/total），最后一行为最终结果。"""
+    prompt = _extraction_prompt(request)
+
+    async def ndjson():
+        async for event in stream_extraction(prompt=prompt, text_content=request.text_content, model=request.model):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -20,6 +20,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app.core.agent_pool import agent_pool
 from app.db.session import get_db
 from app.models.llm_model import LLMModel
 from app.schemas.llm_model import LLMModelCreate, LLMModelResponse, LLMModelUpdate
@@ -51,6 +52,7 @@ async def create_model(model_in: LLMModelCreate, db: AsyncSession = Depends(get_
     db_model = LLMModel(**model_in.model_dump())
     db.add(db_model)
     await db.commit()
+    agent_pool.invalidate_templates()
     await db.refresh(db_model)
     return db_model
 
@@ -74,6 +76,7 @@ async def update_model(model_id: int, model_in: LLMModelUpdate, db: AsyncSession
         setattr(db_model, field, value)
 
     await db.commit()
+    agent_pool.invalidate_templates()
     await db.refresh(db_model)
     return db_model
 
@@ -87,6 +90,7 @@ async def delete_model(model_id: int, db: AsyncSession = Depends(get_db)):
 
     await db.delete(db_model)
     await db.commit()
+    agent_pool.invalidate_templates()
     return {"ok": True}
 
 
@@ -104,5 +108,6 @@ async def activate_model(model_id: int, db: AsyncSession = Depends(get_db)):
 
     db_model.is_active = True
     await db.commit()
+    agent_pool.invalidate_templates()
     await db.refresh(db_model)
     return db_model
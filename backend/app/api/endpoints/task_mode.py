@@ -60,18 +60,20 @@ async def create_task(payload: TaskCreate, db: AsyncSession = Depends(get_db)):
 
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
 async def get_task(task_id: str, db: AsyncSession = Depends(get_db)):
-    cache_key = f"task_mode:task:{task_id}"
-    cached = await cache.get_json(cache_key)
-    if cached is not None:
-        return cached
+    async def load():
+        task = await task_mode.get_task(db, task_id)
+        if task is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return TaskResponse.model_validate(task).model_dump(mode="json")
+
+    return await cache.get_or_compute(
+        f"task_mode:task:{task_id}", load, ttl_seconds=settings.TASK_MODE_CACHE_TTL_SECONDS
+    )
 
-    task = await task_mode.get_task(db, task_id)
-    if task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
 
-    data = TaskResponse.model_validate(task).model_dump()
-    await cache.set_json(cache_key, data, ttl_seconds=settings.TASK_MODE_CACHE_TTL_SECONDS)
-    return data
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return cache.stats()
 
 
 @router.get("/tasks", response_model=List[TaskResponse])
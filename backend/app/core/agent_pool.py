@@ -1,20 +1,115 @@
-from cachetools import TTLCache
+import asyncio
+import copy
+import hashlib
+import json
 import logging
+import sys
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from agno.agent import Agent as AgnoAgent
+from cachetools import TTLCache
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+SessionToolFactory = Callable[[str], Any]
+
+
+def config_hash(*parts: Any) -> str:
+    """Stable short hash of JSON-able configuration parts (agent config columns, model id, flags...)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _approx_size(obj: Any, depth: int = 3, seen: Optional[set] = None) -> int:
+    """Rough recursive sys.getsizeof, bounded in depth; shared objects are counted once."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj, 0)
+    if depth <= 0 or isinstance(obj, (str, bytes, int, float, bool)):
+        return size
+    if isinstance(obj, dict):
+        items = list(obj.keys()) + list(obj.values())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        items = list(obj)
+    elif hasattr(obj, "__dict__"):
+        items = list(vars(obj).values())
+    else:
+        return size
+    return size + sum(_approx_size(i, depth - 1, seen) for i in items)
+
+
+class AgentTemplate:
+    """
+    Session-independent part of an agent: model client, shared tool instances, compiled instructions.
+
+    Built once per agent config and shared by every session; ``instantiate`` creates the cheap
+    per-session Agno agent (shallow-copied model that reuses the HTTP client, shared tools plus
+    the session-scoped tools such as the sandbox).
+    """
+
+    def __init__(
+        self,
+        key: str,
+        agent_kwargs: Dict[str, Any],
+        session_tools: Optional[List[SessionToolFactory]] = None,
+        agent_obj: Any = None,
+        deepseek_like: bool = False,
+    ):
+        self.key = key
+        self.agent_kwargs = agent_kwargs
+        self.session_tools = session_tools or []
+        self.agent_obj = agent_obj
+        self.deepseek_like = deepseek_like
+        self.nbytes = _approx_size(
+            {"instructions": agent_kwargs.get("instructions"), "tools": agent_kwargs.get("tools")}
+        )
+
+    def instantiate(self, session_id: Optional[str] = None) -> AgnoAgent:
+        kwargs = dict(self.agent_kwargs)
+        kwargs["model"] = copy.copy(kwargs["model"])
+        tools = list(kwargs.get("tools") or [])
+        for factory in self.session_tools:
+            try:
+                tools.append(factory(session_id))
+            except Exception as e:
+                logger.error(f"Failed to create session tool for {self.key}: {e}")
+        kwargs["tools"] = tools
+        return AgnoAgent(**kwargs)
+
+
 class AgentPool:
     """
-    LRU/TTL Cache for Agent instances to avoid re-initialization overhead.
+    Two-level agent cache.
+
+    - Templates (``AgentTemplate``), keyed by agent id + config hash: the expensive part (DB lookups,
+      model client, tool instances / MCP discovery, instructions). LRU with a TTL.
+    - Session entries, keyed ``session_id:mode``: the per-session agent built from a template.
+      Cheap to rebuild, so losing one to TTL/LRU only costs a template lookup.
+
+    Template builds are single-flight: concurrent cold sessions of the same agent share one build.
     """
-    def __init__(self, max_size=100, ttl=300):
-        # Cache up to 100 agents, expire after 5 minutes of inactivity
-        self.cache = TTLCache(maxsize=max_size, ttl=ttl)
+
+    def __init__(self, max_size: int = None, ttl: int = None, template_size: int = None, template_ttl: int = None):
+        self.cache = TTLCache(maxsize=max_size or settings.AGENT_POOL_SESSION_SIZE,
+                              ttl=ttl or settings.AGENT_POOL_SESSION_TTL_SECONDS)
+        self.templates = TTLCache(maxsize=template_size or settings.AGENT_TEMPLATE_CACHE_SIZE,
+                                  ttl=template_ttl or settings.AGENT_TEMPLATE_TTL_SECONDS)
+        self._building: Dict[str, asyncio.Future] = {}
+        self._stats = {"session_hits": 0, "session_misses": 0, "template_hits": 0, "template_builds": 0}
+
+    # --- session entries ---
 
     def get(self, key: str):
         agent = self.cache.get(key)
         if agent:
+            self._stats["session_hits"] += 1
             logger.debug(f"Agent cache hit for {key}")
+        else:
+            self._stats["session_misses"] += 1
         return agent
 
     def put(self, key: str, value: any):
@@ -25,4 +120,59 @@ class AgentPool:
         if key in self.cache:
             del self.cache[key]
 
+    # --- templates ---
+
+    async def get_or_build_template(self, key: str, build: Callable[[], Awaitable[AgentTemplate]]) -> AgentTemplate:
+        template = self.templates.get(key)
+        if template is not None:
+            self._stats["template_hits"] += 1
+            return template
+
+        pending = self._building.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            template = await build()
+            self._stats["template_builds"] += 1
+            self.templates[key] = template
+            future.set_result(template)
+            return template
+        except BaseException as e:
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Avoid "exception was never retrieved" when nobody else was waiting
+                    future.exception()
+            raise
+        finally:
+            self._building.pop(key, None)
+
+    def invalidate_templates(self, prefix: str = ""):
+        """Drop templates whose key starts with ``prefix`` (all when empty) and the sessions built from them."""
+        for key in [k for k in self.templates.keys() if k.startswith(prefix)]:
+            self.templates.pop(key, None)
+        for key, value in list(self.cache.items()):
+            template_key = value[3] if isinstance(value, tuple) and len(value) > 3 else None
+            if template_key is None or template_key.startswith(prefix):
+                self.cache.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        templates = list(self.templates.values())
+        return {
+            **self._stats,
+            "sessions": len(self.cache),
+            "sessions_max": self.cache.maxsize,
+            "templates": len(templates),
+            "templates_max": self.templates.maxsize,
+            # Shared components are counted once per template; session agents only add a small wrapper
+            "templates_approx_bytes": sum(t.nbytes for t in templates),
+            "template_keys": [t.key for t in templates],
+        }
+
+
 agent_pool = AgentPool()
@@ -1,12 +1,23 @@
 import asyncio
+import inspect
 import json
+import logging
 import time
-from typing import Any, Optional
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
 
 import redis.asyncio as redis
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Result handed to single-flight waiters when the loading coroutine is cancelled
+_LEADER_CANCELLED = object()
+
 
 class _MemoryEntry:
     __slots__ = ("value", "expires_at")
@@ -16,15 +27,49 @@ class _MemoryEntry:
         self.expires_at = expires_at
 
 
+class _Stats:
+    __slots__ = (
+        "l1_hits", "l2_hits", "misses", "loads", "load_errors", "coalesced",
+        "evictions", "redis_errors", "invalidations_received", "l2_time", "l2_calls", "load_time",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+
 class Cache:
+    """
+    Two-tier JSON cache.
+
+    - L1: in-process LRU with TTL, bounded by ``CACHE_L1_MAX_ENTRIES``. While Redis is up, L1 entries
+      live at most ``CACHE_L1_TTL_SECONDS`` and are dropped on pub/sub invalidation from other workers.
+      While Redis is down, L1 is the only tier and keeps the caller's TTL.
+    - L2: Redis. Connection failures back off exponentially instead of re-pinging on every call.
+    - ``get_or_compute`` coalesces concurrent misses for the same key into a single loader call.
+    """
+
     def __init__(self):
         self._redis: Optional[redis.Redis] = None
-        self._memory: dict[str, _MemoryEntry] = {}
+        self._memory: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
         self._lock = asyncio.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._max_entries = max(1, settings.CACHE_L1_MAX_ENTRIES)
+        self._l1_ttl = settings.CACHE_L1_TTL_SECONDS
+        self._retry_at = 0.0
+        self._backoff = 0.0
+        self._instance_id = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self._stats = _Stats()
 
+    # ------------------------------------------------------------------
+    # Redis health
+    # ------------------------------------------------------------------
     async def _get_redis(self) -> Optional[redis.Redis]:
         if self._redis is not None:
             return self._redis
+        if time.monotonic() < self._retry_at:
+            return None
         try:
             client = redis.Redis(
                 host=settings.REDIS_HOST,
@@ -35,45 +80,214 @@ class Cache:
             )
             await client.ping()
             self._redis = client
+            self._backoff = 0.0
+            self._start_listener(client)
             return self._redis
         except Exception:
-            self._redis = None
+            self._mark_down()
             return None
 
+    def _mark_down(self) -> None:
+        self._stats.redis_errors += 1
+        self._redis = None
+        self._backoff = min(max(self._backoff * 2, 1.0), settings.CACHE_REDIS_MAX_BACKOFF_SECONDS)
+        self._retry_at = time.monotonic() + self._backoff
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def redis_client(self) -> Optional[redis.Redis]:
+        """Shared Redis client for other Redis-backed structures; None while Redis is down (backing off)."""
+        return await self._get_redis()
+
+    def mark_redis_down(self) -> None:
+        self._mark_down()
+
+    def _start_listener(self, client: redis.Redis) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen(client))
+
+    async def _listen(self, client: redis.Redis) -> None:
+        try:
+            pubsub = client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    origin, key = message["data"].split(":", 1)
+                except (AttributeError, ValueError):
+                    continue
+                if origin != self._instance_id:
+                    self._stats.invalidations_received += 1
+                    self._memory.pop(key, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener stopped: {e}")
+
+    async def _publish_invalidation(self, client: redis.Redis, key: str) -> None:
+        await client.publish(INVALIDATION_CHANNEL, f"{self._instance_id}:{key}")
+
+    # ------------------------------------------------------------------
+    # L1
+    # ------------------------------------------------------------------
+    def _l1_get(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.time():
+            self._memory.pop(key, None)
+            return None
+        self._memory.move_to_end(key)
+        return entry.value
+
+    def _l1_set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        self._memory[key] = _MemoryEntry(value=value, expires_at=time.time() + ttl_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self._stats.evictions += 1
+
+    def _l1_ttl_for(self, ttl_seconds: int, redis_up: bool) -> float:
+        return min(ttl_seconds, self._l1_ttl) if redis_up else ttl_seconds
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
     async def get_json(self, key: str) -> Optional[Any]:
+        async with self._lock:
+            value = self._l1_get(key)
+        if value is not None:
+            self._stats.l1_hits += 1
+            return value
+
         client = await self._get_redis()
         if client is not None:
-            raw = await client.get(key)
+            start = time.perf_counter()
+            try:
+                raw = await client.get(key)
+            except Exception:
+                self._mark_down()
+                self._stats.misses += 1
+                return None
+            finally:
+                self._stats.l2_time += time.perf_counter() - start
+                self._stats.l2_calls += 1
             if raw is None:
+                self._stats.misses += 1
                 return None
-            return json.loads(raw)
+            value = json.loads(raw)
+            self._stats.l2_hits += 1
+            async with self._lock:
+                self._l1_set(key, value, self._l1_ttl)
+            return value
 
-        async with self._lock:
-            entry = self._memory.get(key)
-            if entry is None:
-                return None
-            if entry.expires_at < time.time():
-                self._memory.pop(key, None)
-                return None
-            return entry.value
+        self._stats.misses += 1
+        return None
 
     async def set_json(self, key: str, value: Any, ttl_seconds: int) -> None:
         client = await self._get_redis()
         if client is not None:
-            await client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl_seconds)
-            return
+            payload = json.dumps(value, ensure_ascii=False, default=str)
+            try:
+                await client.set(key, payload, ex=ttl_seconds)
+                await self._publish_invalidation(client, key)
+            except Exception:
+                self._mark_down()
+                client = None
 
         async with self._lock:
-            self._memory[key] = _MemoryEntry(value=value, expires_at=time.time() + ttl_seconds)
+            self._l1_set(key, value, self._l1_ttl_for(ttl_seconds, client is not None))
 
     async def delete(self, key: str) -> None:
-        client = await self._get_redis()
-        if client is not None:
-            await client.delete(key)
-            return
         async with self._lock:
             self._memory.pop(key, None)
+        client = await self._get_redis()
+        if client is not None:
+            try:
+                await client.delete(key)
+                await self._publish_invalidation(client, key)
+            except Exception:
+                self._mark_down()
 
+    async def get_or_compute(
+        self,
+        key: str,
+        loader: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl_seconds: int,
+    ) -> Any:
+        """
+        Return the cached value for ``key``; on a miss call ``loader`` (sync or async) once,
+        even when many coroutines miss the same key concurrently, and cache its result.
+        ``None`` results are returned but not cached.
+        """
+        while True:
+            value = await self.get_json(key)
+            if value is not None:
+                return value
 
-cache = Cache()
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self._stats.coalesced += 1
+            value = await asyncio.shield(pending)
+            if value is not _LEADER_CANCELLED:
+                return value
+            # The loading coroutine was cancelled; retry so one of the waiters takes over the load
 
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            start = time.perf_counter()
+            try:
+                value = loader()
+                if inspect.isawaitable(value):
+                    value = await value
+            except BaseException:
+                self._stats.load_errors += 1
+                raise
+            finally:
+                self._stats.loads += 1
+                self._stats.load_time += time.perf_counter() - start
+            if value is not None:
+                await self.set_json(key, value, ttl_seconds)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    # Cancellation belongs to the caller, not to the waiters sharing the load
+                    future.set_result(_LEADER_CANCELLED)
+                else:
+                    future.set_exception(e)
+                    # Avoid "exception was never retrieved" when nobody else was waiting
+                    future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        s = self._stats
+        lookups = s.l1_hits + s.l2_hits + s.misses
+        return {
+            "l1_size": len(self._memory),
+            "l1_max_entries": self._max_entries,
+            "l1_hits": s.l1_hits,
+            "l2_hits": s.l2_hits,
+            "misses": s.misses,
+            "hit_ratio": round((s.l1_hits + s.l2_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": s.evictions,
+            "loads": s.loads,
+            "load_errors": s.load_errors,
+            "coalesced": s.coalesced,
+            "avg_load_ms": round(s.load_time / s.loads * 1000, 3) if s.loads else 0.0,
+            "avg_l2_ms": round(s.l2_time / s.l2_calls * 1000, 3) if s.l2_calls else 0.0,
+            "redis_errors": s.redis_errors,
+            "redis_up": self._redis is not None,
+            "invalidations_received": s.invalidations_received,
+        }
+
+
+cache = Cache()
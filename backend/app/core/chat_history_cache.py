@@ -0,0 +1,92 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import cache
+from app.core.config import settings
+
+KEY_PREFIX = "chat:history:"
+# First element of a list that holds the whole session (nothing older exists in the database)
+_START = json.dumps({"start": True})
+
+
+class ChatHistoryCache:
+    """
+    Tail of each chat session's messages in a Redis list (oldest first, one JSON entry per message).
+
+    - Filled from the database on a miss, then kept current by ``append`` when messages are created
+      (``RPUSHX``: a session that is not cached stays uncached) and trimmed to ``max_entries``.
+    - A list that starts with the ``start`` marker holds the complete session, so windows longer
+      than the list can still be served from it.
+    - Updating a cached message drops the session's list (``drop``); an in-place LSET would race
+      with concurrent appends/trims shifting the indexes.
+    - Uses the shared Redis client of ``app.core.cache``; while Redis is down every call is a no-op / miss.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None):
+        self.max_entries = max_entries or settings.CHAT_HISTORY_CACHE_SIZE
+        self.ttl_seconds = ttl_seconds or settings.CHAT_HISTORY_CACHE_TTL_SECONDS
+
+    @staticmethod
+    def key(session_id: str) -> str:
+        return f"{KEY_PREFIX}{session_id}"
+
+    async def tail(self, session_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Last ``limit`` entries, or None when the cache cannot answer (miss / too short)."""
+        client = await cache.redis_client()
+        if client is None:
+            return None
+        try:
+            raw = await client.lrange(self.key(session_id), -(limit + 1), -1)
+        except Exception:
+            cache.mark_redis_down()
+            return None
+        if not raw:
+            return None
+        if raw[0] == _START:
+            return [json.loads(r) for r in raw[1:]]
+        if len(raw) > limit:
+            return [json.loads(r) for r in raw[-limit:]]
+        return None
+
+    async def fill(self, session_id: str, entries: List[Dict[str, Any]], complete: bool):
+        client = await cache.redis_client()
+        if client is None:
+            return
+        key = self.key(session_id)
+        values = ([_START] if complete else []) + [json.dumps(e, ensure_ascii=False, default=str) for e in entries]
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if values:
+                    pipe.rpush(key, *values)
+                    pipe.ltrim(key, -(self.max_entries + 1), -1)
+                    pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception:
+            cache.mark_redis_down()
+
+    async def append(self, session_id: str, entry: Dict[str, Any]):
+        client = await cache.redis_client()
+        if client is None:
+            return
+        key = self.key(session_id)
+        try:
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.rpushx(key, json.dumps(entry, ensure_ascii=False, default=str))
+                pipe.ltrim(key, -(self.max_entries + 1), -1)
+                pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception:
+            cache.mark_redis_down()
+
+    async def drop(self, session_id: str):
+        client = await cache.redis_client()
+        if client is None:
+            return
+        try:
+            await client.delete(self.key(session_id))
+        except Exception:
+            cache.mark_redis_down()
+
+
+chat_history_cache = ChatHistoryCache()
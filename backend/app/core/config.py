@@ -54,11 +54,36 @@ class Settings(BaseSettings):
     TASK_MODE_LOG_RETENTION_NORMAL_DAYS: int = 30
     TASK_MODE_LOG_RETENTION_IMPORTANT_DAYS: int = 365
 
+    # Task worker / 任务执行器
+    TASK_WORKER_CONCURRENCY: int = 8
+    TASK_STREAM_RECLAIM_IDLE_MS: int = 60000
+    TASK_STREAM_MAX_DELIVERIES: int = 3
+
     # Redis / 缓存
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     REDIS_PASSWORD: Optional[str] = None
+    CACHE_L1_MAX_ENTRIES: int = 2048
+    CACHE_L1_TTL_SECONDS: int = 10
+    CACHE_REDIS_MAX_BACKOFF_SECONDS: int = 30
+    # 聊天历史：每轮只加载最近 N 条 / token 预算内的消息；Redis 按会话缓存尾部消息
+    CHAT_HISTORY_WINDOW: int = 200
+    CHAT_HISTORY_TOKEN_BUDGET: int = 8000
+    CHAT_HISTORY_CACHE_SIZE: int = 200
+    CHAT_HISTORY_CACHE_TTL_SECONDS: int = 86400
+    # Agent 池：会话级 Agent（廉价包装）与按 Agent 配置共享的模板（模型客户端、工具、指令）
+    AGENT_POOL_SESSION_SIZE: int = 1000
+    AGENT_POOL_SESSION_TTL_SECONDS: int = 3600
+    AGENT_TEMPLATE_CACHE_SIZE: int = 64
+    AGENT_TEMPLATE_TTL_SECONDS: int = 3600
+    # 启动时预构建模板：all = 所有启用的 Agent，default = 仅默认 Agent，none = 不预热
+    AGENT_PREWARM_ON_STARTUP: str = "default"
+    # MCP 会话池：每个服务器同时在途的工具调用数、空闲关闭时间、健康检查（ping）间隔、连接超时
+    MCP_POOL_MAX_INFLIGHT: int = 8
+    MCP_POOL_IDLE_TIMEOUT_SECONDS: int = 600
+    MCP_POOL_HEALTH_CHECK_SECONDS: int = 30
+    MCP_POOL_CONNECT_TIMEOUT_SECONDS: int = 30
 
     # S3 Object Storage / 对象存储
     STORAGE_TYPE: str = "local"  # local, s3, aliyun_oss
@@ -159,6 +184,27 @@ class Settings(BaseSettings):
 
     # Smart Ask Data (Text-to-SQL) / 智能问数
     KG_Q2S_ENABLE: bool = True
+    # 查询结果上限：超过行数 / 字节数即截断，防止 SELECT * 拖垮进程
+    CHATBI_MAX_ROWS: int = 10000
+    CHATBI_MAX_BYTES: int = 64 * 1024 * 1024
+    CHATBI_FETCH_CHUNK_SIZE: int = 1000
+    # SQL 语义缓存：问题向量余弦相似度 >= 阈值即复用已生成的 SQL
+    CHATBI_SQL_CACHE_SIZE: int = 1000
+    CHATBI_SQL_CACHE_THRESHOLD: float = 0.95
+    # 表结构训练：每次 embeddings 请求的条数与并发请求数
+    CHATBI_EMBED_BATCH_SIZE: int = 64
+    CHATBI_EMBED_CONCURRENCY: int = 4
+    # 指标提取 Map-Reduce：并发分块数、单块超时（秒）与重试次数
+    EXTRACTION_CONCURRENCY: int = 8
+    EXTRACTION_CHUNK_TIMEOUT: float = 120
+    EXTRACTION_MAX_RETRIES: int = 2
+    # 数据表转图谱：每页行数与每篇文档包含的行数
+    GRAPH_CONVERT_PAGE_SIZE: int = 1000
+    GRAPH_CONVERT_ROWS_PER_DOC: int = 50
+    # 意图路由：问题→意图 LRU 缓存条数；本地分类器至少学习多少条 LLM 判定、置信度多高才直接采用
+    INTENT_CACHE_SIZE: int = 4096
+    INTENT_LOCAL_MIN_SAMPLES: int = 30
+    INTENT_LOCAL_MIN_CONFIDENCE: float = 0.9
 
     class Config:
         # Support loading from .env in backend directory regardless of cwd
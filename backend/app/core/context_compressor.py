@@ -1,16 +1,38 @@
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+import asyncio
+import hashlib
 import logging
 from app.services.llm.factory import ModelFactory
 from app.models.llm_model import LLMModel
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from app.db.session import AsyncSessionLocal
+from app.core.context_utils import count_tokens
 from sqlalchemy import select
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_META_KEY = "context_summary"
+MESSAGE_OVERHEAD = 4
+
+# Persists {"text": ..., "upto_id": ...} for a session once a fold completes
+SummaryPersist = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
 class ContextCompressor:
-    def __init__(self, model: Optional[LLMModel] = None):
+    """
+    Keeps chat history within a token budget with a rolling summary.
+
+    History messages may carry an ``id`` (chat message id). When the history exceeds
+    ``max_tokens``, the most recent messages that fit in half the budget are kept raw and
+    everything older is represented by the session's rolling summary. The summary is
+    persisted with a watermark (``upto_id``, the last message folded in); only messages
+    evicted after the watermark are folded into it, in a background task, so a chat turn
+    never waits on the summarizer. Token counts are cached per message.
+    """
+
+    def __init__(self, model: Optional[LLMModel] = None, token_cache_size: int = 20000):
         self.model = model
         self.agent = None
         if model:
@@ -21,103 +43,172 @@ class ContextCompressor:
                  # show_tool_calls=False,
                  markdown=True
              )
+        self._token_cache: "OrderedDict[Any, int]" = OrderedDict()
+        self._token_cache_size = token_cache_size
+        self._folding: Dict[str, asyncio.Task] = {}
 
-    async def compress_context(self, history: List[Dict[str, Any]], max_tokens: int = 4000) -> List[Dict[str, Any]]:
+    async def compress_context(
+        self,
+        history: List[Dict[str, Any]],
+        max_tokens: int = 4000,
+        session_id: Optional[str] = None,
+        summary: Optional[Dict[str, Any]] = None,
+        persist: Optional[SummaryPersist] = None,
+    ) -> List[Dict[str, Any]]:
         """
         Compress context by summarizing older messages if token limit is exceeded.
+        ``summary`` is the session's stored rolling summary; ``persist`` saves an updated one.
         """
         # 1. Check if compression is needed
-        current_tokens = self._estimate_tokens(history)
+        counts = [self._message_tokens(m) for m in history]
+        current_tokens = sum(counts)
         if current_tokens <= max_tokens:
-            return history
-            
-        logger.info(f"Context size ({current_tokens}) exceeds limit ({max_tokens}). Triggering compression.")
-        
+            return [self._strip(m) for m in history]
+
         # 2. Split history into to-be-summarized and recent
         # Strategy: Keep the last 50% of the token window for raw messages
         recent_limit = max_tokens // 2
-        recent_history = []
+        split = len(history)
         recent_tokens = 0
-        summary_history = []
-        
-        # Iterate backwards to keep most recent
-        for msg in reversed(history):
-            # Skip system messages in calculation if we handle them separately, 
-            # but usually we want to keep the main system prompt. 
-            # Here we assume history contains user/assistant messages.
-            
-            tokens = self._estimate_tokens([msg])
-            if recent_tokens + tokens < recent_limit:
-                recent_history.insert(0, msg)
-                recent_tokens += tokens
-            else:
-                summary_history.insert(0, msg)
-                
-        if not summary_history:
+        while split > 0 and recent_tokens + counts[split - 1] < recent_limit:
+            split -= 1
+            recent_tokens += counts[split]
+        evicted, recent = history[:split], history[split:]
+        recent_history = [self._strip(m) for m in recent]
+        if not evicted:
             return recent_history
 
-        # 3. Generate Summary
+        # 3. Fold newly evicted messages into the rolling summary, off the critical path
+        summary = summary or {}
+        pending = self._after_watermark(evicted, summary.get("upto_id"))
+        if pending:
+            logger.info(
+                f"Context size ({current_tokens}) exceeds limit ({max_tokens}). "
+                f"Folding {len(pending)} evicted messages into the summary."
+            )
+            if session_id and persist:
+                self._schedule_fold(session_id, summary.get("text", ""), pending, max_tokens, persist)
+            elif not summary.get("text"):
+                # No place to persist the summary: summarize inline (legacy behaviour)
+                text = await self._fold("", pending, max_tokens)
+                summary = {"text": text} if text else {}
+
+        # 4. Combine: [Summary] + [Recent History]
+        if summary.get("text"):
+            summary_msg = {"role": "system", "content": f"Prior Conversation Summary: {summary['text']}"}
+            return [summary_msg] + recent_history
+        return recent_history
+
+    def _schedule_fold(self, session_id: str, text: str, pending: List[Dict[str, Any]], max_tokens: int,
+                       persist: SummaryPersist):
+        running = self._folding.get(session_id)
+        if running is not None and not running.done():
+            # The running fold will be followed by another one on a later turn
+            return
+
+        async def fold_and_persist():
+            try:
+                new_text = await self._fold(text, pending, max_tokens)
+                if new_text:
+                    await persist(session_id, {"text": new_text, "upto_id": pending[-1].get("id")})
+            except Exception as e:
+                logger.error(f"Rolling summary update failed for session {session_id}: {e}")
+            finally:
+                self._folding.pop(session_id, None)
+
+        self._folding[session_id] = asyncio.create_task(fold_and_persist())
+
+    async def _fold(self, summary_text: str, messages: List[Dict[str, Any]], max_tokens: int) -> Optional[str]:
+        """
+        Fold messages into the summary, in slices that keep every prompt within ``max_tokens``.
+        Returns None when no summarizer agent is available, so the watermark is not advanced.
+        """
         # If no agent is initialized, try to load default model
         if not self.agent:
             await self._init_default_agent()
-            
-        if self.agent:
-            try:
-                # Prepare text for summarization
-                text_to_summarize = ""
-                for m in summary_history:
-                    role = m.get("role", "unknown")
-                    content = m.get("content", "")
-                    text_to_summarize += f"{role}: {content}\n"
-                
-                if not text_to_summarize.strip():
-                     return recent_history
+        if not self.agent:
+            logger.warning("No agent available for summarization. Falling back to truncation.")
+            return None
+
+        for batch in self._slices(messages, max_tokens):
+            # Prepare text for summarization
+            text_to_summarize = ""
+            for m in batch:
+                role = m.get("role", "unknown")
+                content = m.get("content", "")
+                text_to_summarize += f"{role}: {content}\n"
+            if not text_to_summarize.strip():
+                continue
 
+            if summary_text:
+                summary_prompt = (
+                    "Update the summary of a conversation with its next messages. Keep it concise.\n\n"
+                    f"Current summary:\n{summary_text}\n\nNew messages:\n{text_to_summarize}"
+                )
+            else:
                 summary_prompt = f"Please summarize the following conversation history concisely:\n\n{text_to_summarize}"
-                
-                # Use arun to get response asynchronously
-                # Note: Agno Agent.arun returns a RunResponse or similar
-                response = await self.agent.arun(summary_prompt)
-                
-                # Handle different response types from Agno
-                summary_text = ""
-                if hasattr(response, "content"):
-                    summary_text = response.content
-                elif isinstance(response, str):
-                    summary_text = response
-                else:
-                    summary_text = str(response)
-                
-                logger.info(f"Generated summary of length {len(summary_text)}")
-                
-                # 4. Create new history with summary
-                # We inject the summary as a System message or a special User message
-                # Usually best as a System message at the start, or appended to existing System prompt
-                
-                # Here we create a specific system message for the summary
-                summary_msg = {
-                    "role": "system", 
-                    "content": f"Prior Conversation Summary: {summary_text}"
-                }
-                
-                # Combine: [Summary] + [Recent History]
-                new_history = [summary_msg] + recent_history
-                return new_history
-                
-            except Exception as e:
-                logger.error(f"Summarization failed: {e}")
-                # Fallback: just return recent history (truncation)
-                return recent_history 
+
+            # Use arun to get response asynchronously
+            response = await self.agent.arun(summary_prompt)
+
+            # Handle different response types from Agno
+            if hasattr(response, "content"):
+                summary_text = response.content
+            elif isinstance(response, str):
+                summary_text = response
+            else:
+                summary_text = str(response)
+
+        logger.info(f"Generated summary of length {len(summary_text or '')}")
+        return summary_text
+
+    def _slices(self, messages: List[Dict[str, Any]], max_tokens: int):
+        batch, tokens = [], 0
+        for m in messages:
+            n = self._message_tokens(m)
+            if batch and tokens + n > max_tokens:
+                yield batch
+                batch, tokens = [], 0
+            batch.append(m)
+            tokens += n
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _after_watermark(messages: List[Dict[str, Any]], upto_id: Any) -> List[Dict[str, Any]]:
+        if upto_id is None:
+            return list(messages)
+        for i, m in enumerate(messages):
+            if m.get("id") == upto_id:
+                return list(messages[i + 1:])
+        # Watermark message not in the evicted prefix (deleted, or not yet evicted)
+        ids = [m.get("id") for m in messages]
+        if all(isinstance(i, int) for i in ids) and isinstance(upto_id, int):
+            return [m for m in messages if m["id"] > upto_id]
+        return []
+
+    @staticmethod
+    def _strip(msg: Dict[str, Any]) -> Dict[str, Any]:
+        if "id" not in msg:
+            return msg
+        return {k: v for k, v in msg.items() if k != "id"}
+
+    def _message_tokens(self, msg: Dict[str, Any]) -> int:
+        content = str(msg.get("content", ""))
+        key = ("id", msg["id"], len(content)) if msg.get("id") is not None else hashlib.blake2b(
+            content.encode("utf-8"), digest_size=16).digest()
+        n = self._token_cache.get(key)
+        if n is None:
+            n = count_tokens(content) + MESSAGE_OVERHEAD
+            self._token_cache[key] = n
+            if len(self._token_cache) > self._token_cache_size:
+                self._token_cache.popitem(last=False)
         else:
-             logger.warning("No agent available for summarization. Falling back to truncation.")
-             return recent_history
-        
+            self._token_cache.move_to_end(key)
+        return n
+
     def _estimate_tokens(self, history):
-        count = 0
-        for msg in history:
-            content = str(msg.get("content", ""))
-            count += len(content) // 4 + 4 # Approx 4 chars per token + overhead
-        return count
+        return sum(self._message_tokens(m) for m in history)
 
     async def _init_default_agent(self):
         """Initialize a default agent if none was provided"""
@@ -130,7 +221,7 @@ class ContextCompressor:
                     .order_by(LLMModel.updated_at.desc())
                 )
                 active_model = res.scalars().first()
-                
+
                 if active_model:
                      self.agent = Agent(
                          model=ModelFactory.create_model(active_model),
@@ -139,3 +230,7 @@ class ContextCompressor:
                      )
         except Exception as e:
             logger.error(f"Failed to init default summarizer agent: {e}")
+
+
+# Shared instance: keeps the summarizer agent, token counts and in-flight folds across turns
+context_compressor = ContextCompressor()
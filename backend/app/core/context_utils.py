@@ -3,6 +3,30 @@ from typing import List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+TOKENIZER = "cl100k_base"
+
+_encoder = None
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding(TOKENIZER)
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({e}), falling back to character estimate")
+            _encoder = False
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoder()
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
 def get_optimized_context(history: List[Dict[str, Any]], system_prompt: str = "", max_tokens: int = 4000) -> List[Dict[str, Any]]:
     """
     Optimize context window by keeping the system prompt and the most recent messages 
@@ -1,23 +1,86 @@
+import asyncio
+import bisect
 import logging
 import time
-from typing import List, Dict, Any, Optional, Tuple, Union
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from redis.exceptions import ResponseError
 from app.core.redis import get_redis_connection
 
 logger = logging.getLogger(__name__)
 
+
+def _id_key(msg_id: str) -> Tuple[int, int]:
+    ms, _, seq = str(msg_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+class _MemoryGroup:
+    """
+    In-memory consumer group state: last delivered id and the pending entries list (PEL).
+    PEL entries: msg_id -> [consumer, last_delivered_ms, times_delivered]
+    """
+
+    def __init__(self, last_id: Tuple[int, int]):
+        self.last_id = last_id
+        self.pending: "OrderedDict[str, List[Any]]" = OrderedDict()
+
+
 class RedisStream:
     """
     A wrapper around Redis Streams to handle common operations like
     adding messages, creating consumer groups, reading, and acknowledging messages.
+
+    When Redis is unreachable, falls back to an in-memory simulation that keeps the same
+    consumer-group semantics: each message is delivered to one consumer of a group,
+    stays pending until acked, and can be reclaimed after it has been idle.
     """
     # Class-level storage for in-memory simulation across instances
     _memory_streams: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    _memory_groups: Dict[Tuple[str, str], _MemoryGroup] = {}
 
     def __init__(self, stream_key: str, group_name: str = "default_group"):
         self.stream_key = stream_key
         self.group_name = group_name
 
+    @property
+    def dead_letter_key(self) -> str:
+        return f"{self.stream_key}:dead"
+
+    # ------------------------------------------------------------------
+    # In-memory helpers
+    # ------------------------------------------------------------------
+    def _mem_stream(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return RedisStream._memory_streams.setdefault(self.stream_key, [])
+
+    def _mem_group(self) -> _MemoryGroup:
+        key = (self.stream_key, self.group_name)
+        group = RedisStream._memory_groups.get(key)
+        if group is None:
+            group = RedisStream._memory_groups[key] = _MemoryGroup((0, 0))
+        return group
+
+    def _mem_lookup(self, msg_id: str) -> Optional[Dict[str, Any]]:
+        stream = self._mem_stream()
+        key = _id_key(msg_id)
+        i = bisect.bisect_left(stream, key, key=lambda m: _id_key(m[0]))
+        if i < len(stream) and stream[i][0] == msg_id:
+            return stream[i][1]
+        return None
+
+    @staticmethod
+    def _mem_add(stream_key: str, data: Dict[str, Any], max_len: int) -> str:
+        stream = RedisStream._memory_streams.setdefault(stream_key, [])
+        ms = int(time.time() * 1000)
+        last = _id_key(stream[-1][0]) if stream else (0, 0)
+        ms = max(ms, last[0])
+        seq = last[1] + 1 if ms == last[0] else 0
+        msg_id = f"{ms}-{seq}"
+        stream.append((msg_id, dict(data)))
+        if max_len and len(stream) > max_len:
+            del stream[: len(stream) - max_len]
+        return msg_id
+
     async def ensure_group(self, start_id: str = "0") -> None:
         """
         Ensure the consumer group exists.
@@ -29,9 +92,11 @@ class RedisStream:
         except Exception as e:
             logger.warning(f"Redis connection failed: {e}. Switching to MemoryStream mode (Simulated).")
             self._use_memory = True
-            # Initialize shared memory for this key if needed
-            if self.stream_key not in RedisStream._memory_streams:
-                RedisStream._memory_streams[self.stream_key] = []
+            stream = self._mem_stream()
+            key = (self.stream_key, self.group_name)
+            if key not in RedisStream._memory_groups:
+                last = _id_key(stream[-1][0]) if (start_id == "$" and stream) else (0, 0)
+                RedisStream._memory_groups[key] = _MemoryGroup(last)
             return
 
         try:
@@ -50,12 +115,7 @@ class RedisStream:
         Add a message to the stream.
         """
         if getattr(self, "_use_memory", False):
-            import time
-            msg_id = f"{int(time.time() * 1000)}-0"
-            if self.stream_key not in RedisStream._memory_streams:
-                 RedisStream._memory_streams[self.stream_key] = []
-            RedisStream._memory_streams[self.stream_key].append((msg_id, data))
-            return msg_id
+            return self._mem_add(self.stream_key, data, max_len)
 
         redis = await get_redis_connection()
         try:
@@ -66,51 +126,35 @@ class RedisStream:
             raise e
 
     async def read_group(
-        self, 
-        consumer_name: str, 
-        count: int = 1, 
+        self,
+        consumer_name: str,
+        count: int = 1,
         block: int = 0
     ) -> List[Tuple[str, Dict[str, Any]]]:
         """
-        Read messages from the stream using the consumer group.
+        Read up to ``count`` new messages for this consumer.
+        Delivered messages stay in the group's pending list until acknowledged.
         """
         if getattr(self, "_use_memory", False):
-            # Simple simulation: just pop from memory stream if available
-            if self.stream_key not in RedisStream._memory_streams:
-                 RedisStream._memory_streams[self.stream_key] = []
-            
-            stream_data = RedisStream._memory_streams[self.stream_key]
-            if stream_data:
-                # Return messages
-                # Note: In real Redis, xreadgroup with > returns only new messages delivered to this consumer
-                # Here we simplify: Just return whatever is there.
-                # Issue: Multiple consumers will get same messages if we don't track "delivered".
-                # For simulation, let's assume one consumer or just return all.
-                # To avoid infinite loops in worker, we should maybe "hide" them?
-                # But worker acks them.
-                # Let's just return first N.
-                messages = stream_data[:count]
-                return messages
-            
-            # Simulate blocking if requested?
-            if block > 0:
-                import asyncio
-                await asyncio.sleep(block / 1000.0)
-                
-            return []
+            deadline = time.monotonic() + block / 1000.0
+            while True:
+                messages = self._mem_read(consumer_name, count)
+                if messages or block <= 0 or time.monotonic() >= deadline:
+                    return messages
+                await asyncio.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
 
         redis = await get_redis_connection()
         try:
             # Read new messages (">")
             streams = {self.stream_key: ">"}
             response = await redis.xreadgroup(
-                self.group_name, 
-                consumer_name, 
-                streams, 
-                count=count, 
+                self.group_name,
+                consumer_name,
+                streams,
+                count=count,
                 block=block
             )
-            
+
             # Response format: [[stream_name, [[msg_id, data], ...]], ...]
             messages = []
             if response:
@@ -118,29 +162,35 @@ class RedisStream:
                     if stream_name == self.stream_key:
                         for msg_id, msg_data in msg_list:
                             messages.append((msg_id, msg_data))
-            
+
             return messages
         except Exception as e:
             logger.error(f"Error reading from stream {self.stream_key}: {e}")
             return []
 
+    def _mem_read(self, consumer_name: str, count: int) -> List[Tuple[str, Dict[str, Any]]]:
+        stream = self._mem_stream()
+        group = self._mem_group()
+        start = bisect.bisect_right(stream, group.last_id, key=lambda m: _id_key(m[0]))
+        batch = stream[start : start + max(1, count)]
+        now = int(time.time() * 1000)
+        for msg_id, _ in batch:
+            group.pending[msg_id] = [consumer_name, now, 1]
+        if batch:
+            group.last_id = _id_key(batch[-1][0])
+        return [(msg_id, dict(data)) for msg_id, data in batch]
+
     async def ack(self, message_ids: List[str]) -> int:
         """
         Acknowledge processed messages.
         """
-        if getattr(self, "_use_memory", False):
-            if self.stream_key not in RedisStream._memory_streams:
-                 return 0
-            
-            stream_data = RedisStream._memory_streams[self.stream_key]
-            original_len = len(stream_data)
-            # Remove acked messages
-            RedisStream._memory_streams[self.stream_key] = [m for m in stream_data if m[0] not in message_ids]
-            return original_len - len(RedisStream._memory_streams[self.stream_key])
-
         if not message_ids:
             return 0
-            
+
+        if getattr(self, "_use_memory", False):
+            pending = self._mem_group().pending
+            return sum(1 for m in message_ids if pending.pop(m, None) is not None)
+
         redis = await get_redis_connection()
         try:
             return await redis.xack(self.stream_key, self.group_name, *message_ids)
@@ -149,48 +199,148 @@ class RedisStream:
             return 0
 
     async def claim_stale_messages(
-        self, 
-        consumer_name: str, 
-        min_idle_time: int = 60000, 
+        self,
+        consumer_name: str,
+        min_idle_time: int = 60000,
         count: int = 10
     ) -> List[Tuple[str, Dict[str, Any]]]:
         """
         Claim messages that have been pending for too long (e.g. crashed workers).
+        Each claim increments the message's delivery counter.
         :param consumer_name: The consumer claiming ownership.
         :param min_idle_time: Minimum idle time in milliseconds.
         :param count: Max number of messages to claim.
         :return: List of claimed messages.
         """
+        if getattr(self, "_use_memory", False):
+            group = self._mem_group()
+            now = int(time.time() * 1000)
+            claimed = []
+            for msg_id, entry in list(group.pending.items()):
+                if len(claimed) >= count:
+                    break
+                if now - entry[1] < min_idle_time:
+                    continue
+                data = self._mem_lookup(msg_id)
+                if data is None:
+                    # Trimmed from the stream: drop from PEL like XAUTOCLAIM does
+                    group.pending.pop(msg_id, None)
+                    continue
+                entry[0], entry[1], entry[2] = consumer_name, now, entry[2] + 1
+                claimed.append((msg_id, dict(data)))
+            return claimed
+
         redis = await get_redis_connection()
         try:
             # XAUTOCLAIM is available in Redis 6.2+
-            # It returns: (next_start_id, [ (msg_id, data), ... ])
+            # It returns: (next_start_id, [ (msg_id, data), ... ], [deleted_ids])
             # We use "0-0" to start from the beginning of PEL
             start_id = "0-0"
             result = await redis.xautoclaim(
-                self.stream_key, 
-                self.group_name, 
-                consumer_name, 
-                min_idle_time, 
-                start_id, 
+                self.stream_key,
+                self.group_name,
+                consumer_name,
+                min_idle_time,
+                start_id,
                 count=count
             )
-            
-            # result[1] is the list of messages
-            messages = result[1]
-            return messages
+
+            # result[1] is the list of messages; entries trimmed from the stream come back without data
+            return [(msg_id, data) for msg_id, data in result[1] if data]
         except Exception as e:
             logger.error(f"Error claiming messages in {self.stream_key}: {e}")
             return []
 
+    async def touch(self, consumer_name: str, message_ids: List[str]) -> List[str]:
+        """
+        Reset the idle time of messages this consumer is still processing (XCLAIM ... JUSTID),
+        so long-running work is not reclaimed. The delivery counter is left unchanged.
+        """
+        if not message_ids:
+            return []
+
+        if getattr(self, "_use_memory", False):
+            pending = self._mem_group().pending
+            now = int(time.time() * 1000)
+            touched = []
+            for msg_id in message_ids:
+                entry = pending.get(msg_id)
+                if entry is not None:
+                    entry[0], entry[1] = consumer_name, now
+                    touched.append(msg_id)
+            return touched
+
+        redis = await get_redis_connection()
+        try:
+            return await redis.xclaim(
+                self.stream_key, self.group_name, consumer_name, 0, message_ids, justid=True
+            )
+        except Exception as e:
+            logger.error(f"Error refreshing pending messages in {self.stream_key}: {e}")
+            return []
+
+    async def get_delivery_counts(self, message_ids: List[str]) -> Dict[str, int]:
+        """
+        Return how many times each pending message has been delivered (XPENDING times_delivered).
+        """
+        if not message_ids:
+            return {}
+
+        if getattr(self, "_use_memory", False):
+            pending = self._mem_group().pending
+            return {m: pending[m][2] for m in message_ids if m in pending}
+
+        redis = await get_redis_connection()
+        try:
+            # One exact-id range per message: a shared min..max range can be filled by other pending entries
+            async with redis.pipeline(transaction=False) as pipe:
+                for msg_id in message_ids:
+                    pipe.xpending_range(self.stream_key, self.group_name, min=msg_id, max=msg_id, count=1)
+                results = await pipe.execute()
+            return {e["message_id"]: int(e["times_delivered"]) for entries in results for e in entries}
+        except Exception as e:
+            logger.error(f"Error reading delivery counts for {self.stream_key}: {e}")
+            return {}
+
+    async def dead_letter(self, msg_id: str, data: Dict[str, Any], reason: str = "") -> Optional[str]:
+        """
+        Move a message to the dead-letter stream (``<stream_key>:dead``) and ack the original.
+        """
+        entry = dict(data or {})
+        entry.update({"origin_id": msg_id, "origin_stream": self.stream_key, "reason": reason or ""})
+        try:
+            if getattr(self, "_use_memory", False):
+                dead_id = self._mem_add(self.dead_letter_key, entry, 10000)
+            else:
+                redis = await get_redis_connection()
+                dead_id = await redis.xadd(self.dead_letter_key, entry, maxlen=10000)
+        except Exception as e:
+            logger.error(f"Error dead-lettering message {msg_id} from {self.stream_key}: {e}")
+            return None
+        await self.ack([msg_id])
+        logger.warning(f"Message {msg_id} moved to {self.dead_letter_key}: {reason}")
+        return dead_id
+
     async def get_pending_info(self) -> Dict[str, Any]:
         """
         Get information about pending messages.
         """
+        if getattr(self, "_use_memory", False):
+            pending = self._mem_group().pending
+            consumers: Dict[str, int] = {}
+            for consumer, _, _ in pending.values():
+                consumers[consumer] = consumers.get(consumer, 0) + 1
+            ids = list(pending)
+            return {
+                "pending": len(ids),
+                "min": min(ids, key=_id_key) if ids else None,
+                "max": max(ids, key=_id_key) if ids else None,
+                "consumers": [{"name": k, "pending": v} for k, v in consumers.items()],
+            }
+
         redis = await get_redis_connection()
         try:
             return await redis.xpending(self.stream_key, self.group_name)
         except Exception as e:
             logger.error(f"Error getting pending info for {self.stream_key}: {e}")
             return {}
-
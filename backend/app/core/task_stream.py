@@ -1,6 +1,7 @@
 import json
 import logging
-from typing import Optional, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any
+from app.core.redis import get_redis_connection
 from app.core.redis_stream import RedisStream
 
 logger = logging.getLogger(__name__)
@@ -33,27 +34,78 @@ class TaskStream(RedisStream):
             logger.error(f"Failed to push task to stream: {e}")
             raise e
 
+    async def push_tasks(self, tasks: List[Dict[str, Any]], max_len: int = 10000) -> List[str]:
+        """
+        Push several tasks in one pipelined round-trip.
+        """
+        if not tasks:
+            return []
+        if getattr(self, "_use_memory", False):
+            return [await self.push_task(t) for t in tasks]
+        try:
+            redis = await get_redis_connection()
+            async with redis.pipeline(transaction=False) as pipe:
+                for t in tasks:
+                    pipe.xadd(self.stream_key, {"payload": json.dumps(t)}, maxlen=max_len)
+                return await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to push tasks to stream: {e}")
+            raise e
+
+    async def _decode(self, messages: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+        tasks = []
+        for msg_id, data in messages:
+            try:
+                tasks.append((msg_id, json.loads(data["payload"])))
+            except Exception:
+                logger.warning(f"Received malformed message {msg_id} without payload")
+                # Park it in the dead-letter stream so it is neither lost nor redelivered
+                await self.dead_letter(msg_id, data, reason="malformed payload")
+        return tasks
+
+    async def pop_tasks(
+        self, consumer_name: str, count: int = 10, block: int = 2000
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Pop up to ``count`` tasks for a specific consumer.
+        Returns [(message_id, task_data), ...].
+        """
+        try:
+            messages = await self.read_group(consumer_name, count=count, block=block)
+            return await self._decode(messages)
+        except Exception as e:
+            logger.error(f"Failed to pop tasks from stream: {e}")
+            return []
+
     async def pop_task(self, consumer_name: str, block: int = 2000) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
         """
         Pop a task for a specific consumer.
         Returns (message_id, task_data).
         """
-        try:
-            messages = await self.read_group(consumer_name, count=1, block=block)
-            if messages:
-                msg_id, data = messages[0]
-                if "payload" in data:
-                    return msg_id, json.loads(data["payload"])
-                else:
-                    logger.warning(f"Received malformed message {msg_id} without payload")
-                    # Ack it so we don't process it again? Or move to DLQ?
-                    # For now, let's just ack it to clear it
-                    await self.ack([msg_id])
-                    return None, None
-            return None, None
-        except Exception as e:
-            logger.error(f"Failed to pop task from stream: {e}")
-            return None, None
+        tasks = await self.pop_tasks(consumer_name, count=1, block=block)
+        if tasks:
+            return tasks[0]
+        return None, None
+
+    async def reclaim_tasks(
+        self, consumer_name: str, min_idle_time: int = 60000, count: int = 10, max_deliveries: int = 3
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Take over tasks left un-acked by failed or crashed workers.
+        Tasks already delivered more than ``max_deliveries`` times are moved to the dead-letter stream.
+        """
+        claimed = await self.claim_stale_messages(consumer_name, min_idle_time=min_idle_time, count=count)
+        if not claimed:
+            return []
+        counts = await self.get_delivery_counts([msg_id for msg_id, _ in claimed])
+        retry = []
+        for msg_id, data in claimed:
+            deliveries = counts.get(msg_id, 1)
+            if deliveries > max_deliveries:
+                await self.dead_letter(msg_id, data, reason=f"exceeded {max_deliveries} deliveries")
+            else:
+                retry.append((msg_id, data))
+        return await self._decode(retry)
 
     async def ack_task(self, msg_id: str):
         """
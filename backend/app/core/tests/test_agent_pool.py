@@ -0,0 +1,85 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+
+from agno.models.openai import OpenAIChat
+
+from app.core.agent_pool import AgentPool, AgentTemplate, config_hash
+
+
+def shared_tool(query: str) -> str:
+    """Shared test tool."""
+    return query
+
+
+class SessionTool:
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+class TestAgentPool(unittest.TestCase):
+
+    def _template(self, key="agent:a1:x"):
+        kwargs = dict(name="A", model=OpenAIChat(id="gpt-4o", api_key="sk-test"),
+                      instructions="Be brief.", tools=[shared_tool], markdown=True)
+        return AgentTemplate(key, kwargs, session_tools=[SessionTool])
+
+    def test_template_build_is_single_flight(self):
+        async def run():
+            pool = AgentPool(max_size=10, ttl=60, template_size=4, template_ttl=60)
+            builds = []
+
+            async def build():
+                builds.append(1)
+                await asyncio.sleep(0.01)
+                return self._template()
+
+            templates = await asyncio.gather(*(pool.get_or_build_template("agent:a1:x", build) for _ in range(5)))
+            self.assertEqual(len(builds), 1)
+            self.assertTrue(all(t is templates[0] for t in templates))
+            await pool.get_or_build_template("agent:a1:x", build)
+            stats = pool.stats()
+            self.assertEqual((stats["template_builds"], stats["template_hits"]), (1, 1))
+            self.assertGreater(stats["templates_approx_bytes"], 0)
+
+        asyncio.run(run())
+
+    def test_instantiate_shares_components_per_session(self):
+        template = self._template()
+        a, b = template.instantiate("s1"), template.instantiate("s2")
+        self.assertIsNot(a, b)
+        self.assertIsNot(a.model, b.model)
+        self.assertIs(a.tools[0], b.tools[0])
+        self.assertEqual([t.session_id for t in (a.tools[1], b.tools[1])], ["s1", "s2"])
+        self.assertEqual(len(template.agent_kwargs["tools"]), 1)
+
+    def test_invalidate_drops_templates_and_their_sessions(self):
+        async def run():
+            pool = AgentPool(max_size=10, ttl=60, template_size=4, template_ttl=60)
+
+            async def build():
+                return self._template("agent:a1:x")
+
+            template = await pool.get_or_build_template("agent:a1:x", build)
+            pool.put("s1:chat", (template.instantiate("s1"), None, False, template.key))
+            pool.put("s2:chat", ("other", None, False, "agent:a2:y"))
+            pool.invalidate_templates("agent:a1:")
+            self.assertIsNone(pool.get("s1:chat"))
+            self.assertIsNotNone(pool.get("s2:chat"))
+            self.assertEqual(pool.stats()["templates"], 0)
+
+        asyncio.run(run())
+
+    def test_config_hash_is_stable(self):
+        self.assertEqual(config_hash({"b": 1, "a": 2}, "x"), config_hash({"a": 2, "b": 1}, "x"))
+        self.assertNotEqual(config_hash({"a": 1}), config_hash({"a": 2}))
+
+
+if __name__ == "__main__":
+    unittest.main()
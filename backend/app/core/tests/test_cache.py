@@ -0,0 +1,117 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from unittest import mock
+
+from app.core.cache import Cache
+
+
+class TestCacheWithoutRedis(unittest.TestCase):
+
+    def _cache(self, max_entries=3):
+        c = Cache()
+        c._max_entries = max_entries
+        return c
+
+    def test_single_flight(self):
+        async def run():
+            c = self._cache()
+            calls = []
+
+            async def loader():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return {"v": 1}
+
+            with mock.patch.object(Cache, "_get_redis", mock.AsyncMock(return_value=None)):
+                results = await asyncio.gather(*(c.get_or_compute("k", loader, 60) for _ in range(10)))
+                self.assertEqual(results, [{"v": 1}] * 10)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(await c.get_or_compute("k", loader, 60), {"v": 1})
+            stats = c.stats()
+            self.assertEqual(stats["loads"], 1)
+            self.assertEqual(stats["coalesced"], 9)
+            self.assertGreaterEqual(stats["l1_hits"], 1)
+
+        asyncio.run(run())
+
+    def test_loader_error_propagates_to_all_waiters(self):
+        async def run():
+            c = self._cache()
+
+            async def loader():
+                await asyncio.sleep(0.01)
+                raise ValueError("boom")
+
+            with mock.patch.object(Cache, "_get_redis", mock.AsyncMock(return_value=None)):
+                results = await asyncio.gather(
+                    *(c.get_or_compute("k", loader, 60) for _ in range(3)), return_exceptions=True
+                )
+            self.assertTrue(all(isinstance(r, ValueError) for r in results))
+            self.assertEqual(c._inflight, {})
+
+        asyncio.run(run())
+
+    def test_cancelled_loader_hands_over_to_waiters(self):
+        async def run():
+            c = self._cache()
+            calls = 0
+
+            async def loader():
+                nonlocal calls
+                calls += 1
+                await asyncio.sleep(0.05)
+                return {"v": calls}
+
+            with mock.patch.object(Cache, "_get_redis", mock.AsyncMock(return_value=None)):
+                leader = asyncio.create_task(c.get_or_compute("k", loader, 60))
+                await asyncio.sleep(0)
+                followers = [asyncio.create_task(c.get_or_compute("k", loader, 60)) for _ in range(3)]
+                await asyncio.sleep(0.01)
+                leader.cancel()
+                results = await asyncio.gather(*followers)
+                with self.assertRaises(asyncio.CancelledError):
+                    await leader
+            # One follower took over the load; the others coalesced onto it
+            self.assertEqual(calls, 2)
+            self.assertEqual(results, [{"v": 2}] * 3)
+            self.assertEqual(c._inflight, {})
+
+        asyncio.run(run())
+
+    def test_lru_bound_and_ttl(self):
+        async def run():
+            c = self._cache(max_entries=2)
+            with mock.patch.object(Cache, "_get_redis", mock.AsyncMock(return_value=None)):
+                await c.set_json("a", 1, 60)
+                await c.set_json("b", 2, 60)
+                await c.get_json("a")
+                await c.set_json("c", 3, 60)
+                self.assertIsNone(await c.get_json("b"))
+                self.assertEqual(await c.get_json("a"), 1)
+                await c.set_json("d", 4, -1)
+                self.assertIsNone(await c.get_json("d"))
+            self.assertEqual(c.stats()["evictions"], 2)
+
+        asyncio.run(run())
+
+    def test_redis_down_backs_off(self):
+        async def run():
+            c = self._cache()
+            with mock.patch("app.core.cache.redis.Redis") as factory:
+                factory.return_value.ping = mock.AsyncMock(side_effect=ConnectionError("down"))
+                for _ in range(5):
+                    await c.get_json("x")
+                self.assertEqual(factory.call_count, 1)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from unittest import mock
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.cache import Cache
+from app.core.chat_history_cache import ChatHistoryCache
+from app.core.context_compressor import ContextCompressor
+from app.crud.crud_chat import chat as crud_chat
+from app.db.base import Base
+from app.models.agent import Agent
+from app.models.chat import ChatMessage, ChatSession
+
+
+class FakeListClient:
+    """The few Redis list commands ChatHistoryCache uses."""
+
+    def __init__(self):
+        self.lists = {}
+
+    async def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        start = max(len(items) + start, 0) if start < 0 else start
+        end = len(items) + end if end < 0 else end
+        return items[start:end + 1]
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipe:
+            def __init__(self):
+                self.ops = []
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            def __getattr__(self, name):
+                return lambda *args: self.ops.append((name, args))
+
+            async def execute(self):
+                for name, args in self.ops:
+                    key = args[0]
+                    if name == "delete":
+                        client.lists.pop(key, None)
+                    elif name == "rpush":
+                        client.lists.setdefault(key, []).extend(args[1:])
+                    elif name == "rpushx" and key in client.lists:
+                        client.lists[key].append(args[1])
+                    elif name == "ltrim" and key in client.lists:
+                        client.lists[key] = client.lists[key][args[1]:]
+
+        return Pipe()
+
+
+class TestChatHistoryCache(unittest.TestCase):
+
+    def test_tail_serves_only_what_it_holds(self):
+        async def run():
+            client = FakeListClient()
+            c = ChatHistoryCache(max_entries=3, ttl_seconds=60)
+            entries = [{"id": i, "role": "user", "content": str(i)} for i in range(1, 6)]
+            with mock.patch.object(Cache, "redis_client", mock.AsyncMock(return_value=client)):
+                self.assertIsNone(await c.tail("s", 2))
+                await c.fill("s", entries, complete=False)
+                self.assertEqual([e["id"] for e in await c.tail("s", 2)], [4, 5])
+                # Only 4 entries cached and the session is longer: cannot answer
+                self.assertIsNone(await c.tail("s", 10))
+                await c.append("s", {"id": 6, "role": "assistant", "content": "6"})
+                self.assertEqual([e["id"] for e in await c.tail("s", 3)], [4, 5, 6])
+
+                await c.fill("t", entries[:2], complete=True)
+                self.assertEqual([e["id"] for e in await c.tail("t", 10)], [1, 2])
+
+        asyncio.run(run())
+
+
+class TestHistoryWindow(unittest.TestCase):
+
+    def test_window_paging_and_token_budget(self):
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite://")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all,
+                                    tables=[Agent.__table__, ChatSession.__table__, ChatMessage.__table__])
+            Session = async_sessionmaker(engine, expire_on_commit=False)
+            with mock.patch.object(Cache, "redis_client", mock.AsyncMock(return_value=None)):
+                async with Session() as db:
+                    db.add(ChatSession(id="s1"))
+                    await db.commit()
+                    ids = []
+                    for i in range(10):
+                        msg = await crud_chat.create_message(db, "s1", "user", f"message {i} " + "x" * 40)
+                        ids.append(msg.id)
+
+                    window = await crud_chat.get_history_window(db, "s1", limit=4)
+                    self.assertEqual([m["id"] for m in window], ids[-4:])
+
+                    older = await crud_chat.get_history_window(db, "s1", limit=4, before_id=window[0]["id"])
+                    self.assertEqual([m["id"] for m in older], ids[2:6])
+
+                    trimmed = await crud_chat.get_history_window(db, "s1", limit=10, max_tokens=1)
+                    self.assertEqual([m["id"] for m in trimmed], ids[-1:])
+            await engine.dispose()
+
+        asyncio.run(run())
+
+    def test_summary_found_when_watermark_is_outside_window(self):
+        async def run():
+            engine = create_async_engine("sqlite+aiosqlite://")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all,
+                                    tables=[Agent.__table__, ChatSession.__table__, ChatMessage.__table__])
+            Session = async_sessionmaker(engine, expire_on_commit=False)
+            with mock.patch.object(Cache, "redis_client", mock.AsyncMock(return_value=None)):
+                async with Session() as db:
+                    db.add(ChatSession(id="s1"))
+                    await db.commit()
+                    ids = []
+                    for i in range(10):
+                        msg = await crud_chat.create_message(db, "s1", "user", f"message {i} " + "x" * 200)
+                        ids.append(msg.id)
+                    await crud_chat.save_context_summary(db, "s1", {"text": "earlier turns", "upto_id": ids[1]})
+
+                    window = await crud_chat.get_history_window(db, "s1", limit=4)
+                    self.assertNotIn(ids[1], [m["id"] for m in window])
+                    summary = await crud_chat.get_context_summary(db, "s1")
+                    self.assertEqual(summary["upto_id"], ids[1])
+
+                    compressor = ContextCompressor()
+                    folded = []
+
+                    async def fold(text, pending, max_tokens):
+                        folded.append((text, [m["id"] for m in pending]))
+                        return text + "+"
+
+                    compressor._fold = fold
+                    history = [{"id": m["id"], "role": m["role"], "content": m["content"]} for m in window]
+                    out = await compressor.compress_context(history, max_tokens=200, session_id="s1",
+                                                            summary=summary, persist=mock.AsyncMock())
+                    while compressor._folding:
+                        await asyncio.sleep(0)
+                    # The earlier context is kept and only the newly evicted window messages are folded in
+                    self.assertEqual(out[0]["content"], "Prior Conversation Summary: earlier turns")
+                    self.assertEqual(folded[0][0], "earlier turns")
+                    self.assertTrue(all(i > ids[1] for i in folded[0][1]))
+            await engine.dispose()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from app.core.context_compressor import ContextCompressor
+
+
+class _FakeAgent:
+    def __init__(self):
+        self.prompts = []
+
+    async def arun(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f"summary#{len(self.prompts)}")
+
+
+def _history(n, size=200):
+    return [{"id": i, "role": "user" if i % 2 else "assistant", "content": f"message {i} " + "x" * size} for i in range(1, n + 1)]
+
+
+class TestContextCompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.compressor = ContextCompressor()
+        self.agent = self.compressor.agent = _FakeAgent()
+        self.saved = []
+
+    async def _persist(self, session_id, summary):
+        self.saved.append((session_id, summary))
+
+    def _compress(self, history, summary=None):
+        async def run():
+            out = await self.compressor.compress_context(
+                history, max_tokens=400, session_id="s1", summary=summary, persist=self._persist
+            )
+            # let the background fold finish
+            while self.compressor._folding:
+                await asyncio.sleep(0)
+            return out
+        return asyncio.run(run())
+
+    def test_under_budget_is_untouched(self):
+        history = _history(3, size=10)
+        out = self._compress(history)
+        self.assertEqual([m["content"] for m in out], [m["content"] for m in history])
+        self.assertTrue(all("id" not in m for m in out))
+        self.assertEqual(self.agent.prompts, [])
+
+    def test_fold_runs_in_background_and_persists_watermark(self):
+        history = _history(20)
+        out = self._compress(history)
+        # No summary yet on the first overflow: recent messages only, fold persisted afterwards
+        self.assertNotEqual(out[0]["role"], "system")
+        self.assertEqual(len(self.saved), 1)
+        summary = self.saved[0][1]
+        self.assertEqual(summary["text"], f"summary#{len(self.agent.prompts)}")
+        kept = {m["content"] for m in out}
+        self.assertNotIn(history[summary["upto_id"] - 1]["content"], kept)
+        self.assertIn(history[summary["upto_id"]]["content"], kept)
+
+    def test_only_new_evictions_are_folded(self):
+        history = _history(20)
+        self._compress(history)
+        summary = self.saved[-1][1]
+        prompts_before = len(self.agent.prompts)
+
+        # Same history again: nothing new evicted, the stored summary is reused without an LLM call
+        out = self._compress(history, summary=summary)
+        self.assertEqual(out[0]["content"], f"Prior Conversation Summary: {summary['text']}")
+        self.assertEqual(len(self.agent.prompts), prompts_before)
+
+        # Two more turns: only the newly evicted messages go into the update prompt
+        longer = _history(22)
+        self._compress(longer, summary=summary)
+        prompt = self.agent.prompts[-1]
+        self.assertIn(f"Current summary:\n{summary['text']}", prompt)
+        self.assertNotIn(f"message {summary['upto_id']} ", prompt)
+        self.assertIn(f"message {summary['upto_id'] + 1} ", prompt)
+        self.assertGreater(self.saved[-1][1]["upto_id"], summary["upto_id"])
+
+    def test_watermark_kept_without_agent(self):
+        self.compressor.agent = None
+
+        async def no_agent():
+            return None
+        self.compressor._init_default_agent = no_agent
+
+        summary = {"text": "old summary", "upto_id": 2}
+        out = self._compress(_history(20), summary=summary)
+        # No fold ran: the stored summary is still used and nothing is persisted
+        self.assertEqual(out[0]["content"], "Prior Conversation Summary: old summary")
+        self.assertEqual(self.saved, [])
+
+    def test_token_counts_are_cached(self):
+        history = _history(5)
+        self.compressor._estimate_tokens(history)
+        self.assertEqual(len(self.compressor._token_cache), 5)
+        self.compressor._estimate_tokens(history)
+        self.assertEqual(len(self.compressor._token_cache), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
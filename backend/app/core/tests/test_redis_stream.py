@@ -0,0 +1,132 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from unittest import mock
+
+from app.core import redis_stream
+from app.core.redis_stream import RedisStream
+from app.core.task_stream import TaskStream
+
+
+class TestMemoryStream(unittest.TestCase):
+    """Memory-mode consumer-group semantics (Redis unavailable)."""
+
+    def setUp(self):
+        RedisStream._memory_streams.clear()
+        RedisStream._memory_groups.clear()
+
+    def _stream(self, group="g"):
+        s = RedisStream("test_stream", group)
+        s._use_memory = True
+        return s
+
+    def test_each_message_delivered_once_per_group(self):
+        async def run():
+            a, b = self._stream(), self._stream()
+            ids = [await a.add({"n": str(i)}) for i in range(5)]
+            self.assertEqual(len(set(ids)), 5)
+            first = await a.read_group("c1", count=3)
+            second = await b.read_group("c2", count=3)
+            self.assertEqual([m for m, _ in first] + [m for m, _ in second], ids)
+            self.assertEqual(await a.read_group("c1", count=3), [])
+            # 另一个 group 独立消费全部消息
+            other = await self._stream("other").read_group("c3", count=10)
+            self.assertEqual(len(other), 5)
+            self.assertEqual(await a.ack(ids[:2]), 2)
+            info = await a.get_pending_info()
+            self.assertEqual(info["pending"], 3)
+
+        asyncio.run(run())
+
+    def test_reclaim_and_dead_letter(self):
+        async def run():
+            s = TaskStream()
+            s._use_memory = True
+            await s.push_task({"sub_task_id": 1})
+            (msg_id, task), = await s.pop_tasks("w1", count=5, block=0)
+            self.assertEqual(task, {"sub_task_id": 1})
+
+            # 未 ack：空闲后可被其他 worker 接管，投递次数递增
+            for expected in (2, 3):
+                reclaimed = await s.reclaim_tasks("w2", min_idle_time=0, max_deliveries=3)
+                self.assertEqual([m for m, _ in reclaimed], [msg_id])
+                self.assertEqual((await s.get_delivery_counts([msg_id]))[msg_id], expected)
+
+            self.assertEqual(await s.reclaim_tasks("w2", min_idle_time=0, max_deliveries=3), [])
+            self.assertEqual((await s.get_pending_info())["pending"], 0)
+            dead = RedisStream._memory_streams[s.dead_letter_key]
+            self.assertEqual(dead[0][1]["origin_id"], msg_id)
+
+        asyncio.run(run())
+
+    def test_touch_keeps_running_task_from_being_reclaimed(self):
+        async def run():
+            s = TaskStream()
+            s._use_memory = True
+            await s.push_task({"sub_task_id": 1})
+            (msg_id, _), = await s.pop_tasks("w1", count=5, block=0)
+            RedisStream._memory_groups[(s.stream_key, s.group_name)].pending[msg_id][1] -= 120000
+
+            self.assertEqual(await s.touch("w1", [msg_id, "0-1"]), [msg_id])
+            self.assertEqual(await s.reclaim_tasks("w2", min_idle_time=60000), [])
+            self.assertEqual((await s.get_delivery_counts([msg_id]))[msg_id], 1)
+
+        asyncio.run(run())
+
+    def test_malformed_message_dead_lettered(self):
+        async def run():
+            s = TaskStream()
+            s._use_memory = True
+            await s.add({"oops": "1"})
+            self.assertEqual(await s.pop_task("w1", block=0), (None, None))
+            self.assertEqual(len(RedisStream._memory_streams[s.dead_letter_key]), 1)
+
+        asyncio.run(run())
+
+
+class FakePipeline:
+    def __init__(self, pending):
+        self.pending = pending
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xpending_range(self, name, groupname, min, max, count):
+        self.calls.append((min, max, count))
+
+    async def execute(self):
+        results = []
+        for lo, hi, count in self.calls:
+            ids = sorted((m for m in self.pending if lo <= m <= hi), key=redis_stream._id_key)[:count]
+            results.append([{"message_id": m, "times_delivered": self.pending[m]} for m in ids])
+        return results
+
+
+class TestRedisDeliveryCounts(unittest.TestCase):
+
+    def test_counts_not_cut_off_by_other_pending_entries(self):
+        async def run():
+            # 150 other pending entries lie between the two requested ids
+            pending = {f"1-{i}": 1 for i in range(1, 151)}
+            pending.update({"1-0": 4, "2-0": 2})
+            client = mock.Mock()
+            client.pipeline = lambda transaction=False: FakePipeline(pending)
+            with mock.patch.object(redis_stream, "get_redis_connection", mock.AsyncMock(return_value=client)):
+                counts = await RedisStream("s", "g").get_delivery_counts(["1-0", "2-0"])
+            self.assertEqual(counts, {"1-0": 4, "2-0": 2})
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
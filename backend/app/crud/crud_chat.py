@@ -1,9 +1,11 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy import desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.chat_history_cache import chat_history_cache
+from app.core.context_utils import count_tokens
 from app.models.chat import ChatMessage, ChatSession
 from app.schemas.chat import ChatSessionCreate, ChatSessionUpdate
 
@@ -29,10 +31,11 @@ class CRUDChat:
         # Re-fetch to load options properly
         return await self.get(db, db_obj.id)
 
-    async def get(self, db: AsyncSession, id: str) -> Optional[ChatSession]:
-        result = await db.execute(
-            select(ChatSession).options(selectinload(ChatSession.messages)).filter(ChatSession.id == id)
-        )
+    async def get(self, db: AsyncSession, id: str, with_messages: bool = True) -> Optional[ChatSession]:
+        query = select(ChatSession).filter(ChatSession.id == id)
+        if with_messages:
+            query = query.options(selectinload(ChatSession.messages))
+        result = await db.execute(query)
         return result.scalars().first()
 
     async def update(self, db: AsyncSession, db_obj: ChatSession, obj_in: ChatSessionUpdate) -> ChatSession:
@@ -53,6 +56,7 @@ class CRUDChat:
         if obj:
             await db.delete(obj)
             await db.commit()
+            await chat_history_cache.drop(id)
         return obj
 
     async def create_message(
@@ -61,6 +65,7 @@ class CRUDChat:
         msg = ChatMessage(session_id=session_id, role=role, content=content, meta_data=meta_data)
         db.add(msg)
         await db.commit()
+        await chat_history_cache.append(session_id, self.history_entry(msg))
         return msg
 
     async def get_history(self, db: AsyncSession, session_id: str) -> List[ChatMessage]:
@@ -80,12 +85,75 @@ class CRUDChat:
             msg = result.scalars().first()
             
         if msg:
-            base = msg.meta_data or {}
-            for k, v in meta.items():
-                base[k] = v
-            msg.meta_data = base
+            # New dict: mutating the loaded one in place is not detected as a change of the JSON column
+            msg.meta_data = {**(msg.meta_data or {}), **meta}
             db.add(msg)
             await db.commit()
+            # The cached entry is stale now; the next read refills the list from the database
+            await chat_history_cache.drop(msg.session_id)
+
+    async def get_context_summary(self, db: AsyncSession, session_id: str) -> Optional[Dict[str, Any]]:
+        """Rolling summary of the session's evicted history, independent of the loaded window."""
+        result = await db.execute(select(ChatSession.context_summary).filter(ChatSession.id == session_id))
+        return result.scalar()
+
+    async def save_context_summary(self, db: AsyncSession, session_id: str, summary: Dict[str, Any]):
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return
+        session.context_summary = summary
+        await db.commit()
+
+    @staticmethod
+    def history_entry(msg: ChatMessage) -> Dict[str, Any]:
+        return {"id": msg.id, "role": msg.role, "content": msg.content, "meta_data": msg.meta_data}
+
+    async def get_history_window(
+        self,
+        db: AsyncSession,
+        session_id: str,
+        limit: int = 50,
+        max_tokens: Optional[int] = None,
+        before_id: Optional[int] = None,
+        expect_last_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        The most recent ``limit`` messages of a session (oldest first), as plain dicts
+        (id / role / content / meta_data), optionally cut further to the newest ``max_tokens``.
+
+        - ``before_id`` pages older context in: messages strictly older than that message id.
+        - The tail (``before_id`` None) is served from the Redis list cache when possible;
+          ``expect_last_id`` (e.g. the just-created user message) guards against a stale tail.
+        """
+        entries = None
+        if before_id is None:
+            entries = await chat_history_cache.tail(session_id, limit)
+            if entries is not None and expect_last_id is not None:
+                if not entries or entries[-1]["id"] != expect_last_id:
+                    entries = None
+
+        if entries is None:
+            # Tail misses load enough rows to refill the cache
+            fetch = limit if before_id is not None else max(limit, chat_history_cache.max_entries)
+            query = select(ChatMessage).filter(ChatMessage.session_id == session_id)
+            if before_id is not None:
+                query = query.filter(ChatMessage.id < before_id)
+            query = query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(fetch)
+            result = await db.execute(query)
+            rows = [self.history_entry(m) for m in reversed(result.scalars().all())]
+            if before_id is None:
+                await chat_history_cache.fill(session_id, rows, complete=len(rows) < fetch)
+            entries = rows[-limit:] if limit else []
+
+        if max_tokens is not None:
+            kept, tokens = 0, 0
+            for entry in reversed(entries):
+                tokens += count_tokens(str(entry.get("content") or ""))
+                if kept and tokens > max_tokens:
+                    break
+                kept += 1
+            entries = entries[len(entries) - kept:]
+        return entries
 
 
 chat = CRUDChat()
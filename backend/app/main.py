@@ -34,6 +34,18 @@ from app.core.i18n import _
 setup_logging()
 
 
+def _add_missing_columns(sync_conn, table, names):
+    """ALTER TABLE ... ADD COLUMN for nullable model columns missing from an existing table."""
+    from sqlalchemy import inspect, text
+
+    existing = {c["name"] for c in inspect(sync_conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column_type = table.c[name].type.compile(dialect=sync_conn.dialect)
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {column_type}"))
+            logger.info(f"Added column {table.name}.{name}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Connect to DB, Redis, S3 checks
@@ -75,6 +87,12 @@ async def lifespan(app: FastAPI):
 
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips indexes and new columns of tables that already exist
+        from app.models.chat import ChatMessage, ChatSession
+
+        for index in ChatMessage.__table__.indexes:
+            await conn.run_sync(lambda sync_conn, ix=index: ix.create(sync_conn, checkfirst=True))
+        await conn.run_sync(_add_missing_columns, ChatSession.__table__, ["context_summary"])
 
     from app.db.session import AsyncSessionLocal
 
@@ -95,6 +113,21 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to initialize Knowledge Base config: {e}")
 
+    # Prewarm shared agent templates in the background (model clients, tools, MCP discovery)
+    async def prewarm_agents():
+        try:
+            from app.services.chat.service import chat_service
+
+            async with AsyncSessionLocal() as db:
+                result = await chat_service.prewarm_templates(db, settings.AGENT_PREWARM_ON_STARTUP)
+            logger.info(f"Agent templates prewarmed: {result}")
+        except Exception as e:
+            logger.error(f"Failed to prewarm agent templates: {e}")
+
+    prewarm_task = None
+    if settings.AGENT_PREWARM_ON_STARTUP != "none":
+        prewarm_task = asyncio.create_task(prewarm_agents())
+
     # Start Node Monitoring Task
     from app.services.openclaw.node.monitor import node_monitor
     await node_monitor.start()
@@ -111,8 +144,12 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown: Close connections
     logger.info(_("Shutting down..."))
+    if prewarm_task is not None and not prewarm_task.done():
+        prewarm_task.cancel()
     await task_worker.stop()
     await node_monitor.stop()
+    from app.services.mcp.session_pool import mcp_session_pool
+    await mcp_session_pool.close_all()
 
 
 import time
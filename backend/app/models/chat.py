@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -16,6 +16,7 @@ class ChatSession(Base):
     agent_id = Column(String, ForeignKey("agents.id"), nullable=True)
     mode = Column(String, default="chat")  # chat, workflow, auto_task
     workflow_state = Column(JSON, nullable=True)  # Stores tasks, logs, documents
+    context_summary = Column(JSON, nullable=True)  # Rolling summary of evicted history: {"text", "upto_id"}
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
@@ -26,6 +27,8 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    # Recent-window history loads: WHERE session_id = ? ORDER BY created_at DESC LIMIT n
+    __table_args__ = (Index("ix_chat_messages_session_created", "session_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, ForeignKey("chat_sessions.id"), nullable=False)
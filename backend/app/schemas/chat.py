@@ -24,6 +24,13 @@ class ChatMessageResponse(ChatMessageBase):
         from_attributes = True
 
 
+class ChatMessageWindowItem(BaseModel):
+    id: int
+    role: str
+    content: str
+    meta_data: Optional[Dict[str, Any]] = None
+
+
 class ChatSessionBase(BaseModel):
     title: Optional[str] = Field(None, description=_("Title of the chat session"))
     agent_id: Optional[str] = Field(None, description=_("ID of the agent used in this session"))
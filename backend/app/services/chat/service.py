@@ -19,7 +19,9 @@ from agno.models.openai import OpenAIChat
 from openai import OpenAI
 from app.services.eah_agent.tools.libs.duckduckgo import DuckDuckGoTools
 from app.services.eah_agent.tools.libs.runner import run_reasoning_tool_loop
-from app.core.agent_pool import agent_pool
+from app.core.agent_pool import AgentTemplate, agent_pool, config_hash
+from app.core.context_compressor import SUMMARY_META_KEY, context_compressor
+from app.db.session import AsyncSessionLocal
 from app.services.eah_agent.core.stream_processor import parse_thinking_stream
 from datetime import datetime
 from app.services.nlu.classifier import IntentClassifier, QueryIntent
@@ -52,7 +54,7 @@ class ChatService:
         try:
             # 1. Get Session
             logger.info(f"[CHAT] Starting chat for session={session_id}")
-            session = await crud_chat.get(db, session_id)
+            session = await crud_chat.get(db, session_id, with_messages=False)
             if not session:
                 logger.error(f"[CHAT] Session {session_id} not found")
                 yield self._format_sse("error", "Session not found")
@@ -198,17 +200,19 @@ class ChatService:
             cached_data = agent_pool.get(cache_key)
             
             if cached_data:
-                agent, agent_obj, deepseek_like = cached_data
+                agent, agent_obj, deepseek_like = cached_data[:3]
                 logger.info(f"[CHAT] Used cached agent for {session_id}")
             else:
+                # Shared template (model client, tools, instructions) + cheap per-session agent
                 if session.agent_id:
-                    agent, agent_obj = await self._load_agent(db, session.agent_id, session_id, enable_search)
-                    if agent:
-                        deepseek_like = self._detect_deepseek(agent, agent_obj)
+                    template = await self._load_agent_template(db, session.agent_id, enable_search)
                 else:
-                    agent, agent_obj, deepseek_like = await self._create_default_agent(
-                        db, session_id, message, user_msg, enable_search, session.mode
-                    )
+                    template = await self._get_default_template(db, session.mode)
+
+                if template:
+                    agent = template.instantiate(session_id)
+                    agent_obj = template.agent_obj
+                    deepseek_like = template.deepseek_like or self._detect_deepseek(agent, agent_obj)
                 
                 if agent:
                     # Save Agent Config to SharedState
@@ -236,7 +240,7 @@ class ChatService:
                     except Exception as e:
                         logger.warning(f"Failed to save agent config to shared state: {e}")
 
-                    agent_pool.put(cache_key, (agent, agent_obj, deepseek_like))
+                    agent_pool.put(cache_key, (agent, agent_obj, deepseek_like, template.key))
             
             if not agent:
                  yield self._format_sse("error", "Failed to initialize agent.")
@@ -387,68 +391,75 @@ class ChatService:
             logger.error(f"Chat execution failed: {e}", exc_info=True)
             yield self._format_sse("error", f"Internal Server Error - {str(e)}")
 
-    async def _load_agent(self, db, agent_id, session_id, enable_search):
+    async def _load_agent_template(self, db, agent_id, enable_search) -> Optional[AgentTemplate]:
         try:
-            agent = await agent_manager.create_agno_agent(db, agent_id, session_id, enable_search=enable_search)
-            res = await db.execute(select(Agent).filter(Agent.id == agent_id))
-            agent_obj = res.scalars().first()
-            return agent, agent_obj
+            return await agent_manager.get_agent_template(db, agent_id, enable_search)
         except Exception as e:
             logger.error(f"Failed to load agent {agent_id}: {e}")
-            return None, None
+            return None
 
-    async def _create_default_agent(self, db, session_id, message, user_msg, enable_search, mode="chat"):
-        # 1. Find active model
+    async def _get_default_template(self, db, mode="chat") -> Optional[AgentTemplate]:
+        # 1. Find active model (the only DB read once the template is cached)
         res = await db.execute(
             select(LLMModel)
             .filter(LLMModel.is_active == True, LLMModel.api_key != None, LLMModel.api_key != "")
             .order_by(LLMModel.updated_at.desc())
         )
         active_model = res.scalars().first()
-        
-        deepseek_like = False
-        agent = None
-        agent_obj = None # No DB object for default agent
 
         if active_model:
-             # Create temp agent
-             default_tools = self._get_default_tools(mode)
-             model_instance = ModelFactory.create_model(active_model)
-             is_reasoning = ModelFactory.should_use_agno_reasoning(active_model)
-             
-             agent = AgnoAgent(
+            key = f"default:{mode}:{config_hash(active_model.id, active_model.model_id, active_model.base_url, active_model.provider, active_model.updated_at)}"
+        elif agent_manager.has_global_api_key():
+            key = f"default:{mode}:global"
+        else:
+            return None
+        return await agent_pool.get_or_build_template(key, lambda: self._build_default_template(key, mode, active_model))
+
+    async def _build_default_template(self, key, mode, active_model: Optional[LLMModel]) -> AgentTemplate:
+        default_tools = self._get_default_tools(mode)
+        instructions = "You are a helpful assistant."
+        if default_tools:
+            instructions += "\n" + self._get_kb_instructions()
+            if settings.OPENCLAW_BASE_URL and mode == "auto_task":
+                instructions += "\n" + self._get_openclaw_instructions()
+
+        if active_model:
+            # Temp agent on the active model
+            agent_kwargs = dict(
                 name="Default Agent",
-                model=model_instance,
-                instructions="You are a helpful assistant.",
+                model=ModelFactory.create_model(active_model),
+                instructions=instructions,
                 markdown=True,
-                reasoning=is_reasoning,
+                reasoning=ModelFactory.should_use_agno_reasoning(active_model),
                 tools=default_tools,
-             )
-             
-             if default_tools:
-                 agent.instructions += "\n" + self._get_kb_instructions()
-                 if settings.OPENCLAW_BASE_URL and mode == "auto_task":
-                      agent.instructions += "\n" + self._get_openclaw_instructions()
-                 
-             # Detect DeepSeek
-             deepseek_like = self._detect_deepseek_model(active_model)
-             
-        elif agent_manager.has_global_api_key():
-             # Fallback to OpenAI
-             default_tools = self._get_default_tools(mode)
-             agent = AgnoAgent(
-                 name="Global Default Agent",
-                 model=OpenAIChat(id="gpt-4o", api_key=settings.OPENAI_API_KEY),
-                 instructions="You are a helpful assistant.",
-                 markdown=True,
-                 tools=default_tools
-             )
-             if default_tools:
-                 agent.instructions += "\n" + self._get_kb_instructions()
-                 if settings.OPENCLAW_BASE_URL and mode == "auto_task":
-                      agent.instructions += "\n" + self._get_openclaw_instructions()
-             
-        return agent, agent_obj, deepseek_like
+            )
+            # Detect DeepSeek
+            deepseek_like = self._detect_deepseek_model(active_model)
+        else:
+            # Fallback to OpenAI
+            agent_kwargs = dict(
+                name="Global Default Agent",
+                model=OpenAIChat(id="gpt-4o", api_key=settings.OPENAI_API_KEY),
+                instructions=instructions,
+                markdown=True,
+                tools=default_tools,
+            )
+            deepseek_like = False
+        # No DB object for default agent
+        return AgentTemplate(key, agent_kwargs, agent_obj=None, deepseek_like=deepseek_like)
+
+    async def prewarm_templates(self, db, scope: str = "default") -> Dict[str, Any]:
+        """Build agent templates ahead of the first chat: ``default`` (default agent) or ``all`` (plus every active agent)."""
+        result: Dict[str, Any] = {"default": False}
+        if scope == "none":
+            return result
+        try:
+            result["default"] = await self._get_default_template(db, "chat") is not None
+        except Exception as e:
+            logger.warning(f"Prewarm of the default agent failed: {e}")
+        if scope == "all":
+            result.update(await agent_manager.prewarm_templates(db))
+        return result
 
     def _get_default_tools(self, mode="chat"):
         tools = []
@@ -528,15 +539,26 @@ Do not say you cannot access the configuration; instead, use the tools to perfor
         return ("deepseek" in mid) or ("reasoner" in mid) or ("r1" in mid) or ("deepseek" in base) or ("deepseek" in provider) or ("aliyun" in provider) or ("siliconflow" in provider)
 
     async def _build_history(self, db, session_id, user_msg, deepseek_like):
-        history_msgs = await crud_chat.get_history(db, session_id)
+        # Only the recent window is loaded (Redis-cached tail); the rolling summary covers older turns
+        history_msgs = await crud_chat.get_history_window(
+            db,
+            session_id,
+            limit=settings.CHAT_HISTORY_WINDOW,
+            max_tokens=settings.CHAT_HISTORY_TOKEN_BUDGET,
+            expect_last_id=user_msg.id,
+        )
+        # Stored on the session: the watermark message is older than the window more often than not
+        summary = await crud_chat.get_context_summary(db, session_id)
         agno_history = []
         for msg in history_msgs:
-            if msg.id == user_msg.id: continue
-            msg_dict = {"role": msg.role, "content": msg.content}
-            if msg.role == "assistant":
-                reasoning = ""
-                if msg.meta_data and "reasoning" in msg.meta_data:
-                    reasoning = msg.meta_data["reasoning"]
+            meta = msg.get("meta_data") or {}
+            if summary is None and SUMMARY_META_KEY in meta:
+                # Summaries written before they moved to the session row
+                summary = meta[SUMMARY_META_KEY]
+            if msg["id"] == user_msg.id: continue
+            msg_dict = {"id": msg["id"], "role": msg["role"], "content": msg["content"]}
+            if msg["role"] == "assistant":
+                reasoning = meta.get("reasoning") or ""
                 
                 if reasoning:
                     msg_dict["reasoning_content"] = reasoning
@@ -546,13 +568,18 @@ Do not say you cannot access the configuration; instead, use the tools to perfor
             
         # Use ContextCompressor for intelligent context management
         try:
-            from app.core.context_compressor import ContextCompressor
-            compressor = ContextCompressor()
-            return await compressor.compress_context(agno_history)
+            return await context_compressor.compress_context(
+                agno_history, session_id=session_id, summary=summary, persist=self._save_context_summary
+            )
         except Exception as e:
             logger.error(f"Context compression failed: {e}. Falling back to simple truncation.")
             from app.core.context_utils import get_optimized_context
-            return get_optimized_context(agno_history)
+            return get_optimized_context([{k: v for k, v in m.items() if k != "id"} for m in agno_history])
+
+    async def _save_context_summary(self, session_id: str, summary: Dict[str, Any]):
+        """Store the rolling summary on the session (runs in the background, own DB session)."""
+        async with AsyncSessionLocal() as db:
+            await crud_chat.save_context_summary(db, session_id, summary)
 
     async def _get_allowed_docs(self, db, agent_obj, attachments, strict_mode):
         doc_ids = []
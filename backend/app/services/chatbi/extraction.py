@@ -1,10 +1,12 @@
 import asyncio
 import json
 import logging
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Dict, List, Optional
 
 from sqlalchemy import select
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.models.llm_model import LLMModel
 from app.services.llm.factory import ModelFactory
@@ -72,7 +74,11 @@ Extract the indicator "{indicator_name}" from the text below.
 
 class DataExtractionService:
     def __init__(self):
-        pass
+        concurrency = max(1, settings.EXTRACTION_CONCURRENCY)
+        # Process-wide limit on LLM calls in flight, shared by every extraction request
+        self._slots = asyncio.Semaphore(concurrency)
+        # Models without an async API: blocking model.response() runs here, never on the event loop
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="extraction")
 
     async def _get_model_client(self, model_id: str):
         """
@@ -137,69 +143,157 @@ class DataExtractionService:
 
         return json.dumps(merged_list, ensure_ascii=False, indent=2)
 
-    async def _call_llm(self, prompt: str, model_id: str) -> str:
+    async def _call_llm(self, prompt: str, model_id: str, model: Any = None) -> str:
+        """
+        One LLM call with a per-attempt timeout and retries (exponential backoff).
+        Errors are returned as ``"Error: ..."`` strings, as the merge step expects.
+        """
         try:
-            model = await self._get_model_client(model_id)
-            
-            # Agno model usage: model.response(messages=[Message(role="user", content=prompt)])
-            response = model.response(messages=[Message(role="user", content=prompt)])
-            return response.content
+            if model is None:
+                model = await self._get_model_client(model_id)
         except Exception as e:
             logger.error(f"LLM Call Error: {e}")
             return f"Error: {str(e)}"
 
-    async def run_extraction(self, prompt: str, text_content: str, model: str = "qwen-plus") -> Dict[str, Any]:
+        attempts = max(0, settings.EXTRACTION_MAX_RETRIES) + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                response = await self._invoke(model, [Message(role="user", content=prompt)])
+                return response.content
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    e = TimeoutError(f"LLM call timed out after {settings.EXTRACTION_CHUNK_TIMEOUT}s")
+                if attempt == attempts:
+                    logger.error(f"LLM Call Error: {e}")
+                    return f"Error: {str(e)}"
+                delay = min(2 ** (attempt - 1), 10)
+                logger.warning(f"LLM call failed (attempt {attempt}/{attempts}), retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _invoke(self, model: Any, messages: List[Message]) -> Any:
         """
-        Run extraction task. Calls LLM API.
-        Handles chunking for large texts.
+        One model call holding a global slot. The timeout starts once the slot is held, so time spent
+        waiting behind other requests does not count against EXTRACTION_CHUNK_TIMEOUT.
         """
-        CHUNK_THRESHOLD = 30000
+        timeout = settings.EXTRACTION_CHUNK_TIMEOUT
+        await self._slots.acquire()
+        if hasattr(model, "aresponse"):
+            try:
+                # Cancelling the coroutine on timeout aborts the request
+                return await asyncio.wait_for(model.aresponse(messages=messages), timeout)
+            finally:
+                self._slots.release()
 
-        if len(text_content) > CHUNK_THRESHOLD and model != "qwen-long":
-            logger.info(f"[Extraction] Text length {len(text_content)} exceeds threshold. Using Map-Reduce with {model}.")
-            chunks = self._chunk_text(text_content)
-            tasks = []
+        # Blocking model: a thread cannot be cancelled, so its slot is only freed when the call returns
+        # and hung calls never queue new ones behind them in the pool
+        loop = asyncio.get_running_loop()
 
-            for chunk in chunks:
-                if "{text_content}" in prompt:
-                    chunk_input = prompt.replace("{text_content}", chunk)
-                else:
-                    chunk_input = prompt.replace("{{text_content}}", chunk)
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._slots.release)
+            except RuntimeError:
+                # Event loop already closed
+                pass
 
-                tasks.append(self._call_llm(chunk_input, model))
+        try:
+            future = self._executor.submit(model.response, messages=messages)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    @staticmethod
+    def _fill_prompt(prompt: str, text: str) -> str:
+        if "{text_content}" in prompt:
+            return prompt.replace("{text_content}", text)
+        return prompt.replace("{{text_content}}", text)
+
+    def _finalize(self, results: List[str]) -> Dict[str, Any]:
+        merged_content = self._merge_results(results)
+
+        if merged_content == "[]":
+            # Fallback: check if we have any valid text results that failed to parse
+            valid_results = [r for r in results if r and not r.startswith("Error:")]
+            if valid_results:
+                return {"status": "success", "content": "\n\n".join(valid_results)}
+            
+            # Check for errors
+            error_results = [r for r in results if r and r.startswith("Error:")]
+            if error_results:
+                return {"status": "error", "content": error_results[0]}
 
-            results = await asyncio.gather(*tasks)
-            merged_content = self._merge_results(results)
+        return {"status": "success", "content": merged_content}
 
-            if merged_content == "[]":
-                # Fallback: check if we have any valid text results that failed to parse
-                valid_results = [r for r in results if r and not r.startswith("Error:")]
-                if valid_results:
-                    return {"status": "success", "content": "\n\n".join(valid_results)}
-                
-                # Check for errors
-                error_results = [r for r in results if r and r.startswith("Error:")]
-                if error_results:
-                    return {"status": "error", "content": error_results[0]}
+    async def stream_extraction(
+        self, prompt: str, text_content: str, model: str = "qwen-plus"
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Run extraction, yielding ``{"status": "partial", "done", "total", "content"}`` each time a chunk
+        completes (content = merge of the chunks finished so far, in document order), then the final result.
 
-            return {"status": "success", "content": merged_content}
+        Map phase: chunks run concurrently, at most EXTRACTION_CONCURRENCY LLM calls at a time across all
+        requests, so a long document takes about ceil(chunks / concurrency) chunk latencies.
+        """
+        CHUNK_THRESHOLD = 30000
 
-        else:
+        if len(text_content) <= CHUNK_THRESHOLD or model == "qwen-long":
             # Single call
-            if "{text_content}" in prompt:
-                final_input = prompt.replace("{text_content}", text_content)
+            content = await self._call_llm(self._fill_prompt(prompt, text_content), model)
+
+            if content and content.startswith("Error:"):
+                yield {"status": "error", "content": content}
+            elif content:
+                yield {"status": "success", "content": content}
             else:
-                final_input = prompt.replace("{{text_content}}", text_content)
+                yield {"status": "error", "content": "LLM returned empty response"}
+            return
+
+        chunks = self._chunk_text(text_content)
+        logger.info(
+            f"[Extraction] Text length {len(text_content)} exceeds threshold. "
+            f"Using Map-Reduce with {model} over {len(chunks)} chunks."
+        )
+        try:
+            client = await self._get_model_client(model)
+        except Exception as e:
+            logger.error(f"LLM Call Error: {e}")
+            yield {"status": "error", "content": f"Error: {str(e)}"}
+            return
 
-            content = await self._call_llm(final_input, model)
+        async def map_chunk(index: int, chunk: str):
+            # Concurrency is bounded by the service-wide slots in _invoke
+            return index, await self._call_llm(self._fill_prompt(prompt, chunk), model, client)
 
-            if content and content.startswith("Error:"):
-                return {"status": "error", "content": content}
+        results: List[Optional[str]] = [None] * len(chunks)
+        tasks = [asyncio.create_task(map_chunk(i, c)) for i, c in enumerate(chunks)]
+        try:
+            for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+                index, result = await next_result
+                results[index] = result
+                if done < len(chunks):
+                    yield {
+                        "status": "partial",
+                        "done": done,
+                        "total": len(chunks),
+                        "content": self._merge_results([r for r in results if r]),
+                    }
+        finally:
+            # Client went away mid-stream: stop scheduling the remaining chunks
+            for task in tasks:
+                task.cancel()
+
+        yield self._finalize(results)
 
-            if content:
-                return {"status": "success", "content": content}
-            else:
-                return {"status": "error", "content": "LLM returned empty response"}
+    async def run_extraction(self, prompt: str, text_content: str, model: str = "qwen-plus") -> Dict[str, Any]:
+        """
+        Run extraction task. Calls LLM API.
+        Handles chunking for large texts.
+        """
+        result: Dict[str, Any] = {"status": "error", "content": "LLM returned empty response"}
+        async for result in self.stream_extraction(prompt, text_content, model):
+            pass
+        return result
 
 
 extraction_service = DataExtractionService()
@@ -209,6 +303,10 @@ async def run_extraction(prompt: str, text_content: str, model: str = "qwen-plus
     return await extraction_service.run_extraction(prompt, text_content, model)
 
 
+def stream_extraction(prompt: str, text_content: str, model: str = "qwen-plus") -> AsyncGenerator[Dict[str, Any], None]:
+    return extraction_service.stream_extraction(prompt, text_content, model)
+
+
 def generate_prompt(
     name: str,
     definition: str,
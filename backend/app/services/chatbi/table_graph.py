@@ -0,0 +1,234 @@
+"""
+数据表 → 知识图谱的分页转换。
+
+- 按主键做 keyset 分页（WHERE pk > :last ORDER BY pk LIMIT n），任意大小的表内存中只保留一页；
+  无主键的表退化为 OFFSET 分页。
+- 每页按 ``rows_per_doc`` 行渲染为一篇文档，整页一次交给 LightRAG（其内部在 llm_model_max_async
+  限制内并发抽取）；插入当前页的同时预取下一页。
+- 每页插入成功后写检查点（JSON），任务中断或进程重启后从最后一页继续。
+- 增量模式：按更新时间列（如 updated_at）只转换上次运行以来修改过的行。每次运行开始时取
+  MAX(更新列) 作为本次上界，运行期间新修改的行留给下一次运行。
+"""
+import asyncio
+import datetime
+import decimal
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import MetaData, Table, and_, func, or_, select
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = Path(__file__).resolve().parents[3] / "data" / "graph_conversion"
+
+UPDATED_COLUMN_CANDIDATES = ("updated_at", "update_time", "modified_at", "gmt_modified", "last_modified", "mtime")
+
+InsertFn = Callable[[List[Tuple[str, Optional[str]]]], Awaitable[None]]
+ProgressFn = Callable[[int, str], None]
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict) and "__type__" in value:
+        kind, raw = value["__type__"], value["value"]
+        if kind == "datetime":
+            return datetime.datetime.fromisoformat(raw)
+        if kind == "date":
+            return datetime.date.fromisoformat(raw)
+        if kind == "decimal":
+            return decimal.Decimal(raw)
+    return value
+
+
+class TableGraphConverter:
+    _active: set = set()
+    _active_lock = threading.Lock()
+
+    def __init__(
+        self,
+        engine: Engine,
+        table_name: str,
+        insert_texts: InsertFn,
+        connection_key: str = "default",
+        page_size: int = 1000,
+        rows_per_doc: int = 50,
+        incremental: bool = False,
+        updated_column: Optional[str] = None,
+        checkpoint_dir: Path = CHECKPOINT_DIR,
+    ):
+        self.engine = engine
+        self.table_name = table_name
+        self.insert_texts = insert_texts
+        self.page_size = max(1, page_size)
+        self.rows_per_doc = max(1, rows_per_doc)
+        self.incremental = incremental
+        self.updated_column = updated_column
+        self.checkpoint_path = Path(checkpoint_dir) / f"{connection_key}_{table_name}.json"
+        self.table: Optional[Table] = None
+        self.key_columns: List[Any] = []
+        self.updated: Optional[Any] = None
+
+    # --- checkpoint ---
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_checkpoint(self, state: Dict[str, Any]):
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    # --- database (sync, run in threadpool) ---
+
+    def _reflect(self):
+        self.table = Table(self.table_name, MetaData(), autoload_with=self.engine)
+        self.key_columns = list(self.table.primary_key.columns)
+        name = self.updated_column
+        if name is None:
+            name = next((c for c in UPDATED_COLUMN_CANDIDATES if c in self.table.c), None)
+        elif name not in self.table.c:
+            raise ValueError(f"表【{self.table_name}】不存在列 {name}")
+        self.updated = self.table.c[name] if name else None
+
+    def _window(self, since: Any, until: Any) -> List[Any]:
+        conditions = []
+        if since is not None:
+            conditions.append(self.updated > since)
+        if until is not None:
+            conditions.append(self.updated <= until)
+        return conditions
+
+    def _count_and_high(self, since: Any) -> Tuple[int, Any]:
+        columns = [func.count()]
+        if self.updated is not None:
+            columns.append(func.max(self.updated))
+        stmt = select(*columns).select_from(self.table).where(*self._window(since, None))
+        with self.engine.connect() as conn:
+            row = conn.execute(stmt).one()
+        return row[0], (row[1] if self.updated is not None else None)
+
+    def _after(self, last_key: Sequence[Any]):
+        # (a, b) > (x, y) spelled out, since row-value comparison is not portable
+        clauses = []
+        for i, col in enumerate(self.key_columns):
+            equal = [self.key_columns[j] == last_key[j] for j in range(i)]
+            clauses.append(and_(*equal, col > last_key[i]))
+        return or_(*clauses)
+
+    def _fetch_page(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        stmt = select(self.table).where(*self._window(state["since"], state["until"]))
+        if self.key_columns:
+            if state["last_key"] is not None:
+                stmt = stmt.where(self._after(state["last_key"]))
+            stmt = stmt.order_by(*self.key_columns)
+        else:
+            stmt = stmt.order_by(*self.table.c).offset(state["rows_done"])
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(stmt.limit(self.page_size)).mappings()]
+
+    def _page_key(self, row: Dict[str, Any]) -> Optional[List[Any]]:
+        if not self.key_columns:
+            return None
+        return [row[c.name] for c in self.key_columns]
+
+    # --- rendering ---
+
+    def render_documents(self, rows: List[Dict[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+        docs = []
+        for start in range(0, len(rows), self.rows_per_doc):
+            text_parts = []
+            for row in rows[start:start + self.rows_per_doc]:
+                key = self._page_key(row)
+                label = "/".join(str(k) for k in key) if key else ""
+                row_str = ", ".join(f"{k}:{v}" for k, v in row.items() if v is not None)
+                text_parts.append(f"数据表记录 #{label}：{row_str}" if label else f"数据表记录：{row_str}")
+            full_text = f"以下是数据库表【{self.table_name}】的数据记录，请构建相关实体和关系：\n\n" + "\n".join(text_parts)
+            docs.append((full_text, f"Database Table: {self.table_name}"))
+        return docs
+
+    # --- run ---
+
+    async def run(self, progress: ProgressFn) -> Dict[str, Any]:
+        key = str(self.checkpoint_path)
+        with self._active_lock:
+            if key in self._active:
+                raise RuntimeError(f"表【{self.table_name}】正在转换中")
+            self._active.add(key)
+        try:
+            return await self._run(progress)
+        finally:
+            with self._active_lock:
+                self._active.discard(key)
+
+    async def _run(self, progress: ProgressFn) -> Dict[str, Any]:
+        await run_in_threadpool(self._reflect)
+        if self.incremental and self.updated is None:
+            raise ValueError(f"表【{self.table_name}】没有更新时间列，无法增量转换")
+
+        checkpoint = self.load_checkpoint()
+        run = checkpoint.get("run")
+        if run and run.get("status") == "running":
+            state = {k: _load_value(v) for k, v in run.items()}
+            state["last_key"] = [_load_value(v) for v in run["last_key"]] if run["last_key"] is not None else None
+            progress(10, f"从检查点继续：已转换 {state['rows_done']} 行")
+        else:
+            since = _load_value(checkpoint.get("watermark")) if self.incremental else None
+            total, high = await run_in_threadpool(self._count_and_high, since)
+            # A full run covers every row (NULL update times included); an incremental run is bounded above
+            # by the high-water mark taken now, which becomes the next run's starting point
+            state = {"status": "running", "since": since, "until": high if since is not None else None,
+                     "high": high, "last_key": None, "rows_done": 0, "total": total}
+
+        if state["total"] == 0:
+            progress(100, "没有需要转换的数据")
+            return self._finish(checkpoint, state)
+
+        page = await run_in_threadpool(self._fetch_page, state)
+        while page:
+            # Prefetch the next page while LightRAG processes this one
+            next_state = dict(state, last_key=self._page_key(page[-1]), rows_done=state["rows_done"] + len(page))
+            prefetch = asyncio.create_task(run_in_threadpool(self._fetch_page, next_state))
+            try:
+                await self.insert_texts(self.render_documents(page))
+            except BaseException:
+                prefetch.cancel()
+                raise
+            state = next_state
+            self._save_checkpoint(dict(checkpoint, run=self._dump_state(state)))
+            percent = 10 + int(85 * min(state["rows_done"], state["total"]) / max(state["total"], 1))
+            progress(percent, f"已转换 {state['rows_done']}/{state['total']} 行")
+            page = await prefetch
+
+        progress(100, f"转换成功！共 {state['rows_done']} 行")
+        return self._finish(checkpoint, state)
+
+    def _dump_state(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        dumped = {k: _dump_value(v) for k, v in state.items()}
+        if state["last_key"] is not None:
+            dumped["last_key"] = [_dump_value(v) for v in state["last_key"]]
+        return dumped
+
+    def _finish(self, checkpoint: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+        state = dict(state, status="completed")
+        watermark = state["high"] if state["high"] is not None else _load_value(checkpoint.get("watermark"))
+        self._save_checkpoint({"table": self.table_name, "watermark": _dump_value(watermark), "run": self._dump_state(state)})
+        return {"rows": state["rows_done"], "total": state["total"], "incremental": state["since"] is not None}
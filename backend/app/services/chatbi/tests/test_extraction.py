@@ -0,0 +1,148 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from app.core.config import settings
+from app.services.chatbi.extraction import DataExtractionService
+
+
+class _SlowModel:
+    """Blocking model.response() that reports how many calls overlap."""
+
+    def __init__(self, delay: float, fail_first: int = 0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def response(self, messages):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if call <= self.fail_first:
+                raise RuntimeError("boom")
+            return SimpleNamespace(content=json.dumps([{"chunk": len(messages[0].content)}]))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class _AsyncModel:
+    """Model with the async API; the first ``hang_first`` calls never return."""
+
+    def __init__(self, delay: float, hang_first: int = 0):
+        self.delay = delay
+        self.hang_first = hang_first
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def aresponse(self, messages):
+        self.calls += 1
+        call = self.calls
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(3600 if call <= self.hang_first else self.delay)
+            return SimpleNamespace(content=json.dumps([{"chunk": call}]))
+        finally:
+            self.active -= 1
+
+
+class TestRunExtraction(unittest.TestCase):
+
+    def _service(self, model):
+        service = DataExtractionService()
+
+        async def get_client(model_id):
+            return model
+
+        service._get_model_client = get_client
+        return service
+
+    def test_map_phase_runs_concurrently(self):
+        model = _SlowModel(0.2)
+        service = self._service(model)
+        text = "x" * 20000 * 6  # 7 chunks
+
+        async def run():
+            ticks = 0
+            task = asyncio.create_task(service.run_extraction("{{text_content}}", text))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return await task, ticks
+
+        start = time.monotonic()
+        result, ticks = asyncio.run(run())
+        elapsed = time.monotonic() - start
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(len(json.loads(result["content"])), 7)
+        self.assertGreater(model.peak, 1)
+        self.assertLess(elapsed, 7 * 0.2)
+        # The event loop kept running while chunks were in flight
+        self.assertGreater(ticks, 10)
+
+    def test_stream_yields_partials_then_final(self):
+        service = self._service(_SlowModel(0.01))
+        text = "y" * 20000 * 3
+
+        async def collect():
+            return [e async for e in service.stream_extraction("{{text_content}}", text)]
+
+        events = asyncio.run(collect())
+        partials = [e for e in events if e["status"] == "partial"]
+        self.assertTrue(partials)
+        self.assertEqual([e["done"] for e in partials], list(range(1, len(partials) + 1)))
+        self.assertEqual(events[-1]["status"], "success")
+
+    def test_retry_after_failure(self):
+        model = _SlowModel(0, fail_first=1)
+        service = self._service(model)
+        result = asyncio.run(service.run_extraction("{{text_content}}", "short text"))
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(model.calls, 2)
+
+    def test_global_limit_and_queue_time_not_timed(self):
+        model = _AsyncModel(0.1)
+        with mock.patch.multiple(settings, EXTRACTION_CONCURRENCY=2, EXTRACTION_CHUNK_TIMEOUT=0.25):
+            service = self._service(model)
+            text = "z" * 20000 * 3  # 4 chunks per request
+
+            async def run():
+                return await asyncio.gather(*(service.run_extraction("{{text_content}}", text) for _ in range(2)))
+
+            results = asyncio.run(run())
+        # 8 calls through 2 slots take ~0.4s, longer than the timeout: none timed out while queued
+        self.assertEqual([r["status"] for r in results], ["success", "success"])
+        self.assertEqual(model.calls, 8)
+        self.assertEqual(model.peak, 2)
+
+    def test_hung_async_call_is_cancelled_and_retried(self):
+        model = _AsyncModel(0, hang_first=1)
+        with mock.patch.multiple(settings, EXTRACTION_CHUNK_TIMEOUT=0.05):
+            service = self._service(model)
+            result = asyncio.run(service.run_extraction("{{text_content}}", "short text"))
+        self.assertEqual(result["status"], "success")
+        self.assertEqual((model.calls, model.active), (2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import datetime
+import tempfile
+import unittest
+from pathlib import Path
+from sqlalchemy import create_engine, text
+from app.services.chatbi.table_graph import TableGraphConverter
+
+
+class TestTableGraphConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.engine = create_engine(f"sqlite:///{self.dir / 'test.db'}")
+        self.base = datetime.datetime(2024, 1, 1)
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE orders (region TEXT, id INTEGER, amount INTEGER, updated_at DATETIME, PRIMARY KEY (region, id))"))
+            conn.execute(
+                text("INSERT INTO orders VALUES (:region, :id, :amount, :updated_at)"),
+                [{"region": r, "id": i, "amount": i * 10, "updated_at": self.base} for r in ("north", "south") for i in range(12)],
+            )
+        self.inserted = []
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    async def _insert(self, items):
+        self.inserted.extend(items)
+
+    def _converter(self, **kwargs):
+        return TableGraphConverter(self.engine, "orders", self._insert, checkpoint_dir=self.dir,
+                                   page_size=5, rows_per_doc=2, **kwargs)
+
+    def _rows(self):
+        return [line for text_, _ in self.inserted for line in text_.splitlines() if line.startswith("数据表记录")]
+
+    def test_full_conversion_pages_composite_key(self):
+        result = asyncio.run(self._converter().run(lambda p, m: None))
+        self.assertEqual(result["rows"], 24)
+        rows = self._rows()
+        self.assertEqual(len(rows), 24)
+        self.assertEqual(len(set(rows)), 24)
+        self.assertTrue(all(len(t.splitlines()) <= 4 for t, _ in self.inserted))
+
+    def test_resume_from_checkpoint(self):
+        calls = {"n": 0}
+
+        async def flaky(items):
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise RuntimeError("lightrag down")
+            self.inserted.extend(items)
+
+        converter = TableGraphConverter(self.engine, "orders", flaky, checkpoint_dir=self.dir, page_size=5, rows_per_doc=5)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(converter.run(lambda p, m: None))
+        self.assertEqual(len(self._rows()), 10)
+
+        asyncio.run(self._converter().run(lambda p, m: None))
+        self.assertEqual(len(self._rows()), 24)
+        self.assertEqual(len(set(self._rows())), 24)
+
+    def test_incremental_converts_changed_rows_only(self):
+        asyncio.run(self._converter().run(lambda p, m: None))
+        self.inserted.clear()
+        with self.engine.begin() as conn:
+            conn.execute(text("UPDATE orders SET amount = 999, updated_at = :t WHERE id IN (3, 7)"),
+                         {"t": self.base + datetime.timedelta(days=1)})
+
+        result = asyncio.run(self._converter(incremental=True).run(lambda p, m: None))
+        self.assertEqual(result["rows"], 4)
+        self.assertTrue(all("amount:999" in r for r in self._rows()))
+
+        self.inserted.clear()
+        result = asyncio.run(self._converter(incremental=True).run(lambda p, m: None))
+        self.assertEqual(result["rows"], 0)
+        self.assertEqual(self.inserted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
+import hashlib
 import json
 import logging
 import uuid
 import re
-from typing import List, Optional, Dict, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Dict, Any, Union
+from collections import OrderedDict
 from functools import lru_cache
 import pandas as pd
 import lancedb
@@ -13,9 +16,24 @@ import sqlparse
 
 from app.core.config import settings
 from .runners.sql_runner import SQLAlchemyRunner
+from .sql_cache import SemanticSQLCache, connection_key, schema_fingerprint
 
 logger = logging.getLogger(__name__)
 
+# Masking patterns, compiled once: emails keep the first 2 chars, mainland mobile numbers keep 3 + 4 digits
+_EMAIL_MASK = (re.compile(r'(?<![A-Za-z0-9._%+-])([A-Za-z0-9._%+-]{2})[A-Za-z0-9._%+-]*(@[A-Za-z0-9.-]+\.[A-Za-z]{2,})'), r'\1***\2')
+_PHONE_MASK = (re.compile(r'(?<!\d)(1[3-9]\d)\d{4}(\d{4})(?!\d)'), r'\1****\2')
+
+
+def _mask_strings(s: pd.Series) -> pd.Series:
+    for pattern, repl in (_EMAIL_MASK, _PHONE_MASK):
+        s = s.str.replace(pattern, repl, regex=True)
+    return s
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
 # --- Data Models for LanceDB ---
 # Make vector dimension dynamic
 # The 'vector' field is handled as a plain list in Pydantic, 
@@ -41,7 +59,15 @@ class VannaCore:
         self.model = "gpt-3.5-turbo" # Default, will be overwritten by config
         self.embed_model = "text-embedding-3-small"
         self.sql_runner: Optional[SQLAlchemyRunner] = None
-        self._sql_cache = {} # Simple in-memory cache for SQL generation
+        self.connection_key = "default"
+        # Semantic SQL cache (persistent, scoped by connection + schema fingerprint)
+        self.sql_cache = SemanticSQLCache(
+            self.db, max_entries=settings.CHATBI_SQL_CACHE_SIZE, threshold=settings.CHATBI_SQL_CACHE_THRESHOLD
+        )
+        self._schema_fp: Optional[str] = None
+        # In-process exact-match layers in front of the embedding lookup / intent LLM call
+        self._sql_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._intent_cache: "OrderedDict[str, str]" = OrderedDict()
 
     def configure_llm(self, api_key: str, base_url: str = None, model: str = None, 
                       embedding_api_key: str = None, embedding_base_url: str = None, embedding_model: str = None):
@@ -66,8 +92,33 @@ class VannaCore:
             
         logger.info(f"VannaCore configured. Chat Model: {self.model}, Embed Model: {self.embed_model}")
 
-    def set_sql_runner(self, runner: SQLAlchemyRunner):
+    def set_sql_runner(self, runner: SQLAlchemyRunner, connection_id: Optional[str] = None):
         self.sql_runner = runner
+        # SSH tunnels bind a random local port, so callers pass a stable id for the target database
+        if connection_id is None:
+            connection_id = runner.engine.url.render_as_string(hide_password=True)
+        self.connection_key = connection_key(connection_id)
+        self._schema_fp = None
+
+    def _remember(self, cache: OrderedDict, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > settings.CHATBI_SQL_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _schema_fingerprint(self) -> str:
+        """Hash of the DDL currently trained into the context table; recomputed after (re)training."""
+        if self._schema_fp is None:
+            ddls = []
+            self._ensure_table()
+            if self.table is not None:
+                try:
+                    ddls = self._context_rows(["text"], where="type = 'ddl'")["text"].tolist()
+                except Exception as e:
+                    logger.warning(f"Failed to read trained DDL for schema fingerprint: {e}")
+            self._schema_fp = schema_fingerprint(ddls)
+            self.sql_cache.invalidate(self.connection_key, self._schema_fp)
+        return self._schema_fp
 
     def _check_llm_configured(self):
         if not self.openai_client:
@@ -88,6 +139,18 @@ class VannaCore:
                 return self.embed_client.embeddings.create(input=[text], model="text-embedding-ada-002").data[0].embedding
             raise e
 
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings request for a batch of texts (results ordered like the input)."""
+        texts = [(t or "").replace("\n", " ") for t in texts]
+        try:
+            response = self.embed_client.embeddings.create(input=texts, model=self.embed_model)
+        except Exception as e:
+            if self.embed_model != "text-embedding-3-small":
+                raise e
+            logger.warning(f"Embedding failed with {self.embed_model}, trying text-embedding-ada-002. Error: {e}")
+            response = self.embed_client.embeddings.create(input=texts, model="text-embedding-ada-002")
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+
     def _ensure_table(self, dimension: int = 1536):
         """Ensure the table exists and check dimension compatibility."""
         if self.table:
@@ -101,11 +164,28 @@ class VannaCore:
             # Table doesn't exist, we will create it on first write
             pass
 
+    def _context_rows(self, columns: List[str], where: Optional[str] = None) -> pd.DataFrame:
+        """Selected columns of the context table (no vectors unless asked for)."""
+        total = self.table.count_rows() if self.table is not None else 0
+        if not total:
+            return pd.DataFrame(columns=columns)
+        query = self.table.search().select(columns)
+        if where:
+            query = query.where(where)
+        return query.limit(total).to_pandas()
+
+    def _table_dimension(self) -> Optional[int]:
+        try:
+            return getattr(self.table.schema.field("vector").type, "list_size", None)
+        except Exception:
+            return None
+
     def reset_vector_store(self):
         """Clear all vector data."""
         try:
             self.db.drop_table(self.table_name)
             self.table = None
+            self._schema_fp = None
             logger.info(f"Vector store '{self.table_name}' cleared successfully.")
         except Exception as e:
             logger.warning(f"Failed to clear vector store (maybe it didn't exist): {e}")
@@ -129,6 +209,8 @@ class VannaCore:
             
         if not data:
             return []
+        if ddl:
+            self._schema_fp = None
 
         # Get dimension from the first vector
         dim = len(data[0]["vector"])
@@ -164,7 +246,71 @@ class VannaCore:
             logger.error(f"Failed to train/add to vector store: {e}")
             raise e
 
-    def get_related_context(self, question: str, limit: int = 10) -> List[str]:
+    def train_bulk(self, ddls: List[str], batch_size: int = None, max_workers: int = None) -> Dict[str, int]:
+        """
+        Train on a full schema in bulk.
+
+        Each DDL row gets a deterministic id (hash of embedding model + DDL), so only new or changed
+        statements are embedded; DDL no longer in ``ddls`` is deleted. Texts are embedded in batches of
+        ``batch_size`` with ``max_workers`` requests in flight, and written with a single ``add``.
+        """
+        self._check_llm_configured()
+        batch_size = batch_size or settings.CHATBI_EMBED_BATCH_SIZE
+        max_workers = max_workers or settings.CHATBI_EMBED_CONCURRENCY
+
+        wanted: Dict[str, str] = {}
+        for ddl in ddls:
+            if ddl:
+                digest = hashlib.sha256(f"{self.embed_model}\0{ddl}".encode("utf-8")).hexdigest()
+                wanted[f"ddl-{digest[:32]}"] = ddl
+
+        self._ensure_table()
+        trained = set(self._context_rows(["id"], where="type = 'ddl'")["id"])
+
+        stale = sorted(trained - wanted.keys())
+        pending = [(i, ddl) for i, ddl in wanted.items() if i not in trained]
+
+        for start in range(0, len(stale), 500):
+            ids = ", ".join(f"'{i}'" for i in stale[start:start + 500])
+            self.table.delete(f"id IN ({ids})")
+
+        if pending:
+            vectors = self._embed_batched([ddl for _, ddl in pending], batch_size, max_workers)
+            data = [{"id": i, "text": ddl, "type": "ddl", "vector": vec} for (i, ddl), vec in zip(pending, vectors)]
+            self._add_rows(data, batch_size, max_workers)
+
+        if stale or pending:
+            self._schema_fp = None
+        logger.info(f"Schema training: {len(pending)} embedded, {len(stale)} removed, {len(wanted) - len(pending)} unchanged.")
+        return {"embedded": len(pending), "removed": len(stale), "unchanged": len(wanted) - len(pending)}
+
+    def _embed_batched(self, texts: List[str], batch_size: int, max_workers: int) -> List[List[float]]:
+        """Embed in batches of ``batch_size`` with ``max_workers`` requests in flight; output follows input order."""
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return [vec for vecs in pool.map(self._get_embeddings, batches) for vec in vecs]
+
+    def _add_rows(self, data: List[Dict[str, Any]], batch_size: int, max_workers: int):
+        if self.table is None:
+            self.table = self.db.create_table(self.table_name, data=data)
+            return
+        dim = len(data[0]["vector"])
+        stored_dim = self._table_dimension()
+        if stored_dim is not None and stored_dim != dim:
+            # The embedding model changed: every stored vector is unusable, so re-embed the whole
+            # context (sql / doc rows and unchanged DDL included) instead of keeping only the new rows
+            new_ids = {d["id"] for d in data}
+            rows = [r for r in self._context_rows(["id", "text", "type"]).to_dict("records") if r["id"] not in new_ids]
+            logger.warning(f"Vector dimension changed ({stored_dim} -> {dim}). Re-embedding {len(rows)} stored rows...")
+            vectors = self._embed_batched([r["text"] for r in rows], batch_size, max_workers)
+            rebuilt = data + [{**r, "vector": vec} for r, vec in zip(rows, vectors)]
+            self.db.drop_table(self.table_name)
+            self.table = self.db.create_table(self.table_name, data=rebuilt)
+            self._schema_fp = None
+            return
+        self.table.add(data)
+
+    def get_related_context(self, question: str, limit: int = 10, query_vec: Optional[List[float]] = None) -> List[str]:
         """Retrieve related DDL/SQL/Docs."""
         self._check_llm_configured()
         
@@ -177,7 +323,8 @@ class VannaCore:
                 return []
                 
         try:
-            query_vec = self._get_embedding(question)
+            if query_vec is None:
+                query_vec = self._get_embedding(question)
             results = self.table.search(query_vec).limit(limit).to_list()
             return [r["text"] for r in results]
         except Exception as e:
@@ -197,6 +344,11 @@ class VannaCore:
     def classify_intent(self, question: str) -> str:
         """Classify user intent: aggregation, time_series, comparison, detail, or unknown."""
         self._check_llm_configured()
+        key = _normalize_question(question)
+        if key in self._intent_cache:
+            self._intent_cache.move_to_end(key)
+            return self._intent_cache[key]
+
         system_prompt = """You are a Query Intent Classifier.
 Classify the user's question into one of the following categories:
 - aggregation: Questions asking for counts, sums, averages, stats.
@@ -215,17 +367,29 @@ Return ONLY the category name.
             ],
             temperature=0
         )
-        return response.choices[0].message.content.strip().lower()
+        intent = response.choices[0].message.content.strip().lower()
+        self._remember(self._intent_cache, key, intent)
+        return intent
 
     def generate_sql(self, question: str) -> str:
         """RAG-based SQL Generation with Caching."""
         self._check_llm_configured()
-        # Check Cache
-        if question in self._sql_cache:
+        schema_fp = self._schema_fingerprint()
+        key = (self.connection_key, schema_fp, _normalize_question(question))
+        # Check Cache: exact question first, then paraphrases via embedding similarity
+        if key in self._sql_cache:
+            self._sql_cache.move_to_end(key)
             logger.info(f"Cache hit for question: {question}")
-            return self._sql_cache[question]
+            return self._sql_cache[key]
+
+        query_vec = self._get_embedding(question)
+        cached = self.sql_cache.lookup(self.connection_key, schema_fp, query_vec)
+        if cached:
+            logger.info(f"Semantic cache hit for question: {question}")
+            self._remember(self._sql_cache, key, cached)
+            return cached
 
-        context = self.get_related_context(question)
+        context = self.get_related_context(question, query_vec=query_vec)
         
         system_prompt = """You are an expert SQL Data Analyst.
 Your task is to generate a SQL query to answer the user's question.
@@ -258,50 +422,58 @@ Generate SQL:
         
         # Cache Result
         if not sql.startswith("--"):
-            self._sql_cache[question] = sql
+            self._remember(self._sql_cache, key, sql)
+            self.sql_cache.store(self.connection_key, schema_fp, question, sql, query_vec)
             
         return sql
 
     def _mask_sensitive_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Mask sensitive data like emails, phones, ID cards."""
-        # Simple regex-based masking for demonstration
-        # Email
-        email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        # Phone (Simple 11 digit)
-        phone_pattern = r'\b1[3-9]\d{9}\b'
-        
-        # Helper to mask string
-        def mask_val(val):
-            if not isinstance(val, str):
-                return val
-            if re.match(email_pattern, val):
-                return re.sub(r'(^.{2}).*(@.*$)', r'\1***\2', val)
-            if re.match(phone_pattern, val):
-                return re.sub(r'(\d{3})\d{4}(\d{4})', r'\1****\2', val)
-            return val
-
-        # Apply to object columns
-        for col in df.select_dtypes(include=['object']):
-             df[col] = df[col].apply(mask_val)
-             
+        # Vectorized per column: one str.replace pass per precompiled pattern, no per-cell Python calls
+        for col in df.select_dtypes(include=['object', 'string']).columns:
+            s = df[col]
+            kind = pd.api.types.infer_dtype(s, skipna=True)
+            if kind == "string":
+                df[col] = _mask_strings(s)
+            elif kind.startswith("mixed"):
+                # DB drivers return Decimal / dates as object too: only touch the str cells
+                is_str = s.map(type) == str
+                if is_str.any():
+                    s = s.copy()
+                    s[is_str] = _mask_strings(s[is_str])
+                    df[col] = s
         return df
 
     def run_sql(self, sql: str) -> pd.DataFrame:
         """Execute SQL with Security Check and Masking."""
-        if not self.sql_runner:
-            raise Exception("Database not connected")
-        
-        # Security Check
-        if not self._is_read_only(sql):
-             raise Exception("Security Alert: Only SELECT queries are allowed.")
+        self._check_query(sql)
 
         df = self.sql_runner.run_sql(sql)
+        truncated = df.attrs.get("truncated", False)
         
         # Data Masking
         df = self._mask_sensitive_data(df)
+        df.attrs["truncated"] = truncated
         
         return df
 
+    def iter_sql(self, sql: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Streaming variant of run_sql: masked chunks, bounded by the runner's row / byte caps."""
+        self._check_query(sql)
+        for chunk in self.sql_runner.iter_sql(sql, chunksize=chunksize):
+            truncated = chunk.attrs.get("truncated", False)
+            chunk = self._mask_sensitive_data(chunk)
+            chunk.attrs["truncated"] = truncated
+            yield chunk
+
+    def _check_query(self, sql: str):
+        if not self.sql_runner:
+            raise Exception("Database not connected")
+        
+        # Security Check
+        if not self._is_read_only(sql):
+             raise Exception("Security Alert: Only SELECT queries are allowed.")
+
     def _is_read_only(self, sql: str) -> bool:
         """Simple SQL injection/mutation protection."""
         try:
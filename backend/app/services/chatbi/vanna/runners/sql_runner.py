@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Iterator, Optional
 
 import pandas as pd
 from sqlalchemy import create_engine, inspect, text
@@ -18,20 +19,85 @@ class SqlRunner(ABC):
     def get_tables(self) -> list[str]:
         pass
 
+    def iter_sql(self, sql: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Yield the result in chunks. Runners without a streaming path return the whole result as one chunk.
+        """
+        yield self.run_sql(sql)
+
 
 class SQLAlchemyRunner(SqlRunner):
     """
     Concrete implementation of SqlRunner using SQLAlchemy.
+
+    Results are fetched through a server-side cursor (``stream_results``) in chunks of ``chunk_size`` rows,
+    and reading stops once ``max_rows`` rows or ``max_bytes`` bytes of DataFrame memory are held.
+    A result cut short by either cap has ``df.attrs["truncated"] = True``. ``None`` disables a cap.
     """
 
-    def __init__(self, connection_string: str, **kwargs):
+    def __init__(
+        self,
+        connection_string: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        chunk_size: int = 1000,
+        **kwargs,
+    ):
         self.engine: Engine = create_engine(connection_string, **kwargs)
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.chunk_size = max(1, chunk_size)
+
+    def iter_sql(
+        self,
+        sql: str,
+        chunksize: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream the result set chunk by chunk, holding at most one chunk in memory.
+        Closing the generator early closes the cursor, so the rest of the result is never fetched.
+        """
+        chunksize = chunksize or self.chunk_size
+        max_rows = self.max_rows if max_rows is None else max_rows
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        rows = 0
+        size = 0
+
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+            chunks = iter(pd.read_sql(text(sql), conn, chunksize=chunksize))
+            for chunk in chunks:
+                truncated = last = False
+                if max_rows is not None and rows + len(chunk) >= max_rows:
+                    last = True
+                    # Exactly at the cap: one more fetch tells whether rows were left behind
+                    truncated = rows + len(chunk) > max_rows or next(chunks, None) is not None
+                    chunk = chunk.iloc[: max_rows - rows]
+                if max_bytes is not None:
+                    chunk_bytes = int(chunk.memory_usage(index=False, deep=True).sum())
+                    if size + chunk_bytes > max_bytes:
+                        # Keep the share of rows that fits; row sizes within one chunk are close enough
+                        keep = int(len(chunk) * (max_bytes - size) / chunk_bytes)
+                        chunk = chunk.iloc[:keep]
+                        chunk_bytes = int(chunk.memory_usage(index=False, deep=True).sum())
+                        truncated = last = True
+                    size += chunk_bytes
+                rows += len(chunk)
+                if truncated:
+                    chunk.attrs["truncated"] = True
+                yield chunk
+                if last:
+                    return
 
     def run_sql(self, sql: str) -> pd.DataFrame:
-        try:
-            return pd.read_sql(sql, self.engine)
-        except Exception as e:
-            raise e
+        chunks = list(self.iter_sql(sql))
+        if not chunks:
+            return pd.DataFrame()
+        df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+        df.attrs["truncated"] = bool(chunks[-1].attrs.get("truncated"))
+        return df
 
     def get_tables(self) -> list[str]:
         inspector = inspect(self.engine)
@@ -0,0 +1,64 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import tempfile
+import unittest
+from sqlalchemy import text
+from app.services.chatbi.vanna.runners.sql_runner import SQLAlchemyRunner
+
+
+class TestSQLAlchemyRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'test.db')}"
+        runner = SQLAlchemyRunner(self.url)
+        with runner.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (id INTEGER, name TEXT)"))
+            conn.execute(text("INSERT INTO t VALUES (:id, :name)"), [{"id": i, "name": f"user{i}"} for i in range(250)])
+        runner.engine.dispose()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_sql_chunks(self):
+        runner = SQLAlchemyRunner(self.url, chunk_size=100)
+        chunks = list(runner.iter_sql("SELECT * FROM t"))
+        self.assertEqual([len(c) for c in chunks], [100, 100, 50])
+        self.assertFalse(any(c.attrs.get("truncated") for c in chunks))
+        self.assertEqual(runner.run_sql("SELECT * FROM t")["id"].tolist(), list(range(250)))
+
+    def test_row_cap_truncates(self):
+        runner = SQLAlchemyRunner(self.url, max_rows=120, chunk_size=100)
+        df = runner.run_sql("SELECT * FROM t")
+        self.assertEqual(len(df), 120)
+        self.assertTrue(df.attrs["truncated"])
+
+    def test_row_cap_on_chunk_boundary(self):
+        runner = SQLAlchemyRunner(self.url, max_rows=200, chunk_size=100)
+        self.assertTrue(runner.run_sql("SELECT * FROM t").attrs["truncated"])
+        exact = SQLAlchemyRunner(self.url, max_rows=250, chunk_size=50).run_sql("SELECT * FROM t")
+        self.assertEqual(len(exact), 250)
+        self.assertFalse(exact.attrs["truncated"])
+
+    def test_byte_cap_truncates(self):
+        runner = SQLAlchemyRunner(self.url, chunk_size=50)
+        full = runner.run_sql("SELECT * FROM t")
+        budget = int(full.memory_usage(index=False, deep=True).sum() / 2)
+        df = SQLAlchemyRunner(self.url, max_bytes=budget, chunk_size=50).run_sql("SELECT * FROM t")
+        self.assertTrue(df.attrs["truncated"])
+        self.assertLess(len(df), 250)
+        self.assertLessEqual(int(df.memory_usage(index=False, deep=True).sum()), budget)
+
+    def test_empty_result(self):
+        df = SQLAlchemyRunner(self.url).run_sql("SELECT * FROM t WHERE id < 0")
+        self.assertTrue(df.empty)
+        self.assertFalse(df.attrs["truncated"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import asyncio
 import logging
 import time
 import json
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Callable, Generator, List, Optional, AsyncGenerator, Dict
 
 import pandas as pd
@@ -17,6 +19,7 @@ from .runners.sql_runner import SQLAlchemyRunner
 from .core import VannaCore
 from .permission import SQLPermissionValidator
 from app.services.chatbi.semantic_layer import SemanticLayer
+from app.services.chatbi.table_graph import TableGraphConverter
 from app.services.rag.retrieval.engines.lightrag import lightrag_engine
 from app.services.nlu.classifier import QueryIntent
 from app.services.rag.kg_query import KGQueryService
@@ -251,9 +254,12 @@ class SmartDataQueryService:
 
         try:
             sql_runner = SQLAlchemyRunner(
-                conn_str, connect_args=connect_args, pool_size=config.pool_size or 5, max_overflow=10
+                conn_str, connect_args=connect_args, pool_size=config.pool_size or 5, max_overflow=10,
+                max_rows=settings.CHATBI_MAX_ROWS, max_bytes=settings.CHATBI_MAX_BYTES,
+                chunk_size=settings.CHATBI_FETCH_CHUNK_SIZE,
             )
-            self.vanna_core.set_sql_runner(sql_runner)
+            connection_id = f"{config.type}://{config.host}:{config.port}/{config.database or config.path}/{config.db_schema}"
+            self.vanna_core.set_sql_runner(sql_runner, connection_id=connection_id)
             self.current_db_config = config
             logger.info("SQLAlchemy engine created.")
             
@@ -269,12 +275,9 @@ class SmartDataQueryService:
             raise e
 
     def _train_on_schema(self, runner: SQLAlchemyRunner):
-        """Extract DDL and train Vanna."""
+        """Extract DDL and train Vanna (incremental: only new or changed tables are embedded)."""
         logger.info("Starting schema extraction and training...")
         
-        # Clear existing vector data to avoid dimension mismatch or stale schema
-        self.vanna_core.reset_vector_store()
-        
         try:
             inspector = inspect(runner.engine)
             # Pre-check for table names to catch missing DB issues early
@@ -283,10 +286,21 @@ class SmartDataQueryService:
             logger.warning(f"Could not inspect tables (possibly no database selected): {e}")
             return
 
+        # Reflect all tables' columns in one round trip where the dialect supports it
+        try:
+            columns_by_table = {
+                name: cols for (_, name), cols in inspector.get_multi_columns(filter_names=table_names).items()
+            }
+        except (AttributeError, NotImplementedError) as e:
+            logger.debug(f"Bulk column reflection unavailable, falling back to per-table: {e}")
+            columns_by_table = {}
+
         ddl_statements = []
         
         for table_name in table_names:
-            columns = inspector.get_columns(table_name)
+            columns = columns_by_table.get(table_name)
+            if columns is None:
+                columns = inspector.get_columns(table_name)
             # Simplified DDL generation
             col_defs = []
             for col in columns:
@@ -294,9 +308,8 @@ class SmartDataQueryService:
             ddl = f"CREATE TABLE {table_name} ({', '.join(col_defs)});"
             ddl_statements.append(ddl)
             
-        # Train Vanna
-        for ddl in ddl_statements:
-            self.vanna_core.train(ddl=ddl)
+        # Train Vanna (stale DDL from a previous schema / connection is removed)
+        self.vanna_core.train_bulk(ddl_statements)
         logger.info(f"Trained on {len(ddl_statements)} tables.")
 
     def test_connection(self, config: DbConnectionConfig) -> bool:
@@ -313,6 +326,11 @@ class SmartDataQueryService:
             logger.error(f"Test connection failed: {e}")
             return False
 
+    @staticmethod
+    def _rows_payload(df: pd.DataFrame, offset: int) -> Dict[str, Any]:
+        records = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+        return {"offset": offset, "columns": df.columns.tolist(), "rows": records}
+
     async def query_sse(self, question: str, session_id: Optional[str] = None) -> AsyncGenerator[str, None]:
         """
         运行 Tiga 查询并以 SSE 格式流式返回结果。
@@ -321,7 +339,7 @@ class SmartDataQueryService:
         
         def sse_pack(event: str, data: Any) -> str:
             if isinstance(data, (dict, list)):
-                data_str = json.dumps(data, ensure_ascii=False)
+                data_str = json.dumps(data, ensure_ascii=False, default=str)
             else:
                 data_str = str(data)
             lines = data_str.split('\n')
@@ -390,61 +408,83 @@ class SmartDataQueryService:
 
             yield sse_pack("message", "正在执行查询...\n")
             
-            # 3. 执行 SQL
+            # 3. 执行 SQL（流式：服务端游标分块读取，首块到达即输出预览与图表）
             logger.info(f"审计：用户问题 '{question}' 执行的 SQL：{sql}")
-            df = self.vanna_core.run_sql(sql)
-            
-            if df.empty:
-                msg = "查询已执行，但未返回结果。"
-                yield sse_pack("message", msg)
-                full_content.append(msg)
+            loop = asyncio.get_running_loop()
+            # 游标必须始终在同一线程上读取
+            fetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chatbi-fetch")
+            chunks = self.vanna_core.iter_sql(sql)
+            try:
+                df = await loop.run_in_executor(fetcher, next, chunks, None)
+                
+                if df is None or df.empty:
+                    msg = "查询已执行，但未返回结果。"
+                    yield sse_pack("message", msg)
+                    full_content.append(msg)
+                    yield sse_pack("message", "</think>\n")
+                    return
+                    
+                # 4. 数据预览
                 yield sse_pack("message", "</think>\n")
-                return
+                msg_header = "### 查询结果\n"
+                yield sse_pack("message", msg_header)
+                full_content.append(msg_header)
                 
-            # 4. 数据预览
-            yield sse_pack("message", "</think>\n")
-            msg_header = f"### 查询结果（{len(df)} 行）\n"
-            yield sse_pack("message", msg_header)
-            full_content.append(msg_header)
-            
-            msg_table = df.head(10).to_markdown() + "\n\n"
-            yield sse_pack("message", msg_table)
-            full_content.append(msg_table)
-            
-            # Check empty
-            is_effectively_empty = False
-            if len(df) == 1 and df.iloc[0].isnull().all():
-                 is_effectively_empty = True
-            
-            if is_effectively_empty:
-                 msg = "查询结果为空值（NULL），跳过图表生成。"
-                 yield sse_pack("message", msg)
-                 full_content.append(msg)
-            else:
-                # 5. 生成图表
-                yield sse_pack("message", "正在生成可视化...\n")
+                msg_table = df.head(10).to_markdown() + "\n\n"
+                yield sse_pack("message", msg_table)
+                full_content.append(msg_table)
+                total_rows = len(df)
+                truncated = df.attrs.get("truncated", False)
+                yield sse_pack("rows", self._rows_payload(df, 0))
                 
-                try:
-                    chart = self.vanna_core.generate_echarts(question, df, sql)
-                    generated_chart = chart
+                # Check empty
+                is_effectively_empty = False
+                if len(df) == 1 and df.iloc[0].isnull().all():
+                     is_effectively_empty = True
+                
+                if is_effectively_empty:
+                     msg = "查询结果为空值（NULL），跳过图表生成。"
+                     yield sse_pack("message", msg)
+                     full_content.append(msg)
+                else:
+                    # 5. 生成图表（基于首个数据块）
+                    yield sse_pack("message", "正在生成可视化...\n")
                     
-                    if chart:
-                        yield sse_pack("chart", chart)
-                        # Fallback for display in message history if needed (optional)
-                        # msg = f"\n::: echarts\n{json.dumps(chart, indent=2)}\n:::\n"
-                        # full_content.append(msg) 
-                        # We append it to full_content for storage, but maybe not send as message event if we use chart event
-                        # Actually, we should store it in message content so history view works?
-                        # Let's append to full_content
-                        full_content.append(f"\n::: echarts\n{json.dumps(chart, indent=2)}\n:::\n")
-                    else:
-                        msg = "数据特征不足以生成可视化图表。"
-                        yield sse_pack("message", msg)
-                        full_content.append(msg)
-
-                except Exception as e:
-                    logger.warning(f"Chart generation failed: {e}")
-                    yield sse_pack("message", f"图表生成失败，已降级为表格视图。")
+                    try:
+                        chart = await run_in_threadpool(self.vanna_core.generate_echarts, question, df, sql)
+                        generated_chart = chart
+                        
+                        if chart:
+                            yield sse_pack("chart", chart)
+                            full_content.append(f"\n::: echarts\n{json.dumps(chart, indent=2)}\n:::\n")
+                        else:
+                            msg = "数据特征不足以生成可视化图表。"
+                            yield sse_pack("message", msg)
+                            full_content.append(msg)
+    
+                    except Exception as e:
+                        logger.warning(f"Chart generation failed: {e}")
+                        yield sse_pack("message", f"图表生成失败，已降级为表格视图。")
+
+                # 6. 其余数据块边读边推送，内存中只保留当前块
+                while not truncated:
+                    chunk = await loop.run_in_executor(fetcher, next, chunks, None)
+                    if chunk is None:
+                        break
+                    truncated = chunk.attrs.get("truncated", False)
+                    if not chunk.empty:
+                        yield sse_pack("rows", self._rows_payload(chunk, total_rows))
+                        total_rows += len(chunk)
+
+                msg = f"\n共 {total_rows} 行"
+                if truncated:
+                    msg += "（结果超出上限，已截断）"
+                yield sse_pack("message", msg + "\n")
+                full_content.append(msg + "\n")
+            finally:
+                # 提前结束时关闭游标，剩余结果不再读取
+                await loop.run_in_executor(fetcher, chunks.close)
+                fetcher.shutdown(wait=False)
             
         except Exception as e:
             error_msg = str(e)
@@ -798,40 +838,40 @@ class SmartDataQueryService:
             "total": len(df)
         }
 
-    async def convert_table_to_graph_task(self, job_id: str, table_name: str, update_status_callback: Callable):
+    async def convert_table_to_graph_task(
+        self,
+        job_id: str,
+        table_name: str,
+        update_status_callback: Callable,
+        incremental: bool = False,
+        updated_column: Optional[str] = None,
+    ):
+        """
+        整表分页转换为知识图谱（keyset 分页 + 检查点续传）；incremental=True 时只转换上次运行后修改过的行。
+        """
         try:
-            update_status_callback(job_id, "running", 10, "正在获取表数据...")
-            
-            # 获取数据 (限制50条用于演示)
-            limit = 50 
-            # 在线程池中运行以避免阻塞事件循环
-            data = await run_in_threadpool(self.get_table_data, table_name, limit=limit)
-            rows = data.get("data", [])
-            cols = data.get("columns", [])
-            
-            if not rows:
-                update_status_callback(job_id, "completed", 100, "表为空，无需转换")
-                return
+            if not self.vanna_core.sql_runner:
+                raise Exception("数据库未连接")
+            if not table_name or not table_name.replace("_", "").isalnum():
+                raise Exception("无效的表名")
 
-            update_status_callback(job_id, "running", 30, f"正在分析 {len(rows)} 条数据...")
-            
-            # 构建文本
-            text_parts = []
-            for idx, row in enumerate(rows):
-                # 简单的行转文本逻辑
-                row_str = ", ".join([f"{k}:{v}" for k, v in zip(cols, row)])
-                text_parts.append(f"数据表记录 #{idx+1}：{row_str}")
-            
-            full_text = f"以下是数据库表【{table_name}】的数据记录，请构建相关实体和关系：\n\n" + "\n".join(text_parts)
-            
-            update_status_callback(job_id, "running", 50, "正在构建知识图谱（这可能需要一些时间）...")
+            update_status_callback(job_id, "running", 5, "正在初始化知识图谱引擎...")
             
             # 确保 LightRAG 已初始化
             async with AsyncSessionLocal() as session:
                 await lightrag_engine.ensure_initialized(session)
-            
-            # 插入文本建立索引和图谱
-            await lightrag_engine.insert_text_async(full_text, description=f"Database Table: {table_name}")
+
+            converter = TableGraphConverter(
+                self.vanna_core.sql_runner.engine,
+                table_name,
+                insert_texts=lightrag_engine.insert_texts_async,
+                connection_key=self.vanna_core.connection_key,
+                page_size=settings.GRAPH_CONVERT_PAGE_SIZE,
+                rows_per_doc=settings.GRAPH_CONVERT_ROWS_PER_DOC,
+                incremental=incremental,
+                updated_column=updated_column,
+            )
+            await converter.run(lambda progress, message: update_status_callback(job_id, "running", progress, message))
             
             update_status_callback(job_id, "completed", 100, "转换成功！")
             
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def schema_fingerprint(ddls: Iterable[str]) -> str:
+    """Order-independent hash of the trained DDL statements."""
+    digest = hashlib.sha256()
+    for ddl in sorted({" ".join(d.split()) for d in ddls if d}):
+        digest.update(ddl.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def connection_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticSQLCache:
+    """
+    Persistent question -> SQL cache in a LanceDB table next to the Vanna context table.
+
+    - Lookup is a nearest-neighbour search on the question embedding (cosine); a hit needs
+      similarity >= ``threshold``, so paraphrases of a cached question reuse its SQL.
+    - Entries are scoped by connection and schema fingerprint: after the schema is retrained
+      with different DDL the old entries are never returned and are deleted on ``invalidate``.
+    - Bounded to ``max_entries`` with LRU eviction on ``last_used``. Hits refresh ``last_used``
+      at most once per ``touch_interval`` seconds to avoid a table write on every hit.
+    - Failures are logged and treated as misses; the cache never breaks SQL generation.
+    """
+
+    def __init__(self, db, table_name: str = "vanna_sql_cache", max_entries: int = 1000,
+                 threshold: float = 0.95, touch_interval: float = 300):
+        self.db = db
+        self.table_name = table_name
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.touch_interval = touch_interval
+        self.table = None
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _open(self):
+        if self.table is None:
+            try:
+                self.table = self.db.open_table(self.table_name)
+            except Exception:
+                # Created on first store
+                pass
+        return self.table
+
+    @staticmethod
+    def _scope_filter(connection: str, schema: str) -> str:
+        return f"connection = '{connection}' AND schema = '{schema}'"
+
+    def lookup(self, connection: str, schema: str, vector: List[float]) -> Optional[str]:
+        with self._lock:
+            try:
+                table = self._open()
+                if table is None:
+                    self.stats["misses"] += 1
+                    return None
+                rows = (
+                    table.search(vector)
+                    .metric("cosine")
+                    .where(self._scope_filter(connection, schema), prefilter=True)
+                    .limit(1)
+                    .to_list()
+                )
+            except Exception as e:
+                logger.warning(f"SQL cache lookup failed: {e}")
+                self._drop_if_incompatible(e)
+                return None
+
+            if not rows or 1.0 - rows[0]["_distance"] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+
+            row = rows[0]
+            self.stats["hits"] += 1
+            now = time.time()
+            if now - row["last_used"] > self.touch_interval:
+                try:
+                    self.table.update(where=f"id = '{row['id']}'", values={"last_used": now})
+                except Exception as e:
+                    logger.debug(f"SQL cache touch failed: {e}")
+            return row["sql"]
+
+    def store(self, connection: str, schema: str, question: str, sql: str, vector: List[float]):
+        data = [{
+            "id": str(uuid.uuid4()),
+            "connection": connection,
+            "schema": schema,
+            "question": question,
+            "sql": sql,
+            "vector": vector,
+            "last_used": time.time(),
+        }]
+        with self._lock:
+            try:
+                table = self._open()
+                if table is None:
+                    self.table = self.db.create_table(self.table_name, data=data)
+                else:
+                    try:
+                        table.add(data)
+                    except Exception as e:
+                        # Embedding model changed dimension: start a new cache
+                        if not self._drop_if_incompatible(e):
+                            raise
+                        self.table = self.db.create_table(self.table_name, data=data)
+                self.stats["stores"] += 1
+                self._evict()
+            except Exception as e:
+                logger.warning(f"SQL cache store failed: {e}")
+
+    def _evict(self):
+        overflow = self.table.count_rows() - self.max_entries
+        if overflow <= 0:
+            return
+        entries = self.table.search().select(["id", "last_used"]).limit(overflow + self.max_entries).to_pandas()
+        stale = entries.nsmallest(overflow, "last_used")["id"].tolist()
+        ids = ", ".join(f"'{i}'" for i in stale)
+        self.table.delete(f"id IN ({ids})")
+        self.stats["evictions"] += len(stale)
+
+    def invalidate(self, connection: str, schema: str):
+        """Delete the connection's entries that belong to any other schema fingerprint."""
+        with self._lock:
+            try:
+                if self._open() is not None:
+                    self.table.delete(f"connection = '{connection}' AND schema != '{schema}'")
+            except Exception as e:
+                logger.warning(f"SQL cache invalidation failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            try:
+                self.db.drop_table(self.table_name)
+            except Exception:
+                pass
+            self.table = None
+
+    def _drop_if_incompatible(self, e: Exception) -> bool:
+        err = str(e).lower()
+        if "dimension" in err or "fixedsizelist" in err or "query dim" in err:
+            logger.warning(f"SQL cache vector dimension changed, dropping '{self.table_name}'")
+            try:
+                self.db.drop_table(self.table_name)
+            except Exception:
+                pass
+            self.table = None
+            return True
+        return False
@@ -0,0 +1,81 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import tempfile
+import unittest
+from app.services.chatbi.vanna.sql_cache import SemanticSQLCache, connection_key, schema_fingerprint
+
+try:
+    import lancedb
+except ImportError:
+    lancedb = None
+
+
+class TestSchemaFingerprint(unittest.TestCase):
+
+    def test_order_and_whitespace_insensitive(self):
+        a = ["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT)"]
+        b = ["CREATE TABLE b (id INT)", "CREATE  TABLE a\n(id INT)", "CREATE TABLE b (id INT)"]
+        self.assertEqual(schema_fingerprint(a), schema_fingerprint(b))
+
+    def test_changes_with_schema(self):
+        a = ["CREATE TABLE a (id INT)"]
+        b = ["CREATE TABLE a (id INT, name TEXT)"]
+        self.assertNotEqual(schema_fingerprint(a), schema_fingerprint(b))
+        self.assertNotEqual(schema_fingerprint([]), schema_fingerprint(a))
+
+    def test_connection_key(self):
+        self.assertEqual(connection_key("mysql://h:3306/db"), connection_key("mysql://h:3306/db"))
+        self.assertNotEqual(connection_key("mysql://h:3306/db"), connection_key("mysql://h:3306/other"))
+
+
+@unittest.skipIf(lancedb is None, "lancedb not installed")
+class TestSemanticSQLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db = lancedb.connect(self.tmp.name)
+        self.cache = SemanticSQLCache(self.db, max_entries=3, threshold=0.95)
+
+    def test_lookup_threshold_and_scope(self):
+        self.assertIsNone(self.cache.lookup("c1", "s1", [1.0, 0.0, 0.0]))
+        self.cache.store("c1", "s1", "total sales", "SELECT SUM(x) FROM t", [1.0, 0.0, 0.0])
+
+        # A close paraphrase hits, an unrelated question misses
+        self.assertEqual(self.cache.lookup("c1", "s1", [0.99, 0.05, 0.0]), "SELECT SUM(x) FROM t")
+        self.assertIsNone(self.cache.lookup("c1", "s1", [0.0, 1.0, 0.0]))
+        # Other connection or schema fingerprint: never returned
+        self.assertIsNone(self.cache.lookup("c2", "s1", [1.0, 0.0, 0.0]))
+        self.assertIsNone(self.cache.lookup("c1", "s2", [1.0, 0.0, 0.0]))
+        self.assertEqual((self.cache.stats["hits"], self.cache.stats["misses"]), (1, 4))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.touch_interval = 0
+        for i, vec in enumerate(([1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0])):
+            self.cache.store("c1", "s1", f"q{i}", f"SELECT {i}", vec)
+        # Touch q0 so q1 becomes the oldest entry
+        self.assertEqual(self.cache.lookup("c1", "s1", [1.0, 0.0, 0.0]), "SELECT 0")
+        self.cache.store("c1", "s1", "q3", "SELECT 3", [1.0, 1.0, 0.0])
+
+        self.assertEqual(self.cache.table.count_rows(), 3)
+        self.assertEqual(self.cache.stats["evictions"], 1)
+        self.assertIsNone(self.cache.lookup("c1", "s1", [0.0, 1.0, 0.0]))
+        self.assertEqual(self.cache.lookup("c1", "s1", [1.0, 0.0, 0.0]), "SELECT 0")
+
+    def test_invalidate_drops_other_schemas_of_the_connection(self):
+        self.cache.store("c1", "old", "q", "SELECT old", [1.0, 0.0, 0.0])
+        self.cache.store("c1", "new", "q", "SELECT new", [1.0, 0.0, 0.0])
+        self.cache.store("c2", "old", "q", "SELECT other", [1.0, 0.0, 0.0])
+        self.cache.invalidate("c1", "new")
+
+        self.assertEqual(sorted(self.cache.table.to_pandas()["sql"]), ["SELECT new", "SELECT other"])
+        self.assertEqual(self.cache.lookup("c1", "new", [1.0, 0.0, 0.0]), "SELECT new")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import hashlib
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+
+from app.services.chatbi.vanna.sql_cache import schema_fingerprint
+
+try:
+    from app.services.chatbi.vanna.core import VannaCore
+except ImportError:
+    VannaCore = None
+
+
+def _vector(text, dim):
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255.0 for b in digest[:dim]]
+
+
+class FakeEmbeddings:
+    """OpenAI-style embeddings endpoint; results are returned shuffled to exercise index ordering."""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def create(self, input, model):
+        with self.lock:
+            self.batches.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=_vector(t, self.dim)) for i, t in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+@unittest.skipIf(VannaCore is None, "lancedb not installed")
+class TestTrainBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.core = VannaCore(db_path=self.tmp.name)
+        self.embeddings = FakeEmbeddings()
+        self.core.openai_client = self.core.embed_client = SimpleNamespace(embeddings=self.embeddings)
+
+    def _rows(self):
+        df = self.core.table.to_pandas()
+        return {row["text"]: (row["type"], list(row["vector"])) for _, row in df.iterrows()}
+
+    def test_batches_keep_order_and_only_changes_are_embedded(self):
+        ddls = [f"CREATE TABLE t{i} (id INT)" for i in range(7)]
+        result = self.core.train_bulk(ddls, batch_size=3, max_workers=2)
+        self.assertEqual(result, {"embedded": 7, "removed": 0, "unchanged": 0})
+        self.assertEqual(sorted(len(b) for b in self.embeddings.batches), [1, 3, 3])
+        # Every row carries the vector of its own text across batches
+        for text, (_, vec) in self._rows().items():
+            self.assertEqual(vec, _vector(text, 8))
+
+        self.embeddings.batches.clear()
+        changed = ddls[:5] + ["CREATE TABLE t5 (id INT, name TEXT)"]
+        result = self.core.train_bulk(changed, batch_size=3, max_workers=2)
+        self.assertEqual(result, {"embedded": 1, "removed": 2, "unchanged": 5})
+        self.assertEqual(self.embeddings.batches, [["CREATE TABLE t5 (id INT, name TEXT)"]])
+        self.assertEqual(sorted(self._rows()), sorted(changed))
+
+        self.embeddings.batches.clear()
+        self.assertEqual(self.core.train_bulk(changed)["embedded"], 0)
+        self.assertEqual(self.embeddings.batches, [])
+
+    def test_dimension_change_reembeds_whole_context(self):
+        self.core.train_bulk(["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT)"])
+        self.core.train(sql="SELECT 1")
+        self.embeddings.dim = 16
+
+        result = self.core.train_bulk(["CREATE TABLE a (id INT)", "CREATE TABLE c (id INT)"])
+        self.assertEqual(result["embedded"], 1)
+        rows = self._rows()
+        # Trained sql and the unchanged DDL survive, re-embedded with the new dimension
+        self.assertEqual(sorted(rows), ["CREATE TABLE a (id INT)", "CREATE TABLE c (id INT)", "SELECT 1"])
+        self.assertTrue(all(len(vec) == 16 for _, vec in rows.values()))
+        self.assertEqual(self.core.train_bulk(["CREATE TABLE a (id INT)", "CREATE TABLE c (id INT)"])["embedded"], 0)
+
+    def test_schema_fingerprint_covers_trained_ddl_only(self):
+        ddls = ["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT)"]
+        self.core.train_bulk(ddls)
+        self.core.train(sql="SELECT 1")
+        self.assertEqual(self.core._schema_fingerprint(), schema_fingerprint(ddls))
+
+
+if __name__ == '__main__':
+    unittest.main()
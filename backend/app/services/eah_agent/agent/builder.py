@@ -11,6 +11,7 @@ from app.services.eah_agent.tools import default_tools
 from app.services.eah_agent.skills.manager import Skills as FileSkillsManager
 from app.services.eah_agent.skills.loaders.local import LocalSkills
 from app.core.config import settings
+from app.core.agent_pool import AgentTemplate
 
 from .prompt import InstructionBuilder
 
@@ -22,10 +23,10 @@ class AgentBuilder:
     Encapsulates database access and tool loading logic.
     """
     
-    def __init__(self, db: AsyncSession, agent_id: str):
+    def __init__(self, db: AsyncSession, agent_id: str, agent_model: Optional[AgentModel] = None):
         self.db = db
         self.agent_id = agent_id
-        self.agent_model: Optional[AgentModel] = None
+        self.agent_model: Optional[AgentModel] = agent_model
         self.llm_model: Optional[LLMModel] = None
         self.tools: List[Any] = []
         self.instructions: str = ""
@@ -35,9 +36,10 @@ class AgentBuilder:
         return bool(settings.OPENAI_API_KEY and settings.OPENAI_API_KEY.startswith("sk-"))
 
     async def _fetch_agent_config(self):
-        """Fetch agent configuration from DB."""
-        result = await self.db.execute(select(AgentModel).filter(AgentModel.id == self.agent_id))
-        self.agent_model = result.scalars().first()
+        """Fetch agent configuration from DB (unless it was passed in)."""
+        if self.agent_model is None:
+            result = await self.db.execute(select(AgentModel).filter(AgentModel.id == self.agent_id))
+            self.agent_model = result.scalars().first()
         if not self.agent_model:
             raise ValueError(f"Agent {self.agent_id} not found")
         
@@ -101,10 +103,12 @@ class AgentBuilder:
         if not self.llm_model:
             raise ValueError("No active LLM model found")
 
-    async def _load_tools(self, session_id: str = None, enable_search: bool = False):
+    async def _load_tools(self, session_id: str = None, enable_search: bool = False, include_session_tools: bool = True):
         """Load tools using the centralized loader."""
         # Load standard and configured tools
-        self.tools = await default_tools.load_tools(self.agent_model, self.db, session_id, enable_search=enable_search)
+        self.tools = await default_tools.load_tools(
+            self.agent_model, self.db, session_id, enable_search=enable_search, include_session_tools=include_session_tools
+        )
         
         # Handle file skills specifically as they might add instructions
         skills_config = getattr(self.agent_model, "skills_config", {}) or {}
@@ -163,16 +167,17 @@ class AgentBuilder:
         if enable_cot:
             self.instruction_builder.add_cot_prompt()
 
-    async def build(self, session_id: str = None, enable_search: bool = True) -> AgnoAgent:
+    async def build_template(self, key: str, enable_search: bool = True) -> AgentTemplate:
         """
-        Build and return the AgnoAgent instance.
+        Build the session-independent part of the agent (model client, shared tools, instructions).
+        Session-scoped tools are added per session by ``AgentTemplate.instantiate``.
         """
         # 1. Load configs
         await self._fetch_agent_config()
         await self._fetch_model_config()
         
         # 2. Load Tools
-        await self._load_tools(session_id, enable_search=enable_search)
+        await self._load_tools(None, enable_search=enable_search, include_session_tools=False)
         
         # 3. Configure Instructions
         self._configure_instructions()
@@ -192,8 +197,8 @@ class AgentBuilder:
         model_config = getattr(self.agent_model, "model_config", {}) or {}
         show_tool_calls = model_config.get("show_tool_calls", False)
         
-        # 5. Create Agent
-        agent = AgnoAgent(
+        # 5. Agent arguments shared by every session
+        agent_kwargs = dict(
             name=self.agent_model.name,
             model=model,
             description=getattr(self.agent_model, "description", None),
@@ -204,5 +209,16 @@ class AgentBuilder:
             # show_tool_calls=show_tool_calls,
             debug_mode=True,
         )
-        
-        return agent
+        return AgentTemplate(
+            key,
+            agent_kwargs,
+            session_tools=default_tools.session_tool_factories(self.agent_model),
+            agent_obj=self.agent_model,
+        )
+
+    async def build(self, session_id: str = None, enable_search: bool = True) -> AgnoAgent:
+        """
+        Build and return the AgnoAgent instance.
+        """
+        template = await self.build_template(f"agent:{self.agent_id}", enable_search)
+        return template.instantiate(session_id)
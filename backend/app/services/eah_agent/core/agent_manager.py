@@ -24,6 +24,7 @@ from app.services.eah_agent.core.agent_factory import AgentFactory
 logger = logging.getLogger(__name__)
 
 from app.core.config import settings
+from app.core.agent_pool import AgentTemplate, agent_pool, config_hash
 from app.services.llm.factory import ModelFactory
 # from app.services.eah_agent.tools.registry import discover_tools # Removed: Handled by loader
 
@@ -49,15 +50,59 @@ class AgentManager:
     async def create_agno_agent(self, db: AsyncSession, agent_id: str, session_id: str = None, enable_search: bool = True) -> AgnoAgent:
         """
         Creates an AgnoAgent instance using the unified AgentBuilder.
+        The expensive part is shared through the agent template cache (see ``get_agent_template``).
         """
         try:
-            from app.services.eah_agent.agent.builder import AgentBuilder
-            builder = AgentBuilder(db, agent_id)
-            return await builder.build(session_id, enable_search)
+            template = await self.get_agent_template(db, agent_id, enable_search)
+            return template.instantiate(session_id)
         except Exception as e:
             logger.exception(f"Error creating agent {agent_id}")
             raise e
 
+    @staticmethod
+    def agent_template_key(agent_model: AgentModel, enable_search: bool) -> str:
+        digest = config_hash(
+            agent_model.name, agent_model.description, agent_model.system_prompt,
+            agent_model.enable_react, agent_model.enable_cot, agent_model.model_config,
+            agent_model.tools_config, agent_model.mcp_config, agent_model.skills_config,
+            agent_model.knowledge_config, agent_model.updated_at, enable_search,
+        )
+        return f"agent:{agent_model.id}:{digest}"
+
+    async def get_agent_template(self, db: AsyncSession, agent_id: str, enable_search: bool = True) -> AgentTemplate:
+        """
+        Shared template of an agent, keyed by its config hash: one DB read when the template is cached;
+        otherwise model resolution, tool loading (MCP discovery) and instructions are built once.
+        """
+        from app.services.eah_agent.agent.builder import AgentBuilder
+
+        res = await db.execute(select(AgentModel).filter(AgentModel.id == agent_id))
+        agent_model = res.scalars().first()
+        if not agent_model:
+            raise ValueError(f"Agent {agent_id} not found")
+        key = self.agent_template_key(agent_model, enable_search)
+        return await agent_pool.get_or_build_template(
+            key, lambda: AgentBuilder(db, agent_id, agent_model=agent_model).build_template(key, enable_search)
+        )
+
+    async def prewarm_templates(self, db: AsyncSession, agent_ids: Optional[List[str]] = None,
+                                enable_search: bool = True) -> Dict[str, Any]:
+        """Build templates ahead of the first chat (all active, non-template agents when ``agent_ids`` is None)."""
+        if agent_ids is None:
+            res = await db.execute(
+                select(AgentModel.id).filter(AgentModel.is_active == True, AgentModel.is_template == False)
+            )
+            agent_ids = list(res.scalars().all())
+        built, failed = [], {}
+        for agent_id in agent_ids:
+            try:
+                await self.get_agent_template(db, agent_id, enable_search)
+                built.append(agent_id)
+            except Exception as e:
+                logger.warning(f"Prewarm failed for agent {agent_id}: {e}")
+                failed[agent_id] = str(e)
+        return {"built": built, "failed": failed}
+
     async def create_agent_from_config(self, config: Dict[str, Any], db: Optional[AsyncSession] = None, llm_model: Optional[LLMModel] = None) -> AgnoAgent:
         """
         New Method: Creates an AgnoAgent instance from a configuration dictionary or object.
@@ -6,6 +6,8 @@ from sqlalchemy import select, desc
 from sqlalchemy.orm import selectinload
 
 from app.models.chat import ChatSession, ChatMessage
+from app.core.chat_history_cache import chat_history_cache
+from app.crud.crud_chat import chat as crud_chat
 from app.core.i18n import _
 
 logger = logging.getLogger(__name__)
@@ -55,6 +57,7 @@ class SessionHistory:
         self.db.add(message)
         await self.db.commit()
         await self.db.refresh(message)
+        await chat_history_cache.append(session_id, crud_chat.history_entry(message))
         return message
 
     async def get_messages(self, session_id: str, limit: int = 50) -> List[ChatMessage]:
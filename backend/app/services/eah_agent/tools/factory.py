@@ -4,9 +4,9 @@ from typing import Dict, Any, Union
 
 from agno.tools import Toolkit
 from app.services.mcp.client import mcp_pool
+from app.services.mcp.session_pool import mcp_session_pool
 from app.services.eah_agent.tools.libs.mcp_tool import MCPToolkit as LegacyWSToolkit
-# Import the Agno implementation from local path
-from app.services.eah_agent.tools.mcp.mcp import MCPTools as AgnoMCPTools
+from app.services.eah_agent.tools.mcp.pooled import PooledMCPToolkit
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +23,7 @@ async def get_mcp_toolkit(config: Dict[str, Any], agent_id: str = None) -> Toolk
         agent_id: Optional agent ID for context injection
         
     Returns:
-        A Toolkit instance (either LegacyWSToolkit or AgnoMCPTools)
+        A Toolkit instance (either LegacyWSToolkit or PooledMCPToolkit)
     """
     url = config.get("url")
     command = config.get("command")
@@ -35,48 +35,26 @@ async def get_mcp_toolkit(config: Dict[str, Any], agent_id: str = None) -> Toolk
         client = await mcp_pool.get_client(url)
         # Ensure connected
         await client.connect()
-        # Fetch tools immediately to register them
+        # Tool schemas are cached on the pooled client until the server reports a list change
         tools_list = await client.list_tools()
         return LegacyWSToolkit(client, tools_list)
         
     # Case 2: Stdio / HTTP / SSE (New Agno Path)
-    # This enables local execution and standard HTTP/SSE servers
+    # One pooled session per server config: stdio processes and HTTP sessions are shared across agents
     elif command or (url and url.startswith("http")):
-        logger.info(f"Using Agno MCP Tools for {'stdio' if command else url}")
-        
-        # Determine transport
-        transport = "stdio"
-        if url:
-            transport = "streamable-http"
-            if config.get("type") == "sse" or "sse" in str(config.get("transport", "")).lower():
-                transport = "sse"
-        
-        # Define header provider for dynamic context injection
-        def _header_provider(run_context=None, agent=None, **kwargs):
-            headers = {}
-            if agent_id:
-                headers["X-Agent-ID"] = agent_id
-            if run_context and hasattr(run_context, "run_id"):
-                headers["X-Run-ID"] = run_context.run_id
-            return headers
+        server = await mcp_session_pool.acquire(config, agent_id=agent_id)
+        logger.info(f"Using pooled MCP session {server.key} ({server.transport}) for {url or command}")
 
-        # Create Agno toolkit instance
-        toolkit = AgnoMCPTools(
-            command=command,
-            url=url,
-            transport=transport,
-            header_provider=_header_provider,
-            # Pass environment variables if needed
-            env=config.get("env"),
+        toolkit = PooledMCPToolkit(
+            server,
             # Include/exclude tools if configured
             include_tools=config.get("include_tools"),
-            exclude_tools=config.get("exclude_tools")
+            exclude_tools=config.get("exclude_tools"),
+            tool_name_prefix=config.get("tool_name_prefix"),
         )
-        
-        # Initialize connection
-        # Note: Agno tools are lazy-loaded, but we connect here to fail fast if config is bad
+        # Tool schemas come from the pool cache after the first agent; fails fast if the server is bad
         await toolkit.initialize()
-        
+
         return toolkit
     
     raise ValueError(f"Invalid MCP configuration: must provide 'url' (ws/http) or 'command'. Config: {config}")
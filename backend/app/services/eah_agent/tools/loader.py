@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Optional, Type, Union
+from typing import List, Dict, Any, Callable, Optional, Type, Union
 import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from agno.tools import Toolkit
@@ -43,7 +43,26 @@ class ToolsManager:
         """
         self._custom_tools.append(tool)
         
-    async def load_tools(self, agent_model: Any, db: AsyncSession = None, session_id: str = None, enable_search: bool = False) -> List[Any]:
+    @staticmethod
+    def _sandbox_enabled(agent_model: Any) -> bool:
+        tools_config = getattr(agent_model, "tools_config", []) or []
+        skills_config = getattr(agent_model, "skills_config", {}) or {}
+        if skills_config.get("sandbox", {}).get("enabled"):
+            return True
+        return isinstance(tools_config, list) and any(isinstance(t, str) and t.startswith("sb_") for t in tools_config)
+
+    def session_tool_factories(self, agent_model: Any) -> List[Callable[[Optional[str]], Any]]:
+        """
+        Tools bound to a chat session (SandboxTools needs session_id), as factories called per session.
+        Used with ``load_tools(include_session_tools=False)`` to build shareable agent templates.
+        """
+        factories = []
+        if self._sandbox_enabled(agent_model):
+            factories.append(lambda session_id: SandboxTools(session_id=session_id))
+        return factories
+
+    async def load_tools(self, agent_model: Any, db: AsyncSession = None, session_id: str = None, enable_search: bool = False,
+                         include_session_tools: bool = True) -> List[Any]:
         """
         Load all tools based on agent configuration and defaults.
         This replaces the hardcoded logic in AgentManager.
@@ -101,14 +120,7 @@ class ToolsManager:
             tools.append(DuckDuckGoTools())
 
         # Sandbox
-        is_sandbox_enabled = skills_config.get("sandbox", {}).get("enabled")
-        if not is_sandbox_enabled and isinstance(tools_config, list):
-            for t in tools_config:
-                if isinstance(t, str) and t.startswith("sb_"):
-                    is_sandbox_enabled = True
-                    break
-        
-        if is_sandbox_enabled:
+        if include_session_tools and self._sandbox_enabled(agent_model):
             try:
                 # SandboxTools needs session_id
                 tools.append(SandboxTools(session_id=session_id))
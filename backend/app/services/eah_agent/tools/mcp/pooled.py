@@ -0,0 +1,90 @@
+import functools
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from agno.tools import Toolkit
+from agno.tools.function import Function
+from agno.utils.mcp import get_entrypoint_for_tool
+
+from app.services.mcp.session_pool import PooledMCPServer
+
+logger = logging.getLogger(__name__)
+
+
+class PooledMCPToolkit(Toolkit):
+    """
+    Agno toolkit over a pooled MCP session (see ``app.services.mcp.session_pool``).
+
+    Many toolkits (one per agent, each with its own include/exclude filter) share one server
+    connection. Functions are built from the server's cached tool schemas and rebuilt when the
+    schema version changes (``tools/list_changed``). Every call takes a bounded in-flight slot and
+    resolves the live session at call time, so reconnects are transparent.
+    """
+
+    def __init__(
+        self,
+        server: PooledMCPServer,
+        include_tools: Optional[List[str]] = None,
+        exclude_tools: Optional[List[str]] = None,
+        tool_name_prefix: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(name="MCPTools", **kwargs)
+        self.server = server
+        self.include_tools = include_tools
+        self.exclude_tools = exclude_tools
+        self.tool_name_prefix = tool_name_prefix
+        self._built_version = -1
+
+    @property
+    def functions(self) -> Dict[str, Function]:
+        server = getattr(self, "server", None)
+        if server is not None and self._built_version != server.tools_version and server.tools is not None:
+            self._build_functions(server.tools)
+        return self._functions
+
+    @functions.setter
+    def functions(self, value: Dict[str, Function]):
+        self._functions = value
+
+    async def initialize(self) -> None:
+        """Load the tool schemas (from the server cache when possible) and build the functions."""
+        self._build_functions(await self.server.list_tools())
+
+    async def get_session_for_run(self, run_context=None, agent=None, team=None, **kwargs):
+        # Called by the agno entrypoint for every call: the pooled session, health-checked
+        return await self.server.ensure_session()
+
+    def _build_functions(self, tools: List[Any]):
+        prefix = f"{self.tool_name_prefix}_" if self.tool_name_prefix else ""
+        functions: Dict[str, Function] = OrderedDict()
+        for tool in tools:
+            if self.exclude_tools and tool.name in self.exclude_tools:
+                continue
+            if self.include_tools is not None and tool.name not in self.include_tools:
+                continue
+            try:
+                entrypoint = self._bounded(get_entrypoint_for_tool(tool=tool, session=None, mcp_tools_instance=self))
+                functions[prefix + tool.name] = Function(
+                    name=prefix + tool.name,
+                    description=tool.description,
+                    parameters=tool.inputSchema,
+                    entrypoint=entrypoint,
+                    skip_entrypoint_processing=True,
+                )
+            except Exception as e:
+                logger.error(f"Failed to register MCP tool {tool.name}: {e}")
+        self._functions = functions
+        self._built_version = self.server.tools_version
+
+    def _bounded(self, entrypoint):
+        server = self.server
+
+        # functools.wraps keeps the entrypoint signature visible to agno (injected run context args)
+        @functools.wraps(entrypoint)
+        async def call_tool(*args, **kwargs):
+            async with server.call_slot():
+                return await entrypoint(*args, **kwargs)
+
+        return call_tool
@@ -43,6 +43,8 @@ class MCPClient:
             "sampling": {}
         }
         self._initialized = False
+        # tools/list result, dropped on notifications/tools/list_changed
+        self._tools_cache: Optional[List[Dict]] = None
         
         # Performance metrics
         self._request_count = 0
@@ -102,6 +104,8 @@ class MCPClient:
             
             self._server_capabilities = response.get("capabilities", {})
             self._initialized = True
+            # Notifications may have been missed while disconnected
+            self._tools_cache = None
             
             # Send initialized notification
             await self.send_notification("notifications/initialized")
@@ -187,7 +191,8 @@ class MCPClient:
                             method = data.get("method")
                             if method:
                                 logger.info(f"Received notification: {method}")
-                                # TODO: Handle specific notifications if needed
+                                if method == "notifications/tools/list_changed":
+                                    self._tools_cache = None
                                 
                     except json.JSONDecodeError:
                         logger.error("Received invalid JSON")
@@ -250,10 +255,12 @@ class MCPClient:
                 logger.error(f"Send request failed: {e}")
                 raise
 
-    async def list_tools(self) -> List[Dict]:
-        """Fetch available tools."""
-        response = await self.send_request("tools/list")
-        return response.get("tools", [])
+    async def list_tools(self, refresh: bool = False) -> List[Dict]:
+        """Fetch available tools (cached until the server reports a list change)."""
+        if self._tools_cache is None or refresh:
+            response = await self.send_request("tools/list")
+            self._tools_cache = response.get("tools", [])
+        return self._tools_cache
 
     async def call_tool(self, name: str, arguments: Dict) -> Any:
         """Call a specific tool."""
@@ -281,7 +288,8 @@ class MCPClient:
             "requests": self._request_count,
             "duration": duration,
             "connected": self._connected,
-            "pending_requests": len(self._pending_requests)
+            "pending_requests": len(self._pending_requests),
+            "tools_cached": self._tools_cache is not None
         }
 
 # Global connection pool manager
@@ -0,0 +1,278 @@
+"""
+进程级 MCP 会话池（stdio / Streamable HTTP / SSE）。
+
+- 按服务器配置哈希复用一个长连接：同一 stdio 服务器只启动一个进程，所有 Agent 的工具调用在其
+  ClientSession 上多路复用，并由信号量限制同时在途的调用数。
+- 工具 schema（tools/list）按服务器缓存；收到 ``notifications/tools/list_changed`` 后后台重新拉取并递增版本号，
+  引用该服务器的工具集在下次取函数时按新 schema 重建。
+- 取用时按间隔 ping 做健康检查，失败则重连；空闲超过 ``idle_timeout`` 且没有在途调用的连接由后台任务关闭。
+- 连接在池自己的后台任务中打开和关闭（anyio 要求上下文在同一任务内进出）。
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import shlex
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def server_key(config: Dict[str, Any], agent_id: Optional[str] = None) -> str:
+    """Hash of the connection-relevant part of an MCP server config (tool filters are per toolkit)."""
+    relevant = {k: config.get(k) for k in ("url", "command", "args", "env", "headers", "type", "transport")}
+    # HTTP sessions carry the agent id header, so they are pooled per agent; stdio processes are shared
+    if config.get("url") and agent_id:
+        relevant["agent_id"] = agent_id
+    raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def transport_of(config: Dict[str, Any]) -> str:
+    if not config.get("url"):
+        return "stdio"
+    if config.get("type") == "sse" or "sse" in str(config.get("transport", "")).lower():
+        return "sse"
+    return "streamable-http"
+
+
+class PooledMCPServer:
+    """One long-lived MCP session plus its cached tool schemas."""
+
+    def __init__(self, key: str, config: Dict[str, Any], agent_id: Optional[str] = None,
+                 max_inflight: int = None, health_check_interval: float = None, connect_timeout: float = None):
+        self.key = key
+        self.config = config
+        self.agent_id = agent_id
+        self.transport = transport_of(config)
+        self.session = None
+        self.tools: Optional[List[Any]] = None
+        self.tools_version = 0
+        self.inflight = asyncio.Semaphore(max_inflight or settings.MCP_POOL_MAX_INFLIGHT)
+        self.max_inflight = max_inflight or settings.MCP_POOL_MAX_INFLIGHT
+        self.active_calls = 0
+        self.health_check_interval = health_check_interval or settings.MCP_POOL_HEALTH_CHECK_SECONDS
+        self.connect_timeout = connect_timeout or settings.MCP_POOL_CONNECT_TIMEOUT_SECONDS
+        self.last_used = time.monotonic()
+        self.last_checked = 0.0
+        self.stats = {"connects": 0, "calls": 0, "tool_lists": 0, "list_changed": 0, "health_failures": 0}
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+        self._tools_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # --- connection lifecycle ---
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    @asynccontextmanager
+    async def _open_session(self):
+        """Open the transport and an initialized ClientSession (override point for tests)."""
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import get_default_environment, stdio_client
+
+        timeout = timedelta(seconds=self.config.get("timeout", 10))
+        headers = dict(self.config.get("headers") or {})
+        if self.agent_id:
+            headers["X-Agent-ID"] = self.agent_id
+
+        if self.transport == "stdio":
+            parts = shlex.split(self.config["command"]) + list(self.config.get("args") or [])
+            env = {**get_default_environment(), **(self.config.get("env") or {})}
+            context = stdio_client(StdioServerParameters(command=parts[0], args=parts[1:], env=env, cwd=self.config.get("cwd")))
+        elif self.transport == "sse":
+            from mcp.client.sse import sse_client
+            context = sse_client(url=self.config["url"], headers=headers)
+        else:
+            from mcp.client.streamable_http import streamablehttp_client
+            context = streamablehttp_client(url=self.config["url"], headers=headers)
+
+        async with context as streams:
+            read, write = streams[0:2]
+            async with ClientSession(read, write, read_timeout_seconds=timeout, message_handler=self._on_message) as session:
+                await session.initialize()
+                yield session
+
+    async def _run(self, ready: asyncio.Future, stop: asyncio.Event):
+        try:
+            async with self._open_session() as session:
+                self.session = session
+                self.last_checked = time.monotonic()
+                self.stats["connects"] += 1
+                ready.set_result(session)
+                await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+                ready.exception()
+            elif not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"MCP server {self.key} connection ended: {e}")
+        finally:
+            self.session = None
+
+    async def connect(self):
+        async with self._lock:
+            if self.connected:
+                return self.session
+            ready = asyncio.get_running_loop().create_future()
+            self._stop = asyncio.Event()
+            self._task = asyncio.create_task(self._run(ready, self._stop))
+            try:
+                return await asyncio.wait_for(asyncio.shield(ready), self.connect_timeout)
+            except BaseException:
+                self._stop.set()
+                self._task.cancel()
+                raise
+
+    async def close(self):
+        task, self._task = self._task, None
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(task, 5)
+        except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+            task.cancel()
+        self.session = None
+
+    async def ensure_session(self):
+        """Live session: connect if needed, ping when the last check is older than the interval."""
+        self.last_used = time.monotonic()
+        if not self.connected:
+            return await self.connect()
+        if time.monotonic() - self.last_checked > self.health_check_interval:
+            try:
+                await asyncio.wait_for(self.session.send_ping(), 5)
+                self.last_checked = time.monotonic()
+            except Exception as e:
+                self.stats["health_failures"] += 1
+                logger.warning(f"MCP server {self.key} failed its health check ({e}), reconnecting")
+                await self.close()
+                return await self.connect()
+        return self.session
+
+    # --- tool schemas ---
+
+    async def list_tools(self) -> List[Any]:
+        if self.tools is not None:
+            return self.tools
+        async with self._tools_lock:
+            if self.tools is None:
+                session = await self.ensure_session()
+                result = await session.list_tools()
+                self.stats["tool_lists"] += 1
+                self.tools = list(result.tools)
+                self.tools_version += 1
+        return self.tools
+
+    async def _on_message(self, message: Any):
+        root = getattr(message, "root", None)
+        if getattr(root, "method", None) == "notifications/tools/list_changed":
+            self.stats["list_changed"] += 1
+            self.tools = None
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_tools())
+
+    async def _refresh_tools(self):
+        try:
+            await self.list_tools()
+        except Exception as e:
+            logger.warning(f"Failed to refresh tools of MCP server {self.key}: {e}")
+
+    # --- calls ---
+
+    @asynccontextmanager
+    async def call_slot(self):
+        """Bounded in-flight slot for one tool call on the shared session."""
+        async with self.inflight:
+            self.active_calls += 1
+            self.stats["calls"] += 1
+            try:
+                yield
+            finally:
+                self.active_calls -= 1
+                self.last_used = time.monotonic()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "transport": self.transport,
+            "target": self.config.get("url") or self.config.get("command"),
+            "connected": self.connected,
+            "tools": len(self.tools) if self.tools is not None else None,
+            "tools_version": self.tools_version,
+            "active_calls": self.active_calls,
+            "max_inflight": self.max_inflight,
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            **self.stats,
+        }
+
+
+class MCPSessionPool:
+    """Process-wide pool of ``PooledMCPServer`` keyed by server config hash, with idle eviction."""
+
+    def __init__(self, idle_timeout: float = None):
+        self.idle_timeout = idle_timeout or settings.MCP_POOL_IDLE_TIMEOUT_SECONDS
+        self.servers: Dict[str, PooledMCPServer] = {}
+        self._lock = asyncio.Lock()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    async def acquire(self, config: Dict[str, Any], agent_id: Optional[str] = None) -> PooledMCPServer:
+        key = server_key(config, agent_id)
+        async with self._lock:
+            server = self.servers.get(key)
+            if server is None:
+                server = PooledMCPServer(key, config, agent_id=agent_id if config.get("url") else None)
+                self.servers[key] = server
+            if self._sweeper is None or self._sweeper.done():
+                self._sweeper = asyncio.create_task(self._sweep_loop())
+        await server.ensure_session()
+        return server
+
+    async def _sweep_loop(self):
+        interval = max(1.0, min(60.0, self.idle_timeout / 2))
+        try:
+            while self.servers:
+                await asyncio.sleep(interval)
+                await self.evict_idle()
+        except asyncio.CancelledError:
+            pass
+
+    async def evict_idle(self) -> List[str]:
+        now = time.monotonic()
+        evicted = []
+        for key, server in list(self.servers.items()):
+            if server.connected and server.active_calls == 0 and now - server.last_used > self.idle_timeout:
+                # Keep the entry (and its cached schemas): the next call reconnects lazily
+                await server.close()
+                evicted.append(key)
+        if evicted:
+            logger.info(f"Closed {len(evicted)} idle MCP sessions")
+        return evicted
+
+    async def close_all(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        for server in list(self.servers.values()):
+            await server.close()
+        self.servers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "servers": [s.describe() for s in self.servers.values()],
+            "connected": sum(1 for s in self.servers.values() if s.connected),
+            "idle_timeout": self.idle_timeout,
+        }
+
+
+mcp_session_pool = MCPSessionPool()
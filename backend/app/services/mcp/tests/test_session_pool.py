@@ -0,0 +1,134 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import time
+import unittest
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from app.services.mcp import session_pool
+from app.services.mcp.session_pool import MCPSessionPool, PooledMCPServer, server_key
+
+
+class FakeSession:
+    opened = 0
+
+    def __init__(self):
+        FakeSession.opened += 1
+        self.list_calls = 0
+        self.pings = 0
+        self.alive = True
+
+    async def send_ping(self):
+        self.pings += 1
+        if not self.alive:
+            raise ConnectionError("gone")
+
+    async def list_tools(self):
+        self.list_calls += 1
+        return SimpleNamespace(tools=[SimpleNamespace(name=f"tool_{self.list_calls}")])
+
+
+class FakeServer(PooledMCPServer):
+
+    @asynccontextmanager
+    async def _open_session(self):
+        yield FakeSession()
+
+
+class TestMCPSessionPool(unittest.TestCase):
+
+    def setUp(self):
+        FakeSession.opened = 0
+        patcher = mock.patch.object(session_pool, "PooledMCPServer", FakeServer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stdio_server_shared_across_agents(self):
+        async def run():
+            pool = MCPSessionPool(idle_timeout=60)
+            config = {"command": "npx some-server"}
+            a = await pool.acquire(config, agent_id="a1")
+            b = await pool.acquire(dict(config, include_tools=["x"]), agent_id="a2")
+            self.assertIs(a, b)
+            self.assertEqual(FakeSession.opened, 1)
+            # HTTP sessions carry the agent header, so they are per agent
+            self.assertNotEqual(server_key({"url": "http://x"}, "a1"), server_key({"url": "http://x"}, "a2"))
+            await pool.close_all()
+
+        asyncio.run(run())
+
+    def test_tool_schemas_cached_until_list_changed(self):
+        async def run():
+            pool = MCPSessionPool(idle_timeout=60)
+            server = await pool.acquire({"command": "srv"})
+            first = await server.list_tools()
+            self.assertEqual(await server.list_tools(), first)
+            self.assertEqual(server.stats["tool_lists"], 1)
+
+            await server._on_message(SimpleNamespace(root=SimpleNamespace(method="notifications/tools/list_changed")))
+            await server._refresh_task
+            self.assertEqual(server.tools_version, 2)
+            self.assertEqual(server.tools[0].name, "tool_2")
+            await pool.close_all()
+
+        asyncio.run(run())
+
+    def test_idle_eviction_and_reconnect(self):
+        async def run():
+            pool = MCPSessionPool(idle_timeout=60)
+            server = await pool.acquire({"command": "srv"})
+            await server.list_tools()
+            self.assertEqual(await pool.evict_idle(), [])
+
+            server.last_used = time.monotonic() - 120
+            self.assertEqual(await pool.evict_idle(), [server.key])
+            self.assertFalse(server.connected)
+            # Schemas survive eviction; the next use reconnects
+            self.assertIsNotNone(server.tools)
+            await server.ensure_session()
+            self.assertTrue(server.connected)
+            self.assertEqual(FakeSession.opened, 2)
+            await pool.close_all()
+
+        asyncio.run(run())
+
+    def test_failed_health_check_reconnects(self):
+        async def run():
+            pool = MCPSessionPool(idle_timeout=60)
+            server = await pool.acquire({"command": "srv"})
+            server.session.alive = False
+            server.last_checked = 0.0
+            session = await server.ensure_session()
+            self.assertTrue(session.alive)
+            self.assertEqual(server.stats["health_failures"], 1)
+            await pool.close_all()
+
+        asyncio.run(run())
+
+    def test_inflight_calls_are_bounded(self):
+        async def run():
+            server = FakeServer("k", {"command": "srv"}, max_inflight=2)
+            peak = 0
+
+            async def call():
+                nonlocal peak
+                async with server.call_slot():
+                    peak = max(peak, server.active_calls)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*(call() for _ in range(6)))
+            self.assertEqual(peak, 2)
+            self.assertEqual(server.stats["calls"], 6)
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,51 @@
+import json
 import logging
+import time
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pydantic import BaseModel, Field
 from agno.agent import Agent
 from app.services.llm.factory import ModelFactory
 from app.models.llm_model import LLMModel
 from app.db.session import AsyncSessionLocal
+from app.core.config import settings
+from app.services.nlu.router import KeywordMatcher, LocalIntentModel
 from sqlalchemy import select
 
 logger = logging.getLogger(__name__)
 
+# Keyword groups of the rule stage, compiled once into a single Aho-Corasick automaton
+_KEYWORDS = {
+    # RAG indicators: definitions, explanations
+    "rag": ["是什么", "定义", "解释", "介绍", "总结", "政策", "规定", "合同", "条款", "what is", "explain", "describe", "summary", "summarize", "summarise"],
+    # Data keywords that keep "What is the total sales?" out of RAG
+    "data": ["多少", "统计", "总数", "count", "sum", "total", "trend", "趋势"],
+    "kg": ["趋势", "走势", "分布", "关系", "路径", "关联", "影响", "trend", "distribution", "relationship", "path"],
+    # "图谱" is ambiguous: KG only together with an action ("展示...图谱")
+    "graph": ["图谱"],
+    "graph_action": ["展示", "画", "生成", "分析", "show", "generate"],
+    # "查询", "多少", "列表", "list" are too generic (e.g. "What is the price?", "List the benefits")
+    "sql": ["统计", "总数", "排名", "top", "count", "sum", "average", "avg", "max", "min"],
+    "structured": ["多少", "统计", "总数", "排名", "top", "count", "sum", "average", "avg", "max", "min"],
+    "table": ["table", "表格", "数据", "表"],
+    # Weak hints, only used when nothing decisive matched
+    "weak_sql": ["count", "sum", "how many"],
+    "weak_kg": ["trend", "chart", "between"],
+}
+# English keywords match whole words only ("sum" must not fire on "summary", "top" on "stop")
+_MATCHER = KeywordMatcher(_KEYWORDS, word_boundary=True)
+
+# Confidence of a decisive keyword rule / of the weak-hint and default guesses
+KEYWORD_CONFIDENCE = 0.9
+WEAK_CONFIDENCE = 0.5
+
+TIERS = ("cache", "keyword", "local", "llm", "fallback")
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
 class QueryIntent(str, Enum):
     SQL_QUERY = "SQL_QUERY"       # Precision lookup, aggregation
     KG_QUERY = "KG_QUERY"         # Trends, relationships, distribution
@@ -32,9 +68,12 @@ class IntentResponse(BaseModel):
 class IntentClassifier:
     _instance = None
     
-    def __init__(self):
+    def __init__(self, local_model: Optional[LocalIntentModel] = None):
         self.agent: Optional[Agent] = None
         self._agent_init_lock = False
+        self.local_model = local_model or LocalIntentModel(min_samples=settings.INTENT_LOCAL_MIN_SAMPLES)
+        self._cache: "OrderedDict[str, QueryIntent]" = OrderedDict()
+        self._metrics = {tier: {"count": 0, "seconds": 0.0} for tier in TIERS}
 
     @classmethod
     def get_instance(cls):
@@ -84,42 +123,88 @@ Also extract relevant parameters like time ranges, locations, and entities.
 
     async def classify(self, question: str) -> QueryIntent:
         """
-        Classifies the user question into an intent using semantic understanding.
-        Returns the intent enum.
+        Classifies the user question into an intent, cheapest tier first:
+        LRU cache -> keyword rules (Aho-Corasick) -> local model trained on past LLM decisions -> LLM.
+        The LLM only runs when the local tiers are not confident; its decisions train the local model.
         """
-        # 1. Try LLM Classification first (if available)
+        started = time.perf_counter()
+        key = _normalize_question(question)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self._observe("cache", started)
+            return cached
+
+        intent, confidence = self._keyword_stage(key)
+        tier = "keyword"
+        if confidence < KEYWORD_CONFIDENCE:
+            predicted = self.local_model.predict(key)
+            if predicted and predicted[1] >= settings.INTENT_LOCAL_MIN_CONFIDENCE:
+                intent, tier = QueryIntent(predicted[0]), "local"
+            else:
+                llm_intent = await self._llm_classify(question)
+                if llm_intent is not None:
+                    intent, tier = llm_intent, "llm"
+                    self.local_model.record(key, llm_intent.value)
+                else:
+                    # No LLM: best local guess, else the weak keyword guess
+                    if predicted:
+                        intent = QueryIntent(predicted[0])
+                    tier = "fallback"
+
+        self._remember(key, intent)
+        self._observe(tier, started)
+        return intent
+
+    async def _llm_classify(self, question: str) -> Optional[QueryIntent]:
         await self._ensure_agent()
-        
-        if self.agent:
+        if not self.agent:
+            return None
+        try:
+            # Manually parse response if structured output is not supported via init
             try:
-                # Manually parse response if structured output is not supported via init
-                # Or try to pass response_model to arun if supported there
-                # For now, let's assume arun can handle it or we use a wrapper
+                response = await self.agent.arun(question, response_model=IntentResponse)
+            except TypeError:
+                return None
+
+            if isinstance(response, IntentResponse):
+                return response.intent
+            if hasattr(response, "content"):
+                # It might be a RunResponse/RunOutput object with structured or JSON content
+                if isinstance(response.content, IntentResponse):
+                    return response.content.intent
                 try:
-                    response = await self.agent.arun(question, response_model=IntentResponse)
-                except TypeError:
-                     # Fallback: prompt engineering for JSON
-                     response_text = await self.agent.arun(question + "\nRespond in JSON format matching the schema.")
-                     # Parse JSON manually (omitted for brevity in this fix, assuming fallback handles it)
-                     return self._rule_based_classify(question) # Temporary fallback
-                
-                if isinstance(response, IntentResponse):
-                    return response.intent
-                elif hasattr(response, "content"):
-                     # If Agno returned a RunOutput but content is structured
-                     import json
-                     try:
-                         # It might be a RunResponse/RunOutput object
-                         # Check if content is JSON string
-                         data = json.loads(response.content)
-                         return QueryIntent(data.get("intent", "RAG_QUERY"))
-                     except:
-                         pass
-            except Exception as e:
-                logger.error(f"LLM Classification failed: {e}. Falling back to rules.")
-        
-        # 2. Fallback to Rule-based Classification
-        return self._rule_based_classify(question)
+                    data = json.loads(response.content)
+                    return QueryIntent(data.get("intent", "RAG_QUERY"))
+                except (TypeError, ValueError):
+                    pass
+        except Exception as e:
+            logger.error(f"LLM Classification failed: {e}. Falling back to rules.")
+        return None
+
+    def _remember(self, key: str, intent: QueryIntent):
+        self._cache[key] = intent
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.INTENT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _observe(self, tier: str, started: float):
+        metric = self._metrics[tier]
+        metric["count"] += 1
+        metric["seconds"] += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(m["count"] for m in self._metrics.values())
+        tiers = {
+            tier: {
+                "count": m["count"],
+                "ratio": round(m["count"] / total, 4) if total else 0.0,
+                "avg_ms": round(1000 * m["seconds"] / m["count"], 3) if m["count"] else 0.0,
+            }
+            for tier, m in self._metrics.items()
+        }
+        return {"total": total, "tiers": tiers, "cache_size": len(self._cache),
+                "local_model_samples": self.local_model.samples}
 
     async def classify_detailed(self, question: str) -> IntentResponse:
         """
@@ -162,83 +247,61 @@ Also extract relevant parameters like time ranges, locations, and entities.
         )
 
     def _rule_based_classify(self, question: str) -> QueryIntent:
+        return self._keyword_stage(question)[0]
+
+    def _keyword_stage(self, question: str) -> Tuple[QueryIntent, float]:
+        """
+        Keyword rules on one automaton pass. Returns (intent, confidence).
+
+        A rule is decisive (``KEYWORD_CONFIDENCE``) only when exactly one of the RAG / KG / SQL rules
+        fires; conflicting hits keep the priority-order guess at ``WEAK_CONFIDENCE`` so the local
+        model or the LLM decides.
+        """
+        hits = _MATCHER.match(question)
+        candidates = []
+
         # 1. RAG Indicators (High Priority: Definitions, Explanations)
-        # Check these FIRST to prevent "What is a graph?" from being caught by "graph" keyword
-        rag_keywords = ["是什么", "定义", "解释", "介绍", "总结", "政策", "规定", "合同", "条款", "what is", "explain", "describe", "summary"]
-        if any(w in question.lower() for w in rag_keywords):
-            # Exception: "What is the total sales?" -> SQL
-            # Exception: "Explain the trend" -> KG
-            # But "What is a Knowledge Graph?" -> RAG
-            
-            # If it contains strong data keywords, it might still be SQL/KG
-            data_keywords = ["多少", "统计", "总数", "count", "sum", "total", "trend", "趋势"]
-            if not any(dk in question.lower() for dk in data_keywords):
-                return QueryIntent.RAG_QUERY
+        # Checked FIRST so "What is a graph?" is not caught by the "graph" keywords,
+        # unless strong data keywords make it SQL/KG ("What is the total sales?")
+        if hits.get("rag") and not hits.get("data"):
+            candidates.append(QueryIntent.RAG_QUERY)
 
         # 2. KG Indicators (Trends, Relationships)
-        kg_keywords = ["趋势", "走势", "分布", "关系", "路径", "关联", "影响", "trend", "distribution", "relationship", "path"]
-        # "图谱" (Graph) is ambiguous. "Show me the graph of X" vs "What is a graph".
-        # We only treat "图谱" as KG intent if it's "展示...图谱" or "构建...图谱"
-        if any(w in question for w in kg_keywords):
-            return QueryIntent.KG_QUERY
-            
-        if "图谱" in question and any(action in question for action in ["展示", "画", "生成", "分析", "show", "generate"]):
-             return QueryIntent.KG_QUERY
+        if hits.get("kg") or (hits.get("graph") and hits.get("graph_action")):
+            candidates.append(QueryIntent.KG_QUERY)
 
         # 3. Structured/SQL Indicators (Data Retrieval)
-        # "查询" is too generic. We remove it from the strict list.
-        # Removed "多少", "列表", "list" as they are too generic and cause false positives (e.g. "What is the price?", "List the benefits")
-        sql_keywords = ["统计", "总数", "排名", "top", "count", "sum", "average", "avg", "max", "min"]
-        
-        if any(w in question.lower() for w in sql_keywords):
-            # Check for structured query confidence
-            confidence = self._calculate_confidence(question)
-            if confidence >= 0.85:
-                return QueryIntent.STRUCTURED_QUERY
-            return QueryIntent.SQL_QUERY
+        if hits.get("sql"):
+            if self._structured_confidence(hits) >= 0.85:
+                candidates.append(QueryIntent.STRUCTURED_QUERY)
+            else:
+                candidates.append(QueryIntent.SQL_QUERY)
 
-        # 4. Default fallback
-        logger.info(f"Rule-based classification fallback for: {question}")
-        return self._mock_llm_classify(question)
+        if candidates:
+            return candidates[0], KEYWORD_CONFIDENCE if len(candidates) == 1 else WEAK_CONFIDENCE
+
+        # 4. Weak hints; RAG is the safe default
+        if hits.get("weak_sql"):
+            return QueryIntent.SQL_QUERY, WEAK_CONFIDENCE
+        if hits.get("weak_kg"):
+            return QueryIntent.KG_QUERY, WEAK_CONFIDENCE
+        return QueryIntent.RAG_QUERY, 0.0
 
     def _calculate_confidence(self, question: str) -> float:
         """
         Calculates confidence score for structured query intent.
         Simple heuristic: higher score for more specific keywords.
         """
+        return self._structured_confidence(_MATCHER.match(question))
+
+    @staticmethod
+    def _structured_confidence(hits: Dict[str, set]) -> float:
         score = 0.0
-        q_lower = question.lower()
-        keywords = ["多少", "统计", "总数", "排名", "top", "count", "sum", "average", "avg", "max", "min"]
-        
-        # Base score for having keywords
-        matches = [k for k in keywords if k in q_lower]
+        matches = hits.get("structured")
+        # Base score for having keywords, boost for multiple keywords
         if matches:
-            score += 0.6
-            score += len(matches) * 0.1  # Boost for multiple keywords
-        
+            score += 0.6 + len(matches) * 0.1
         # Boost for clear structured indicators
-        if "table" in q_lower or "表格" in q_lower or "数据" in q_lower or "表" in q_lower:
+        if hits.get("table"):
             score += 0.2
-            
         return min(score, 1.0)
-
-    def _mock_llm_classify(self, question: str) -> QueryIntent:
-        """
-        Simulates LLM decision making.
-        """
-        q_lower = question.lower()
-        
-        # Ambiguous "Query" (查询) handling
-        # If the user says "Query X", and X looks like an entity, it might be RAG or SQL.
-        # Without real LLM, we default to RAG for safety, unless it looks like a DB table query.
-        
-        # SQL/Structured Indicators
-        if "count" in q_lower or "sum" in q_lower or "how many" in q_lower:
-            return QueryIntent.SQL_QUERY
-            
-        # KG Indicators
-        if "trend" in q_lower or "chart" in q_lower or "between" in q_lower:
-            return QueryIntent.KG_QUERY
-            
-        # Default fallback
-        return QueryIntent.RAG_QUERY
@@ -0,0 +1,188 @@
+"""
+意图路由的本地快速层（不调用 LLM）。
+
+- ``KeywordMatcher``：Aho-Corasick 多模式匹配，预编译全部关键词，一次扫描得到每组命中的关键词；
+  可选对英文关键词按词边界匹配（"sum" 不命中 "summary"）。
+- ``LocalIntentModel``：基于记录的 LLM 判定增量训练的朴素贝叶斯分类器（英文单词 + 中文字二元组特征），
+  判定追加写入 JSONL，进程重启后重放恢复。
+"""
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DECISION_LOG = Path(__file__).resolve().parents[3] / "data" / "intent_router" / "decisions.jsonl"
+
+_WORD = re.compile(r"[a-z0-9_]+")
+_CJK = re.compile(r"[一-鿿]+")
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over named keyword groups (case-insensitive).
+
+    With ``word_boundary`` an ASCII keyword only matches as a whole word: an ASCII word character
+    right before / after it rejects the hit. CJK keywords always match as substrings.
+    """
+
+    def __init__(self, groups: Dict[str, Iterable[str]], word_boundary: bool = False):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[Tuple[str, str]]] = [set()]
+        # keyword -> (check left edge, check right edge)
+        self._edges: Dict[str, Tuple[bool, bool]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                self._add(group, keyword)
+                if word_boundary and keyword:
+                    edges = (_is_word_char(keyword[0]), _is_word_char(keyword[-1]))
+                    if any(edges):
+                        self._edges[keyword] = edges
+        self._link()
+
+    def _add(self, group: str, keyword: str):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].add((group, keyword))
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def match(self, text: str) -> Dict[str, Set[str]]:
+        hits: Dict[str, Set[str]] = defaultdict(set)
+        text = text.lower()
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for group, keyword in self._out[state]:
+                edges = self._edges.get(keyword)
+                if edges and not self._on_boundary(text, end - len(keyword) + 1, end, edges):
+                    continue
+                hits[group].add(keyword)
+        return hits
+
+    @staticmethod
+    def _on_boundary(text: str, start: int, end: int, edges: Tuple[bool, bool]) -> bool:
+        if edges[0] and start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if edges[1] and end + 1 < len(text) and _is_word_char(text[end + 1]):
+            return False
+        return True
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+def features(text: str) -> List[str]:
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    for run in _CJK.findall(text):
+        tokens.extend(run[i:i + 2] for i in range(max(len(run) - 1, 1)))
+    return tokens
+
+
+class LocalIntentModel:
+    """
+    Multinomial naive Bayes trained incrementally from logged (question, intent) decisions.
+
+    ``predict`` returns (label, posterior) or None until ``min_samples`` decisions covering at
+    least two labels have been seen. Decisions are appended to ``log_path`` and replayed on load.
+    """
+
+    def __init__(self, log_path: Optional[Path] = DECISION_LOG, min_samples: int = 30, max_replay: int = 20000):
+        self.log_path = Path(log_path) if log_path else None
+        self.min_samples = min_samples
+        self.max_replay = max_replay
+        self._docs: Counter = Counter()
+        self._tokens: Dict[str, Counter] = defaultdict(Counter)
+        self._token_totals: Counter = Counter()
+        self._vocab: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @property
+    def samples(self) -> int:
+        return sum(self._docs.values())
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.log_path or not self.log_path.exists():
+            return
+        try:
+            with self.log_path.open(encoding="utf-8") as f:
+                lines = deque(f, maxlen=self.max_replay)
+            for line in lines:
+                try:
+                    row = json.loads(line)
+                    self._learn(row["q"], row["intent"])
+                except (ValueError, KeyError):
+                    continue
+        except OSError as e:
+            logger.warning(f"Failed to load intent decisions: {e}")
+
+    def _learn(self, question: str, label: str):
+        tokens = features(question)
+        self._docs[label] += 1
+        self._tokens[label].update(tokens)
+        self._token_totals[label] += len(tokens)
+        self._vocab.update(tokens)
+
+    def record(self, question: str, label: str):
+        with self._lock:
+            self._load()
+            self._learn(question, label)
+            if not self.log_path:
+                return
+            try:
+                self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.log_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({"q": question, "intent": label}, ensure_ascii=False) + "\n")
+            except OSError as e:
+                logger.warning(f"Failed to log intent decision: {e}")
+
+    def predict(self, question: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            self._load()
+            total = self.samples
+            if total < self.min_samples or len(self._docs) < 2:
+                return None
+            tokens = [t for t in features(question) if t in self._vocab]
+            if not tokens:
+                return None
+            vocab = len(self._vocab)
+            scores = {}
+            for label, docs in self._docs.items():
+                counts, denom = self._tokens[label], self._token_totals[label] + vocab
+                scores[label] = math.log(docs / total) + sum(math.log((counts[t] + 1) / denom) for t in tokens)
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
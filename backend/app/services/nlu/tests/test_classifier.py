@@ -0,0 +1,90 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from unittest import mock
+
+from app.services.nlu.classifier import IntentClassifier, QueryIntent
+from app.services.nlu.router import KeywordMatcher, LocalIntentModel
+
+
+class TestKeywordMatcher(unittest.TestCase):
+
+    def test_matches_all_overlapping_keywords(self):
+        m = KeywordMatcher({"a": ["he", "she", "his", "hers"], "b": ["是什么", "什么"]})
+        hits = m.match("USHERS 这是什么")
+        self.assertEqual(hits["a"], {"he", "she", "hers"})
+        self.assertEqual(hits["b"], {"是什么", "什么"})
+
+    def test_word_boundary_for_ascii_keywords(self):
+        m = KeywordMatcher({"a": ["sum", "top", "how many", "总数"]}, word_boundary=True)
+        self.assertEqual(m.match("Give me a summary, please stop"), {})
+        self.assertEqual(m.match("Sum of sales, top-5, how many 总数量"), {"a": {"sum", "top", "how many", "总数"}})
+
+
+class TestTieredRouting(unittest.TestCase):
+
+    def _classifier(self, llm_intent=None):
+        c = IntentClassifier(local_model=LocalIntentModel(log_path=None, min_samples=4))
+        c._llm_classify = mock.AsyncMock(return_value=llm_intent)
+        return c
+
+    def test_keyword_rules_skip_llm(self):
+        c = self._classifier(QueryIntent.RAG_QUERY)
+        cases = {
+            "什么是知识图谱？解释一下": QueryIntent.RAG_QUERY,
+            "What is the total sales count?": QueryIntent.SQL_QUERY,
+            "近三年销售额的趋势": QueryIntent.KG_QUERY,
+            "统计各部门数据表中的总数": QueryIntent.STRUCTURED_QUERY,
+        }
+        for question, expected in cases.items():
+            self.assertEqual(asyncio.run(c.classify(question)), expected, question)
+        c._llm_classify.assert_not_called()
+        self.assertEqual(c.stats()["tiers"]["keyword"]["count"], 4)
+
+    def test_substring_and_conflicting_hits_are_not_decisive(self):
+        c = self._classifier(QueryIntent.RAG_QUERY)
+        self.assertEqual(asyncio.run(c.classify("Give me a summary of the contract")), QueryIntent.RAG_QUERY)
+        self.assertEqual(asyncio.run(c.classify("Please summarize this document")), QueryIntent.RAG_QUERY)
+        c._llm_classify.assert_not_called()
+
+        # "top" inside "stop" is not a ranking keyword: the LLM decides
+        self.assertEqual(asyncio.run(c.classify("How do I stop the laptop from sleeping?")), QueryIntent.RAG_QUERY)
+        self.assertEqual(c._llm_classify.await_count, 1)
+
+        # KG and SQL rules both fire: weak guess, falls through
+        intent, confidence = c._keyword_stage("各部门的总数和趋势")
+        self.assertEqual(intent, QueryIntent.KG_QUERY)
+        self.assertLess(confidence, 0.9)
+
+    def test_llm_only_when_unsure_then_cached_and_learned(self):
+        c = self._classifier(QueryIntent.SQL_QUERY)
+        self.assertEqual(asyncio.run(c.classify("查询 上海 门店 的 销售额")), QueryIntent.SQL_QUERY)
+        self.assertEqual(asyncio.run(c.classify("  查询 上海 门店 的 销售额 ")), QueryIntent.SQL_QUERY)
+        self.assertEqual(c._llm_classify.await_count, 1)
+        tiers = c.stats()["tiers"]
+        self.assertEqual((tiers["llm"]["count"], tiers["cache"]["count"]), (1, 1))
+        self.assertEqual(c.local_model.samples, 1)
+
+    def test_local_model_answers_once_trained(self):
+        c = self._classifier(None)
+        for _ in range(3):
+            c.local_model.record("查询 门店 销售额", QueryIntent.SQL_QUERY.value)
+        c.local_model.record("介绍 公司 历史", QueryIntent.RAG_QUERY.value)
+        self.assertEqual(asyncio.run(c.classify("查询 北京 门店 销售额")), QueryIntent.SQL_QUERY)
+        self.assertEqual(c.stats()["tiers"]["local"]["count"], 1)
+        c._llm_classify.assert_not_called()
+
+    def test_fallback_without_llm(self):
+        c = self._classifier(None)
+        self.assertEqual(asyncio.run(c.classify("hello there")), QueryIntent.RAG_QUERY)
+        self.assertEqual(c.stats()["tiers"]["fallback"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi.responses import PlainTextResponse
 from typing import List, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -6,6 +7,7 @@ from app.api.deps import get_db
 from app.services.pathway.core.config import PathwayJobConfig, SourceConfig
 from app.services.pathway.core.models import DAGPipeline, DAGNode
 from app.services.pathway.core.engine import engine
+from app.services.pathway.core.metrics import to_prometheus
 from app.services.pathway.core.exceptions import PathwayException
 from app.crud import crud_pathway
 from app.models.pathway import PathwayJobStatus
@@ -109,17 +111,28 @@ async def get_pipeline(pipeline_id: int, db: AsyncSession = Depends(get_db)):
         if metrics and db_job.dag_config and "nodes" in db_job.dag_config:
             # Inject metrics into nodes
             nodes = db_job.dag_config["nodes"]
+            node_metrics = metrics.get("nodes", {})
             for node in nodes:
                 # Ensure data object exists
                 if "data" not in node:
                     node["data"] = {}
                 
-                # In a real scenario, we'd map specific metrics to specific nodes
-                # For now, we apply the global simulated metrics to all nodes
                 node["data"]["status"] = "running"
+                m = node_metrics.get(node.get("id"))
+                if m is None:
+                    # Node not instrumented (or no snapshot yet): fall back to job-wide values
+                    node["data"]["metrics"] = {
+                        "eps": metrics.get("global_eps", 0),
+                        "latency": metrics.get("global_latency", 0)
+                    }
+                    continue
                 node["data"]["metrics"] = {
-                    "eps": metrics.get("global_eps", 0),
-                    "latency": metrics.get("global_latency", 0)
+                    "eps": m["eps"],
+                    "latency": m["latency_avg_ms"],
+                    "latency_p95": m["latency_p95_ms"],
+                    "rows_in": m["rows_in"],
+                    "rows_out": m["rows_out"],
+                    "lag": m["lag_ms"]
                 }
     elif db_job.status == PathwayJobStatus.RUNNING and engine_status != "running":
         # DB thinks it's running but engine says no -> Set to stopped/failed
@@ -328,13 +341,15 @@ async def stop_job(name: str, db: AsyncSession = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/metrics/prometheus")
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
 async def get_metrics():
     """
-    Expose metrics for Prometheus.
-    This is a placeholder. In a real scenario, you would aggregate metrics 
-    from running Pathway instances or proxy to their metrics endpoints.
+    Expose metrics for Prometheus (text exposition format).
+    Aggregates the latest snapshot of every running job.
     """
-    # Assuming we want to expose metrics from the main app or specific jobs
-    # For now, we return a simple up metric
-    return "pathway_up 1\n"
+    lines = ["pathway_up 1"]
+    for job_name in list(engine.active_jobs):
+        metrics = engine.get_job_metrics(job_name)
+        if metrics:
+            lines.extend(to_prometheus(job_name, metrics))
+    return "\n".join(lines) + "\n"
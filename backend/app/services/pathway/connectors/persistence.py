@@ -1,12 +1,11 @@
 import time
-import json
 import logging
-import uuid
 import os
 from typing import List, Dict, Any, Optional
 import pathway as pw
 from neo4j import GraphDatabase, Driver
 from app.services.pathway.connectors.base import BaseSink
+from app.services.rag.retrieval.segment_store import SegmentCompactor, SegmentWriter
 from app.services.pathway.core.exceptions import ConnectorError
 from loguru import logger
 
@@ -133,60 +132,37 @@ class Neo4jSink(BaseSink):
 class LightRAGSink(BaseSink):
     """
     Sink for LightRAG File Store.
-    Writes serialized JSON/GraphML files with sharding.
+    Appends entities / relations / chunks to length-prefixed segments (see rag/retrieval/segment_store.py);
+    a background compactor merges sealed segments and builds the doc_id index, and
+    LightRAGEngine.mount_segments loads the result directly.
     """
-    def __init__(self, base_path: str, shard_size: int = 10000):
+    def __init__(
+        self,
+        base_path: str,
+        shard_size: int = 10000,
+        segment_bytes: int = 64 * 1024 * 1024,
+        compact_interval: float = 60.0,
+        compact_min_segments: int = 4,
+    ):
         self.base_path = base_path
         self.shard_size = shard_size
         os.makedirs(self.base_path, exist_ok=True)
+        # shard_size now bounds the records per segment instead of creating one directory per batch
+        self.writer = SegmentWriter(base_path, segment_bytes=segment_bytes, max_records=shard_size)
+        self.compactor = SegmentCompactor(base_path, interval=compact_interval, min_segments=compact_min_segments)
 
     def write(self, table: pw.Table, config: Dict[str, Any]) -> None:
         def _write_shard(rows: List[Dict]):
             if not rows:
                 return
-            
-            # Generate shard ID based on timestamp and uuid
-            shard_id = f"{int(time.time())}_{uuid.uuid4().hex[:8]}"
-            shard_dir = os.path.join(self.base_path, f"shard_{shard_id}")
-            os.makedirs(shard_dir, exist_ok=True)
-            
-            # Group data by type
-            entities = {}
-            relations = {}
-            chunks = {}
-            
-            for row in rows:
-                doc_id = row.get('doc_id', 'unknown')
-                r_type = row.get('type')
-                
-                if r_type == 'entity':
-                    if doc_id not in entities: entities[doc_id] = []
-                    entities[doc_id].append(row)
-                elif r_type == 'relation':
-                    if doc_id not in relations: relations[doc_id] = []
-                    relations[doc_id].append(row)
-                elif r_type == 'chunk':
-                    if doc_id not in chunks: chunks[doc_id] = []
-                    chunks[doc_id].append(row)
-            
-            # Write JSON files (KV Store simulation)
-            self._write_json(os.path.join(shard_dir, "kv_store_full_entities.json"), entities)
-            self._write_json(os.path.join(shard_dir, "kv_store_full_relations.json"), relations)
-            self._write_json(os.path.join(shard_dir, "kv_store_text_chunks.json"), chunks)
-            
-            # Write GraphML (Graph Store simulation)
-            # This requires converting the batch to a networkx graph then graphml, or manual XML generation
-            # For performance, we might just append to a log or write a mini-graphml
-            pass
+            self.writer.append(rows)
 
+        self.compactor.start()
         pw.io.python.write(table, _write_shard)
 
-    def _write_json(self, path: str, data: Dict):
-        # Atomic write: write to temp then rename
-        tmp_path = path + ".tmp"
-        with open(tmp_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, path)
+    def close(self):
+        self.writer.seal()
+        self.compactor.stop()
 
 # =============================================================================
 # 3. Vector & Object Storage Sink
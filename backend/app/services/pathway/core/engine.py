@@ -10,40 +10,57 @@ from app.services.pathway.connectors.sink import get_sink
 from app.services.pathway.operators.cleaning import apply_operator
 # Import udf and structuring modules to ensure registration of operators
 import app.services.pathway.operators.udf 
+from app.services.pathway.operators.udf import precompile_udfs
 import app.services.pathway.operators.structuring
 import app.services.pathway.operators.ai_operators
 import app.services.pathway.operators.logic
 from app.services.pathway.core.parser import DAGParser
+from app.services.pathway.core.metrics import JobMetricsCollector, MetricsChannel
 from app.services.pathway.core.exceptions import ConfigurationError, PathwayException
 from app.core.logger import logger
 
-def _run_dag(pipeline: DAGPipeline):
+def _make_collector(name: str, settings: Dict[str, Any], metrics_channel: Optional[str]) -> Optional[JobMetricsCollector]:
+    if not metrics_channel or not settings.get("metrics", True):
+        return None
+    return JobMetricsCollector(name, metrics_channel, interval=float(settings.get("metrics_interval", 1.0)))
+
+def _run_dag(pipeline: DAGPipeline, metrics_channel: Optional[str] = None):
     """Run a DAG-based pipeline."""
     from app.core.logger import setup_logging
     setup_logging()
     
+    collector = _make_collector(pipeline.name, pipeline.settings, metrics_channel)
     try:
-        parser = DAGParser()
+        parser = DAGParser(collector=collector)
         parser.parse(pipeline)
         
+        if collector:
+            collector.start()
         monitoring_port = pipeline.settings.get("monitoring_port", 8081)
         pw.run(monitoring_dashboard_address=f"0.0.0.0:{monitoring_port}")
     except Exception as e:
         logger.error(f"Pathway DAG job {pipeline.name} failed: {e}", exc_info=True)
+    finally:
+        if collector:
+            collector.stop()
 
-def _run_job(config: PathwayJobConfig):
+def _run_job(config: PathwayJobConfig, metrics_channel: Optional[str] = None):
     """The actual pathway execution logic running in a child process (Legacy/Linear)."""
     # Re-initialize logger in child process
     from app.core.logger import setup_logging
     setup_logging()
     
+    # Linear jobs have no node ids; metrics use source_<i> / op_<i> / sink_<i>
+    collector = _make_collector(config.name, config.settings, metrics_channel)
     try:
         # 1. Sources
         tables = []
-        for source_conf in config.sources:
+        for i, source_conf in enumerate(config.sources):
             source = get_source(source_conf.type)
             table = source.read(source_conf.config)
             tables.append(table)
+            if collector:
+                collector.attach(table, f"source_{i}")
         
         if not tables:
             raise ConfigurationError("No sources defined")
@@ -53,19 +70,27 @@ def _run_job(config: PathwayJobConfig):
         current_table = tables[0]
         for t in tables[1:]:
             current_table += t
+        upstream = [f"source_{i}" for i in range(len(tables))]
 
         # 2. Operators (Cleaning & Transformation)
-        for op_conf in config.operators:
+        for i, op_conf in enumerate(config.operators):
             # Unified operator application via factory/registry
             # apply_operator now uses OperatorRegistry internally
             current_table = apply_operator(current_table, op_conf.dict())
+            if collector:
+                collector.attach(current_table, f"op_{i}", inputs=upstream)
+                upstream = [f"op_{i}"]
 
         # 3. Sinks
-        for sink_conf in config.sinks:
+        for i, sink_conf in enumerate(config.sinks):
             sink = get_sink(sink_conf.type)
             sink.write(current_table, sink_conf.config)
+            if collector:
+                collector.attach(current_table, f"sink_{i}", inputs=upstream)
 
         # 4. Run
+        if collector:
+            collector.start()
         monitoring_port = config.settings.get("monitoring_port", 8081)
         pw.run(monitoring_dashboard_address=f"0.0.0.0:{monitoring_port}")
 
@@ -73,10 +98,15 @@ def _run_job(config: PathwayJobConfig):
         logger.error(f"Pathway job {config.name} failed: {e}", exc_info=True)
         # We don't re-raise here because it would just crash the process silently
         # Logging is enough
+    finally:
+        if collector:
+            collector.stop()
 
 class PathwayEngine:
     def __init__(self):
         self.active_jobs: Dict[str, multiprocessing.Process] = {}
+        # Shared-memory segments the job processes publish their metrics snapshots into
+        self.metrics_channels: Dict[str, MetricsChannel] = {}
 
     def start_job(self, job_config: Union[PathwayJobConfig, DAGPipeline]):
         """Start a pathway job in a separate process."""
@@ -86,12 +116,27 @@ class PathwayEngine:
             else:
                 # Cleanup dead process
                 del self.active_jobs[job_config.name]
+                self._close_metrics(job_config.name)
 
         target_func = _run_dag if isinstance(job_config, DAGPipeline) else _run_job
 
+        # Compile UDF files here; the forked job process inherits the warm code objects
+        if isinstance(job_config, DAGPipeline):
+            precompile_udfs(n.config for n in job_config.nodes if n.operator == "udf")
+        else:
+            precompile_udfs(op.config for op in job_config.operators if op.type == "udf")
+
+        try:
+            channel = MetricsChannel(create=True)
+            self.metrics_channels[job_config.name] = channel
+            channel_name = channel.name
+        except OSError as e:
+            logger.warning(f"Metrics disabled for {job_config.name}: {e}")
+            channel_name = None
+
         process = multiprocessing.Process(
             target=target_func,
-            args=(job_config,),
+            args=(job_config, channel_name),
             name=f"pathway-{job_config.name}",
             daemon=True
         )
@@ -110,9 +155,15 @@ class PathwayEngine:
                     process.kill()
                 logger.info(f"Stopped Pathway job: {job_name}")
             del self.active_jobs[job_name]
+            self._close_metrics(job_name)
         else:
             raise PathwayException(f"Job {job_name} not found")
 
+    def _close_metrics(self, job_name: str):
+        channel = self.metrics_channels.pop(job_name, None)
+        if channel is not None:
+            channel.close()
+
     def get_job_status(self, job_name: str) -> str:
         if job_name in self.active_jobs:
             process = self.active_jobs[job_name]
@@ -122,29 +173,29 @@ class PathwayEngine:
     def get_job_metrics(self, job_name: str) -> Dict[str, Any]:
         """
         Get runtime metrics for a running job.
-        For now, this returns simulated data for visualization purposes.
-        In a real scenario, this would query the Pathway monitoring endpoint.
+        Reads the latest snapshot the job process published (never blocks on the job):
+        per-node rows in/out, eps, batch latency (avg/p95/histogram), queue lag,
+        plus process CPU%/RSS and job-wide aggregates (global_eps, global_latency).
         """
-        import random
-        
         status = self.get_job_status(job_name)
         if status != "running":
             return {}
-            
-        # Simulate metrics for demonstration
-        # Returns a dict keyed by node_id (if we knew them) or just generic metrics
-        # Since engine doesn't track node IDs directly, we'll return a generic structure
-        # that the API layer can map to actual node IDs.
-        
-        # However, to map to specific nodes, the caller (API) needs to provide node IDs.
-        # So we'll return a "generator" function or just raw data that the API can distribute.
-        
-        # Let's return a simple randomizer helper that the API can use
+
+        channel = self.metrics_channels.get(job_name)
+        snapshot = channel.read() if channel else None
+        if not snapshot:
+            # Job is starting up and has not published yet
+            return {"timestamp": time.time(), "status": "running", "nodes": {}, "global_eps": 0, "global_latency": 0}
+
+        nodes = snapshot.get("nodes", {})
+        # Rows entering the job = rows emitted by nodes without inputs (sources);
+        # job latency = worst lag between a batch's timestamp and a node finishing it
+        sources = [m for m in nodes.values() if not m.get("inputs")]
         return {
-            "timestamp": time.time(),
+            **snapshot,
             "status": "running",
-            "global_eps": random.randint(50, 500),
-            "global_latency": random.uniform(5.0, 50.0)
+            "global_eps": round(sum(m["eps"] for m in sources), 2),
+            "global_latency": max((m["lag_ms"] for m in nodes.values()), default=0),
         }
 
 
@@ -0,0 +1,275 @@
+"""
+Runtime metrics for Pathway jobs.
+
+The job's child process records per-DAG-node counters through ``pw.io.subscribe`` hooks and
+periodically publishes a JSON snapshot into a shared-memory segment owned by the API process.
+The segment is a seqlock: the writer bumps a sequence number to odd before writing and to even
+after, so readers never block and simply keep their last good snapshot when they race a write.
+"""
+import bisect
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core.logger import logger
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+_HEADER = struct.Struct("<QI")  # sequence, payload length
+DEFAULT_SEGMENT_SIZE = 256 * 1024
+
+
+class MetricsChannel:
+    """Seqlock-protected shared-memory segment carrying the latest metrics snapshot."""
+
+    def __init__(self, name: Optional[str] = None, create: bool = False, size: int = DEFAULT_SEGMENT_SIZE):
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self._owner = create
+        self._last: Optional[Dict[str, Any]] = None
+        if create:
+            _HEADER.pack_into(self.shm.buf, 0, 0, 0)
+
+    def write(self, snapshot: Dict[str, Any]) -> bool:
+        payload = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+        if _HEADER.size + len(payload) > self.shm.size:
+            logger.warning(f"Metrics snapshot ({len(payload)} bytes) exceeds segment {self.name}")
+            return False
+        buf = self.shm.buf
+        seq, _ = _HEADER.unpack_from(buf, 0)
+        _HEADER.pack_into(buf, 0, seq + 1, 0)
+        buf[_HEADER.size : _HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(buf, 0, seq + 2, len(payload))
+        return True
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """Return the latest complete snapshot without blocking (last good one on a torn read)."""
+        buf = self.shm.buf
+        seq, length = _HEADER.unpack_from(buf, 0)
+        if seq == 0 or seq % 2 or length == 0:
+            return self._last
+        payload = bytes(buf[_HEADER.size : _HEADER.size + length])
+        if _HEADER.unpack_from(buf, 0)[0] != seq:
+            return self._last
+        try:
+            self._last = json.loads(payload)
+        except ValueError:
+            pass
+        return self._last
+
+    def close(self):
+        try:
+            self.shm.close()
+            if self._owner:
+                self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class NodeMetrics:
+    __slots__ = ("inputs", "rows_out", "rows_removed", "batches", "histogram", "latency_sum",
+                 "last_lag_ms", "last_time", "_pending_rows", "_finished")
+
+    def __init__(self, inputs: Iterable[str] = ()):
+        self.inputs = list(inputs)
+        self.rows_out = 0
+        self.rows_removed = 0
+        self.batches = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_sum = 0.0
+        self.last_lag_ms = 0.0
+        self.last_time: Optional[int] = None
+        self._pending_rows = 0
+        # logical time -> wall clock (ms) at which this node finished that batch
+        self._finished: "OrderedDict[int, float]" = OrderedDict()
+
+
+class JobMetricsCollector:
+    """
+    Per-node counters for one running job (lives in the job's child process).
+
+    - rows in/out: rows_in of a node is the sum of its inputs' rows_out
+    - per-batch latency: wall time between the slowest input finishing a logical time and this
+      node finishing it (sources: time since the batch's timestamp)
+    - queue lag: wall clock minus the logical time of the last completed batch
+    """
+
+    def __init__(self, job_name: str, channel_name: Optional[str] = None, interval: float = 1.0):
+        self.job_name = job_name
+        self.nodes: Dict[str, NodeMetrics] = {}
+        self.interval = interval
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._channel = MetricsChannel(channel_name) if channel_name else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cpu_prev = (time.monotonic(), time.process_time())
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def register(self, node_id: str, inputs: Iterable[str] = ()) -> NodeMetrics:
+        with self._lock:
+            node = self.nodes.get(node_id)
+            if node is None:
+                node = self.nodes[node_id] = NodeMetrics(inputs)
+            return node
+
+    def on_change(self, node_id: str, is_addition: bool, n: int = 1):
+        node = self.nodes[node_id]
+        if is_addition:
+            node._pending_rows += n
+        else:
+            node.rows_removed += n
+
+    def on_time_end(self, node_id: str, logical_time: int, now_ms: Optional[float] = None):
+        now_ms = time.time() * 1000.0 if now_ms is None else now_ms
+        with self._lock:
+            node = self.nodes[node_id]
+            ready_at = [self.nodes[i]._finished.get(logical_time) for i in node.inputs if i in self.nodes]
+            ready_at = [t for t in ready_at if t is not None]
+            latency = now_ms - (max(ready_at) if ready_at else float(logical_time))
+            latency = max(0.0, latency)
+
+            node.rows_out += node._pending_rows
+            node._pending_rows = 0
+            node.batches += 1
+            node.latency_sum += latency
+            node.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency)] += 1
+            node.last_lag_ms = max(0.0, now_ms - float(logical_time))
+            node.last_time = logical_time
+            node._finished[logical_time] = now_ms
+            while len(node._finished) > 64:
+                node._finished.popitem(last=False)
+
+    def attach(self, table: Any, node_id: str, inputs: Iterable[str] = ()):
+        """Subscribe to a Pathway table so its updates feed this node's counters."""
+        import pathway as pw
+
+        self.register(node_id, inputs)
+        pw.io.subscribe(
+            table,
+            on_change=lambda key, row, time, is_addition: self.on_change(node_id, is_addition),
+            on_time_end=lambda time: self.on_time_end(node_id, time),
+        )
+
+    # ------------------------------------------------------------------
+    # Snapshot / publishing
+    # ------------------------------------------------------------------
+    def _process_stats(self) -> Dict[str, Any]:
+        now, cpu = time.monotonic(), time.process_time()
+        prev_now, prev_cpu = self._cpu_prev
+        self._cpu_prev = (now, cpu)
+        cpu_percent = 100.0 * (cpu - prev_cpu) / (now - prev_now) if now > prev_now else 0.0
+        return {"pid": os.getpid(), "cpu_percent": round(cpu_percent, 1), "rss_bytes": _rss_bytes()}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = max(1e-6, time.time() - self.started_at)
+            nodes = {}
+            for node_id, m in self.nodes.items():
+                rows_in = sum(self.nodes[i].rows_out for i in m.inputs if i in self.nodes)
+                nodes[node_id] = {
+                    "inputs": m.inputs,
+                    "rows_in": rows_in,
+                    "rows_out": m.rows_out,
+                    "rows_removed": m.rows_removed,
+                    "batches": m.batches,
+                    "eps": round(m.rows_out / elapsed, 2),
+                    "latency_avg_ms": round(m.latency_sum / m.batches, 3) if m.batches else 0.0,
+                    "latency_p95_ms": _histogram_quantile(m.histogram, 0.95),
+                    "latency_histogram": m.histogram[:],
+                    "lag_ms": round(m.last_lag_ms, 1),
+                }
+        return {
+            "job": self.job_name,
+            "timestamp": time.time(),
+            "uptime": round(elapsed, 1),
+            "buckets_ms": LATENCY_BUCKETS_MS,
+            "process": self._process_stats(),
+            "nodes": nodes,
+        }
+
+    def publish(self):
+        if self._channel is not None:
+            self._channel.write(self.snapshot())
+
+    def start(self):
+        if self._channel is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"metrics-{self.job_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        self.publish()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                logger.warning(f"Publishing metrics for {self.job_name} failed: {e}")
+
+
+def _histogram_quantile(histogram: List[int], q: float) -> float:
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target = q * total
+    acc = 0
+    for i, count in enumerate(histogram):
+        acc += count
+        if acc >= target:
+            return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else float(LATENCY_BUCKETS_MS[-1])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import resource
+
+            # ru_maxrss is the peak RSS in KiB on Linux
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return 0
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(job_name: str, metrics: Dict[str, Any]) -> List[str]:
+    """Render one job's metrics snapshot as Prometheus text exposition lines."""
+    job = _label(job_name)
+    lines = []
+    process = metrics.get("process") or {}
+    if process:
+        lines.append(f'pathway_job_cpu_percent{{job="{job}"}} {process.get("cpu_percent", 0)}')
+        lines.append(f'pathway_job_rss_bytes{{job="{job}"}} {process.get("rss_bytes", 0)}')
+    buckets = metrics.get("buckets_ms") or LATENCY_BUCKETS_MS
+    for node_id, m in (metrics.get("nodes") or {}).items():
+        labels = f'job="{job}",node="{_label(node_id)}"'
+        lines.append(f"pathway_node_rows_in_total{{{labels}}} {m['rows_in']}")
+        lines.append(f"pathway_node_rows_out_total{{{labels}}} {m['rows_out']}")
+        lines.append(f"pathway_node_batches_total{{{labels}}} {m['batches']}")
+        lines.append(f"pathway_node_lag_ms{{{labels}}} {m['lag_ms']}")
+        cumulative = 0
+        for bound, count in zip(buckets + ["+Inf"], m["latency_histogram"]):
+            cumulative += count
+            lines.append(f'pathway_node_batch_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"pathway_node_batch_latency_ms_count{{{labels}}} {m['batches']}")
+        lines.append(f"pathway_node_batch_latency_ms_sum{{{labels}}} {round(m['latency_avg_ms'] * m['batches'], 3)}")
+    return lines
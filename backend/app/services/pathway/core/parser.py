@@ -8,8 +8,10 @@ from app.services.pathway.core.exceptions import ConfigurationError, PathwayExce
 from app.core.logger import logger
 
 class DAGParser:
-    def __init__(self):
+    def __init__(self, collector: Optional[Any] = None):
         self.tables: Dict[str, pw.Table] = {}
+        # Optional JobMetricsCollector; when set every node's output is subscribed for runtime metrics
+        self.collector = collector
 
     def parse(self, pipeline: DAGPipeline) -> None:
         """
@@ -21,6 +23,20 @@ class DAGParser:
         # 2. Build Graph
         for node in sorted_nodes:
             self._process_node(node)
+            if self.collector is not None:
+                self._instrument(node)
+
+    def _instrument(self, node: DAGNode):
+        """
+        Attach metrics hooks to the node's output table.
+        Sinks have no output table; their input is observed instead, so rows_out counts rows delivered.
+        """
+        table = self.tables.get(node.id)
+        if table is None and node.type == "sink" and node.inputs:
+            table = self.tables.get(node.inputs[0])
+        if table is None:
+            return
+        self.collector.attach(table, node.id, inputs=node.inputs)
 
     def _topological_sort(self, nodes: List[DAGNode]) -> List[DAGNode]:
         """
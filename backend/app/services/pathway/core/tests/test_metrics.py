@@ -0,0 +1,73 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import unittest
+from app.services.pathway.core.metrics import JobMetricsCollector, MetricsChannel, to_prometheus
+
+
+class TestMetricsChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.owner = MetricsChannel(create=True, size=4096)
+        self.reader = MetricsChannel(self.owner.name)
+
+    def tearDown(self):
+        self.reader.close()
+        self.owner.close()
+
+    def test_read_before_write_is_none(self):
+        self.assertIsNone(self.reader.read())
+
+    def test_round_trip_and_torn_read(self):
+        writer = MetricsChannel(self.owner.name)
+        writer.write({"n": 1})
+        self.assertEqual(self.reader.read(), {"n": 1})
+
+        # Simulate a writer caught mid-update (odd sequence): reader keeps the last good snapshot
+        seq = int.from_bytes(bytes(self.owner.shm.buf[:8]), "little")
+        self.owner.shm.buf[:8] = (seq + 1).to_bytes(8, "little")
+        self.assertEqual(self.reader.read(), {"n": 1})
+        self.owner.shm.buf[:8] = seq.to_bytes(8, "little")
+
+        writer.write({"n": 2})
+        self.assertEqual(self.reader.read(), {"n": 2})
+        self.assertFalse(writer.write({"blob": "x" * 5000}))
+        writer.close()
+
+
+class TestJobMetricsCollector(unittest.TestCase):
+
+    def test_rows_latency_and_lag(self):
+        c = JobMetricsCollector("job")
+        c.register("src")
+        c.register("clean", inputs=["src"])
+        for _ in range(3):
+            c.on_change("src", True)
+        c.on_time_end("src", 1000, now_ms=1004)
+        c.on_change("clean", True)
+        c.on_change("clean", True)
+        c.on_change("clean", False)
+        c.on_time_end("clean", 1000, now_ms=1034)
+
+        snap = c.snapshot()
+        src, clean = snap["nodes"]["src"], snap["nodes"]["clean"]
+        self.assertEqual((src["rows_in"], src["rows_out"]), (0, 3))
+        self.assertEqual((clean["rows_in"], clean["rows_out"], clean["rows_removed"]), (3, 2, 1))
+        # Source latency is measured from the batch timestamp, downstream from the input finishing
+        self.assertEqual(src["latency_avg_ms"], 4.0)
+        self.assertEqual(clean["latency_avg_ms"], 30.0)
+        self.assertEqual(clean["lag_ms"], 34.0)
+        self.assertEqual(sum(clean["latency_histogram"]), 1)
+        self.assertIn("rss_bytes", snap["process"])
+
+        lines = to_prometheus("job", snap)
+        self.assertIn('pathway_node_rows_out_total{job="job",node="clean"} 2', lines)
+        self.assertIn('pathway_node_batch_latency_ms_bucket{job="job",node="clean",le="+Inf"} 1', lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
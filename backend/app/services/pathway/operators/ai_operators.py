@@ -1,7 +1,8 @@
 import json
 import pathway as pw
-from typing import Dict, Any
+from typing import Dict, Any, List
 from app.services.pathway.operators.registry import OperatorRegistry
+from app.services.pathway.operators.llm_batch import BatchedCaller, make_llm_batch_fn, resolve_llm_config
 
 # 模拟 LLM 调用函数
 def mock_llm_call(text: str, config: Dict[str, Any]) -> Dict[str, Any]:
@@ -48,28 +49,87 @@ def mock_llm_call(text: str, config: Dict[str, Any]) -> Dict[str, Any]:
         "processing_time_ms": random.randint(100, 500)
     }
 
+def _batched_caller(config: Dict[str, Any], batch_fn) -> BatchedCaller:
+    return BatchedCaller(
+        batch_fn,
+        max_batch_size=int(config.get("batch_size", 16)),
+        max_wait_ms=float(config.get("batch_wait_ms", 50)),
+        max_concurrency=int(config.get("max_concurrency", 4)),
+        cache_size=int(config.get("cache_size", 10000)),
+    )
+
+def _intent_prompt(texts: List[str], config: Dict[str, Any]) -> str:
+    intents = config.get("intents")
+    template = config.get("prompt_template") or (
+        "Classify the intent of each numbered user message"
+        + (f" into one of: {', '.join(intents)} (or \"unknown\")" if intents else "")
+        + ". Extract relevant slots (e.g. order_id)."
+    )
+    numbered = "\n".join(f"{i + 1}. {json.dumps(t, ensure_ascii=False)}" for i, t in enumerate(texts))
+    return (
+        f"{template}\n\nMessages:\n{numbered}\n\n"
+        f"Return ONLY a JSON array with exactly {len(texts)} objects in the same order, each like "
+        '{"intent": "...", "confidence": 0.0-1.0, "slots": {}}.'
+    )
+
+def _intent_batch_fn(config: Dict[str, Any]):
+    """
+    Batch function for llm_intent: one completion per micro-batch against the configured LLMModel,
+    or the rule-based simulation when no model is configured.
+    """
+    llm = resolve_llm_config(config)
+    if llm is None:
+        async def simulated(texts: List[str]) -> List[Dict[str, Any]]:
+            return [mock_llm_call(t, config) for t in texts]
+        return simulated
+
+    call = make_llm_batch_fn(
+        llm,
+        lambda texts: _intent_prompt(texts, config),
+        fallback=lambda text: {"intent": "fallback", "error": "unparseable LLM response"},
+        timeout=float(config.get("timeout", 60)),
+    )
+
+    async def batch_fn(texts: List[str]) -> List[Dict[str, Any]]:
+        items = await call(texts)
+        results = []
+        for item in items:
+            item = item if isinstance(item, dict) else {"intent": str(item)}
+            item.setdefault("intent", "unknown")
+            item.setdefault("confidence", 0.0)
+            item.setdefault("slots", {})
+            item["model"] = llm["model"]
+            results.append(item)
+        return results
+    return batch_fn
+
 @OperatorRegistry.register("llm_intent")
 def apply_llm_intent(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
     """
     Applies LLM Intent Recognition to a text column.
     
+    Rows are micro-batched (one LLM request per batch) with bounded concurrency,
+    a normalized-text result cache and rate-limit backoff, see llm_batch.BatchedCaller.
+
     Config:
     - input_col: str (default: "content")
     - output_col: str (default: "intent_result")
-    - model: str
-    - prompt_template: str
-    - ... other LLM params
+    - model / api_key / base_url: inline model, else llm_model_id or the active LLMModel
+    - prompt_template: str, intents: list[str]
+    - batch_size: int (default 16), batch_wait_ms: float (default 50)
+    - max_concurrency: int (default 4), cache_size: int (default 10000)
     """
     input_col = config.get("input_col", "content")
     output_col = config.get("output_col", "intent_result")
+    caller = _batched_caller(config, _intent_batch_fn(config))
     
     # Define the UDF
-    def intent_recognizer(text: Any) -> str:
+    async def intent_recognizer(text: Any) -> str:
         if text is None:
             return json.dumps({"error": "Empty input"})
         try:
-            result = mock_llm_call(str(text), config)
-            return json.dumps(result)
+            result = await caller.submit(str(text))
+            return json.dumps(result, ensure_ascii=False)
         except Exception as e:
             return json.dumps({"error": str(e), "intent": "fallback"})
 
@@ -81,7 +141,7 @@ def apply_llm_intent(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
     # Note: We use **kwargs unpacking to add the new column dynamically
     return table.select(
         *table.columns,
-        **{output_col: pw.apply(intent_recognizer, table[input_col])}
+        **{output_col: pw.apply_async(intent_recognizer, table[input_col])}
     )
 
 def mock_knowledge_retrieval(query: str, config: Dict[str, Any]) -> Dict[str, Any]:
@@ -124,25 +184,33 @@ def apply_knowledge_retrieval(table: pw.Table, config: Dict[str, Any]) -> pw.Tab
     """
     Applies Knowledge Retrieval (RAG) to a query column.
     
+    Queries go through the same micro-batching / caching layer as llm_intent.
+
     Config:
     - query_column: str (default: "content")
     - top_k: int (default: 3)
     - score_threshold: float (default: 0.7)
+    - batch_size, batch_wait_ms, max_concurrency, cache_size: see llm_intent
     """
     query_col = config.get("query_column", "content")
     # Output is fixed structure, maybe just "retrieval_result"
     output_col = "retrieval_result"
+
+    async def retrieve_batch(queries: List[str]) -> List[Dict[str, Any]]:
+        return [mock_knowledge_retrieval(q, config) for q in queries]
+
+    caller = _batched_caller(config, retrieve_batch)
     
-    def retriever(query: Any) -> str:
+    async def retriever(query: Any) -> str:
         if query is None:
             return json.dumps({"error": "Empty query"})
         try:
-            result = mock_knowledge_retrieval(str(query), config)
+            result = await caller.submit(str(query))
             return json.dumps(result)
         except Exception as e:
             return json.dumps({"error": str(e)})
 
     return table.select(
         *table.columns,
-        **{output_col: pw.apply(retriever, table[query_col])}
+        **{output_col: pw.apply_async(retriever, table[query_col])}
     )
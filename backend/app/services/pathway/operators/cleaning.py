@@ -20,6 +20,12 @@ from typing import Dict, Any, List, Optional, Union, Callable
 import pathway as pw
 from app.services.pathway.core.exceptions import OperatorError
 from app.services.pathway.operators.registry import OperatorRegistry
+from app.services.pathway.operators.masking import (
+    build_masker,
+    regex_extract_batch,
+    regex_replace_batch,
+    word_filter_batch,
+)
 
 # Optional dependencies
 try:
@@ -45,6 +51,20 @@ try:
 except ImportError:
     np = None
 
+DEFAULT_BATCH_SIZE = 1024
+
+def _apply_batched(batch_fn: Callable[[List[Any]], List[Any]], column: Any, batch_size: int = DEFAULT_BATCH_SIZE) -> Any:
+    """
+    Apply a batch kernel (list of values -> list of results) to a column.
+    Pathway hands the UDF chunks of up to ``batch_size`` rows; on Pathway versions without
+    batched UDFs it falls back to a per-row apply of the same kernel.
+    """
+    try:
+        udf = pw.udf(batch_fn, deterministic=True, max_batch_size=batch_size)
+    except (AttributeError, TypeError):
+        return pw.apply(lambda x: batch_fn([x])[0], column)
+    return udf(column)
+
 # =============================================================================
 # Dispatcher
 # =============================================================================
@@ -169,14 +189,18 @@ def _apply_text_process(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
             method = params.get("method", "replace") # replace, extract
             if not pattern:
                 raise OperatorError("Regex pattern required")
+            batch_size = params.get("batch_size", DEFAULT_BATCH_SIZE)
             
+            # Compiled once per operator and applied over column chunks
+            if method == "replace":
+                kernel = regex_replace_batch({pattern: repl})
+            elif method == "extract":
+                # Extract first match
+                kernel = regex_extract_batch(pattern)
+            else:
+                raise OperatorError(f"Unknown regex method: {method}")
             for out_col, in_col in col_map.items():
-                if method == "replace":
-                    # pw.apply with re.sub
-                    res_cols[out_col] = pw.apply(lambda x: re.sub(pattern, repl, x) if x else x, table[in_col])
-                elif method == "extract":
-                    # Extract first match
-                    res_cols[out_col] = pw.apply(lambda x: (re.search(pattern, x).group(0) if re.search(pattern, x) else None) if x else None, table[in_col])
+                res_cols[out_col] = _apply_batched(kernel, table[in_col], batch_size)
 
         elif action == "tokenize":
             engine = params.get("engine", "split") # split, jieba
@@ -205,13 +229,10 @@ def _apply_text_process(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
         elif action == "sensitive_filter":
             sensitive_words = params.get("words", [])
             replace_char = params.get("replace_char", "*")
+            # All words in one compiled alternation instead of one str.replace per word per row
+            kernel = word_filter_batch(sensitive_words, replace_char)
             for out_col, in_col in col_map.items():
-                def _filter(text):
-                    if not text: return text
-                    for w in sensitive_words:
-                        text = text.replace(w, replace_char * len(w))
-                    return text
-                res_cols[out_col] = pw.apply(_filter, table[in_col])
+                res_cols[out_col] = _apply_batched(kernel, table[in_col], params.get("batch_size", DEFAULT_BATCH_SIZE))
 
         elif action == "similarity":
             # Levenshtein or SequenceMatcher
@@ -485,15 +506,22 @@ def _apply_deduplication(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
 
 @OperatorRegistry.register("mask_pii")
 def _apply_mask_pii(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
+    """
+    Mask PII columns (see operators/masking.py).
+
+    Config:
+        columns (List[str]): Columns to mask in place.
+        method (str): mask (default), hash, partial, regex.
+        salt (str): Required for hash (or PII_HASH_SALT); hash_length (int, default 16).
+        kinds (List[str]): partial detectors: id_card, phone, email, bank_card.
+        patterns (Dict[str, str]): regex dictionary {pattern or builtin name: replacement}.
+        mask_char (str), replacement (str), batch_size (int).
+    """
     try:
         columns = config.get("columns", [])
-        method = config.get("method", "mask")
-        masked_cols = {}
-        for col in columns:
-            if method == "hash":
-                masked_cols[col] = pw.apply(lambda x: "HASHed", table[col])
-            else:
-                masked_cols[col] = pw.apply(lambda x: "***", table[col])
+        kernel = build_masker(config)
+        batch_size = config.get("batch_size", DEFAULT_BATCH_SIZE)
+        masked_cols = {col: _apply_batched(kernel, table[col], batch_size) for col in columns}
         return table.with_columns(**masked_cols)
     except Exception as e:
         raise OperatorError(f"PII Mask operator failed: {e}")
@@ -0,0 +1,274 @@
+"""
+Micro-batching for row-wise LLM operators.
+
+Pathway calls an async UDF once per row; ``BatchedCaller.submit`` parks each row in a pending batch
+that is flushed when it reaches ``max_batch_size`` items or is ``max_wait_ms`` old. Batches run with
+bounded concurrency, results are cached by normalized input text (identical in-flight inputs share
+one call), and a provider rate limit pauses every batch with exponential backoff. Rows waiting on a
+full pipeline block ``submit``, which propagates the backpressure to the Pathway executor.
+"""
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.logger import logger
+
+BatchFn = Callable[[List[str]], Awaitable[List[Any]]]
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: Any) -> str:
+    return _WS_RE.sub(" ", str(text)).strip().casefold()
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return status == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _retry_after(e: BaseException) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _LoopState:
+    """asyncio primitives are bound to the loop Pathway runs the UDF on."""
+
+    def __init__(self, max_concurrency: int, max_pending: int):
+        self.pending: List[tuple] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.capacity = asyncio.Semaphore(max_pending)
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.tasks: set = set()
+
+
+class BatchedCaller:
+    def __init__(
+        self,
+        batch_fn: BatchFn,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 50,
+        max_concurrency: int = 4,
+        cache_size: int = 10000,
+        max_retries: int = 5,
+        max_backoff: float = 30.0,
+        max_pending: Optional[int] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max_pending or self.max_batch_size * self.max_concurrency * 4
+        self.cache_size = cache_size
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._states: Dict[int, _LoopState] = {}
+        self._resume_at = 0.0
+        self._backoff = 0.0
+        self.stats = {"rows": 0, "cache_hits": 0, "coalesced": 0, "batches": 0, "rate_limited": 0}
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(id(loop))
+        if state is None:
+            state = self._states[id(loop)] = _LoopState(self.max_concurrency, self.max_pending)
+        return state
+
+    async def submit(self, text: str) -> Any:
+        self.stats["rows"] += 1
+        key = normalize_text(text)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return self._cache[key]
+
+        state = self._state()
+        future = state.inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        await state.capacity.acquire()
+        try:
+            future = asyncio.get_running_loop().create_future()
+            state.inflight[key] = future
+            state.pending.append((key, text, future))
+            if len(state.pending) >= self.max_batch_size:
+                self._flush(state)
+            elif state.timer is None:
+                state.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush, state)
+            return await asyncio.shield(future)
+        finally:
+            state.capacity.release()
+
+    def _flush(self, state: _LoopState):
+        if state.timer is not None:
+            state.timer.cancel()
+            state.timer = None
+        while state.pending:
+            batch, state.pending = state.pending[: self.max_batch_size], state.pending[self.max_batch_size :]
+            task = asyncio.get_running_loop().create_task(self._run_batch(state, batch))
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+
+    async def _run_batch(self, state: _LoopState, batch: List[tuple]):
+        try:
+            async with state.semaphore:
+                results = await self._call_with_backoff([text for _, text, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch returned {len(results)} results for {len(batch)} inputs")
+            for (key, _, future), result in zip(batch, results):
+                self._remember(key, result)
+                if not future.done():
+                    future.set_result(result)
+        except BaseException as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            for key, _, _ in batch:
+                state.inflight.pop(key, None)
+
+    async def _call_with_backoff(self, texts: List[str]) -> List[Any]:
+        attempt = 0
+        while True:
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                self.stats["batches"] += 1
+                results = await self.batch_fn(texts)
+                self._backoff = 0.0
+                return results
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.stats["rate_limited"] += 1
+                self._backoff = min(max(self._backoff * 2, 0.5), self.max_backoff)
+                wait = _retry_after(e) or self._backoff
+                # Every batch waits on the shared gate, so the provider sees a real pause
+                self._resume_at = max(self._resume_at, time.monotonic() + wait)
+                logger.warning(f"LLM provider rate limited, backing off {wait:.1f}s (attempt {attempt})")
+
+    def _remember(self, key: str, value: Any):
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+# ----------------------------------------------------------------------
+# LLM-backed batch functions
+# ----------------------------------------------------------------------
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.S)
+
+
+def parse_json_array(content: str, expected: int) -> Optional[List[Any]]:
+    match = _JSON_ARRAY_RE.search(content or "")
+    if not match:
+        return None
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(items, list) or len(items) != expected:
+        return None
+    return items
+
+
+def resolve_llm_config(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Operator config may name the model inline (model / api_key / base_url); otherwise the active
+    text ``LLMModel`` is read from the database. Returns None when no model is configured.
+    """
+    if config.get("base_url") or config.get("api_key"):
+        return {"model": config.get("model", "gpt-3.5-turbo"), "api_key": config.get("api_key"),
+                "base_url": config.get("base_url")}
+    try:
+        return asyncio.run(_load_active_llm(config.get("llm_model_id")))
+    except Exception as e:
+        logger.warning(f"No LLM model available for Pathway operator: {e}")
+        return None
+
+
+async def _load_active_llm(model_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.core.config import settings
+    from app.models.llm_model import LLMModel
+
+    # The job runs in a forked process: use a private engine instead of the parent's pool
+    db_engine = create_async_engine(settings.database_url, poolclass=NullPool)
+    try:
+        async with db_engine.connect() as conn:
+            stmt = select(LLMModel.__table__)
+            if model_id is not None:
+                stmt = stmt.where(LLMModel.id == model_id)
+            else:
+                stmt = stmt.where(LLMModel.is_active == True, LLMModel.model_type != "embedding").order_by(
+                    LLMModel.updated_at.desc()
+                )
+            row = (await conn.execute(stmt.limit(1))).mappings().first()
+    finally:
+        await db_engine.dispose()
+    if row is None:
+        return None
+    return {"model": row["model_id"], "api_key": row["api_key"] or "dummy", "base_url": row["base_url"]}
+
+
+def make_llm_batch_fn(
+    llm: Dict[str, Any],
+    build_prompt: Callable[[List[str]], str],
+    fallback: Callable[[str], Any],
+    timeout: float = 60.0,
+) -> BatchFn:
+    """
+    One chat completion per batch; the prompt must ask for a JSON array with one item per input.
+    If the reply cannot be parsed, the batch is retried item by item; items that still fail use ``fallback``.
+    """
+    from openai import AsyncOpenAI
+
+    clients: Dict[int, AsyncOpenAI] = {}
+
+    def client() -> AsyncOpenAI:
+        loop_id = id(asyncio.get_running_loop())
+        if loop_id not in clients:
+            # Retries are handled by BatchedCaller so rate limits back off globally
+            clients[loop_id] = AsyncOpenAI(api_key=llm["api_key"], base_url=llm["base_url"], timeout=timeout, max_retries=0)
+        return clients[loop_id]
+
+    async def complete(texts: List[str]) -> Optional[List[Any]]:
+        response = await client().chat.completions.create(
+            model=llm["model"],
+            messages=[{"role": "user", "content": build_prompt(texts)}],
+            temperature=0,
+        )
+        return parse_json_array(response.choices[0].message.content, len(texts))
+
+    async def batch_fn(texts: List[str]) -> List[Any]:
+        items = await complete(texts)
+        if items is not None:
+            return items
+        if len(texts) == 1:
+            return [fallback(texts[0])]
+        singles = await asyncio.gather(*(complete([t]) for t in texts))
+        return [s[0] if s is not None else fallback(t) for s, t in zip(singles, texts)]
+
+    return batch_fn
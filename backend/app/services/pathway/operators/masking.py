@@ -0,0 +1,213 @@
+"""
+Batch PII masking and regex kernels for the cleaning operators.
+
+Every kernel takes a list of column values and returns a list of the same length, so Pathway
+can call it once per chunk of rows (``pw.udf(max_batch_size=...)``) instead of once per row.
+Patterns are compiled once per operator, and duplicate values inside a batch are computed once.
+
+Masking strategies (``method``):
+- ``mask``:    replace the whole value with a constant (default ``***``)
+- ``hash``:    salted keyed BLAKE2b digest (hex, ``hash_length`` chars); equal inputs stay joinable
+- ``partial``: format-preserving masks for phone numbers, emails and Chinese ID numbers found in the text
+- ``regex``:   regex dictionary ``{pattern: replacement}``, applied in a single combined pass
+"""
+import hashlib
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.services.pathway.core.exceptions import OperatorError
+
+BatchFn = Callable[[Sequence[Any]], List[Any]]
+
+# Built-in detectors, usable by name in ``kinds`` (partial) or ``patterns`` (regex)
+BUILTIN_PATTERNS: Dict[str, str] = {
+    "email": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    "id_card": r"(?<!\d)[1-9]\d{5}(?:18|19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\d{3}[\dXx](?!\d)",
+    "phone": r"(?<!\d)(?:\+?86[- ]?)?1[3-9]\d[- ]?\d{4}[- ]?\d{4}(?!\d)|(?<!\d)0\d{2,3}-\d{7,8}(?!\d)",
+    "bank_card": r"(?<!\d)[3-6]\d{15,18}(?!\d)",
+}
+
+_BACKREF_RE = re.compile(r"\\[1-9]")
+
+_ID_WEIGHTS = (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)
+_ID_CHECK = "10X98765432"
+
+
+def valid_id_card(value: str) -> bool:
+    """GB 11643 checksum of an 18-digit resident ID number."""
+    if len(value) != 18 or not value[:17].isdigit():
+        return False
+    total = sum(int(c) * w for c, w in zip(value[:17], _ID_WEIGHTS))
+    return _ID_CHECK[total % 11] == value[17].upper()
+
+
+def _mask_digits(text: str, keep_head: int, keep_tail: int, char: str) -> str:
+    """Mask digits between the first ``keep_head`` and last ``keep_tail`` digits, keeping separators."""
+    positions = [i for i, c in enumerate(text) if c.isdigit() or c in "Xx"]
+    hidden = set(positions[keep_head : len(positions) - keep_tail])
+    return "".join(char if i in hidden else c for i, c in enumerate(text))
+
+
+def mask_phone(value: str, char: str = "*") -> str:
+    digits = sum(c.isdigit() for c in value)
+    # 138****1234; landlines keep area code and last 4
+    if value.startswith("0"):
+        area = value.split("-", 1)[0]
+        return area + "-" + _mask_digits(value[len(area) + 1 :], 0, 4, char)
+    return _mask_digits(value, digits - 8, 4, char)
+
+
+def mask_email(value: str, char: str = "*") -> str:
+    local, _, domain = value.partition("@")
+    return (local[:1] + char * max(len(local) - 1, 3)) + "@" + domain
+
+
+def mask_id_card(value: str, char: str = "*") -> str:
+    return value[:6] + char * 8 + value[-4:]
+
+
+def mask_bank_card(value: str, char: str = "*") -> str:
+    return value[:6] + char * (len(value) - 10) + value[-4:]
+
+
+_PARTIAL_MASKERS: Dict[str, Callable[[str, str], str]] = {
+    "email": mask_email,
+    "id_card": mask_id_card,
+    "phone": mask_phone,
+    "bank_card": mask_bank_card,
+}
+
+
+def _dedup(fn: Callable[[Any], Any]) -> BatchFn:
+    """Lift a per-value function to a batch function that computes each distinct value once."""
+
+    def batch(values: Sequence[Any]) -> List[Any]:
+        memo: Dict[Any, Any] = {}
+        out = []
+        for v in values:
+            if v is None:
+                out.append(None)
+                continue
+            try:
+                r = memo[v]
+            except KeyError:
+                r = memo[v] = fn(v)
+            except TypeError:  # unhashable values (lists, dicts)
+                r = fn(v)
+            out.append(r)
+        return out
+
+    return batch
+
+
+def _combine(named: Dict[str, str]) -> "re.Pattern":
+    # One alternation with a named group per rule: a single scan of each value finds every rule's matches
+    return re.compile("|".join(f"(?P<r{i}>{p})" for i, p in enumerate(named.values())))
+
+
+def build_masker(config: Dict[str, Any]) -> BatchFn:
+    """Build the batch kernel for a ``mask_pii`` operator config."""
+    method = config.get("method", "mask")
+    char = config.get("mask_char", "*")
+
+    if method == "mask":
+        constant = config.get("replacement", "***")
+        return lambda values: [None if v is None else constant for v in values]
+
+    if method == "hash":
+        salt = config.get("salt") or os.environ.get("PII_HASH_SALT")
+        if not salt:
+            raise OperatorError("mask_pii hash method requires a 'salt' (or PII_HASH_SALT)")
+        length = int(config.get("hash_length", 16))
+        key = hashlib.sha256(str(salt).encode("utf-8")).digest()[:32]
+
+        def _hash(v: Any) -> str:
+            return hashlib.blake2b(str(v).encode("utf-8"), key=key, digest_size=32).hexdigest()[:length]
+
+        return _dedup(_hash)
+
+    if method == "partial":
+        kinds = config.get("kinds") or ["id_card", "phone", "email", "bank_card"]
+        unknown = [k for k in kinds if k not in _PARTIAL_MASKERS]
+        if unknown:
+            raise OperatorError(f"Unknown PII kinds: {unknown}")
+        combined = _combine({k: BUILTIN_PATTERNS[k] for k in kinds})
+        maskers = [_PARTIAL_MASKERS[k] for k in kinds]
+        id_slot = kinds.index("id_card") if "id_card" in kinds else -1
+
+        def _replace(m: "re.Match") -> str:
+            slot = int(m.lastgroup[1:])
+            text = m.group(0)
+            if slot == id_slot and not valid_id_card(text):
+                # 18 digits failing the checksum: treat as a generic number (bank card / phone) or leave as is
+                return _mask_digits(text, 6, 4, char) if "bank_card" in kinds else text
+            return maskers[slot](text, char)
+
+        return _dedup(lambda v: combined.sub(_replace, v) if isinstance(v, str) else v)
+
+    if method == "regex":
+        patterns = config.get("patterns") or {}
+        if not patterns:
+            raise OperatorError("mask_pii regex method requires 'patterns'")
+        resolved = {BUILTIN_PATTERNS.get(p, p): repl for p, repl in patterns.items()}
+        return regex_replace_batch(resolved)
+
+    raise OperatorError(f"Unknown mask_pii method: {method}")
+
+
+def regex_replace_batch(patterns: Dict[str, str], flags: int = 0) -> BatchFn:
+    """
+    Regex-dictionary replacement: ``{pattern: replacement}`` applied in one scan per value.
+    Replacements may use ``\\g<0>`` for the matched text. Rules are tried in dictionary order.
+    """
+    try:
+        singles = [re.compile(p, flags) for p in patterns]
+    except re.error as e:
+        raise OperatorError(f"Invalid regex: {e}")
+    replacements = list(patterns.values())
+
+    # Named groups or backreferences would clash / shift inside the combined alternation:
+    # fall back to one pass per rule for such dictionaries
+    if len(singles) == 1 or any("(?P" in p or _BACKREF_RE.search(p) for p in patterns):
+        def _sequential(v: Any) -> Any:
+            if not isinstance(v, str):
+                return v
+            for compiled, repl in zip(singles, replacements):
+                v = compiled.sub(repl, v)
+            return v
+        return _dedup(_sequential)
+
+    combined = re.compile("|".join(f"(?P<r{i}>{p})" for i, p in enumerate(patterns)), flags)
+
+    def _replace(m: "re.Match") -> str:
+        slot = int(m.lastgroup[1:])
+        # Re-match the rule at the same position in the full string (lookarounds keep their context)
+        # and expand its replacement so \1 / \g<name> refer to the rule's own groups
+        return singles[slot].match(m.string, m.start()).expand(replacements[slot])
+
+    return _dedup(lambda v: combined.sub(_replace, v) if isinstance(v, str) else v)
+
+
+def regex_extract_batch(pattern: str, flags: int = 0) -> BatchFn:
+    try:
+        compiled = re.compile(pattern, flags)
+    except re.error as e:
+        raise OperatorError(f"Invalid regex: {e}")
+
+    def _extract(v: Any) -> Optional[str]:
+        if not v:
+            return None
+        m = compiled.search(v)
+        return m.group(0) if m else None
+
+    return _dedup(_extract)
+
+
+def word_filter_batch(words: Sequence[str], replace_char: str = "*") -> BatchFn:
+    """Sensitive-word filter: every word is masked in one scan (longest words win on overlaps)."""
+    words = sorted({w for w in words if w}, key=len, reverse=True)
+    if not words:
+        return lambda values: list(values)
+    compiled = re.compile("|".join(re.escape(w) for w in words))
+    return _dedup(lambda v: compiled.sub(lambda m: replace_char * len(m.group(0)), v) if v else v)
@@ -0,0 +1,81 @@
+"""
+Throughput benchmark for the cleaning kernels (rows/sec per operator).
+
+Run: python -m unittest app.services.pathway.operators.tests.test_cleaning_benchmark -v
+Skipped unless CLEANING_BENCH_MIN_RPS (the rows/sec floor every kernel must sustain) is set, so
+slow CI machines do not fail the default suite. CLEANING_BENCH_ROWS changes the sample size.
+"""
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import random
+import time
+import unittest
+from app.services.pathway.operators.masking import (
+    build_masker,
+    regex_extract_batch,
+    regex_replace_batch,
+    word_filter_batch,
+)
+
+ROWS = int(os.environ.get("CLEANING_BENCH_ROWS", "20000"))
+MIN_RPS = os.environ.get("CLEANING_BENCH_MIN_RPS")
+BATCH_SIZE = 1024
+
+
+def _sample_rows(n: int):
+    rng = random.Random(42)
+    templates = [
+        "客户 {name} 电话 138{d8}，邮箱 {name}@example.com，请尽快回电",
+        "order {d8} shipped to {name}, contact 0755-{d8}",
+        "身份证 110105194912310021 用户反馈：物流太慢了",
+        "plain text without any personal data, just a product review #{d8}",
+    ]
+    rows = []
+    for _ in range(n):
+        t = rng.choice(templates)
+        rows.append(t.format(name=f"user{rng.randint(0, 500)}", d8=f"{rng.randint(0, 99999999):08d}"))
+    return rows
+
+
+KERNELS = {
+    "mask_pii.mask": build_masker({"method": "mask"}),
+    "mask_pii.hash": build_masker({"method": "hash", "salt": "bench"}),
+    "mask_pii.partial": build_masker({"method": "partial"}),
+    "mask_pii.regex": build_masker({"method": "regex", "patterns": {"email": "<EMAIL>", "phone": "<PHONE>", "id_card": "<ID>"}}),
+    "text_process.regex_replace": regex_replace_batch({r"\d{4,}": "<NUM>"}),
+    "text_process.regex_extract": regex_extract_batch(r"[\w.]+@[\w.]+"),
+    "text_process.sensitive_filter": word_filter_batch(["物流", "太慢", "shipped", "review"]),
+}
+
+
+@unittest.skipUnless(MIN_RPS, "set CLEANING_BENCH_MIN_RPS to run the throughput benchmark")
+class TestCleaningThroughput(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rows = _sample_rows(ROWS)
+
+    def test_kernel_throughput(self):
+        report = []
+        for name, kernel in KERNELS.items():
+            start = time.perf_counter()
+            out = []
+            for i in range(0, len(self.rows), BATCH_SIZE):
+                out.extend(kernel(self.rows[i : i + BATCH_SIZE]))
+            elapsed = time.perf_counter() - start
+            self.assertEqual(len(out), len(self.rows))
+            rps = len(self.rows) / elapsed if elapsed else float("inf")
+            report.append((name, rps))
+        width = max(len(n) for n, _ in report)
+        print("\n" + "\n".join(f"{n:<{width}}  {rps:>12,.0f} rows/s" for n, rps in report))
+        for name, rps in report:
+            self.assertGreaterEqual(rps, float(MIN_RPS), f"{name} throughput regressed: {rps:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+from app.services.pathway.operators.llm_batch import BatchedCaller, parse_json_array
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class TestBatchedCaller(unittest.IsolatedAsyncioTestCase):
+
+    async def test_batches_by_size_and_caches_normalized_text(self):
+        calls = []
+
+        async def batch_fn(texts):
+            calls.append(list(texts))
+            return [t.upper() for t in texts]
+
+        caller = BatchedCaller(batch_fn, max_batch_size=3, max_wait_ms=1000)
+        results = await asyncio.gather(*(caller.submit(t) for t in ["a", "b", "c", "d", "e", "f"]))
+        self.assertEqual(results, ["A", "B", "C", "D", "E", "F"])
+        self.assertEqual(calls, [["a", "b", "c"], ["d", "e", "f"]])
+
+        self.assertEqual(await caller.submit("  A "), "A")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(caller.stats["cache_hits"], 1)
+
+    async def test_flushes_after_wait_and_coalesces_duplicates(self):
+        calls = []
+
+        async def batch_fn(texts):
+            calls.append(list(texts))
+            return [len(t) for t in texts]
+
+        caller = BatchedCaller(batch_fn, max_batch_size=100, max_wait_ms=10)
+        results = await asyncio.gather(caller.submit("hello"), caller.submit("Hello"), caller.submit("hi"))
+        self.assertEqual(results, [5, 5, 2])
+        self.assertEqual(calls, [["hello", "hi"]])
+
+    async def test_bounded_concurrency(self):
+        running = peak = 0
+
+        async def batch_fn(texts):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return texts
+
+        caller = BatchedCaller(batch_fn, max_batch_size=1, max_concurrency=2)
+        await asyncio.gather(*(caller.submit(str(i)) for i in range(8)))
+        self.assertEqual(peak, 2)
+
+    async def test_rate_limit_backs_off_and_retries(self):
+        attempts = []
+
+        async def batch_fn(texts):
+            attempts.append(asyncio.get_running_loop().time())
+            if len(attempts) == 1:
+                raise RateLimitError("slow down")
+            return texts
+
+        caller = BatchedCaller(batch_fn, max_batch_size=1)
+        self.assertEqual(await caller.submit("x"), "x")
+        self.assertEqual(caller.stats["rate_limited"], 1)
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.45)
+
+    async def test_errors_reach_every_row_of_the_batch(self):
+        async def batch_fn(texts):
+            raise ValueError("boom")
+
+        caller = BatchedCaller(batch_fn, max_batch_size=2)
+        results = await asyncio.gather(caller.submit("a"), caller.submit("b"), return_exceptions=True)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+
+class TestParseJsonArray(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_json_array('```json\n[{"intent": "a"}, 1]\n```', 2), [{"intent": "a"}, 1])
+        self.assertIsNone(parse_json_array("[1]", 2))
+        self.assertIsNone(parse_json_array("no json", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import unittest
+from app.services.pathway.core.exceptions import OperatorError
+from app.services.pathway.operators.masking import (
+    build_masker,
+    regex_extract_batch,
+    regex_replace_batch,
+    valid_id_card,
+    word_filter_batch,
+)
+
+ID_CARD = "11010519491231002X"
+
+
+class TestMasking(unittest.TestCase):
+
+    def test_constant_mask_keeps_nulls(self):
+        self.assertEqual(build_masker({})(["a", None]), ["***", None])
+
+    def test_salted_hash(self):
+        h1 = build_masker({"method": "hash", "salt": "s1"})
+        h2 = build_masker({"method": "hash", "salt": "s2"})
+        a, b, a2 = h1(["alice", "bob", "alice"])
+        self.assertEqual(a, a2)
+        self.assertNotEqual(a, b)
+        self.assertEqual(len(a), 16)
+        self.assertNotEqual(a, h2(["alice"])[0])
+        with self.assertRaises(OperatorError):
+            build_masker({"method": "hash"})
+
+    def test_partial_masks_preserve_format(self):
+        self.assertTrue(valid_id_card(ID_CARD))
+        mask = build_masker({"method": "partial"})
+        out = mask([
+            "call 13812345678 or +86 139-1234-5678",
+            "mail john.doe@example.com",
+            f"id {ID_CARD}",
+            "office 010-87654321",
+            "card 6222021234567890123",
+        ])
+        self.assertEqual(out[0], "call 138****5678 or +86 139-****-5678")
+        self.assertEqual(out[1], "mail j*******@example.com")
+        self.assertEqual(out[2], "id 110105********002X")
+        self.assertEqual(out[3], "office 010-****4321")
+        self.assertEqual(out[4], "card 622202*********0123")
+
+    def test_regex_dictionary(self):
+        mask = build_masker({"method": "regex", "patterns": {"email": "<EMAIL>", r"\bsecret-(\d+)\b": r"secret-#"}})
+        self.assertEqual(mask(["a@b.io has secret-42"]), ["<EMAIL> has secret-#"])
+        # Backreferences fall back to per-rule passes
+        kernel = regex_replace_batch({r"(\w)\1": r"<\1>", "x": "y"})
+        self.assertEqual(kernel(["aabx"]), ["<a>by"])
+
+    def test_regex_replace_keeps_lookaround_context(self):
+        kernel = regex_replace_batch({r"(?<=@)[a-z]+": "X", r"\d+(?=kg)": "N"})
+        self.assertEqual(kernel(["me@example.com 12kg 34"]), ["me@X.com Nkg 34"])
+        self.assertEqual(regex_replace_batch({r"(?<=@)[a-z]+": "X"})(["me@example.com"]), ["me@X.com"])
+
+    def test_regex_extract_and_word_filter(self):
+        self.assertEqual(regex_extract_batch(r"\d+")(["ab12c", "none", None]), ["12", None, None])
+        self.assertEqual(word_filter_batch(["bad", "badword"])(["a badword here"]), ["a ******* here"])
+
+
+if __name__ == "__main__":
+    unittest.main()
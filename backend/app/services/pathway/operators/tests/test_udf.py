@@ -0,0 +1,70 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import tempfile
+import unittest
+from pathlib import Path
+from app.services.pathway.core.exceptions import OperatorError
+from app.services.pathway.operators.udf import UDFRegistry, _batch_to_row
+
+
+class TestUDFRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.registry = UDFRegistry(self.dir / "cache")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name: str, body: str) -> str:
+        path = self.dir / name
+        path.write_text(body)
+        return str(path)
+
+    def test_isolated_namespaces(self):
+        a = self._write("a.py", "FACTOR = 2\ndef f(x):\n    return x * FACTOR\n")
+        b = self._write("b.py", "FACTOR = 10\ndef f(x):\n    return x * FACTOR\n")
+        fa = self.registry.load(a, "f")
+        fb = self.registry.load(b, "f")
+        self.assertEqual((fa(3), fb(3)), (6, 30))
+        self.assertNotEqual(fa.__module__, fb.__module__)
+
+    def test_content_hash_reuse_and_bytecode_cache(self):
+        body = "CALLS = []\ndef f(x):\n    return x + 1\n"
+        a = self._write("a.py", body)
+        copy = self._write("copy.py", body)
+        self.assertIs(self.registry.load(a, "f"), self.registry.load(copy, "f"))
+        self.assertEqual(self.registry.stats["compiles"], 1)
+        self.assertEqual(len(list((self.dir / "cache").glob("*.pyc"))), 1)
+
+        # A fresh registry (new process) reads the marshalled bytecode instead of compiling
+        fresh = UDFRegistry(self.dir / "cache")
+        self.assertEqual(fresh.load(a, "f")(1), 2)
+        self.assertEqual((fresh.stats["compiles"], fresh.stats["bytecode_hits"]), (0, 1))
+
+        # Editing the file changes the hash
+        Path(a).write_text("def f(x):\n    return x + 2\n")
+        self.assertEqual(self.registry.load(a, "f")(1), 3)
+
+    def test_errors(self):
+        a = self._write("a.py", "VALUE = 1\n")
+        with self.assertRaises(OperatorError):
+            self.registry.load(a, "missing")
+        with self.assertRaises(OperatorError):
+            self.registry.load(a, "VALUE")
+        with self.assertRaises(OperatorError):
+            self.registry.load(str(self.dir / "nope.py"), "f")
+
+    def test_batch_to_row(self):
+        batch = lambda xs, ys: [x + y for x, y in zip(xs, ys)]
+        self.assertEqual(_batch_to_row(batch)(1, 2), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
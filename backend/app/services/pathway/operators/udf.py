@@ -1,30 +1,131 @@
-import importlib.util
+import hashlib
+import marshal
 import os
 import sys
-from typing import Callable, Dict, Any
+import threading
+import types
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, Tuple
 import pathway as pw
 from app.services.pathway.core.exceptions import OperatorError
 from app.services.pathway.operators.registry import OperatorRegistry
+from app.core.logger import logger
 
-def load_udf(file_path: str, function_name: str) -> Callable:
-    """Load a UDF from a python file."""
-    try:
-        spec = importlib.util.spec_from_file_location("udf_module", file_path)
-        if spec is None or spec.loader is None:
-            raise OperatorError(f"Could not load UDF from {file_path}")
-        
-        module = importlib.util.module_from_spec(spec)
-        sys.modules["udf_module"] = module
-        spec.loader.exec_module(module)
-        
-        func = getattr(module, function_name)
+UDF_CACHE_DIR = Path(os.environ.get("PATHWAY_UDF_CACHE_DIR", Path(__file__).resolve().parents[4] / "data" / "udf_cache"))
+
+class UDFRegistry:
+    """
+    UDF modules keyed by the sha256 of the file content.
+
+    - Each distinct file gets its own module namespace (``pathway_udf_<hash>``), so two UDF nodes
+      in one DAG never overwrite each other; identical files share one module.
+    - Compiled code objects are cached in memory and as marshalled bytecode under ``cache_dir``.
+      The engine precompiles a job's UDFs in the API process before forking, so job processes
+      start with warm code objects and only execute the module body.
+    - Editing a file changes its hash, so stale code is never reused.
+    """
+
+    def __init__(self, cache_dir: Path = UDF_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._code: Dict[str, types.CodeType] = {}
+        self._modules: Dict[str, types.ModuleType] = {}
+        self._lock = threading.RLock()
+        self.stats = {"module_hits": 0, "code_hits": 0, "bytecode_hits": 0, "compiles": 0}
+
+    def compile(self, file_path: str) -> Tuple[str, types.CodeType]:
+        """Return (content hash, code object) for a UDF file."""
+        try:
+            source = Path(file_path).read_bytes()
+        except OSError as e:
+            raise OperatorError(f"Could not load UDF from {file_path}: {e}")
+        digest = hashlib.sha256(source).hexdigest()
+
+        with self._lock:
+            code = self._code.get(digest)
+            if code is not None:
+                self.stats["code_hits"] += 1
+                return digest, code
+
+            pyc = self.cache_dir / f"{digest}.{sys.implementation.cache_tag}.pyc"
+            try:
+                code = marshal.loads(pyc.read_bytes())
+                self.stats["bytecode_hits"] += 1
+            except (OSError, EOFError, ValueError, TypeError):
+                code = compile(source, file_path, "exec", dont_inherit=True)
+                self.stats["compiles"] += 1
+                self._write_bytecode(pyc, code)
+            self._code[digest] = code
+            return digest, code
+
+    def _write_bytecode(self, pyc: Path, code: types.CodeType):
+        try:
+            pyc.parent.mkdir(parents=True, exist_ok=True)
+            tmp = pyc.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(marshal.dumps(code))
+            os.replace(tmp, pyc)
+        except OSError as e:
+            logger.warning(f"Could not write UDF bytecode cache {pyc}: {e}")
+
+    def load_module(self, file_path: str) -> types.ModuleType:
+        digest, code = self.compile(file_path)
+        with self._lock:
+            module = self._modules.get(digest)
+            if module is not None:
+                self.stats["module_hits"] += 1
+                return module
+
+            name = f"pathway_udf_{digest[:16]}"
+            module = types.ModuleType(name)
+            module.__file__ = str(file_path)
+            # Registered before exec so dataclasses / pickling inside the module can resolve it
+            sys.modules[name] = module
+            try:
+                exec(code, module.__dict__)
+            except BaseException:
+                sys.modules.pop(name, None)
+                raise
+            self._modules[digest] = module
+            return module
+
+    def load(self, file_path: str, function_name: str) -> Callable:
+        module = self.load_module(file_path)
+        func = getattr(module, function_name, None)
+        if func is None:
+            raise OperatorError(f"{function_name} not found in {file_path}")
         if not callable(func):
             raise OperatorError(f"{function_name} is not callable")
-        
         return func
+
+udf_registry = UDFRegistry()
+
+def load_udf(file_path: str, function_name: str) -> Callable:
+    """Load a UDF from a python file."""
+    try:
+        return udf_registry.load(file_path, function_name)
+    except OperatorError:
+        raise
     except Exception as e:
         raise OperatorError(f"Failed to load UDF: {e}")
 
+def precompile_udfs(operator_configs: Iterable[Dict[str, Any]]) -> int:
+    """Compile the UDF files referenced by a job's operator configs (does not execute them)."""
+    count = 0
+    for config in operator_configs:
+        file_path = (config or {}).get("file_path")
+        if not file_path:
+            continue
+        try:
+            udf_registry.compile(file_path)
+            count += 1
+        except Exception as e:
+            # The job process reports the real error when it loads the UDF
+            logger.warning(f"Could not precompile UDF {file_path}: {e}")
+    return count
+
+def _batch_to_row(func: Callable) -> Callable:
+    """Run a batch UDF (lists in, list out) on a single row."""
+    return lambda *values: func(*[[v] for v in values])[0]
+
 @OperatorRegistry.register("udf")
 def apply_udf(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
     """
@@ -34,7 +135,9 @@ def apply_udf(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
         "function_name": "my_transform",
         "input_columns": ["col1", "col2"],
         "output_column": "new_col",
-        "return_type": "int" 
+        "return_type": "int",
+        "batch": false,          # true: function takes one list per input column, returns a list
+        "max_batch_size": 1024
     }
     """
     file_path = config.get("file_path")
@@ -42,7 +145,7 @@ def apply_udf(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
     input_columns = config.get("input_columns", [])
     output_column = config.get("output_column")
     return_type_str = config.get("return_type", "str")
-    
+
     # Map return type string to Python type
     type_map = {
         "int": int,
@@ -56,15 +159,23 @@ def apply_udf(table: pw.Table, config: Dict[str, Any]) -> pw.Table:
 
     try:
         udf_func = load_udf(file_path, function_name)
-        
+
         # Apply UDF
         # pw.apply takes a function and columns
         # If multiple input columns, need to pass them as args
         args = [table[col] for col in input_columns]
-        
-        # Using pw.apply
-        result_col = pw.apply(udf_func, *args)
-        
+
+        if config.get("batch"):
+            # Vectorized UDF: Pathway passes chunks of rows, amortizing per-call overhead
+            try:
+                batch_udf = pw.udf(udf_func, return_type=return_type, max_batch_size=int(config.get("max_batch_size", 1024)))
+                result_col = batch_udf(*args)
+            except (AttributeError, TypeError):
+                result_col = pw.apply(_batch_to_row(udf_func), *args)
+        else:
+            # Using pw.apply
+            result_col = pw.apply(udf_func, *args)
+
         return table.with_columns(**{output_column: result_col})
     except Exception as e:
         raise OperatorError(f"Failed to apply UDF: {e}")
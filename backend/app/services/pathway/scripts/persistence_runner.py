@@ -103,6 +103,7 @@ def run_persistence_pipeline(config_path: str):
         logger.info("Pipeline stopped by user.")
     finally:
         neo4j_sink.close()
+        lightrag_sink.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Pathway Persistence Runner")
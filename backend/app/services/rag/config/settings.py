@@ -10,6 +10,7 @@ DATA_DIR = BACKEND_DIR / "data"
 LANCEDB_DIR = DATA_DIR / "lancedb"
 LIGHTRAG_DIR = DATA_DIR / "lightrag_store"
 UPLOAD_DIR = DATA_DIR / "temp"
+PARSED_CACHE_DIR = DATA_DIR / "parsed_cache"
 
 # Ensure directories exist
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -27,6 +28,23 @@ class RagSettings(BaseSettings):
     
     # KG Query
     ENABLE_MOCK_KG_FALLBACK: bool = False
+
+    # Per-document lexical (BM25) index cache for QA content search
+    LEXICAL_INDEX_CACHE_SIZE: int = 64
+
+    # Parsed document text cache (in-process tier / local disk tier)
+    PARSED_CACHE_MEMORY_MB: int = 128
+    PARSED_CACHE_DISK_MB: int = 2048
+
+    # Knowledge base rebuild / ingest pipeline
+    INGEST_PARSE_WORKERS: int = 4
+    INGEST_QUEUE_SIZE: int = 16
+    INGEST_BATCH_DOCS: int = 4
+    INGEST_EMBED_BATCH: int = 64
+    INGEST_EMBED_MAX_ASYNC: int = 8
+    INGEST_LLM_MAX_ASYNC: int = 8
+    # 保留的重建检查点最多续跑次数，超过后从头重建
+    INGEST_MAX_RESUMES: int = 3
     
     class Config:
         env_prefix = "RAG_"
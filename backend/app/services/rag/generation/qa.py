@@ -1,3 +1,4 @@
+import io
 import json
 import logging
 import re
@@ -11,8 +12,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.knowledge import KnowledgeChat, KnowledgeDocument
 from app.services.nlu.classifier import IntentClassifier, QueryIntent
+from app.services.rag.config.settings import settings as rag_settings
 from app.services.rag.retrieval.engines.lightrag import lightrag_engine
+from app.services.rag.retrieval.lexical import LexicalIndex, LexicalIndexCache
 from app.services.rag.knowledge.service import UPLOAD_DIR, kb_service
+from app.services.rag.knowledge.text_cache import parsed_text_cache, sha256_bytes
 from app.services.storage.service import storage_service
 from app.services.utils.markdown import to_markdown
 from app.services.rag.utils.common import sse_pack
@@ -28,6 +32,8 @@ class QAService:
     """
 
     _instance = None
+    # 文档级 BM25 索引，按 (doc_id, 内容版本) 缓存，避免每次提问都重新读取和切分文档
+    _lexical_cache = LexicalIndexCache(rag_settings.LEXICAL_INDEX_CACHE_SIZE)
 
     @classmethod
     def get_instance(cls):
@@ -40,7 +46,12 @@ class QAService:
         """
         读取文档内容，支持从本地或 OSS 获取。
         逻辑复用了 kb_service 中的部分代码，进行了简化。
+        解析结果经 parsed_text_cache 缓存：oss_key 别名命中时既不下载也不解析。
         """
+        cached = parsed_text_cache.get_by_alias(doc.oss_key)
+        if cached is not None:
+            return cached
+
         filename = doc.filename or ""
         file_path = UPLOAD_DIR / filename
         raw_data = None
@@ -77,6 +88,14 @@ class QAService:
         if not raw_data:
             return ""
 
+        # 内容寻址：同一份文件（例如经其他 oss_key 上传）只解析一次
+        digest = sha256_bytes(raw_data)
+        cached = parsed_text_cache.get(digest)
+        if cached is not None:
+            if doc.oss_key:
+                parsed_text_cache.add_alias(doc.oss_key, digest)
+            return cached
+
         text = ""
         file_ext = Path(filename).suffix.lower()
 
@@ -84,7 +103,8 @@ class QAService:
             # 3. 根据文件类型解析文本
             if file_ext == ".pdf":
                 pdf_reader = PyPDF2.PdfReader(io.BytesIO(raw_data))
-                text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
+                pages = (page.extract_text() for page in pdf_reader.pages)
+                text = "\n".join(t for t in pages if t)
             else:
                 # 尝试多种编码格式解析文本
                 for encoding in ["utf-8", "gbk", "gb18030", "latin1"]:
@@ -99,7 +119,10 @@ class QAService:
             logger.error(f"读取文档内容出错: {e}")
             return ""
 
-        return to_markdown(text, {"source": "qa_read", "title": Path(filename).stem if filename else ""})
+        markdown = to_markdown(text, {"source": "qa_read", "title": Path(filename).stem if filename else ""})
+        if markdown.strip():
+            parsed_text_cache.put(digest, markdown, aliases=[doc.oss_key])
+        return markdown
 
     async def graph_search(
         self, doc_id: int, query: str, db: AsyncSession, top_k: int = 5, trace_id: Optional[str] = None
@@ -198,31 +221,42 @@ class QAService:
             logger.exception(f"[QA][GRAPH][{trace_id}] graph search error for doc {doc_id}")
             return []
 
+    def _content_version(self, doc: KnowledgeDocument) -> str:
+        """
+        文档内容版本：OSS 对象键在每次上传时唯一；本地文件则使用文件名 + mtime。
+        """
+        if doc.oss_key:
+            return doc.oss_key
+        try:
+            mtime = (UPLOAD_DIR / (doc.filename or "")).stat().st_mtime
+        except OSError:
+            mtime = 0
+        return f"{doc.filename}:{mtime}"
+
+    def build_lexical_index(self, doc_id: int, text: str, version: str) -> LexicalIndex:
+        """构建并缓存文档的词法索引（上传解析完成后调用，可提前预热）。"""
+        index = LexicalIndex(self._chunk_text(text))
+        self._lexical_cache.put(doc_id, version, index)
+        return index
+
+    def _get_lexical_index(self, doc: KnowledgeDocument) -> Optional[LexicalIndex]:
+        def _load() -> Optional[LexicalIndex]:
+            text = self._read_document_content(doc)
+            return LexicalIndex(self._chunk_text(text)) if text else None
+
+        return self._lexical_cache.get_or_build(doc.id, self._content_version(doc), _load)
+
     async def _content_search(self, doc: KnowledgeDocument, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        text = self._read_document_content(doc)
-        if not text or not (query or "").strip():
+        q = (query or "").strip()
+        if not q:
             return []
-        chunks = self._chunk_text(text)
-        if not chunks:
+        import asyncio
+
+        index = await asyncio.to_thread(self._get_lexical_index, doc)
+        if not index:
             return []
-        q = (query or "").strip()
-        results: List[Dict[str, Any]] = []
-        for c in chunks:
-            s = 0.0
-            if q in c:
-                s += 10.0
-            try:
-                # 简单覆盖度估计：查询字符是否出现在片段中
-                overlap = sum(1 for ch in set(q) if ch in c)
-                if overlap:
-                    s += min(5.0, float(overlap))
-            except Exception:
-                pass
-            if s > 0.0:
-                results.append({"content": c[:400], "score": s})
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:top_k]
-    
+        return [{"content": index.chunks[i][:400], "score": score} for i, score in index.search(q, top_k)]
+
     def _chunk_text(self, text: str, chunk_size=400) -> List[str]:
         return chunk_text(text, chunk_size)
 
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.services.rag.knowledge.parser import parse_local_file
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestJob:
+    """待入库的单个文档。source_path 为空且 text 已给出时跳过解析阶段。"""
+
+    doc_id: int
+    description: str
+    source_path: Optional[str] = None
+    cache_key: Optional[str] = None
+    text: Optional[str] = None
+    cleanup: bool = False
+
+
+@dataclass
+class IngestProgress:
+    total: int = 0
+    skipped: int = 0
+    parsed: int = 0
+    inserted: int = 0
+    failed: int = 0
+    running: bool = False
+    started_at: float = 0.0
+    finished_at: Optional[float] = None
+    failed_ids: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "total": self.total,
+            "skipped": self.skipped,
+            "parsed": self.parsed,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "running": self.running,
+            "elapsed": round(elapsed, 1),
+            "failed_ids": list(self.failed_ids),
+        }
+
+
+class IngestCheckpoint:
+    """
+    重建进度检查点：记录已完成入库的文档 ID。
+
+    文件保存在向量存储目录之外（清库不会删除它），按运行签名区分不同的重建请求；
+    正常结束后删除，中断后再次调用同签名的重建即可从上次完成的位置继续。
+    ``resumes`` 记录检查点已被续跑的次数，超过上限后不再续跑，避免失败文档导致每次重建都停在旧进度上。
+    """
+
+    def __init__(self, path: Path, signature: str):
+        self.path = Path(path)
+        self.signature = signature
+        self.done: Set[int] = set()
+        self.resumed = False
+        self.resumes = 0
+
+    @staticmethod
+    def make_signature(**params: Any) -> str:
+        raw = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def load(self, max_resumes: Optional[int] = None) -> bool:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"[Ingest] Ignoring unreadable checkpoint {self.path}: {e}")
+            return False
+        if data.get("signature") != self.signature:
+            return False
+        resumes = int(data.get("resumes") or 0)
+        if max_resumes is not None and resumes >= max_resumes:
+            logger.warning(f"[Ingest] Checkpoint {self.path} already resumed {resumes} time(s), starting over")
+            return False
+        self.done = {int(x) for x in data.get("done") or []}
+        self.resumed = True
+        self.resumes = resumes + 1
+        return True
+
+    def mark_done(self, doc_ids: Iterable[int]) -> None:
+        self.done.update(int(x) for x in doc_ids)
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({
+                "signature": self.signature,
+                "done": sorted(self.done),
+                "resumes": self.resumes,
+                "updated_at": time.time(),
+            }),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _parse_job(source_path: str, cache_key: Optional[str]) -> str:
+    # 运行在解析进程池中，必须是模块级函数以便 pickle
+    return parse_local_file(source_path, cache_key=cache_key)
+
+
+def _make_parse_executor(workers: int) -> Executor:
+    try:
+        # spawn 避免在已有事件循环/线程的进程中 fork
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    except Exception as e:
+        logger.warning(f"[Ingest] Process pool unavailable, parsing in threads: {e}")
+        return ThreadPoolExecutor(max_workers=workers)
+
+
+class IngestPipeline:
+    """
+    分阶段的文档入库流水线，阶段之间用有界队列衔接：
+
+    1. prepare：下载/定位源文件（线程中执行），命中解析缓存时直接带文本进入下一阶段；
+    2. parse：在进程池中并行解析；
+    3. insert：按批把多篇文档一次交给 ``insert_batch``（LightRAG 在一次 ainsert 中批量嵌入、
+       按 llm_model_max_async 并发抽取实体），完成后写检查点。
+    """
+
+    def __init__(
+        self,
+        insert_batch: Callable[[List[IngestJob]], Awaitable[None]],
+        parse_workers: int = 4,
+        queue_size: int = 16,
+        batch_docs: int = 4,
+        executor: Optional[Executor] = None,
+    ):
+        self.insert_batch = insert_batch
+        self.parse_workers = max(1, parse_workers)
+        self.queue_size = max(1, queue_size)
+        self.batch_docs = max(1, batch_docs)
+        self._executor = executor
+        self.progress = IngestProgress()
+
+    async def run(
+        self,
+        jobs: List[IngestJob],
+        prepare: Callable[[IngestJob], IngestJob],
+        checkpoint: Optional[IngestCheckpoint] = None,
+    ) -> IngestProgress:
+        done = checkpoint.done if checkpoint else set()
+        pending = [j for j in jobs if j.doc_id not in done]
+        self.progress = IngestProgress(
+            total=len(jobs), skipped=len(jobs) - len(pending), running=True, started_at=time.time()
+        )
+        if checkpoint and checkpoint.resumed:
+            logger.info(f"[Ingest] Resuming: {self.progress.skipped}/{len(jobs)} documents already done")
+
+        parse_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        insert_q: asyncio.Queue = asyncio.Queue(self.queue_size)
+        own_executor = self._executor is None
+        executor = self._executor or _make_parse_executor(self.parse_workers)
+        loop = asyncio.get_running_loop()
+
+        async def produce():
+            for job in pending:
+                try:
+                    job = await asyncio.to_thread(prepare, job)
+                except Exception as e:
+                    self._fail(job, f"prepare failed: {e}")
+                    continue
+                await parse_q.put(job)
+            for _ in range(self.parse_workers):
+                await parse_q.put(None)
+
+        async def parse_worker():
+            while True:
+                job = await parse_q.get()
+                if job is None:
+                    break
+                try:
+                    if job.text is None and job.source_path:
+                        job.text = await loop.run_in_executor(executor, _parse_job, job.source_path, job.cache_key)
+                except Exception as e:
+                    logger.warning(f"[Ingest] Parse failed for doc#{job.doc_id}: {e}")
+                finally:
+                    self._cleanup(job)
+                if not job.text:
+                    self._fail(job, "text extraction failed or empty")
+                    continue
+                self.progress.parsed += 1
+                await insert_q.put(job)
+
+        async def parse_stage():
+            await asyncio.gather(*(parse_worker() for _ in range(self.parse_workers)))
+            await insert_q.put(None)
+
+        async def insert_stage():
+            finished = False
+            while not finished:
+                job = await insert_q.get()
+                if job is None:
+                    break
+                batch = [job]
+                while len(batch) < self.batch_docs:
+                    try:
+                        nxt = insert_q.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if nxt is None:
+                        finished = True
+                        break
+                    batch.append(nxt)
+                await self._insert(batch, checkpoint)
+
+        try:
+            await asyncio.gather(produce(), parse_stage(), insert_stage())
+        finally:
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            self.progress.running = False
+            self.progress.finished_at = time.time()
+        return self.progress
+
+    async def _insert(self, batch: List[IngestJob], checkpoint: Optional[IngestCheckpoint]):
+        try:
+            await self.insert_batch(batch)
+        except Exception as e:
+            for job in batch:
+                self._fail(job, f"insert failed: {e}")
+            return
+        self.progress.inserted += len(batch)
+        if checkpoint:
+            checkpoint.mark_done(j.doc_id for j in batch)
+        p = self.progress
+        logger.info(
+            f"[Ingest] {p.inserted + p.skipped}/{p.total} documents indexed "
+            f"({p.failed} failed, {time.time() - p.started_at:.0f}s elapsed)"
+        )
+        for job in batch:
+            job.text = None
+
+    def _fail(self, job: IngestJob, reason: str):
+        self.progress.failed += 1
+        self.progress.failed_ids.append(job.doc_id)
+        logger.error(f"[Ingest] doc#{job.doc_id} ({job.description}): {reason}")
+        self._cleanup(job)
+
+    @staticmethod
+    def _cleanup(job: IngestJob):
+        if job.cleanup and job.source_path and os.path.exists(job.source_path):
+            try:
+                os.remove(job.source_path)
+            except Exception:
+                pass
+        job.cleanup = False
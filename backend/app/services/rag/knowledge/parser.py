@@ -1,7 +1,8 @@
+import codecs
 import io
 import logging
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 import docx
 import pypdf
@@ -9,6 +10,8 @@ from fastapi import HTTPException, UploadFile
 from PIL import Image
 
 from app.core.config import settings
+from app.services.rag.knowledge.text_cache import parsed_text_cache, sha256_file
+from app.services.rag.utils.chunking import iter_chunks, iter_paragraphs
 from app.services.utils.markdown import to_markdown
 
 logger = logging.getLogger(__name__)
@@ -38,19 +41,80 @@ def is_text_valid(text: str) -> bool:
     return True
 
 
-def parse_local_file(file_path: str) -> str:
+def parse_local_file(file_path: str, cache_key: Optional[str] = None) -> str:
     """
     Parse a local file and return text content.
     Wrapper around parse_local_file_chunks for backward compatibility.
+
+    解析结果按文件内容 sha256 写入 parsed_text_cache；传入 cache_key（如 oss_key）时同时登记别名，
+    之后 QA 等读取方可直接命中缓存，无需下载和重新解析。
     """
+    digest = None
+    try:
+        digest = sha256_file(file_path)
+        cached = parsed_text_cache.get(digest)
+        if cached is not None:
+            if cache_key:
+                parsed_text_cache.add_alias(cache_key, digest)
+            return cached
+    except Exception as e:
+        logger.debug(f"Parsed text cache lookup failed for {file_path}: {e}")
+
     chunks = parse_local_file_chunks(file_path)
     full_text = "\n".join([c.get("text", "") for c in chunks])
     
     # Add markdown formatting if needed (compatibility)
     filename = os.path.basename(file_path).lower()
     full_text = to_markdown(full_text, {"source": "local", "title": os.path.splitext(os.path.basename(file_path))[0]})
+
+    if digest and full_text.strip():
+        parsed_text_cache.put(digest, full_text, aliases=[cache_key])
     return full_text
 
+_PAGED_EXTS = (".pdf", ".docx")
+
+
+def _sniff_text_encoding(file_path: str, probe_size: int = 64 * 1024) -> str:
+    with open(file_path, "rb") as f:
+        head = f.read(probe_size)
+    for enc in ("utf-8", "gbk"):
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "utf-8"
+
+
+def iter_local_file_chunks(
+    file_path: str, chunk_size: int = None, overlap: int = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    流式解析并切分本地文件，逐个产出 {"page": n, "text": chunk}。
+    纯文本文件按行读取、按段落送入切分器，不会把整个文件读入内存；
+    PDF / DOCX 先按页解析，再逐页切分。
+    """
+    filename = os.path.basename(file_path).lower()
+    if filename.endswith(_PAGED_EXTS):
+        for p in parse_local_file_chunks(file_path):
+            text = p.get("text", "")
+            if not text:
+                continue
+            paras = [x.strip() for x in text.split("\n\n") if x.strip()] or [text]
+            for chunk in iter_chunks(paras, chunk_size, overlap):
+                yield {"page": p.get("page"), "text": chunk}
+        return
+
+    try:
+        enc = _sniff_text_encoding(file_path)
+        with open(file_path, "r", encoding=enc, errors="ignore") as f:
+            paras = (sanitize_text(p) for p in iter_paragraphs(f))
+            for chunk in iter_chunks(paras, chunk_size, overlap):
+                yield {"page": 1, "text": chunk}
+    except Exception as e:
+        logger.error(f"Error streaming local file {file_path}: {e}")
+
+
 def parse_local_file_chunks(file_path: str) -> List[Dict[str, Any]]:
     """
     Parse a local file and return a list of page/chunk dictionaries.
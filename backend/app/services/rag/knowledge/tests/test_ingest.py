@@ -0,0 +1,103 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from app.services.rag.knowledge.ingest import IngestCheckpoint, IngestJob, IngestPipeline
+from app.services.rag.knowledge.text_cache import parsed_text_cache
+
+
+class TestIngestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        # Parsed files go to the shared parse cache: keep it inside the temp dir
+        for attr, value in (("root", self.root / "parsed_cache"), ("_disk_used", None)):
+            patcher = mock.patch.object(parsed_text_cache, attr, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.tmp.cleanup()
+
+    def _jobs(self, n):
+        jobs = []
+        for i in range(n):
+            if i % 2:
+                jobs.append(IngestJob(doc_id=i, description=f"doc#{i}:t.txt", text=f"text {i}"))
+            else:
+                path = self.root / f"{i}.txt"
+                path.write_text(f"file {i}", encoding="utf-8")
+                jobs.append(IngestJob(doc_id=i, description=f"doc#{i}:{i}.txt", source_path=str(path)))
+        return jobs
+
+    def _run(self, jobs, checkpoint, fail_on=None):
+        batches = []
+
+        async def insert(batch):
+            if fail_on is not None and any(j.doc_id == fail_on for j in batch):
+                raise RuntimeError("boom")
+            batches.append([(j.doc_id, j.text) for j in batch])
+
+        pipeline = IngestPipeline(insert, parse_workers=2, queue_size=2, batch_docs=3, executor=self.executor)
+        progress = asyncio.run(pipeline.run(jobs, lambda j: j, checkpoint))
+        return progress, batches
+
+    def test_all_documents_inserted_in_batches(self):
+        cp = IngestCheckpoint(self.root / "cp.json", "sig")
+        progress, batches = self._run(self._jobs(7), cp)
+        inserted = dict(x for b in batches for x in b)
+        self.assertEqual(sorted(inserted), list(range(7)))
+        self.assertTrue(all(len(b) <= 3 for b in batches))
+        self.assertIn("file 0", inserted[0])
+        self.assertEqual(inserted[1], "text 1")
+        self.assertEqual(progress.inserted, 7)
+        self.assertEqual(progress.failed, 0)
+
+    def test_resume_skips_completed(self):
+        cp = IngestCheckpoint(self.root / "cp.json", "sig")
+        progress, _ = self._run(self._jobs(4), cp, fail_on=3)
+        self.assertEqual(progress.failed_ids and progress.failed_ids[-1], 3)
+
+        resumed = IngestCheckpoint(self.root / "cp.json", "sig")
+        self.assertTrue(resumed.load())
+        progress, batches = self._run(self._jobs(4), resumed)
+        done_now = sorted(x[0] for b in batches for x in b)
+        self.assertIn(3, done_now)
+        self.assertEqual(progress.skipped + progress.inserted, 4)
+        self.assertEqual(len(done_now), progress.inserted)
+
+        other = IngestCheckpoint(self.root / "cp.json", "other")
+        self.assertFalse(other.load())
+
+    def test_resume_limit(self):
+        cp = IngestCheckpoint(self.root / "cp.json", "sig")
+        cp.mark_done([1])
+        for _ in range(2):
+            again = IngestCheckpoint(self.root / "cp.json", "sig")
+            self.assertTrue(again.load(max_resumes=2))
+            again.save()
+        self.assertEqual(again.done, {1})
+        self.assertFalse(IngestCheckpoint(self.root / "cp.json", "sig").load(max_resumes=2))
+
+    def test_empty_text_counts_as_failure(self):
+        jobs = [IngestJob(doc_id=1, description="doc#1:x", text="")]
+        progress, batches = self._run(jobs, None)
+        self.assertEqual(batches, [])
+        self.assertEqual(progress.failed, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.services.rag.knowledge.text_cache import ParsedTextCache, sha256_bytes
+
+
+class TestParsedTextCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_get_and_alias(self):
+        cache = ParsedTextCache(self.root, memory_bytes=1024, disk_bytes=1 << 20)
+        digest = sha256_bytes(b"raw pdf bytes")
+        cache.put(digest, "# 标题\n正文", aliases=["knowledge/a.pdf"])
+
+        self.assertEqual(cache.get(digest), "# 标题\n正文")
+        self.assertEqual(cache.get_by_alias("knowledge/a.pdf"), "# 标题\n正文")
+        self.assertIsNone(cache.get_by_alias("knowledge/missing.pdf"))
+
+        # 新进程（空内存层）从磁盘层读取
+        fresh = ParsedTextCache(self.root, memory_bytes=1024, disk_bytes=1 << 20)
+        self.assertEqual(fresh.get_by_alias("knowledge/a.pdf"), "# 标题\n正文")
+
+    def test_memory_tier_bounded(self):
+        cache = ParsedTextCache(self.root, memory_bytes=10, disk_bytes=1 << 20)
+        cache.put("a" * 64, "123456")
+        cache.put("b" * 64, "789012")
+        self.assertLessEqual(cache._memory_used, 10)
+        self.assertNotIn("a" * 64, cache._memory)
+        # 内存淘汰后仍可从磁盘取回
+        self.assertEqual(cache.get("a" * 64), "123456")
+
+    def test_disk_tier_evicts_oldest(self):
+        cache = ParsedTextCache(self.root, memory_bytes=0, disk_bytes=25)
+        for i, d in enumerate(["a", "b", "c"]):
+            path = cache._text_path(d * 64)
+            cache.put(d * 64, "x" * 10)
+            os.utime(path, (1000 + i, 1000 + i))
+        cache.put("d" * 64, "x" * 10)
+        self.assertIsNone(cache.get("a" * 64))
+        self.assertEqual(cache.get("d" * 64), "x" * 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.services.rag.config.settings import settings, PARSED_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(file_path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ParsedTextCache:
+    """
+    文档解析结果（markdown 文本）的内容寻址缓存。
+
+    - 主键为原始文件字节的 sha256，相同内容只解析一次；
+    - 别名（如 oss_key）指向 sha256，命中别名时无需下载原文件；
+    - 进程内 LRU 层 + 本地磁盘层，两层均按字节数限制容量，磁盘层按 mtime 近似 LRU 淘汰。
+    """
+
+    def __init__(self, root: Path, memory_bytes: int, disk_bytes: int):
+        self.root = Path(root)
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_sizes: dict = {}
+        self._memory_used = 0
+        self._disk_used: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _text_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.md"
+
+    def _alias_path(self, alias: str) -> Path:
+        return self.root / "alias" / sha256_bytes(alias.encode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def get(self, digest: Optional[str]) -> Optional[str]:
+        if not digest:
+            return None
+        with self._lock:
+            text = self._memory.get(digest)
+            if text is not None:
+                self._memory.move_to_end(digest)
+                return text
+
+        path = self._text_path(digest)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read parsed text cache {path}: {e}")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._remember(digest, text, len(text.encode("utf-8")))
+        return text
+
+    def resolve_alias(self, alias: Optional[str]) -> Optional[str]:
+        if not alias:
+            return None
+        try:
+            return self._alias_path(alias).read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+        except Exception:
+            return None
+
+    def get_by_alias(self, alias: Optional[str]) -> Optional[str]:
+        return self.get(self.resolve_alias(alias))
+
+    # ------------------------------------------------------------------
+    # Store
+    # ------------------------------------------------------------------
+    def put(self, digest: str, text: str, aliases: Iterable[Optional[str]] = ()) -> None:
+        if not digest or text is None:
+            return
+        data = text.encode("utf-8")
+        path = self._text_path(digest)
+        try:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+                self._account_disk(len(data))
+            for alias in aliases:
+                if alias:
+                    self.add_alias(alias, digest)
+        except Exception as e:
+            logger.warning(f"Failed to write parsed text cache {path}: {e}")
+        self._remember(digest, text, len(data))
+
+    def add_alias(self, alias: str, digest: str) -> None:
+        path = self._alias_path(alias)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(digest, encoding="utf-8")
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"Failed to write parsed text cache alias {path}: {e}")
+
+    def _remember(self, digest: str, text: str, size: int) -> None:
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            if digest in self._memory:
+                self._memory.move_to_end(digest)
+                return
+            self._memory[digest] = text
+            self._memory_sizes[digest] = size
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes and self._memory:
+                old, _ = self._memory.popitem(last=False)
+                self._memory_used -= self._memory_sizes.pop(old, 0)
+
+    # ------------------------------------------------------------------
+    # Disk bound
+    # ------------------------------------------------------------------
+    def _scan_disk(self):
+        files = []
+        for sub in self.root.iterdir() if self.root.exists() else ():
+            if not sub.is_dir() or sub.name == "alias":
+                continue
+            for f in sub.glob("*.md"):
+                try:
+                    st = f.stat()
+                    files.append((st.st_mtime, st.st_size, f))
+                except OSError:
+                    pass
+        return files
+
+    def _account_disk(self, added: int) -> None:
+        with self._lock:
+            if self._disk_used is None:
+                self._disk_used = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_used += added
+            if self._disk_used <= self.disk_bytes:
+                return
+            # 超出上限时按 mtime 淘汰到上限的 90%
+            files = sorted(self._scan_disk(), key=lambda x: x[0])
+            used = sum(size for _, size, _ in files)
+            target = int(self.disk_bytes * 0.9)
+            for _, size, f in files:
+                if used <= target:
+                    break
+                try:
+                    f.unlink()
+                    used -= size
+                except OSError:
+                    pass
+            self._disk_used = used
+
+
+parsed_text_cache = ParsedTextCache(
+    PARSED_CACHE_DIR,
+    memory_bytes=settings.PARSED_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_bytes=settings.PARSED_CACHE_DISK_MB * 1024 * 1024,
+)
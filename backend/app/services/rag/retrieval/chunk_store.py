@@ -0,0 +1,489 @@
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_DOC_MARKER_RE = re.compile(r"doc#(\d+):")
+
+
+def parse_doc_id(file_path: Optional[str]) -> Optional[int]:
+    """从 LightRAG file_path（格式 ``doc#123:filename``）中解析文档 ID。"""
+    if not file_path:
+        return None
+    m = _DOC_MARKER_RE.search(file_path)
+    return int(m.group(1)) if m else None
+
+
+class ChunkStore:
+    """
+    LightRAG 文本块的紧凑磁盘存储。
+
+    - chunks.blob: 所有 chunk 文本按 UTF-8 连续追加，只读 mmap 映射，多个 worker 共享页缓存；
+    - chunks.vec:  chunk 向量（float32 行存储），同样 mmap 映射，用于按文档预过滤的向量检索；
+    - chunks.idx:  首行为代号头，其后每行一条 JSON 记录，只追加：
+        ``[chunk_id, offset, length, file_path]`` 文本记录，
+        ``["#vec", chunk_id, row, dim]`` 向量记录，
+        ``["#del", chunk_id]`` 删除标记；
+    - chunks.meta: 记录最近一次与 kv_store_text_chunks.json 对齐时的 mtime。
+
+    进程内只保留 chunk_id -> (offset, length, file_path) 索引、doc_id -> chunk_id 倒排索引
+    以及 chunk_id -> 向量行号，文本与向量按需从 mmap 读取。
+    写入通过文件锁串行化，读取方按索引文件的增量尾部刷新，无需整文件重新解析。
+    """
+
+    INDEX_FILE = "chunks.idx"
+    BLOB_FILE = "chunks.blob"
+    VEC_FILE = "chunks.vec"
+    META_FILE = "chunks.meta"
+    LOCK_FILE = "chunks.lock"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int, str]] = {}
+        self._doc_index: Dict[int, Dict[str, None]] = {}
+        self._vec_rows: Dict[str, int] = {}
+        self._vec_dim: Optional[int] = None
+        self._index_pos = 0
+        self._generation: Optional[bytes] = None
+        self._blob_file = None
+        self._blob_map: Optional[mmap.mmap] = None
+        self._vec_file = None
+        self._vec_map: Optional[mmap.mmap] = None
+        self._lock_depth = 0
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / self.INDEX_FILE
+
+    @property
+    def blob_path(self) -> Path:
+        return self.root / self.BLOB_FILE
+
+    @property
+    def vec_path(self) -> Path:
+        return self.root / self.VEC_FILE
+
+    @property
+    def meta_path(self) -> Path:
+        return self.root / self.META_FILE
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._index
+
+    def ids(self) -> Iterator[str]:
+        return iter(list(self._index.keys()))
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+    def refresh(self) -> int:
+        """
+        读取索引文件新增的尾部记录，返回新增条数。
+        索引文件被替换或截断（例如重建知识库）时自动重置。
+        """
+        with self._lock:
+            try:
+                f = open(self.index_path, "rb")
+            except FileNotFoundError:
+                if self._index or self._generation is not None:
+                    self._reset_locked()
+                return 0
+
+            with f:
+                # 首行记录代号，文件被清空重建后代号变化（inode 可能被复用，不能依赖 inode 判断）
+                header = f.readline()
+                if not header.endswith(b"\n"):
+                    return 0
+                size = os.fstat(f.fileno()).st_size
+                if header != self._generation or size < self._index_pos:
+                    self._reset_locked()
+                    self._generation = header
+                    self._index_pos = len(header)
+                if size == self._index_pos:
+                    return 0
+                f.seek(self._index_pos)
+                data = f.read(size - self._index_pos)
+
+            # 只消费完整的行，半行留给下次刷新
+            end = data.rfind(b"\n")
+            if end < 0:
+                return 0
+            added = 0
+            for line in data[: end + 1].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    added += self._apply_record(json.loads(line))
+                except Exception:
+                    logger.warning(f"Skip malformed chunk index record: {line[:80]!r}")
+            self._index_pos += end + 1
+            return added
+
+    def _apply_record(self, rec: List[Any]) -> int:
+        tag = rec[0]
+        if tag == "#vec":
+            _, cid, row, dim = rec
+            if cid in self._index:
+                self._vec_rows[cid] = int(row)
+                self._vec_dim = int(dim)
+            return 0
+        if tag == "#del":
+            cid = rec[1]
+            entry = self._index.pop(cid, None)
+            self._vec_rows.pop(cid, None)
+            if entry is not None:
+                doc_id = parse_doc_id(entry[2])
+                if doc_id is not None:
+                    members = self._doc_index.get(doc_id)
+                    if members is not None:
+                        members.pop(cid, None)
+                        if not members:
+                            self._doc_index.pop(doc_id, None)
+            return 0
+        cid, offset, length, file_path = rec
+        self._index[cid] = (int(offset), int(length), sys.intern(file_path or ""))
+        doc_id = parse_doc_id(file_path)
+        if doc_id is not None:
+            self._doc_index.setdefault(doc_id, {})[cid] = None
+        return 1
+
+    def get_text(self, chunk_id: str) -> Optional[str]:
+        entry = self._index.get(chunk_id)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        with self._lock:
+            buf = self._ensure_mapped(offset + length)
+            if buf is None:
+                return None
+            return buf[offset : offset + length].decode("utf-8", errors="ignore")
+
+    def get_file_path(self, chunk_id: str) -> Optional[str]:
+        entry = self._index.get(chunk_id)
+        return entry[2] if entry else None
+
+    def doc_chunk_ids(self, doc_id: int) -> List[str]:
+        """倒排索引：返回指定文档的全部 chunk_id。"""
+        return list(self._doc_index.get(int(doc_id), ()))
+
+    def get_vectors(self, chunk_ids: Sequence[str]) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        返回 (有向量的 chunk_id 列表, 对应的 float32 矩阵)。
+        只拷贝被请求的行，代价与请求的 chunk 数成正比。
+        """
+        with self._lock:
+            ids = [cid for cid in chunk_ids if cid in self._vec_rows]
+            if not ids or not self._vec_dim:
+                return [], None
+            rows = np.fromiter((self._vec_rows[cid] for cid in ids), dtype=np.int64, count=len(ids))
+            row_bytes = self._vec_dim * 4
+            buf = self._ensure_vec_mapped((int(rows.max()) + 1) * row_bytes)
+            if buf is None:
+                return [], None
+            matrix = np.frombuffer(buf, dtype=np.float32, count=len(buf) // row_bytes * self._vec_dim)
+            return ids, matrix.reshape(-1, self._vec_dim)[rows]
+
+    def _ensure_vec_mapped(self, upto: int) -> Optional[mmap.mmap]:
+        if self._vec_map is not None and len(self._vec_map) >= upto:
+            return self._vec_map
+        self._close_vec()
+        try:
+            fh = open(self.vec_path, "rb")
+        except FileNotFoundError:
+            return None
+        size = os.fstat(fh.fileno()).st_size
+        if size < upto or size == 0:
+            fh.close()
+            return None
+        self._vec_file = fh
+        self._vec_map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._vec_map
+
+    def _ensure_mapped(self, upto: int) -> Optional[mmap.mmap]:
+        if self._blob_map is not None and len(self._blob_map) >= upto:
+            return self._blob_map
+        self._close_blob()
+        try:
+            fh = open(self.blob_path, "rb")
+        except FileNotFoundError:
+            return None
+        st = os.fstat(fh.fileno())
+        if st.st_size < upto or st.st_size == 0:
+            fh.close()
+            return None
+        self._blob_file = fh
+        self._blob_map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._blob_map
+
+    def _close_blob(self):
+        if self._blob_map is not None:
+            try:
+                self._blob_map.close()
+            except Exception:
+                pass
+        if self._blob_file is not None:
+            try:
+                self._blob_file.close()
+            except Exception:
+                pass
+        self._blob_map = None
+        self._blob_file = None
+
+    def _close_vec(self):
+        if self._vec_map is not None:
+            try:
+                self._vec_map.close()
+            except Exception:
+                # numpy 视图仍引用映射时无法关闭，交给 GC 处理
+                pass
+        if self._vec_file is not None:
+            try:
+                self._vec_file.close()
+            except Exception:
+                pass
+        self._vec_map = None
+        self._vec_file = None
+
+    def _reset_locked(self):
+        self._close_blob()
+        self._close_vec()
+        self._index = {}
+        self._doc_index = {}
+        self._vec_rows = {}
+        self._vec_dim = None
+        self._index_pos = 0
+        self._generation = None
+
+    def reset(self):
+        """丢弃进程内的索引与映射（磁盘文件由调用方负责清理）。"""
+        with self._lock:
+            self._reset_locked()
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        # 线程锁可重入；flock 只在最外层获取，避免同进程内重复加锁导致自锁
+        with self._lock:
+            if self._lock_depth > 0:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(self.root / self.LOCK_FILE, "a+b") as lf:
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+                self._lock_depth = 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth = 0
+                    if fcntl is not None:
+                        fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+    def _append_index_lines(self, lines: List[str]):
+        with open(self.index_path, "ab") as f:
+            if f.tell() == 0:
+                f.write((json.dumps(["#gen", uuid.uuid4().hex]) + "\n").encode("utf-8"))
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _append_vectors_locked(self, pairs: Sequence[Tuple[str, Any]]) -> List[str]:
+        """写入向量文件并返回对应的 #vec 索引行（调用方持有文件锁）。"""
+        if not pairs:
+            return []
+        matrix = np.asarray([v for _, v in pairs], dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] == 0:
+            return []
+        dim = int(matrix.shape[1])
+        if self._vec_dim and dim != self._vec_dim:
+            logger.warning(f"Chunk vector dim mismatch ({dim} != {self._vec_dim}), skip {len(pairs)} vectors")
+            return []
+        lines = []
+        with open(self.vec_path, "ab") as vf:
+            vf.seek(0, os.SEEK_END)
+            row = vf.tell() // (dim * 4)
+            vf.write(matrix.tobytes())
+            vf.flush()
+            os.fsync(vf.fileno())
+        for cid, _ in pairs:
+            lines.append(json.dumps(["#vec", cid, row, dim], ensure_ascii=False))
+            row += 1
+        return lines
+
+    def append(self, records: Iterable[Tuple[Any, ...]]) -> int:
+        """
+        追加 (chunk_id, content, file_path[, vector]) 记录，已存在的 chunk_id 会被跳过。
+        先写文本 blob / 向量再写索引行，保证读取方看到的索引条目总是指向完整数据。
+        """
+        with self._file_lock():
+            self.refresh()
+            pending = []
+            seen = set()
+            for rec in records:
+                cid, content, file_path = rec[0], rec[1], rec[2]
+                vector = rec[3] if len(rec) > 3 else None
+                if not cid or content is None or cid in self._index or cid in seen:
+                    continue
+                seen.add(cid)
+                pending.append((cid, content, file_path or "", vector))
+            if not pending:
+                return 0
+
+            lines = []
+            with open(self.blob_path, "ab") as bf:
+                bf.seek(0, os.SEEK_END)
+                offset = bf.tell()
+                for cid, content, file_path, _ in pending:
+                    data = content.encode("utf-8", errors="ignore")
+                    bf.write(data)
+                    lines.append(json.dumps([cid, offset, len(data), file_path], ensure_ascii=False))
+                    offset += len(data)
+                bf.flush()
+                os.fsync(bf.fileno())
+
+            lines.extend(self._append_vectors_locked([(cid, v) for cid, _, _, v in pending if v is not None]))
+            self._append_index_lines(lines)
+            self.refresh()
+            return len(pending)
+
+    def set_vectors(self, pairs: Iterable[Tuple[str, Any]]) -> int:
+        """为已存在的 chunk 补写向量（例如从 kv 迁移的旧数据在首次检索时回填）。"""
+        with self._file_lock():
+            self.refresh()
+            todo = [(cid, v) for cid, v in pairs if cid in self._index and cid not in self._vec_rows and v is not None]
+            lines = self._append_vectors_locked(todo)
+            if not lines:
+                return 0
+            self._append_index_lines(lines)
+            self.refresh()
+            return len(lines)
+
+    def delete(self, chunk_ids: Iterable[str]) -> int:
+        """写入删除标记，同时从倒排索引中移除。"""
+        with self._file_lock():
+            self.refresh()
+            targets = [cid for cid in dict.fromkeys(chunk_ids) if cid in self._index]
+            if not targets:
+                return 0
+            self._append_index_lines([json.dumps(["#del", cid], ensure_ascii=False) for cid in targets])
+            self.refresh()
+            return len(targets)
+
+    def delete_doc(self, doc_id: int) -> int:
+        return self.delete(self.doc_chunk_ids(doc_id))
+
+    def clear(self):
+        with self._file_lock():
+            self._reset_locked()
+            for name in (self.INDEX_FILE, self.BLOB_FILE, self.VEC_FILE, self.META_FILE):
+                try:
+                    (self.root / name).unlink()
+                except FileNotFoundError:
+                    pass
+
+    # ------------------------------------------------------------------
+    # LightRAG kv_store_text_chunks.json compatibility
+    # ------------------------------------------------------------------
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f) or {}
+        except Exception:
+            return {}
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp = self.meta_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+    @staticmethod
+    def kv_mtime(kv_path: Path) -> float:
+        try:
+            return os.path.getmtime(kv_path)
+        except OSError:
+            return 0.0
+
+    def mark_kv_synced(self, kv_path: Path, before_write: float = 0.0):
+        """
+        记录 kv 文件当前 mtime，表示其内容已全部追加到本存储。
+
+        ``before_write`` 为本次写入前 kv 文件的 mtime：若存储当时尚未与之对齐（旧数据未迁移、
+        其他写入方的改动未导入），直接记录会让这些 chunk 永远不被导入，此时改为整文件导入。
+        """
+        mtime = self.kv_mtime(kv_path)
+        if not mtime:
+            return
+        with self._file_lock():
+            meta = self._read_meta()
+            synced = float(meta.get("kv_mtime") or 0)
+            if before_write > synced:
+                self.sync_from_kv(kv_path)
+                return
+            meta["kv_mtime"] = max(synced, mtime)
+            self._write_meta(meta)
+
+    def sync_from_kv(self, kv_path: Path) -> int:
+        """
+        当 kv_store_text_chunks.json 比上次对齐时更新（例如由其他写入方生成，或首次迁移），
+        一次性导入缺失的 chunk。正常插入路径走 append 增量写入，不会触发这里的整文件解析。
+        """
+        try:
+            mtime = os.path.getmtime(kv_path)
+        except OSError:
+            return 0
+        if mtime <= float(self._read_meta().get("kv_mtime") or 0):
+            return 0
+
+        with self._file_lock():
+            meta = self._read_meta()
+            if mtime <= float(meta.get("kv_mtime") or 0):
+                return 0
+            try:
+                with open(kv_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to import chunks from {kv_path}: {e}")
+                return 0
+
+            records = []
+            for cid, v in data.items():
+                if isinstance(v, dict):
+                    if "content" in v:
+                        records.append((cid, v["content"], v.get("file_path")))
+                elif isinstance(v, str):
+                    records.append((cid, v, None))
+            del data
+            added = self.append(records)
+            meta["kv_mtime"] = mtime
+            self._write_meta(meta)
+            if added:
+                logger.info(f"Imported {added} chunks from {kv_path.name} into chunk store")
+            return added
@@ -6,11 +6,11 @@ import logging
 import os
 import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from lightrag import LightRAG, QueryParam
-from lightrag.utils import EmbeddingFunc
+from lightrag.utils import EmbeddingFunc, compute_mdhash_id
 from openai import AsyncOpenAI, OpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -19,7 +19,12 @@ from app.core.config import settings
 from app.services.rag.config.settings import settings as rag_settings, LIGHTRAG_DIR, UPLOAD_DIR, DATA_DIR
 from app.models.knowledge import KnowledgeDocument
 from app.models.llm_model import LLMModel
+from app.services.rag.knowledge.ingest import IngestCheckpoint, IngestJob, IngestPipeline
 from app.services.rag.knowledge.parser import parse_local_file
+from app.services.rag.knowledge.text_cache import parsed_text_cache
+from app.services.rag.retrieval.chunk_store import ChunkStore, parse_doc_id
+from app.services.rag.retrieval.graph_index import GraphIndex, GraphIndexCache
+from app.services.rag.retrieval.segment_store import SegmentReader
 from app.services.storage.service import storage_service
 
 logger = logging.getLogger(__name__)
@@ -34,9 +39,12 @@ class LightRAGEngine:
     rag: Optional[LightRAG] = None
     _trans_cache: Dict[str, str] = {}
     _dim_meta_file: Path = LIGHTRAG_DIR / "vector_dim.meta"
-    _chunks_cache: Dict[str, str] = {}
-    _chunks_doc_map: Dict[str, str] = {}  # chunk_id -> file_path
-    _chunks_mtime: float = 0
+    _chunks_kv_file: Path = LIGHTRAG_DIR / "kv_store_text_chunks.json"
+    # 重建检查点放在 LIGHTRAG_DIR 之外，清库时不会被删除
+    _rebuild_checkpoint_file: Path = DATA_DIR / "lightrag_rebuild_checkpoint.json"
+    _rebuild_pipeline: Optional[IngestPipeline] = None
+    _chunk_store: ChunkStore = ChunkStore(LIGHTRAG_DIR / "chunk_store")
+    _graph_cache: GraphIndexCache = GraphIndexCache(LIGHTRAG_DIR / "graph_chunk_entity_relation.graphml")
 
     def __init__(self):
         self.working_dir = str(LIGHTRAG_DIR)
@@ -422,6 +430,8 @@ class LightRAGEngine:
                 logger.warning(f"Auto-detect embed dim failed, use heuristic {embed_dim}: {_e}")
 
             logger.info(f"Initializing LightRAG with model: {embed_model_name}, dim: {embed_dim}")
+            self._embed_dim = embed_dim
+            self._sync_embed_client = None
 
             # 初始化共享 Embedding 客户端
             embed_timeout = float(os.getenv("EMBEDDING_TIMEOUT", 600.0))
@@ -522,6 +532,10 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                     embedding_func=EmbeddingFunc(embedding_dim=embed_dim, max_token_size=8192, func=embedding_func),
                     chunk_token_size=1200,
                     chunk_overlap_token_size=100,
+                    embedding_batch_num=rag_settings.INGEST_EMBED_BATCH,
+                    embedding_func_max_async=rag_settings.INGEST_EMBED_MAX_ASYNC,
+                    llm_model_max_async=rag_settings.INGEST_LLM_MAX_ASYNC,
+                    max_parallel_insert=rag_settings.INGEST_BATCH_DOCS,
                     addon_params={
                         "language": "Chinese",
                         "entity_types": ["人物", "组织", "地点", "事件", "概念", "方法", "技术", "物品", "其他"],
@@ -536,6 +550,10 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                         embedding_func=EmbeddingFunc(embedding_dim=embed_dim, max_token_size=8192, func=embedding_func),
                         chunk_token_size=1200,
                         chunk_overlap_token_size=100,
+                        embedding_batch_num=rag_settings.INGEST_EMBED_BATCH,
+                        embedding_func_max_async=rag_settings.INGEST_EMBED_MAX_ASYNC,
+                        llm_model_max_async=rag_settings.INGEST_LLM_MAX_ASYNC,
+                        max_parallel_insert=rag_settings.INGEST_BATCH_DOCS,
                         addon_params={
                             "language": "Chinese",
                             "entity_types": ["人物", "组织", "地点", "事件", "概念", "方法", "技术", "物品", "其他"],
@@ -605,30 +623,161 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
 
     async def insert_text_async(self, text: str, description: str = None):
         logger.info(f"[LightRAG] insert_text_async called. Description: {description}")
+        await self.insert_texts_async([(text, description)])
+
+    async def insert_texts_async(self, items: List[Tuple[str, Optional[str]]]):
+        """
+        一次 ainsert 插入多篇文档：LightRAG 会跨文档批量请求嵌入，
+        并在 llm_model_max_async 限制内并发执行实体抽取。
+        """
         if not self.rag:
             raise RuntimeError("LightRAG not initialized")
+        if not items:
+            return
 
-        if description:
-            text_with_meta = f"--- Document Metadata ---\nSource: {description}\n------------------------\n\n{text}"
-        else:
-            text_with_meta = text
+        texts: List[str] = []
+        for text, description in items:
+            if description:
+                texts.append(f"--- Document Metadata ---\nSource: {description}\n------------------------\n\n{text}")
+            else:
+                texts.append(text)
+        # 显式指定文档 ID，插入完成后可据此从 doc_status 取回新生成的 chunk 列表
+        doc_keys = [compute_mdhash_id(t, prefix="doc-") for t in texts]
+
+        # 插入前先把 kv 文件中尚未导入的 chunk（升级前的旧数据、其他写入方）同步进 chunk 存储，
+        # 插入后才能只追加新 chunk 并把 kv 标记为已同步
+        await asyncio.to_thread(self._load_chunks_cache)
+        kv_mtime_before = self._chunk_store.kv_mtime(self._chunks_kv_file)
 
         retries = 3
         last_exception = None
         for i in range(retries):
             try:
-                await self.rag.ainsert(text_with_meta, file_paths=description if description else None)
+                if len(texts) == 1:
+                    await self.rag.ainsert(texts[0], ids=doc_keys[0], file_paths=items[0][1] or None)
+                else:
+                    file_paths = [description or "unknown_source" for _, description in items]
+                    await self.rag.ainsert(texts, ids=doc_keys, file_paths=file_paths)
                 try:
                     await self.rag._insert_done()
                 except Exception:
                     pass
+                for doc_key in doc_keys:
+                    await self._append_inserted_chunks(doc_key, kv_mtime_before)
+                self._graph_cache.invalidate()
                 return
             except Exception as e:
                 last_exception = e
-                import asyncio as _asyncio
-                await _asyncio.sleep(2 * (i + 1))
+                await asyncio.sleep(2 * (i + 1))
         raise last_exception
 
+    async def mount_segments(self, base_path: Optional[str] = None, embed: bool = True) -> Dict[str, int]:
+        """
+        挂载 Pathway LightRAGSink 写出的段文件（压缩段 + 其后的新段），
+        直接将实体 / 关系 / chunk 写入 LightRAG 的图、KV 与向量存储，无需经过 JSON 文件中转。
+        embed=False 时只写图与 KV，不计算向量。
+        """
+        if not self.rag:
+            raise RuntimeError("LightRAG not initialized")
+        data = await asyncio.to_thread(SegmentReader(str(base_path or LIGHTRAG_DIR)).load)
+        graph = self.rag.chunk_entity_relation_graph
+        now = int(time.time())
+
+        def _file_path(row: Dict[str, Any]) -> str:
+            return row.get("file_path") or f"pathway:{row.get('doc_id', 'unknown')}"
+
+        chunks, chunk_vdb, chunk_records = {}, {}, []
+        for key, row in data["chunk"].items():
+            content = row.get("text") or row.get("content") or ""
+            if not content:
+                continue
+            cid = row.get("chunk_id") or compute_mdhash_id(content, prefix="chunk-")
+            doc = {
+                "content": content,
+                "full_doc_id": str(row.get("doc_id", "unknown")),
+                "chunk_order_index": int(row.get("chunk_order_index", 0) or 0),
+                "tokens": int(row.get("tokens", 0) or 0),
+                "file_path": _file_path(row),
+            }
+            chunks[cid] = doc
+            chunk_vdb[cid] = {"content": content, "full_doc_id": doc["full_doc_id"], "file_path": doc["file_path"]}
+            chunk_records.append((cid, content, doc["file_path"]))
+
+        entity_vdb = {}
+        for key, row in data["entity"].items():
+            name = str(row.get("name") or row.get("entity_id") or key)
+            description = row.get("description") or ""
+            node = {
+                "entity_id": name,
+                "entity_type": row.get("entity_type") or "UNKNOWN",
+                "description": description,
+                "source_id": row.get("chunk_id") or row.get("source_chunk_id") or "",
+                "file_path": _file_path(row),
+                "created_at": now,
+            }
+            await graph.upsert_node(name, node)
+            entity_vdb[compute_mdhash_id(name, prefix="ent-")] = {
+                "content": f"{name}\n{description}",
+                "entity_name": name,
+                "source_id": node["source_id"],
+                "description": description,
+                "entity_type": node["entity_type"],
+                "file_path": node["file_path"],
+            }
+
+        relation_vdb = {}
+        for row in data["relation"].values():
+            src, tgt = str(row.get("source_id")), str(row.get("target_id"))
+            for node_id in (src, tgt):
+                if not await graph.has_node(node_id):
+                    await graph.upsert_node(node_id, {"entity_id": node_id, "entity_type": "UNKNOWN", "description": "",
+                                                      "source_id": "", "file_path": _file_path(row), "created_at": now})
+            description = row.get("description") or ""
+            keywords = row.get("relation_type") or row.get("keywords") or ""
+            edge = {
+                "weight": float(row.get("weight", 1.0) or 1.0),
+                "description": description,
+                "keywords": keywords,
+                "source_id": row.get("chunk_id") or "",
+                "file_path": _file_path(row),
+                "created_at": now,
+            }
+            await graph.upsert_edge(src, tgt, edge)
+            vdb_src, vdb_tgt = (tgt, src) if src > tgt else (src, tgt)
+            relation_vdb[compute_mdhash_id(vdb_src + vdb_tgt, prefix="rel-")] = {
+                "src_id": vdb_src,
+                "tgt_id": vdb_tgt,
+                "source_id": edge["source_id"],
+                "content": f"{keywords}\t{vdb_src}\n{vdb_tgt}\n{description}",
+                "keywords": keywords,
+                "description": description,
+                "weight": edge["weight"],
+                "file_path": edge["file_path"],
+            }
+
+        storages = [graph]
+        if chunks:
+            await self.rag.text_chunks.upsert(chunks)
+            storages.append(self.rag.text_chunks)
+        if embed:
+            for storage, payload in (
+                (self.rag.chunks_vdb, chunk_vdb),
+                (self.rag.entities_vdb, entity_vdb),
+                (self.rag.relationships_vdb, relation_vdb),
+            ):
+                if payload:
+                    await storage.upsert(payload)
+                    storages.append(storage)
+        for storage in storages:
+            await storage.index_done_callback()
+
+        if chunk_records:
+            await asyncio.to_thread(self._chunk_store.append, chunk_records)
+        self._graph_cache.invalidate()
+        stats = {"entities": len(entity_vdb), "relations": len(relation_vdb), "chunks": len(chunks)}
+        logger.info(f"[LightRAG] Mounted Pathway segments: {stats}")
+        return stats
+
     def query(self, query: str, mode: str = "mix", top_k: int = 60) -> str:
         if not self.rag:
             self._init_rag()
@@ -696,30 +845,96 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
             return f"查询出错: {str(e)}"
 
     def _load_chunks_cache(self):
-        chunks_path = LIGHTRAG_DIR / "kv_store_text_chunks.json"
-        if not chunks_path.exists():
-            return
+        """
+        刷新 chunk 存储的增量索引。
+        仅当 kv_store_text_chunks.json 被其他写入方更新（或首次迁移）时才会整文件导入一次。
+        """
+        try:
+            self._chunk_store.refresh()
+            self._chunk_store.sync_from_kv(self._chunks_kv_file)
+        except Exception as e:
+            logger.warning(f"Failed to refresh chunk store: {e}")
 
-        mtime = os.path.getmtime(str(chunks_path))
-        if mtime > self._chunks_mtime:
+    async def _append_inserted_chunks(self, doc_key: str, kv_mtime_before: float = 0.0):
+        """将刚插入文档的 chunk 增量追加到 chunk 存储，避免读取方重新解析整个 kv 文件。"""
+        try:
+            status = await self.rag.doc_status.get_by_id(doc_key)
+            chunk_ids = list((status or {}).get("chunks_list") or [])
+            if not chunk_ids:
+                return
+            rows = await self.rag.text_chunks.get_by_ids(chunk_ids)
+            vectors = {}
             try:
-                with open(chunks_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    new_cache = {}
-                    new_doc_map = {}
-                    for k, v in data.items():
-                        if isinstance(v, dict):
-                            if "content" in v:
-                                new_cache[k] = v["content"]
-                            if "file_path" in v:
-                                new_doc_map[k] = v["file_path"]
-                        elif isinstance(v, str):
-                            new_cache[k] = v
-                    self._chunks_cache = new_cache
-                    self._chunks_doc_map = new_doc_map
-                    self._chunks_mtime = mtime
+                storage = getattr(self.rag, "chunks_vdb", None)
+                if hasattr(storage, "get_vectors_by_ids"):
+                    vectors = await storage.get_vectors_by_ids(chunk_ids) or {}
             except Exception as e:
-                logger.warning(f"Failed to load chunks cache: {e}")
+                logger.warning(f"Failed to fetch chunk vectors, will backfill on first doc search: {e}")
+            records = [
+                (cid, row.get("content"), row.get("file_path"), vectors.get(cid))
+                for cid, row in zip(chunk_ids, rows)
+                if isinstance(row, dict) and row.get("content")
+            ]
+            await asyncio.to_thread(self._chunk_store.append, records)
+            await asyncio.to_thread(self._chunk_store.mark_kv_synced, self._chunks_kv_file, kv_mtime_before)
+        except Exception as e:
+            logger.warning(f"Failed to append inserted chunks to chunk store: {e}")
+
+    def _embed_texts_sync(self, texts: List[str]) -> Optional[np.ndarray]:
+        """同步计算 embedding（search_* 方法运行在工作线程中，无法复用异步客户端）。"""
+        cfg = getattr(self, "_embed_config", None)
+        if not cfg or not texts:
+            return None
+        if getattr(self, "_sync_embed_client", None) is None:
+            self._sync_embed_client = (
+                OpenAI(api_key=cfg.api_key, base_url=cfg.base_url) if cfg.base_url else OpenAI(api_key=cfg.api_key)
+            )
+        resp = self._sync_embed_client.embeddings.create(model=cfg.model_id, input=texts)
+        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+
+    def _backfill_chunk_vectors(self, chunk_ids: List[str], batch_size: int = 64):
+        """为缺少向量的 chunk（例如从 kv 迁移而来）补算向量，每个 chunk 只需计算一次。"""
+        have, _ = self._chunk_store.get_vectors(chunk_ids)
+        have_set = set(have)
+        missing = [cid for cid in chunk_ids if cid not in have_set]
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i : i + batch_size]
+            texts = [self._chunk_store.get_text(cid) or "" for cid in batch]
+            vecs = self._embed_texts_sync(texts)
+            if vecs is None or len(vecs) != len(batch):
+                return
+            self._chunk_store.set_vectors(zip(batch, vecs))
+
+    def _search_within_docs(self, doc_ids: List[int], query: str, top_k: int) -> Optional[List[Any]]:
+        """
+        预过滤向量检索：通过 doc_id -> chunk_id 倒排索引取出候选子集，
+        仅对这些 chunk 的向量做点积，代价与文档内 chunk 数成正比。
+        返回 [(chunk_id, score), ...]；索引中没有这些文档的 chunk 或向量不可用时返回 None，由调用方回退到全局检索。
+        """
+        chunk_ids: List[str] = []
+        for did in dict.fromkeys(doc_ids):
+            chunk_ids.extend(self._chunk_store.doc_chunk_ids(did))
+        if not chunk_ids:
+            return None
+        try:
+            self._backfill_chunk_vectors(chunk_ids)
+            ids, matrix = self._chunk_store.get_vectors(chunk_ids)
+            if matrix is None:
+                return None
+            q = self._embed_texts_sync([query])
+            if q is None or q.shape[1] != matrix.shape[1]:
+                return None
+            q = q[0]
+            norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0)
+            norms[norms == 0] = 1.0
+            scores = (matrix @ q) / norms
+            k = min(top_k, len(ids))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(ids[i], float(scores[i])) for i in top]
+        except Exception as e:
+            logger.warning(f"Doc-filtered vector search failed, fallback to global search: {e}")
+            return None
 
     def search_doc_chunks(self, doc_id: int, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         if not self.rag:
@@ -731,6 +946,18 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
         marker = f"doc#{doc_id}:"
         candidates = []
 
+        hits = self._search_within_docs([doc_id], query, top_k)
+        if hits is not None:
+            return [
+                {
+                    "id": cid,
+                    "content": self._chunk_store.get_text(cid) or "",
+                    "score": score,
+                    "file_path": self._chunk_store.get_file_path(cid) or f"doc#{doc_id}:Unknown",
+                }
+                for cid, score in hits
+            ]
+
         try:
             storage = getattr(self.rag, "chunks_vdb", None)
             if hasattr(storage, "search"):
@@ -742,16 +969,16 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                     if not cid and isinstance(r, dict):
                         cid = r.get("id") or r.get("__id__")
 
-                    if cid and cid in self._chunks_doc_map:
-                        fp = self._chunks_doc_map[cid]
+                    fp = self._chunk_store.get_file_path(cid) if cid else None
+                    if fp is not None:
                         if marker in fp:
                             preview = ""
                             try:
                                 preview = getattr(r, "text", None) or getattr(r, "content", None) or ""
                             except:
                                 pass
-                            if not preview and cid in self._chunks_cache:
-                                preview = self._chunks_cache[cid]
+                            if not preview:
+                                preview = self._chunk_store.get_text(cid) or ""
 
                             score = float(getattr(r, "score", 0.0) or 0.0)
                             candidates.append({"id": cid, "content": preview, "score": score, "file_path": fp})
@@ -761,8 +988,8 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                             preview = getattr(r, "text", None) or getattr(r, "content", None) or ""
                         except:
                             pass
-                        if not preview and cid and cid in self._chunks_cache:
-                            preview = self._chunks_cache[cid]
+                        if not preview and cid:
+                            preview = self._chunk_store.get_text(cid) or ""
 
                         if preview and marker in preview:
                             score = float(getattr(r, "score", 0.0) or 0.0)
@@ -780,130 +1007,111 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
             logger.warning(f"LightRAG doc chunk search failed: {e}")
         return []
 
-    def query_subgraph(self, query: str, top_k: int = 10) -> Dict[str, Any]:
+    def query_subgraph(self, query: str, top_k: int = 10, hops: int = 1) -> Dict[str, Any]:
         """
         Query the graph to find a subgraph related to the input query.
         1. Search for top_k related entities using vector search.
-        2. Extract the subgraph containing these entities and their neighbors (1-hop).
+        2. Extract the subgraph containing these entities and their neighbors (``hops``-hop).
         """
         if not self.rag:
             self._init_rag()
         if not self.rag:
             return {"nodes": {}, "edges": {}}
 
-        import networkx as nx
-        graphml_path = LIGHTRAG_DIR / "graph_chunk_entity_relation.graphml"
-        if not graphml_path.exists():
-            return {"nodes": {}, "edges": {}}
-
         try:
+            graph = self._graph_cache.get()
+            if graph is None:
+                return {"nodes": {}, "edges": {}}
+
             # 1. Find anchor entities
             candidates = self.search_entities(query, top_k=top_k)
             if not candidates:
                 return {"nodes": {}, "edges": {}}
             
             anchor_ids = [c["entity_name"] for c in candidates]
-            
-            # 2. Load Graph
-            G = nx.read_graphml(str(graphml_path))
-            
-            # 3. Extract Subgraph (Anchor nodes + 1-hop neighbors)
-            relevant_nodes = set(anchor_ids)
-            for node in anchor_ids:
-                if G.has_node(node):
-                    relevant_nodes.add(node)
-                    relevant_nodes.update(G.neighbors(node))
-            
-            # Filter to only existing nodes
-            existing_nodes = [n for n in relevant_nodes if G.has_node(n)]
-            if not existing_nodes:
+            anchors = graph.ids(anchor_ids)
+            if anchors.size == 0:
                 return {"nodes": {}, "edges": {}}
-                
-            subgraph = G.subgraph(existing_nodes)
-            
+
+            # 2. Extract Subgraph (Anchor nodes + k-hop neighbors)
+            node_ids = graph.k_hop(anchors, hops=hops)
+
             # Limit subgraph size if too large (e.g. max 100 nodes)
-            if len(subgraph.nodes) > 100:
+            if node_ids.size > 100:
                 # Keep anchors + high degree neighbors
-                pr = {n: d for n, d in subgraph.degree}
-                # Ensure anchors are kept
-                for anchor in anchor_ids:
-                    if anchor in pr:
-                        pr[anchor] += 1000 # Boost score
-                
-                top_nodes = [n for n, _ in sorted(pr.items(), key=lambda x: x[1], reverse=True)[:100]]
-                subgraph = G.subgraph(top_nodes)
+                score = graph.induced_degree(node_ids).astype(np.int64)
+                score[np.isin(node_ids, anchors)] += 1000 # Boost score
+                node_ids = node_ids[np.argsort(-score, kind="stable")[:100]]
 
-            # 4. Format Output
+            # 3. Format Output
+            anchor_set = set(anchor_ids)
             nodes = {}
-            edges = {}
-            
-            for node_id, data in subgraph.nodes(data=True):
+            for i in node_ids.tolist():
+                node_id = graph.names[i]
+                data = graph.node_attrs[i]
                 attrs = {k: v for k, v in data.items() if k not in ["entity_type"]}
                 nodes[node_id] = {
                     "name": node_id, 
                     "type": data.get("entity_type", "Entity"), 
                     "attributes": attrs,
-                    "symbolSize": 30 if node_id in anchor_ids else 10,
-                    "itemStyle": {"color": "#ee6666"} if node_id in anchor_ids else None
+                    "symbolSize": 30 if node_id in anchor_set else 10,
+                    "itemStyle": {"color": "#ee6666"} if node_id in anchor_set else None
                 }
 
-            for u, v, data in subgraph.edges(data=True):
-                edge_id = f"{u}_{v}"
-                edges[edge_id] = {
-                    "source": u,
-                    "target": v,
-                    "label": data.get("description", "related")[:20],
-                }
-
-            return {"nodes": nodes, "edges": edges}
+            return {"nodes": nodes, "edges": self._format_graph_edges(graph, node_ids)}
 
         except Exception as e:
             logger.error(f"Query subgraph failed: {e}")
             return {"nodes": {}, "edges": {}}
 
-    def get_graph_data(self, doc: Optional[KnowledgeDocument] = None) -> Dict[str, Any]:
-        import networkx as nx
-        graphml_path = LIGHTRAG_DIR / "graph_chunk_entity_relation.graphml"
-        
-        if not graphml_path.exists():
-            return {"nodes": {}, "edges": {}}
+    @staticmethod
+    def _format_graph_edges(graph: GraphIndex, node_ids: np.ndarray) -> Dict[str, Any]:
+        edges = {}
+        for e in graph.induced_edges(node_ids).tolist():
+            u = graph.names[graph.src[e]]
+            v = graph.names[graph.dst[e]]
+            edges[f"{u}_{v}"] = {
+                "source": u,
+                "target": v,
+                "label": graph.edge_attrs[e].get("description", "related")[:20],
+            }
+        return edges
 
+    def get_graph_data(self, doc: Optional[KnowledgeDocument] = None) -> Dict[str, Any]:
         try:
-            G = nx.read_graphml(str(graphml_path))
+            graph = self._graph_cache.get()
+            if graph is None:
+                return {"nodes": {}, "edges": {}}
 
             marker = ""
+            node_ids = None
             if doc:
                 fname = (doc.filename or "").strip()
                 oss_name = Path(doc.oss_key).name if getattr(doc, "oss_key", None) else ""
                 marker = f"doc#{doc.id}:" if getattr(doc, "id", None) else ""
-                keep = set()
-                for node_id, data in G.nodes(data=True):
-                    attrs = data or {}
-                    fp = str(attrs.get("file_path") or attrs.get("FILE_PATH") or "")
-                    sid = str(attrs.get("source_id") or attrs.get("SOURCE_ID") or "")
-                    is_match = False
-                    if marker:
-                        if marker in sid or marker in fp:
-                            is_match = True
-                    if not is_match and not marker and fname:
-                        if fname in fp or (oss_name and oss_name in fp):
-                            is_match = True
-                    if is_match:
-                        keep.add(node_id)
-                G = G.subgraph(keep) if keep else nx.Graph()
+                if marker:
+                    node_ids = graph.doc_nodes.get(int(doc.id), np.empty(0, dtype=np.int32))
+                else:
+                    keep = []
+                    for i, attrs in enumerate(graph.node_attrs):
+                        fp = str(attrs.get("file_path") or attrs.get("FILE_PATH") or "")
+                        if fname and (fname in fp or (oss_name and oss_name in fp)):
+                            keep.append(i)
+                    node_ids = np.asarray(keep, dtype=np.int32)
 
-            nodes = {}
-            edges = {}
-            pr = {}
             try:
-                pr = nx.pagerank(G)
+                node_ids, pr = graph.pagerank(node_ids)
             except Exception:
-                pr = {n: d for n, d in G.degree}
-            
-            top_nodes_ids = [n for n, _ in sorted(pr.items(), key=lambda x: x[1], reverse=True)[:200]]
-            subgraph = G.subgraph(top_nodes_ids)
+                if node_ids is None:
+                    node_ids = np.arange(len(graph), dtype=np.int32)
+                pr = graph.induced_degree(node_ids)
+
+            top_nodes_ids = node_ids[np.argsort(-pr, kind="stable")[:200]]
 
-            for node_id, data in subgraph.nodes(data=True):
+            nodes = {}
+            for i in top_nodes_ids.tolist():
+                node_id = graph.names[i]
+                data = graph.node_attrs[i]
                 attrs = {k: v for k, v in data.items() if k not in ["entity_type"]}
                 
                 # [Feature] Enrich chunks content from source_id
@@ -915,11 +1123,11 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                     for cid in chunk_ids:
                         # Filter chunks by document marker to avoid cross-document context contamination
                         if marker:
-                            fp = self._chunks_doc_map.get(cid)
+                            fp = self._chunk_store.get_file_path(cid)
                             if not fp or marker not in fp:
                                 continue
 
-                        content = self._chunks_cache.get(cid)
+                        content = self._chunk_store.get_text(cid)
                         if content:
                             chunks_data.append({"id": cid, "content": content})
                     if chunks_data:
@@ -927,15 +1135,7 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
 
                 nodes[node_id] = {"name": node_id, "type": data.get("entity_type", "Entity"), "attributes": attrs}
 
-            for u, v, data in subgraph.edges(data=True):
-                edge_id = f"{u}_{v}"
-                edges[edge_id] = {
-                    "source": u,
-                    "target": v,
-                    "label": data.get("description", "related")[:20],
-                }
-
-            return {"nodes": nodes, "edges": edges}
+            return {"nodes": nodes, "edges": self._format_graph_edges(graph, top_nodes_ids)}
         except Exception as e:
             logger.error(f"读取 GraphML 失败: {e}")
             return {"nodes": {}, "edges": {}}
@@ -954,10 +1154,9 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                 except Exception:
                     pass
             
-            # Clear memory cache
-            self._chunks_cache = {}
-            self._chunks_doc_map = {}
-            self._chunks_mtime = 0
+            # Drop in-process chunk index / mmap and graph index (files were removed above)
+            self._chunk_store.reset()
+            self._graph_cache.invalidate()
         except Exception:
             pass
 
@@ -969,68 +1168,111 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
         self.rag = None
         await self.ensure_initialized(db)
 
-    async def rebuild_store(self, db: AsyncSession, exclude_filenames: Optional[List[str]] = None, include_filenames: Optional[List[str]] = None, clear_existing: bool = True):
+    async def rebuild_store(
+        self,
+        db: AsyncSession,
+        exclude_filenames: Optional[List[str]] = None,
+        include_filenames: Optional[List[str]] = None,
+        clear_existing: bool = True,
+        resume: bool = False,
+    ):
+        """
+        重建知识库索引。解析、嵌入与实体抽取经 IngestPipeline 并行执行；
+        进度写入检查点，中断后以相同参数及 ``resume=True`` 再次调用会跳过已完成的文档（且不会再次清库）。
+        检查点签名包含当前 LLM / 嵌入模型配置，换模型后不会续跑旧进度。
+        """
         await self.ensure_initialized(db)
+        llm_cfg = getattr(self, "_llm_config", None)
+        embed_cfg = getattr(self, "_embed_config", None)
+        checkpoint = IngestCheckpoint(
+            self._rebuild_checkpoint_file,
+            IngestCheckpoint.make_signature(
+                exclude=sorted(exclude_filenames or []),
+                include=sorted(include_filenames or []),
+                clear=clear_existing,
+                llm=[getattr(llm_cfg, "model_id", None), getattr(llm_cfg, "base_url", None)],
+                embed=[getattr(embed_cfg, "model_id", None), getattr(embed_cfg, "base_url", None)],
+            ),
+        )
+        if not (resume and checkpoint.load(max_resumes=rag_settings.INGEST_MAX_RESUMES)):
+            checkpoint.clear()
         try:
-            if clear_existing:
+            if clear_existing and not checkpoint.resumed:
                 if os.path.exists(self.working_dir):
                     self._clean_vector_stores()
                 else:
                     os.makedirs(self.working_dir, exist_ok=True)
-            
+            checkpoint.save()
+
             self.rag = None
             await self.ensure_initialized(db)
             res = await db.execute(select(KnowledgeDocument).order_by(KnowledgeDocument.created_at.asc()))
             docs = res.scalars().all()
-            
+
+            jobs = []
+            filenames = {}
             for d in docs:
                 if include_filenames and d.filename not in include_filenames:
                     continue
                 if exclude_filenames and d.filename and d.filename in exclude_filenames:
                     continue
-                
-                try:
-                    temp_path = None
-                    text = ""
-                    try:
-                        if d.oss_key:
-                            if d.oss_key.startswith("local://"):
-                                local_name = d.oss_key.split("local://")[1]
-                                candidate = UPLOAD_DIR / local_name
-                                if candidate.exists():
-                                    text = parse_local_file(str(candidate))
-                                else:
-                                    logger.warning(f"[Rebuild] Local file missing: {candidate} (Doc ID: {d.id})")
-                            else:
-                                ext = os.path.splitext(d.filename or "")[1] or ".txt"
-                                temp_name = f"temp_rebuild_{d.id}{ext}"
-                                temp_path = Path(self.working_dir) / temp_name
-                                storage_service.download_file(d.oss_key, str(temp_path))
-                                text = parse_local_file(str(temp_path))
-                        else:
-                            # Assuming UPLOAD_DIR is available in parser or passed down?
-                            # Using DATA_DIR/temp as convention
-                            candidate = DATA_DIR / "temp" / (d.filename or "")
-                            if candidate.exists():
-                                text = parse_local_file(str(candidate))
-                            else:
-                                logger.warning(f"[Rebuild] File not found locally: {candidate} (Doc ID: {d.id})")
-                        
-                        if text:
-                            await self.insert_text_async(text, description=f"doc#{d.id}:{d.filename}")
-                        else:
-                             logger.warning(f"[Rebuild] Text extraction failed or empty for Doc ID: {d.id} ({d.filename})")
-                    finally:
-                        if temp_path and os.path.exists(temp_path):
-                            try:
-                                os.remove(temp_path)
-                            except Exception:
-                                pass
-                except Exception as e:
-                    logger.error(f"Failed to process document {d.filename} (id={d.id}): {e}")
+                jobs.append(IngestJob(doc_id=d.id, description=f"doc#{d.id}:{d.filename}", cache_key=d.oss_key))
+                filenames[d.id] = d.filename
+
+            pipeline = IngestPipeline(
+                self._insert_ingest_batch,
+                parse_workers=rag_settings.INGEST_PARSE_WORKERS,
+                queue_size=rag_settings.INGEST_QUEUE_SIZE,
+                batch_docs=rag_settings.INGEST_BATCH_DOCS,
+            )
+            self._rebuild_pipeline = pipeline
+            progress = await pipeline.run(
+                jobs, lambda job: self._prepare_ingest_job(job, filenames.get(job.doc_id)), checkpoint
+            )
+            logger.info(f"[Rebuild] Finished: {progress.to_dict()}")
+            if progress.failed:
+                # Keep the checkpoint: resuming with the same arguments retries only the failed docs
+                logger.warning(f"[Rebuild] {progress.failed} document(s) failed, checkpoint kept for retry")
+            else:
+                checkpoint.clear()
         except Exception as e:
             logger.error(f"LightRAG rebuild failed: {e}")
 
+    def get_rebuild_progress(self) -> Optional[Dict[str, Any]]:
+        pipeline = self._rebuild_pipeline
+        return pipeline.progress.to_dict() if pipeline else None
+
+    def _prepare_ingest_job(self, job: IngestJob, filename: Optional[str]) -> IngestJob:
+        """定位待解析的源文件；已有解析缓存时直接带上文本，跳过下载和解析。"""
+        oss_key = job.cache_key
+        if oss_key:
+            if oss_key.startswith("local://"):
+                candidate = UPLOAD_DIR / oss_key.split("local://")[1]
+                if not candidate.exists():
+                    raise FileNotFoundError(f"Local file missing: {candidate}")
+                job.source_path = str(candidate)
+                return job
+            text = parsed_text_cache.get_by_alias(oss_key)
+            if text:
+                job.text = text
+                return job
+            ext = os.path.splitext(filename or "")[1] or ".txt"
+            temp_path = Path(self.working_dir) / f"temp_rebuild_{job.doc_id}{ext}"
+            storage_service.download_file(oss_key, str(temp_path))
+            job.source_path = str(temp_path)
+            job.cleanup = True
+            return job
+
+        # Using DATA_DIR/temp as convention
+        candidate = DATA_DIR / "temp" / (filename or "")
+        if not candidate.exists():
+            raise FileNotFoundError(f"File not found locally: {candidate}")
+        job.source_path = str(candidate)
+        return job
+
+    async def _insert_ingest_batch(self, batch: List[IngestJob]):
+        await self.insert_texts_async([(job.text, job.description) for job in batch])
+
     def search_chunks(self, query: str, top_k: int = 5, doc_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
         if not self.rag:
             self._init_rag()
@@ -1039,7 +1281,28 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
         
         # Load cache for doc mapping
         self._load_chunks_cache()
-        
+
+        if doc_ids:
+            hits = self._search_within_docs(doc_ids, query, top_k)
+            if hits is not None:
+                items = []
+                for cid, score in hits:
+                    file_path = self._chunk_store.get_file_path(cid) or ""
+                    content = self._chunk_store.get_text(cid) or ""
+                    items.append(
+                        {
+                            "title": Path(file_path).name if file_path else "",
+                            "url": None,
+                            "page": None,
+                            "score": score,
+                            "preview": content[:200],
+                            "doc_id": parse_doc_id(file_path),
+                            "chunk_id": cid,
+                            "content": content,
+                        }
+                    )
+                return items
+
         try:
             storage = getattr(self.rag, "chunks_vdb", None)
             if hasattr(storage, "search"):
@@ -1064,22 +1327,17 @@ You are a helpful, rigorous, and intelligent assistant. You must answer the user
                     # Doc ID Filtering
                     doc_id = None
                     file_path = "Unknown"
-                    if cid and cid in self._chunks_doc_map:
-                        file_path = self._chunks_doc_map[cid]
+                    if cid and cid in self._chunk_store:
+                        file_path = self._chunk_store.get_file_path(cid)
                         # Parse doc_id from file_path (format: doc#123:filename)
-                        if file_path and "doc#" in file_path:
-                            try:
-                                doc_part = file_path.split("doc#")[1]
-                                if ":" in doc_part:
-                                    doc_id_str = doc_part.split(":")[0]
-                                    if doc_id_str.isdigit():
-                                        doc_id = int(doc_id_str)
-                            except:
-                                pass
+                        doc_id = parse_doc_id(file_path)
                     
                     if doc_ids and (doc_id is None or doc_id not in doc_ids):
                         continue
-                        
+
+                    if not preview and cid:
+                        preview = self._chunk_store.get_text(cid) or ""
+
                     items.append(
                         {
                             "title": Path(file_path).name if file_path else "", 
@@ -0,0 +1,236 @@
+import logging
+import os
+import pickle
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DOC_MARKER_RE = re.compile(r"doc#(\d+):")
+_SNAPSHOT_VERSION = 1
+
+
+class GraphIndex:
+    """
+    LightRAG 实体关系图的只读内存索引。
+
+    无向图以 CSR 形式保存（indptr / indices / edge_ids，每条边在两个端点下各出现一次），
+    另有 name→id 映射与 doc_id→节点倒排，邻域扩展、诱导子图与 PageRank 均为 NumPy 向量化实现。
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        node_attrs: List[Dict[str, Any]],
+        src: np.ndarray,
+        dst: np.ndarray,
+        edge_attrs: List[Dict[str, Any]],
+    ):
+        self.names = names
+        self.node_attrs = node_attrs
+        self.name_to_id = {n: i for i, n in enumerate(names)}
+        self.src = np.asarray(src, dtype=np.int32)
+        self.dst = np.asarray(dst, dtype=np.int32)
+        self.edge_attrs = edge_attrs
+        self.edge_weight = np.asarray(
+            [float(a.get("weight", 1.0) or 0.0) for a in edge_attrs], dtype=np.float64
+        )
+
+        n = len(names)
+        both_src = np.concatenate([self.src, self.dst])
+        both_dst = np.concatenate([self.dst, self.src])
+        both_eid = np.concatenate([np.arange(len(self.src))] * 2).astype(np.int32)
+        order = np.argsort(both_src, kind="stable")
+        self.indices = both_dst[order]
+        self.edge_ids = both_eid[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        if n:
+            np.cumsum(np.bincount(both_src, minlength=n), out=self.indptr[1:])
+        self.degree = np.diff(self.indptr)
+
+        self.doc_nodes: Dict[int, np.ndarray] = {}
+        buckets: Dict[int, List[int]] = {}
+        for i, attrs in enumerate(node_attrs):
+            text = f"{attrs.get('file_path') or attrs.get('FILE_PATH') or ''} {attrs.get('source_id') or attrs.get('SOURCE_ID') or ''}"
+            for d in set(_DOC_MARKER_RE.findall(text)):
+                buckets.setdefault(int(d), []).append(i)
+        for d, ids in buckets.items():
+            self.doc_nodes[d] = np.asarray(ids, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_graphml(cls, path: Path) -> "GraphIndex":
+        import networkx as nx
+
+        G = nx.read_graphml(str(path))
+        names = [str(n) for n in G.nodes]
+        node_attrs = [dict(G.nodes[n]) for n in G.nodes]
+        lookup = {n: i for i, n in enumerate(G.nodes)}
+        src, dst, edge_attrs = [], [], []
+        for u, v, data in G.edges(data=True):
+            src.append(lookup[u])
+            dst.append(lookup[v])
+            edge_attrs.append(dict(data))
+        return cls(names, node_attrs, np.asarray(src), np.asarray(dst), edge_attrs)
+
+    def _state(self) -> Tuple:
+        return (self.names, self.node_attrs, self.src, self.dst, self.edge_attrs)
+
+    # ------------------------------------------------------------------
+    # Lookup / traversal
+    # ------------------------------------------------------------------
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        out = [self.name_to_id[n] for n in names if n in self.name_to_id]
+        return np.asarray(out, dtype=np.int32)
+
+    def neighbors(self, node_ids: np.ndarray) -> np.ndarray:
+        """返回 node_ids 的所有邻居（可能重复）。"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if node_ids.size == 0:
+            return np.empty(0, dtype=np.int32)
+        starts = self.indptr[node_ids]
+        counts = self.indptr[node_ids + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int32)
+        # 把各节点的 [start, end) 区间展开为一维下标，避免逐节点切片
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self.indices[offsets + np.arange(total)]
+
+    def k_hop(self, seed_ids: np.ndarray, hops: int = 1) -> np.ndarray:
+        visited = np.zeros(len(self.names), dtype=bool)
+        frontier = np.unique(np.asarray(seed_ids, dtype=np.int32))
+        visited[frontier] = True
+        for _ in range(max(0, hops)):
+            nbrs = self.neighbors(frontier)
+            nbrs = np.unique(nbrs[~visited[nbrs]])
+            if nbrs.size == 0:
+                break
+            visited[nbrs] = True
+            frontier = nbrs
+        return np.flatnonzero(visited).astype(np.int32)
+
+    def induced_edges(self, node_ids: np.ndarray) -> np.ndarray:
+        member = np.zeros(len(self.names), dtype=bool)
+        member[np.asarray(node_ids, dtype=np.int64)] = True
+        return np.flatnonzero(member[self.src] & member[self.dst])
+
+    def induced_degree(self, node_ids: np.ndarray) -> np.ndarray:
+        """node_ids 中每个节点在诱导子图内的度数（与 node_ids 对齐）。"""
+        eids = self.induced_edges(node_ids)
+        deg = np.bincount(self.src[eids], minlength=len(self.names)) + np.bincount(
+            self.dst[eids], minlength=len(self.names)
+        )
+        return deg[np.asarray(node_ids, dtype=np.int64)]
+
+    def pagerank(
+        self, node_ids: Optional[np.ndarray] = None, alpha: float = 0.85, max_iter: int = 100, tol: float = 1.0e-6
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        诱导子图（默认整图）上的加权 PageRank，语义与 networkx.pagerank 一致（悬挂节点均匀分配）。
+        返回 (node_ids, scores)。
+        """
+        if node_ids is None:
+            node_ids = np.arange(len(self.names), dtype=np.int32)
+        node_ids = np.asarray(node_ids, dtype=np.int32)
+        n = node_ids.size
+        if n == 0:
+            return node_ids, np.empty(0)
+        local = np.full(len(self.names), -1, dtype=np.int64)
+        local[node_ids] = np.arange(n)
+        eids = self.induced_edges(node_ids)
+        w = self.edge_weight[eids]
+        s = np.concatenate([local[self.src[eids]], local[self.dst[eids]]])
+        t = np.concatenate([local[self.dst[eids]], local[self.src[eids]]])
+        w = np.concatenate([w, w])
+        out_w = np.bincount(s, weights=w, minlength=n)
+        dangling = out_w == 0
+        coef = np.divide(w, out_w[s], out=np.zeros_like(w), where=out_w[s] != 0)
+
+        x = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            prev = x
+            x = alpha * np.bincount(t, weights=prev[s] * coef, minlength=n)
+            x += (alpha * prev[dangling].sum() + 1.0 - alpha) / n
+            if np.abs(x - prev).sum() < n * tol:
+                break
+        return node_ids, x
+
+
+class GraphIndexCache:
+    """
+    进程级 GraphIndex 缓存。
+
+    以 GraphML 文件的 (mtime, size) 判定失效，也可在插入/清库后显式 invalidate()。
+    重新加载时优先读取同目录下的二进制快照（记录了对应 GraphML 的 mtime/size），
+    只有快照过期时才解析 XML，并顺带重写快照。
+    """
+
+    def __init__(self, graphml_path: Path, snapshot_path: Optional[Path] = None):
+        self.graphml_path = Path(graphml_path)
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else self.graphml_path.with_suffix(".snap")
+        self._index: Optional[GraphIndex] = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _source_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.graphml_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+            self._stamp = None
+
+    def get(self) -> Optional[GraphIndex]:
+        stamp = self._source_stamp()
+        if stamp is None:
+            return None
+        with self._lock:
+            if self._index is not None and self._stamp == stamp:
+                return self._index
+            index = self._load_snapshot(stamp)
+            if index is None:
+                index = GraphIndex.from_graphml(self.graphml_path)
+                self._write_snapshot(index, stamp)
+            self._index = index
+            self._stamp = stamp
+            return index
+
+    def _load_snapshot(self, stamp: Tuple[int, int]) -> Optional[GraphIndex]:
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable graph snapshot {self.snapshot_path}: {e}")
+            return None
+        if payload.get("version") != _SNAPSHOT_VERSION or tuple(payload.get("stamp") or ()) != stamp:
+            return None
+        return GraphIndex(*payload["state"])
+
+    def _write_snapshot(self, index: GraphIndex, stamp: Tuple[int, int]):
+        try:
+            tmp = self.snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(
+                    {"version": _SNAPSHOT_VERSION, "stamp": stamp, "state": index._state()},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Failed to write graph snapshot {self.snapshot_path}: {e}")
@@ -0,0 +1,141 @@
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# CJK 统一表意文字 / 假名 / 韩文连续片段，以及拉丁字母数字单词
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK_CHARS}]+|[A-Za-z0-9_]+")
+_CJK_RE = re.compile(f"[{_CJK_CHARS}]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    混合语种分词：CJK 片段切分为字符二元组（单字片段保留单字），拉丁文本按单词小写化。
+    """
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall(text or ""):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+class LexicalIndex:
+    """
+    单文档的 BM25 倒排索引。
+
+    倒排表以 CSR 形式保存（indptr / indices / weights），每个 posting 预先计算好 BM25 权重，
+    查询时只需按词项切片拼接后做一次 ``np.bincount`` 聚合，无需逐 chunk 的 Python 循环。
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.vocab: dict = {}
+
+        term_ids: List[int] = []
+        chunk_ids: List[int] = []
+        tfs: List[int] = []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for i, chunk in enumerate(chunks):
+            toks = tokenize(chunk)
+            lengths[i] = len(toks)
+            for term, tf in Counter(toks).items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                chunk_ids.append(i)
+                tfs.append(tf)
+
+        n_docs = len(chunks)
+        n_terms = len(self.vocab)
+        t = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(t, kind="stable")
+        self.indptr = np.zeros(n_terms + 1, dtype=np.int64)
+        if n_terms:
+            np.cumsum(np.bincount(t, minlength=n_terms), out=self.indptr[1:])
+        self.indices = np.asarray(chunk_ids, dtype=np.int32)[order]
+
+        df = np.diff(self.indptr).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+        avgdl = float(lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1.0 - b + b * lengths[self.indices] / (avgdl or 1.0))
+        self.weights = idf[t[order]] * tf * (k1 + 1.0) / (tf + norm)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def score(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        q_terms = Counter(tid for tid in (self.vocab.get(tok) for tok in tokenize(query)) if tid is not None)
+        if not q_terms:
+            return scores
+        idx_parts = []
+        w_parts = []
+        for tid, qtf in q_terms.items():
+            start, end = self.indptr[tid], self.indptr[tid + 1]
+            idx_parts.append(self.indices[start:end])
+            w_parts.append(self.weights[start:end] * qtf)
+        return np.bincount(
+            np.concatenate(idx_parts), weights=np.concatenate(w_parts), minlength=len(self.chunks)
+        ).astype(np.float32)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """返回 [(chunk 序号, 分数), ...]，完整短语命中额外加权。"""
+        if not self.chunks:
+            return []
+        k = min(top_k * 4, len(self.chunks))
+        if k <= 0:
+            return []
+        scores = self.score(query)
+        q = (query or "").strip()
+        cand = np.argpartition(-scores, k - 1)[:k]
+        if q:
+            for i in cand:
+                if q in self.chunks[i]:
+                    scores[i] += max(1.0, float(scores[i]))
+        cand = cand[np.argsort(-scores[cand])]
+        return [(int(i), float(scores[i])) for i in cand[:top_k] if scores[i] > 0]
+
+
+class LexicalIndexCache:
+    """按 (doc_id, 内容版本) 缓存 LexicalIndex，LRU 淘汰。"""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = max(1, int(maxsize))
+        self._items: "OrderedDict[Hashable, Tuple[Any, LexicalIndex]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doc_id: Hashable, version: Any) -> Optional[LexicalIndex]:
+        with self._lock:
+            item = self._items.get(doc_id)
+            if item is None or item[0] != version:
+                return None
+            self._items.move_to_end(doc_id)
+            return item[1]
+
+    def put(self, doc_id: Hashable, version: Any, index: LexicalIndex):
+        with self._lock:
+            self._items[doc_id] = (version, index)
+            self._items.move_to_end(doc_id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def get_or_build(
+        self, doc_id: Hashable, version: Any, loader: Callable[[], Optional[LexicalIndex]]
+    ) -> Optional[LexicalIndex]:
+        index = self.get(doc_id, version)
+        if index is None:
+            index = loader()
+            if index is not None:
+                self.put(doc_id, version, index)
+        return index
+
+    def invalidate(self, doc_id: Hashable):
+        with self._lock:
+            self._items.pop(doc_id, None)
@@ -0,0 +1,317 @@
+"""
+Append-only segment store written by the Pathway LightRAG sink and mounted by LightRAGEngine.
+
+Layout under ``base_path/segments``:
+
+- ``seg_<seq>.log``: length-prefixed records appended by the sink. Each record is
+  ``<length:u32><crc32:u32><kind:u8>`` followed by ``length`` bytes of compact JSON.
+  A torn tail (crash mid-append) is detected by length/CRC and ignored.
+- ``seg_<seq>.idx``: written when a segment is sealed; per-kind counts and the
+  doc_id -> [[kind, offset, length], ...] index of the segment.
+- ``compact_<seq>.log`` / ``.idx``: output of the compactor, covering every segment with
+  sequence <= ``seq``. Records are deduplicated by key (last write wins).
+
+Readers use the newest compacted segment plus the sealed/active segments after it, so
+segments already merged but not yet deleted are never read twice.
+"""
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENTITY, RELATION, CHUNK = 0, 1, 2
+KINDS = {"entity": ENTITY, "relation": RELATION, "chunk": CHUNK}
+KIND_NAMES = {v: k for k, v in KINDS.items()}
+
+_RECORD = struct.Struct("<IIB")
+_SEG_RE = re.compile(r"^(seg|compact)_(\d{12})\.log$")
+
+
+def record_key(kind: int, row: Dict[str, Any]) -> str:
+    """Identity used by compaction: later records with the same key replace earlier ones."""
+    if kind == ENTITY:
+        return str(row.get("entity_id") or row.get("name") or row.get("id"))
+    if kind == RELATION:
+        return f"{row.get('source_id')}\x1f{row.get('target_id')}\x1f{row.get('relation_type', '')}"
+    return str(row.get("chunk_id") or row.get("id") or zlib.crc32((row.get("text") or "").encode("utf-8")))
+
+
+def encode_record(kind: int, row: Dict[str, Any]) -> bytes:
+    payload = json.dumps(row, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    return _RECORD.pack(len(payload), zlib.crc32(payload), kind) + payload
+
+
+def iter_log(path: Path, start: int = 0) -> Iterator[Tuple[int, int, int, bytes]]:
+    """Yield (offset, kind, length, payload) for every complete record; stops at a torn tail."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            length, crc, kind = _RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"Truncated record in {path.name} at offset {offset}, ignoring tail")
+                return
+            yield offset, kind, length, payload
+            offset += _RECORD.size + length
+
+
+def _build_index(records: Iterable[Tuple[int, int, int, Dict[str, Any]]]) -> Dict[str, Any]:
+    counts = {name: 0 for name in KINDS}
+    doc_index: Dict[str, List[List[int]]] = {}
+    for offset, kind, length, row in records:
+        counts[KIND_NAMES.get(kind, "chunk")] += 1
+        doc_index.setdefault(str(row.get("doc_id", "unknown")), []).append([kind, offset, length])
+    return {"counts": counts, "doc_index": doc_index}
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class SegmentWriter:
+    """
+    Appends micro-batches to the active segment and seals it once it exceeds ``segment_bytes``
+    or ``max_records``. Sequence numbers are claimed with O_EXCL, so several writers
+    (e.g. multiple Pathway workers) can share a directory.
+    """
+
+    def __init__(self, base_path: str, segment_bytes: int = 64 * 1024 * 1024, max_records: int = 100000):
+        self.root = Path(base_path) / "segments"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._path: Optional[Path] = None
+        self._size = 0
+        self._records: List[Tuple[int, int, int, Dict[str, Any]]] = []
+
+    def _open_segment(self):
+        seq = max([s for _, s, _ in list_segments(self.root)] or [0]) + 1
+        while True:
+            path = self.root / f"seg_{seq:012d}.log"
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                break
+            except FileExistsError:
+                seq += 1
+        self._path, self._size, self._records = path, 0, []
+
+    def append(self, rows: Iterable[Dict[str, Any]]) -> int:
+        encoded = []
+        for row in rows:
+            kind = KINDS.get(row.get("type"))
+            if kind is not None:
+                encoded.append((kind, row, encode_record(kind, row)))
+        if not encoded:
+            return 0
+        with self._lock:
+            if self._path is None:
+                self._open_segment()
+            with open(self._path, "ab") as f:
+                offset = self._size
+                for kind, row, data in encoded:
+                    self._records.append((offset, kind, len(data) - _RECORD.size, row))
+                    offset += len(data)
+                f.write(b"".join(data for _, _, data in encoded))
+                f.flush()
+                os.fsync(f.fileno())
+                self._size = offset
+            if self._size >= self.segment_bytes or len(self._records) >= self.max_records:
+                self._seal_locked()
+        return len(encoded)
+
+    def seal(self):
+        with self._lock:
+            self._seal_locked()
+
+    def _seal_locked(self):
+        if self._path is None:
+            return
+        _write_json_atomic(self._path.with_suffix(".idx"), _build_index(self._records))
+        self._path, self._size, self._records = None, 0, []
+
+
+def list_segments(root: Path) -> List[Tuple[str, int, Path]]:
+    """[(kind "seg"/"compact", seq, path)] sorted by sequence."""
+    found = []
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return []
+    for name in names:
+        m = _SEG_RE.match(name)
+        if m:
+            found.append((m.group(1), int(m.group(2)), root / name))
+    return sorted(found, key=lambda s: (s[1], s[0] == "seg"))
+
+
+class SegmentReader:
+    """Reads the live view: newest compacted segment + segments written after it."""
+
+    def __init__(self, base_path: str):
+        self.root = Path(base_path) / "segments"
+
+    def live_segments(self) -> List[Tuple[str, int, Path]]:
+        segments = list_segments(self.root)
+        compacted = [s for s in segments if s[0] == "compact" and s[2].with_suffix(".idx").exists()]
+        floor = compacted[-1][1] if compacted else 0
+        live = [compacted[-1]] if compacted else []
+        live += [s for s in segments if s[0] == "seg" and s[1] > floor]
+        return live
+
+    def iter_records(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        for _, _, path in self.live_segments():
+            for _, kind, _, payload in iter_log(path):
+                yield kind, json.loads(payload)
+
+    def load(self, retries: int = 3) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Deduplicated records: {"entity": {key: row}, "relation": {...}, "chunk": {...}}."""
+        for attempt in range(retries):
+            out: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in KINDS}
+            try:
+                for kind, row in self.iter_records():
+                    bucket = out[KIND_NAMES.get(kind, "chunk")]
+                    key = record_key(kind, row)
+                    bucket.pop(key, None)
+                    bucket[key] = row
+                return out
+            except FileNotFoundError:
+                # A compaction replaced the segments we were reading; take the new view
+                if attempt == retries - 1:
+                    raise
+        return out
+
+    def doc_records(self, doc_id: str) -> List[Dict[str, Any]]:
+        """Records of one document, using the segment indexes (unsealed segments are scanned)."""
+        rows = []
+        for _, _, path in self.live_segments():
+            idx_path = path.with_suffix(".idx")
+            if not idx_path.exists():
+                for _, _, _, payload in iter_log(path):
+                    row = json.loads(payload)
+                    if str(row.get("doc_id", "unknown")) == str(doc_id):
+                        rows.append(row)
+                continue
+            with open(idx_path, encoding="utf-8") as f:
+                entries = json.load(f)["doc_index"].get(str(doc_id), [])
+            if not entries:
+                continue
+            with open(path, "rb") as f:
+                for _, offset, length in entries:
+                    f.seek(offset + _RECORD.size)
+                    rows.append(json.loads(f.read(length)))
+        return rows
+
+
+class SegmentCompactor:
+    """
+    Merges sealed segments into a new compacted segment (deduplicated, grouped by doc_id) and
+    removes the inputs. Runs in a daemon thread every ``interval`` seconds once at least
+    ``min_segments`` sealed segments are waiting. Segments left unsealed by a writer that died
+    are sealed after ``stale_seconds`` without writes.
+    """
+
+    def __init__(self, base_path: str, interval: float = 60.0, min_segments: int = 4, stale_seconds: float = 3600.0):
+        self.root = Path(base_path) / "segments"
+        self.interval = interval
+        self.min_segments = min_segments
+        self.stale_seconds = stale_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lightrag-compactor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"LightRAG segment compaction failed: {e}")
+
+    def seal_stale(self):
+        now = time.time()
+        for kind, _, path in list_segments(self.root):
+            idx_path = path.with_suffix(".idx")
+            if kind != "seg" or idx_path.exists() or now - path.stat().st_mtime < self.stale_seconds:
+                continue
+            records = [(off, k, length, json.loads(p)) for off, k, length, p in iter_log(path)]
+            _write_json_atomic(idx_path, _build_index(records))
+            logger.info(f"Sealed abandoned LightRAG segment {path.name}")
+
+    def compact(self, force: bool = False) -> Optional[Path]:
+        self.seal_stale()
+        live = SegmentReader(str(self.root.parent)).live_segments()
+        base = [s for s in live if s[0] == "compact"]
+        # Only the leading run of sealed segments is merged, so the compacted range stays
+        # contiguous; the active segment (no index yet) keeps growing
+        sealed = []
+        for s in live:
+            if s[0] != "seg":
+                continue
+            if not s[2].with_suffix(".idx").exists():
+                break
+            sealed.append(s)
+        if not sealed or (not force and len(sealed) < self.min_segments):
+            return None
+
+        merged: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        for _, _, path in base + sealed:
+            for _, kind, _, payload in iter_log(path):
+                row = json.loads(payload)
+                key = (kind, record_key(kind, row))
+                merged.pop(key, None)
+                merged[key] = row
+
+        # Group by doc_id so a document's records are contiguous on disk
+        ordered = sorted(merged.items(), key=lambda kv: (str(kv[1].get("doc_id", "unknown")), kv[0][0]))
+        seq = sealed[-1][1]
+        out_path = self.root / f"compact_{seq:012d}.log"
+        tmp_path = out_path.with_suffix(".log.tmp")
+        records = []
+        with open(tmp_path, "wb") as f:
+            offset = 0
+            for (kind, _), row in ordered:
+                data = encode_record(kind, row)
+                f.write(data)
+                records.append((offset, kind, len(data) - _RECORD.size, row))
+                offset += len(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, out_path)
+        # The index makes the compacted segment visible to readers; write it last
+        _write_json_atomic(out_path.with_suffix(".idx"), _build_index(records))
+
+        for _, _, path in base + sealed:
+            for p in (path, path.with_suffix(".idx")):
+                try:
+                    p.unlink()
+                except FileNotFoundError:
+                    pass
+        logger.info(f"Compacted {len(base) + len(sealed)} LightRAG segments into {out_path.name} ({len(records)} records)")
+        return out_path
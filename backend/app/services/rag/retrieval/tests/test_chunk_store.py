@@ -0,0 +1,126 @@
+import sys
+import os
+import json
+import tempfile
+from pathlib import Path
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import unittest
+from app.services.rag.retrieval.chunk_store import ChunkStore
+
+
+class TestChunkStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "chunk_store"
+        self.store = ChunkStore(self.root)
+
+    def tearDown(self):
+        self.store.reset()
+        self.tmp.cleanup()
+
+    def test_append_and_read(self):
+        added = self.store.append([
+            ("chunk-1", "第一段内容", "doc#1:a.pdf"),
+            ("chunk-2", "second chunk", "doc#2:b.txt"),
+        ])
+        self.assertEqual(added, 2)
+        self.assertEqual(self.store.get_text("chunk-1"), "第一段内容")
+        self.assertEqual(self.store.get_text("chunk-2"), "second chunk")
+        self.assertEqual(self.store.get_file_path("chunk-2"), "doc#2:b.txt")
+        self.assertIsNone(self.store.get_text("missing"))
+
+    def test_duplicate_ids_are_skipped(self):
+        self.store.append([("chunk-1", "a", "doc#1:a")])
+        added = self.store.append([("chunk-1", "b", "doc#1:a"), ("chunk-3", "c", "doc#3:c")])
+        self.assertEqual(added, 1)
+        self.assertEqual(self.store.get_text("chunk-1"), "a")
+
+    def test_other_reader_sees_incremental_appends(self):
+        reader = ChunkStore(self.root)
+        self.store.append([("chunk-1", "a" * 100, "doc#1:a")])
+        reader.refresh()
+        self.assertEqual(reader.get_text("chunk-1"), "a" * 100)
+
+        # Growth after the blob is already mapped triggers a remap
+        self.store.append([("chunk-2", "b" * 100, "doc#1:a")])
+        self.assertEqual(reader.refresh(), 1)
+        self.assertEqual(reader.get_text("chunk-2"), "b" * 100)
+        reader.reset()
+
+    def test_clear_resets_readers(self):
+        reader = ChunkStore(self.root)
+        self.store.append([("chunk-1", "a", "doc#1:a")])
+        reader.refresh()
+        self.store.clear()
+        self.store.append([("chunk-9", "z", "doc#9:z")])
+        reader.refresh()
+        self.assertNotIn("chunk-1", reader)
+        self.assertEqual(reader.get_text("chunk-9"), "z")
+        reader.reset()
+
+    def test_sync_from_kv_imports_once(self):
+        kv_path = Path(self.tmp.name) / "kv_store_text_chunks.json"
+        kv_path.write_text(json.dumps({
+            "chunk-a": {"content": "alpha", "file_path": "doc#1:a"},
+            "chunk-b": "legacy string chunk",
+        }), encoding="utf-8")
+        self.assertEqual(self.store.sync_from_kv(kv_path), 2)
+        self.assertEqual(self.store.sync_from_kv(kv_path), 0)
+        self.assertEqual(self.store.get_text("chunk-b"), "legacy string chunk")
+        self.assertEqual(self.store.get_file_path("chunk-a"), "doc#1:a")
+
+    def test_mark_synced_imports_legacy_kv_chunks(self):
+        kv_path = Path(self.tmp.name) / "kv_store_text_chunks.json"
+        kv_path.write_text(json.dumps({"chunk-old": {"content": "legacy"}}), encoding="utf-8")
+        before = ChunkStore.kv_mtime(kv_path)
+        # 新上传写入 kv 并追加到存储，此前旧 chunk 从未导入
+        kv_path.write_text(json.dumps({
+            "chunk-old": {"content": "legacy"},
+            "chunk-new": {"content": "fresh"},
+        }), encoding="utf-8")
+        os.utime(kv_path, (before + 1, before + 1))
+        self.store.append([("chunk-new", "fresh", "")])
+        self.store.mark_kv_synced(kv_path, before)
+        self.assertEqual(self.store.get_text("chunk-old"), "legacy")
+        self.assertEqual(self.store.sync_from_kv(kv_path), 0)
+
+    def test_doc_index_and_vectors(self):
+        self.store.append([
+            ("chunk-1", "a", "doc#1:a.pdf", [1.0, 0.0]),
+            ("chunk-2", "b", "doc#1:a.pdf", None),
+            ("chunk-3", "c", "doc#12:c.pdf", [0.0, 1.0]),
+        ])
+        self.assertEqual(sorted(self.store.doc_chunk_ids(1)), ["chunk-1", "chunk-2"])
+        self.assertEqual(self.store.doc_chunk_ids(12), ["chunk-3"])
+
+        ids, matrix = self.store.get_vectors(self.store.doc_chunk_ids(1))
+        self.assertEqual(ids, ["chunk-1"])
+        self.assertEqual(matrix.tolist(), [[1.0, 0.0]])
+
+        self.assertEqual(self.store.set_vectors([("chunk-2", [0.5, 0.5])]), 1)
+        ids, matrix = self.store.get_vectors(["chunk-2", "chunk-3"])
+        self.assertEqual(ids, ["chunk-2", "chunk-3"])
+        self.assertEqual(matrix.tolist(), [[0.5, 0.5], [0.0, 1.0]])
+
+    def test_delete_doc_updates_inverted_index(self):
+        self.store.append([
+            ("chunk-1", "a", "doc#1:a.pdf"),
+            ("chunk-2", "b", "doc#2:b.pdf"),
+        ])
+        reader = ChunkStore(self.root)
+        reader.refresh()
+        self.assertEqual(self.store.delete_doc(1), 1)
+        reader.refresh()
+        self.assertEqual(reader.doc_chunk_ids(1), [])
+        self.assertNotIn("chunk-1", reader)
+        self.assertEqual(reader.doc_chunk_ids(2), ["chunk-2"])
+        reader.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import sys
+import os
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import unittest
+from app.services.rag.retrieval.chunk_store import ChunkStore
+from app.services.rag.retrieval.engines.lightrag import LightRAGEngine
+
+
+class FakeChunksVdb:
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    def search(self, query, top_k):
+        self.calls += 1
+        return self.results
+
+
+class TestDocFilteredSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.engine = LightRAGEngine.__new__(LightRAGEngine)
+        self.engine._chunk_store = ChunkStore(Path(self.tmp.name) / "chunk_store")
+        self.engine._chunks_kv_file = Path(self.tmp.name) / "kv_store_text_chunks.json"
+        self.vdb = FakeChunksVdb([SimpleNamespace(id="chunk-kv", content="doc#7:report.pdf budget table", score=0.9)])
+        self.engine.rag = SimpleNamespace(chunks_vdb=self.vdb)
+
+    def test_doc_missing_from_index_falls_back_to_global_search(self):
+        # chunk 只存在于 kv / 向量库，chunk 存储的倒排索引里没有该文档
+        self.assertIsNone(self.engine._search_within_docs([7], "budget", 5))
+        hits = self.engine.search_doc_chunks(7, "budget", top_k=5)
+        self.assertEqual(self.vdb.calls, 1)
+        self.assertEqual([h["id"] for h in hits], ["chunk-kv"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import networkx as nx
+import numpy as np
+
+from app.services.rag.retrieval.graph_index import GraphIndex, GraphIndexCache
+
+
+def _sample_graph() -> nx.Graph:
+    G = nx.Graph()
+    G.add_node("A", entity_type="组织", source_id="chunk-1", file_path="doc#1:a.pdf")
+    G.add_node("B", entity_type="人物", source_id="chunk-2", file_path="doc#1:a.pdf<SEP>doc#2:b.pdf")
+    G.add_node("C", entity_type="地点", source_id="chunk-3", file_path="doc#2:b.pdf")
+    G.add_node("D", entity_type="概念", source_id="chunk-4", file_path="doc#3:c.pdf")
+    G.add_node("E", entity_type="概念", source_id="chunk-5", file_path="doc#3:c.pdf")
+    G.add_edge("A", "B", weight=1.0, description="works with")
+    G.add_edge("B", "C", weight=2.0, description="located in")
+    G.add_edge("C", "D", weight=0.5, description="near")
+    return G
+
+
+class TestGraphIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "graph.graphml"
+        self.G = _sample_graph()
+        nx.write_graphml(self.G, str(self.path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_k_hop_and_induced_edges(self):
+        g = GraphIndex.from_graphml(self.path)
+        one = {g.names[i] for i in g.k_hop(g.ids(["A"]), hops=1)}
+        two = {g.names[i] for i in g.k_hop(g.ids(["A"]), hops=2)}
+        self.assertEqual(one, {"A", "B"})
+        self.assertEqual(two, {"A", "B", "C"})
+        edges = {(g.names[g.src[e]], g.names[g.dst[e]]) for e in g.induced_edges(g.ids(["A", "B", "C"]))}
+        self.assertEqual({frozenset(e) for e in edges}, {frozenset("AB"), frozenset("BC")})
+        self.assertEqual(sorted(g.names[i] for i in g.doc_nodes[2]), ["B", "C"])
+
+    def test_pagerank_matches_networkx(self):
+        g = GraphIndex.from_graphml(self.path)
+        ids, scores = g.pagerank()
+        from networkx.algorithms.link_analysis.pagerank_alg import _pagerank_python
+
+        expected = _pagerank_python(nx.read_graphml(str(self.path)))
+        for i, s in zip(ids.tolist(), scores.tolist()):
+            self.assertAlmostEqual(s, expected[g.names[i]], places=4)
+
+    def test_cache_uses_snapshot_and_reloads_on_change(self):
+        cache = GraphIndexCache(self.path)
+        first = cache.get()
+        self.assertIs(cache.get(), first)
+        self.assertTrue(cache.snapshot_path.exists())
+
+        # 冷启动直接读快照，不解析 GraphML
+        cold = GraphIndexCache(self.path)
+        with mock.patch.object(GraphIndex, "from_graphml", side_effect=AssertionError("parsed xml")):
+            self.assertEqual(len(cold.get()), 5)
+
+        self.G.add_edge("D", "E")
+        nx.write_graphml(self.G, str(self.path))
+        os.utime(self.path, ns=(1, 1))
+        reloaded = cache.get()
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(len(reloaded.src), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import unittest
+from app.services.rag.retrieval.lexical import LexicalIndex, LexicalIndexCache, tokenize
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_cjk_bigrams_and_latin_words(self):
+        self.assertEqual(tokenize("智能工厂 Smart-Factory"), ["智能", "能工", "工厂", "smart", "factory"])
+
+    def test_single_cjk_char_kept(self):
+        self.assertEqual(tokenize("2024年"), ["2024", "年"])
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LexicalIndex([
+            "智能工厂建设加速，产值提升了20%。",
+            "今天天气很好，适合出行。",
+            "Smart factory construction accelerated in 2024.",
+            "工厂的安全管理制度。",
+        ])
+
+    def test_cjk_ranking(self):
+        hits = self.index.search("智能工厂", top_k=2)
+        self.assertEqual(hits[0][0], 0)
+        self.assertEqual([i for i, _ in hits], [0, 3])
+
+    def test_latin_query(self):
+        hits = self.index.search("FACTORY", top_k=3)
+        self.assertEqual([i for i, _ in hits], [2])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("量子计算", top_k=3), [])
+
+    def test_empty_index(self):
+        self.assertEqual(LexicalIndex([]).search("anything"), [])
+
+
+class TestLexicalIndexCache(unittest.TestCase):
+
+    def test_version_and_lru_eviction(self):
+        cache = LexicalIndexCache(maxsize=2)
+        builds = []
+
+        def loader(tag):
+            def _load():
+                builds.append(tag)
+                return LexicalIndex([tag])
+            return _load
+
+        cache.get_or_build(1, "v1", loader("a"))
+        cache.get_or_build(1, "v1", loader("a"))
+        self.assertEqual(builds, ["a"])
+
+        cache.get_or_build(1, "v2", loader("b"))
+        self.assertEqual(builds, ["a", "b"])
+
+        cache.get_or_build(2, "v1", loader("c"))
+        cache.get_or_build(3, "v1", loader("d"))
+        self.assertIsNone(cache.get(1, "v2"))
+        self.assertIsNotNone(cache.get(3, "v1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
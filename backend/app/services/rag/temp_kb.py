@@ -4,7 +4,7 @@ import logging
 from typing import List, Dict, Any
 from pathlib import Path
 from app.services.rag.knowledge.service import kb_service
-from app.services.rag.knowledge.parser import parse_local_file_chunks
+from app.services.rag.knowledge.parser import iter_local_file_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -29,22 +29,13 @@ class TempKnowledgeBase:
             logger.error(f"Failed to add temp document {file_path}: {e}")
 
     def _add_document_sync(self, session_id: str, file_path: str):
-        pages = parse_local_file_chunks(file_path)
-        if not pages:
-            return
-            
         all_chunks_text = []
         all_metas = []
         
-        # Chunk per page to keep page number
-        for p in pages:
-            page_num = p.get("page")
-            text = p.get("text", "")
-            if not text: continue
-            
-            page_chunks = kb_service._chunk_text(text)
-            all_chunks_text.extend(page_chunks)
-            all_metas.extend([{"page": page_num}] * len(page_chunks))
+        # Chunk per page to keep page number; plain text files are streamed
+        for c in iter_local_file_chunks(file_path):
+            all_chunks_text.append(c["text"])
+            all_metas.append({"page": c.get("page")})
             
         if not all_chunks_text:
             return
@@ -1,75 +1,113 @@
 import re
-from typing import List
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from app.services.rag.config.settings import settings
 
-def chunk_text(text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
-    strategy = (settings.CHUNK_STRATEGY or "semantic").lower()
-    size = chunk_size or settings.CHUNK_SIZE or 1200
-    ov = overlap or settings.CHUNK_OVERLAP or 120
-    
-    if strategy == "fixed":
-        chunks = []
-        start = 0
-        L = len(text)
-        while start < L:
-            end = min(start + size, L)
-            chunks.append(text[start:end])
-            start = end - ov
-            if start >= end:
-                start = end
-        return chunks
-        
-    paras = [p.strip() for p in text.split("\n\n") if p.strip()]
-    if not paras:
-        paras = [text]
+_SENT_SPLIT_RE = re.compile(r"(?<=[。！？!?；;．.])\s+")
+
+# tiktoken 编码器按名称缓存在模块级，避免每次 chunk_text 都重新查找
+_ENCODERS: Dict[str, object] = {}
 
-    def split_sentences(t: str) -> List[str]:
-        t = t.replace("\r", "\n")
-        sents = re.split(r"(?<=[。！？!?；;．.])\s+", t)
-        sents = [s.strip() for s in sents if s.strip()]
-        return sents
 
-    token_count = None
-    if settings.CHUNK_TOKENIZER:
+def _get_token_counter() -> Optional[Callable[[str], int]]:
+    name = settings.CHUNK_TOKENIZER
+    if not name:
+        return None
+    enc = _ENCODERS.get(name)
+    if enc is None:
         try:
             import tiktoken
-            enc = tiktoken.get_encoding(settings.CHUNK_TOKENIZER)
-            token_count = lambda s: len(enc.encode(s))
+            enc = tiktoken.get_encoding(name)
         except Exception:
-            token_count = None
+            return None
+        _ENCODERS[name] = enc
+    return lambda s: len(enc.encode(s))
+
+
+def split_sentences(t: str) -> List[str]:
+    t = t.replace("\r", "\n")
+    sents = _SENT_SPLIT_RE.split(t)
+    return [s.strip() for s in sents if s.strip()]
+
+
+def iter_paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    """
+    将按行迭代的文本（如打开的文件对象）按空行切分为段落，逐段产出，不整体读入内存。
+    """
+    buf: List[str] = []
+    for line in lines:
+        if line.strip():
+            buf.append(line)
+        elif buf:
+            yield "".join(buf).strip()
+            buf = []
+    if buf:
+        yield "".join(buf).strip()
+
 
-    def measure(s: str) -> int:
-        if token_count:
-            return token_count(s)
-        return len(s)
+def _iter_fixed(paragraphs: Iterable[str], size: int, ov: int) -> Iterator[str]:
+    step = max(1, size - ov)
+    buf = ""
+    first = True
+    for p in paragraphs:
+        buf = p if first else f"{buf}\n\n{p}"
+        first = False
+        # 用游标切片，每段只压缩一次剩余部分，避免反复复制缓冲区
+        pos = 0
+        while len(buf) - pos > size:
+            yield buf[pos:pos + size]
+            pos += step
+        buf = buf[pos:]
+    if buf:
+        yield buf
 
-    chunks = []
-    cur = []
+
+def _iter_semantic(paragraphs: Iterable[str], size: int, ov: int) -> Iterator[str]:
+    measure = _get_token_counter() or len
+    cur: deque = deque()  # (sentence, measured length)
     cur_len = 0
-    sentences = []
-    for p in paras:
-        sentences.extend(split_sentences(p))
-    for sent in sentences:
-        m = measure(sent)
-        if cur_len + m <= size or not cur:
-            cur.append(sent)
-            cur_len += m
-        else:
-            chunks.append("".join(cur))
-            overlap_sents = []
+    for p in paragraphs:
+        for sent in split_sentences(p):
+            m = measure(sent)  # 每个句子只计量一次
+            if cur_len + m <= size or not cur:
+                cur.append((sent, m))
+                cur_len += m
+                continue
+            yield "".join(s for s, _ in cur)
+            # 从尾部保留不超过 ov 的句子作为重叠窗口
+            keep = 0
+            acc = 0
             if ov > 0:
-                rev = []
-                acc = 0
-                for s in reversed(cur):
-                    ms = measure(s)
-                    if acc + ms <= ov:
-                        rev.append(s)
-                        acc += ms
-                    else:
+                for _, ms in reversed(cur):
+                    if acc + ms > ov:
                         break
-                overlap_sents = list(reversed(rev))
-            cur = overlap_sents + [sent]
-            cur_len = sum(measure(s) for s in cur)
+                    acc += ms
+                    keep += 1
+            for _ in range(len(cur) - keep):
+                cur.popleft()
+            cur.append((sent, m))
+            cur_len = acc + m
     if cur:
-        chunks.append("".join(cur))
-    return chunks
+        yield "".join(s for s, _ in cur)
+
+
+def iter_chunks(paragraphs: Iterable[str], chunk_size: int = None, overlap: int = None) -> Iterator[str]:
+    """
+    流式切分：输入为段落迭代器（可以是生成器），按需产出 chunk。
+    semantic 策略下每个句子只分词一次，重叠窗口由 deque + 累计长度维护，整体为线性时间。
+    """
+    strategy = (settings.CHUNK_STRATEGY or "semantic").lower()
+    size = chunk_size or settings.CHUNK_SIZE or 1200
+    ov = overlap or settings.CHUNK_OVERLAP or 120
+    if strategy == "fixed":
+        return _iter_fixed(paragraphs, size, ov)
+    return _iter_semantic(paragraphs, size, ov)
+
+
+def chunk_text(text: str, chunk_size: int = None, overlap: int = None) -> List[str]:
+    if (settings.CHUNK_STRATEGY or "semantic").lower() == "fixed":
+        return list(iter_chunks([text] if text else [], chunk_size, overlap))
+    paras = [p.strip() for p in text.split("\n\n") if p.strip()]
+    if not paras:
+        paras = [text]
+    return list(iter_chunks(paras, chunk_size, overlap))
@@ -0,0 +1,53 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import io
+import unittest
+from unittest import mock
+
+from app.services.rag.utils import chunking
+from app.services.rag.utils.chunking import chunk_text, iter_chunks, iter_paragraphs
+
+
+class TestChunking(unittest.TestCase):
+
+    def test_semantic_overlap(self):
+        text = "第一句。 第二句。 第三句。 第四句。"
+        self.assertEqual(
+            chunk_text(text, chunk_size=8, overlap=4),
+            ["第一句。第二句。", "第二句。第三句。", "第三句。第四句。"],
+        )
+
+    def test_generator_matches_text(self):
+        paras = ["Alpha one. Alpha two.", "Beta one! Beta two?", "Gamma."] * 50
+        text = "\n\n".join(paras)
+        streamed = list(iter_chunks((p for p in paras), chunk_size=60, overlap=15))
+        self.assertEqual(streamed, chunk_text(text, chunk_size=60, overlap=15))
+
+    def test_iter_paragraphs(self):
+        f = io.StringIO("a\nb\n\n\nc\n  \nd")
+        self.assertEqual(list(iter_paragraphs(f)), ["a\nb", "c", "d"])
+
+    def test_each_sentence_measured_once(self):
+        calls = []
+
+        def counter():
+            return lambda s: calls.append(s) or len(s)
+
+        sents = [f"s{i}." for i in range(200)]
+        with mock.patch.object(chunking, "_get_token_counter", counter):
+            list(iter_chunks([" ".join(sents)], chunk_size=20, overlap=10))
+        self.assertEqual(len(calls), len(sents))
+
+    def test_fixed_terminates(self):
+        with mock.patch.object(chunking.settings, "CHUNK_STRATEGY", "fixed"):
+            chunks = chunk_text("x" * 25, chunk_size=10, overlap=3)
+        self.assertEqual(chunks, ["x" * 10, "x" * 10, "x" * 10, "x" * 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+DAG_TTL_SECONDS = 7 * 24 * 3600
+
+# Marks ARGV[1] completed and decrements its dependents (ARGV[2..]) in one atomic step, so a
+# worker dying between the two can't leave a node completed with its dependents never released.
+# Returns {added, completed count, remaining counter per dependent...}.
+_COMPLETE_SCRIPT = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return {0, redis.call('SCARD', KEYS[1])}
+end
+local result = {1, redis.call('SCARD', KEYS[1])}
+for i = 2, #ARGV do
+    result[#result + 1] = redis.call('HINCRBY', KEYS[2], ARGV[i], -1)
+end
+return result
+"""
+
+
+class TaskGraph:
+    """
+    Dependency graph of one parent task's subtasks, keyed by subtask name.
+
+    - dependents: name -> names that depend on it (reverse edges)
+    - remaining:  name -> number of dependencies not yet COMPLETED
+    - ids:        name -> sub_task id
+    """
+
+    def __init__(
+        self,
+        dependents: Dict[str, List[str]],
+        remaining: Dict[str, int],
+        ids: Dict[str, str],
+        completed: Iterable[str] = (),
+    ):
+        self.dependents = dependents
+        self.remaining = remaining
+        self.ids = ids
+        self.completed: Set[str] = set(completed)
+
+    @property
+    def total(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_sub_tasks(cls, sub_tasks: Iterable[Any]) -> "TaskGraph":
+        sub_tasks = list(sub_tasks)
+        ids = {t.name: t.id for t in sub_tasks}
+        id_to_name = {t.id: t.name for t in sub_tasks}
+        completed = {t.name for t in sub_tasks if t.status == "COMPLETED"}
+        dependents: Dict[str, List[str]] = {}
+        remaining: Dict[str, int] = {}
+        for t in sub_tasks:
+            count = 0
+            for dep in t.dependencies or []:
+                # Dependencies are stored as names; accept sub_task ids as well
+                dep_name = dep if dep in ids else id_to_name.get(dep, dep)
+                dependents.setdefault(dep_name, []).append(t.name)
+                if dep_name not in completed:
+                    # Unknown dependencies are never satisfied, matching the previous scan
+                    count += 1
+            remaining[t.name] = count
+        return cls(dependents, remaining, ids, completed)
+
+    def ready_names(self) -> List[str]:
+        return [n for n, c in self.remaining.items() if c == 0 and n not in self.completed]
+
+
+class DagStore:
+    """
+    Shared scheduling state (Redis hashes, in-process fallback when Redis is unavailable).
+
+    Completing a node only touches its direct dependents: a Lua script adds it to the completed
+    set and decrements their counters atomically, so concurrent workers agree on which dependent
+    reached zero without a rescan.
+    Keys: task_dag:{parent} (graph), :remaining (counters), :completed (set, makes completion idempotent).
+    """
+
+    _memory: Dict[str, TaskGraph] = {}
+
+    def __init__(self):
+        self._use_memory: Optional[bool] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _keys(parent_id: str) -> Tuple[str, str, str]:
+        base = f"task_dag:{parent_id}"
+        return base, f"{base}:remaining", f"{base}:completed"
+
+    async def _redis(self):
+        if self._use_memory:
+            return None
+        try:
+            redis = await get_redis_connection()
+            if self._use_memory is None:
+                await redis.ping()
+                self._use_memory = False
+            return redis
+        except Exception as e:
+            logger.warning(f"Redis unavailable for task DAG state: {e}. Using in-memory DAG store.")
+            self._use_memory = True
+            return None
+
+    async def save(self, parent_id: str, graph: TaskGraph) -> None:
+        redis = await self._redis()
+        if redis is None:
+            DagStore._memory[parent_id] = graph
+            return
+        base, rem_key, done_key = self._keys(parent_id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(base, rem_key, done_key)
+            pipe.hset(base, mapping={"dependents": json.dumps(graph.dependents), "ids": json.dumps(graph.ids)})
+            if graph.remaining:
+                pipe.hset(rem_key, mapping=graph.remaining)
+            if graph.completed:
+                pipe.sadd(done_key, *graph.completed)
+            for key in (base, rem_key, done_key):
+                pipe.expire(key, DAG_TTL_SECONDS)
+            await pipe.execute()
+
+    async def load(self, parent_id: str) -> Optional[TaskGraph]:
+        redis = await self._redis()
+        if redis is None:
+            return DagStore._memory.get(parent_id)
+        base, _, _ = self._keys(parent_id)
+        data = await redis.hgetall(base)
+        if not data:
+            return None
+        # Counters and the completed set stay in Redis; only the static structure is loaded
+        return TaskGraph(json.loads(data["dependents"]), {}, json.loads(data["ids"]))
+
+    async def complete(self, parent_id: str, graph: TaskGraph, name: str) -> Tuple[List[str], int]:
+        """
+        Mark ``name`` completed and decrement its direct dependents.
+        Returns (dependents that became ready, number of completed nodes).
+        A repeated completion of the same node is a no-op.
+        """
+        dependents = graph.dependents.get(name, [])
+        redis = await self._redis()
+        if redis is None:
+            async with self._lock:
+                g = DagStore._memory.get(parent_id) or graph
+                if name in g.completed:
+                    return [], len(g.completed)
+                g.completed.add(name)
+                ready = []
+                for d in dependents:
+                    g.remaining[d] = g.remaining.get(d, 0) - 1
+                    if g.remaining[d] == 0:
+                        ready.append(d)
+                return ready, len(g.completed)
+
+        _, rem_key, done_key = self._keys(parent_id)
+        added, total, *left = await redis.eval(_COMPLETE_SCRIPT, 2, done_key, rem_key, name, *dependents)
+        if not int(added):
+            return [], int(total)
+        ready = [d for d, n in zip(dependents, left) if int(n) == 0]
+        return ready, int(total)
+
+    async def drop(self, parent_id: str) -> None:
+        redis = await self._redis()
+        if redis is None:
+            DagStore._memory.pop(parent_id, None)
+            return
+        await redis.delete(*self._keys(parent_id))
+
+
+dag_store = DagStore()
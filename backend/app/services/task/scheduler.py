@@ -1,17 +1,20 @@
 import logging
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Set, Any
 from app.crud.crud_task import task as crud_task
 from app.crud.crud_task import sub_task as crud_sub_task
 from app.core.task_stream import TaskStream
+from app.models.task import SubTask
 from app.schemas.task import SubTaskUpdate, TaskUpdate
-import logging
+from app.services.task.dag import TaskGraph, dag_store
 
 logger = logging.getLogger(__name__)
 
 class Scheduler:
     def __init__(self):
         self.stream = TaskStream()
+        self.dag = dag_store
 
     def _resolve_context_variables(self, context: Any, outputs: Dict[str, Any]) -> Any:
         """
@@ -35,66 +38,105 @@ class Scheduler:
 
     async def check_ready_tasks(self, db: AsyncSession, parent_task_id: str):
         """
-        Check all subtasks for a given parent task.
-        If a subtask is PENDING and all its dependencies are COMPLETED,
-        mark it as QUEUED and push to Redis.
+        Full scan: (re)build the dependency graph for a parent task from the DB and queue every
+        PENDING subtask whose dependencies are all COMPLETED.
+        Used when a task is first split, and as a recovery path when the DAG state is missing.
         """
-        # Get all subtasks for this parent
         sub_tasks = await crud_sub_task.get_by_parent(db, parent_task_id)
-        
-        # Build a map of task name -> status/id for dependency resolution
-        # Assuming dependencies are stored as list of names
-        task_status_map: Dict[str, str] = {t.name: t.status for t in sub_tasks}
-        
-        queued_count = 0
-        
-        for t in sub_tasks:
-            if t.status == 'PENDING':
-                dependencies = t.dependencies or []
-                is_ready = True
-                
-                # Check if all dependencies are COMPLETED
-                for dep_name in dependencies:
-                    dep_status = task_status_map.get(dep_name)
-                    if dep_status != 'COMPLETED':
-                        is_ready = False
-                        break
-                
-                if is_ready:
-                    # Resolve inputs using dependency outputs
-                    dependency_outputs = {}
-                    for dep_name in dependencies:
-                        dep_task = next((dt for dt in sub_tasks if dt.name == dep_name), None)
-                        if dep_task and dep_task.output_result:
-                            dependency_outputs[dep_name] = dep_task.output_result
-                            
-                    resolved_input = self._resolve_context_variables(t.input_context, dependency_outputs)
-
-                    # Update status in DB
-                    # We optionally update input_context in DB if we want to persist resolved state
-                    # But usually we keep template. Let's just pass resolved to worker.
-                    await crud_sub_task.update(db, t, SubTaskUpdate(status='QUEUED'))
-                    
-                    # Push to Redis Queue
-                    task_payload = {
-                        "sub_task_id": t.id,
-                        "parent_task_id": t.parent_id,
-                        "task_type": t.task_type,
-                        "input_context": resolved_input,
-                        "name": t.name
-                    }
-                    await self.stream.push_task(task_payload)
-                    logger.info(f"Task {t.name} ({t.id}) queued for execution.")
-                    queued_count += 1
-        
+        graph = TaskGraph.from_sub_tasks(sub_tasks)
+        await self.dag.save(parent_task_id, graph)
+
+        by_name = {t.name: t for t in sub_tasks}
+        ready = [by_name[n] for n in graph.ready_names() if by_name[n].status == 'PENDING']
+        all_completed = bool(sub_tasks) and len(graph.completed) == graph.total
+
+        queued_count = await self._queue_tasks(db, ready, by_name)
+
         # Check if all tasks are completed to update parent status
-        if all(t.status == 'COMPLETED' for t in sub_tasks):
-            # Update parent task status
-            parent_task = await crud_task.get(db, parent_task_id)
-            if parent_task and parent_task.status != 'COMPLETED':
-                 await crud_task.update(db, parent_task, TaskUpdate(status='COMPLETED'))
-                 logger.info(f"Parent task {parent_task_id} COMPLETED.")
+        if all_completed:
+            await self._complete_parent(db, parent_task_id)
 
         return queued_count
 
+    async def on_task_completed(self, db: AsyncSession, parent_task_id: str, sub_task: SubTask) -> int:
+        """
+        Event-driven step after ``sub_task`` COMPLETED: decrement only its direct dependents,
+        then load and queue just the ones that became ready.
+        """
+        graph = await self.dag.load(parent_task_id)
+        if graph is None or sub_task.name not in graph.ids:
+            return await self.check_ready_tasks(db, parent_task_id)
+
+        ready_names, done = await self.dag.complete(parent_task_id, graph, sub_task.name)
+        queued_count = 0
+        if ready_names:
+            ready_ids = [graph.ids[n] for n in ready_names if n in graph.ids]
+            result = await db.execute(select(SubTask).filter(SubTask.id.in_(ready_ids)))
+            ready = [t for t in result.scalars().all() if t.status == 'PENDING']
+
+            dep_names = {d for t in ready for d in (t.dependencies or [])}
+            by_name = {}
+            if dep_names:
+                result = await db.execute(
+                    select(SubTask).filter(SubTask.parent_id == parent_task_id, SubTask.name.in_(dep_names))
+                )
+                by_name = {t.name: t for t in result.scalars().all()}
+            queued_count = await self._queue_tasks(db, ready, by_name)
+
+        if done >= graph.total:
+            await self._complete_parent(db, parent_task_id)
+            await self.dag.drop(parent_task_id)
+        return queued_count
+
+    async def _queue_tasks(self, db: AsyncSession, ready: List[SubTask], by_name: Dict[str, SubTask]) -> int:
+        """
+        Mark ``ready`` subtasks QUEUED in a single UPDATE and push them to the stream in one pipeline.
+        Only rows still PENDING are queued, so concurrent schedulers never double-queue a task.
+        """
+        if not ready:
+            return 0
+
+        payloads = {}
+        for t in ready:
+            # Resolve inputs using dependency outputs
+            dependency_outputs = {}
+            for dep_name in t.dependencies or []:
+                dep_task = by_name.get(dep_name)
+                if dep_task and dep_task.output_result:
+                    dependency_outputs[dep_name] = dep_task.output_result
+
+            resolved_input = self._resolve_context_variables(t.input_context, dependency_outputs)
+            # Keep the template in DB; pass the resolved context to the worker
+            payloads[t.id] = {
+                "sub_task_id": t.id,
+                "parent_task_id": t.parent_id,
+                "task_type": t.task_type,
+                "input_context": resolved_input,
+                "name": t.name
+            }
+
+        result = await db.execute(
+            update(SubTask)
+            .where(SubTask.id.in_(list(payloads)), SubTask.status == 'PENDING')
+            .values(status='QUEUED', version=SubTask.version + 1)
+            .returning(SubTask.id)
+            .execution_options(synchronize_session="fetch")
+        )
+        queued_ids = set(result.scalars().all())
+        await db.commit()
+
+        tasks = [p for tid, p in payloads.items() if tid in queued_ids]
+        # Push to Redis Queue
+        await self.stream.push_tasks(tasks)
+        for p in tasks:
+            logger.info(f"Task {p['name']} ({p['sub_task_id']}) queued for execution.")
+        return len(tasks)
+
+    async def _complete_parent(self, db: AsyncSession, parent_task_id: str):
+        # Update parent task status
+        parent_task = await crud_task.get(db, parent_task_id)
+        if parent_task and parent_task.status != 'COMPLETED':
+             await crud_task.update(db, parent_task, TaskUpdate(status='COMPLETED'))
+             logger.info(f"Parent task {parent_task_id} COMPLETED.")
+
 scheduler = Scheduler()
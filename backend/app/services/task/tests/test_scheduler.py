@@ -0,0 +1,98 @@
+import sys
+import os
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../../"))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+import asyncio
+import unittest
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.redis_stream import RedisStream
+from app.models.task import ExecutionTask, SubTask
+from app.services.task.dag import DagStore
+from app.services.task.scheduler import Scheduler
+
+
+class TestEventDrivenScheduler(unittest.TestCase):
+    """
+    DAG:  a -> b, a -> c, (b, c) -> d
+    """
+
+    def setUp(self):
+        RedisStream._memory_streams.clear()
+        RedisStream._memory_groups.clear()
+        DagStore._memory.clear()
+
+    async def _setup(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                ExecutionTask.metadata.create_all, tables=[ExecutionTask.__table__, SubTask.__table__]
+            )
+        Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        db = Session()
+        db.add(ExecutionTask(id="p", original_prompt="x", status="READY"))
+        deps = {"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"]}
+        for i, (name, d) in enumerate(deps.items()):
+            db.add(SubTask(id=f"id-{name}", parent_id="p", name=name, task_type="API_CALL",
+                           execution_order=i, dependencies=d, input_context={"q": "{{ a.v }}"} if name == "b" else None))
+        await db.commit()
+
+        scheduler = Scheduler()
+        scheduler.stream._use_memory = True
+        scheduler.dag._use_memory = True
+        return engine, db, scheduler
+
+    async def _complete(self, db, scheduler, name, output=None):
+        t = await db.get(SubTask, f"id-{name}")
+        t.status = "COMPLETED"
+        t.output_result = output or {"v": name}
+        await db.commit()
+        return await scheduler.on_task_completed(db, "p", t)
+
+    def _queued(self):
+        import json
+        return [json.loads(d["payload"]) for _, d in RedisStream._memory_streams.get("task_stream", [])]
+
+    def test_dependents_queued_on_completion(self):
+        async def run():
+            engine, db, scheduler = await self._setup()
+            self.assertEqual(await scheduler.check_ready_tasks(db, "p"), 1)
+            self.assertEqual([p["name"] for p in self._queued()], ["a"])
+
+            self.assertEqual(await self._complete(db, scheduler, "a", {"v": "A"}), 2)
+            queued = {p["name"]: p for p in self._queued()}
+            self.assertEqual(set(queued), {"a", "b", "c"})
+            self.assertEqual(queued["b"]["input_context"], {"q": "A"})
+            self.assertEqual((await db.get(SubTask, "id-b")).status, "QUEUED")
+
+            # 重复完成事件不会重复递减
+            self.assertEqual(await scheduler.on_task_completed(db, "p", await db.get(SubTask, "id-a")), 0)
+
+            self.assertEqual(await self._complete(db, scheduler, "b"), 0)
+            self.assertEqual(await self._complete(db, scheduler, "c"), 1)
+            self.assertEqual(self._queued()[-1]["name"], "d")
+
+            await self._complete(db, scheduler, "d")
+            self.assertEqual((await db.get(ExecutionTask, "p")).status, "COMPLETED")
+            await db.close()
+            await engine.dispose()
+
+        asyncio.run(run())
+
+    def test_missing_dag_state_falls_back_to_scan(self):
+        async def run():
+            engine, db, scheduler = await self._setup()
+            self.assertEqual(await self._complete(db, scheduler, "a"), 2)
+            await db.close()
+            await engine.dispose()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,10 @@ import json
 import logging
 import traceback
 import socket
+import time
 from datetime import datetime, timezone
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
 from app.core.task_stream import TaskStream
 from app.crud.crud_task import sub_task as crud_sub_task
@@ -56,7 +58,7 @@ async def process_task(task_data: dict):
             # Trigger Scheduler for dependents
             # Scheduler now uses TaskStream, so it will push next tasks to Redis Stream
             scheduler = Scheduler()
-            await scheduler.check_ready_tasks(db, parent_task_id)
+            await scheduler.on_task_completed(db, parent_task_id, db_task)
             
         except Exception as e:
             logger.error(f"Task execution failed: {e}")
@@ -66,28 +68,75 @@ async def process_task(task_data: dict):
             # Re-raise to prevent ACK in worker loop
             raise e
 
-async def worker_loop():
+async def handle_message(stream: TaskStream, msg_id: str, task_data: dict):
+    try:
+        await process_task(task_data)
+        await stream.ack_task(msg_id)
+        logger.info(f"Task {msg_id} acknowledged")
+    except Exception as e:
+        logger.error(f"Task {msg_id} processing failed: {e}")
+        # Do NOT ack, so it remains in PEL and is reclaimed (or dead-lettered) later
+
+async def worker_loop(concurrency: int = None):
     stream = TaskStream()
     await stream.ensure_infrastructure()
+
+    concurrency = max(1, concurrency or settings.TASK_WORKER_CONCURRENCY)
+    reclaim_idle = settings.TASK_STREAM_RECLAIM_IDLE_MS
+    reclaim_interval = max(1.0, reclaim_idle / 2000.0)
     
     # Generate unique consumer name
     consumer_name = f"worker-{socket.gethostname()}-{id(stream)}"
-    logger.info(f"Worker {consumer_name} started. Listening for tasks on {stream.stream_key}...")
+    logger.info(
+        f"Worker {consumer_name} started (concurrency={concurrency}). Listening for tasks on {stream.stream_key}..."
+    )
+
+    # msg_id -> running task
+    in_flight: dict = {}
+    last_reclaim = 0.0
+
+    def spawn(batch):
+        for msg_id, task_data in batch:
+            if msg_id in in_flight:
+                # Already running here: never dispatch the same message twice in one worker
+                continue
+            logger.info(f"Received task {msg_id}")
+            t = asyncio.create_task(handle_message(stream, msg_id, task_data))
+            in_flight[msg_id] = t
+            t.add_done_callback(lambda _, m=msg_id: in_flight.pop(m, None))
     
     while True:
         try:
-            # Block for 5 seconds waiting for a task
-            msg_id, task_data = await stream.pop_task(consumer_name, block=5000)
-            
-            if msg_id and task_data:
-                logger.info(f"Received task {msg_id}")
-                try:
-                    await process_task(task_data)
-                    await stream.ack_task(msg_id)
-                    logger.info(f"Task {msg_id} acknowledged")
-                except Exception as e:
-                    logger.error(f"Task {msg_id} processing failed: {e}")
-                    # Do NOT ack, so it remains in PEL for retry/claiming
+            now = time.monotonic()
+            if now - last_reclaim >= reclaim_interval:
+                last_reclaim = now
+                # Heartbeat: running tasks must not look idle to XAUTOCLAIM (ours or another worker's)
+                if in_flight:
+                    await stream.touch(consumer_name, list(in_flight))
+
+                # Periodically take over tasks left pending by failed/crashed workers
+                free = concurrency - len(in_flight)
+                if free > 0:
+                    reclaimed = await stream.reclaim_tasks(
+                        consumer_name,
+                        min_idle_time=reclaim_idle,
+                        count=free,
+                        max_deliveries=settings.TASK_STREAM_MAX_DELIVERIES,
+                    )
+                    if reclaimed:
+                        logger.info(f"Reclaimed {len(reclaimed)} stale task(s)")
+                        spawn(reclaimed)
+
+            free = concurrency - len(in_flight)
+            if free <= 0:
+                # Wake up for the next heartbeat even if every task is long-running
+                await asyncio.wait(list(in_flight.values()), timeout=reclaim_interval,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            # Block briefly when busy so completions are picked up promptly
+            block = 5000 if not in_flight else 200
+            spawn(await stream.pop_tasks(consumer_name, count=free, block=block))
                     
         except Exception as e:
             logger.error(f"Worker loop error: {e}")